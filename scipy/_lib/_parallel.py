@@ -0,0 +1,57 @@
+"""
+Splitting work between threads, for the functions taking an ``n_jobs``
+argument.
+"""
+from __future__ import division, print_function, absolute_import
+
+import threading
+from multiprocessing import cpu_count
+
+from scipy._lib.six import xrange
+
+
+def _num_jobs(n_jobs):
+    """
+    Returns the number of threads requested by `n_jobs`, where -1 stands
+    for the number of processors.
+    """
+    if n_jobs == -1:
+        return cpu_count()
+    elif n_jobs < 1:
+        raise ValueError("n_jobs must be a positive integer or -1")
+    return n_jobs
+
+
+def _run_threaded(func, n, n_jobs):
+    """
+    Calls ``func(start, stop)`` over contiguous chunks covering ``range(n)``.
+
+    Each chunk is handled by its own thread, so `func` is expected to release
+    the GIL for the bulk of its work.  An exception raised in any of the
+    threads is re-raised in the calling thread.
+    """
+    n_jobs = min(_num_jobs(n_jobs), n)
+    if n_jobs <= 1:
+        if n > 0:
+            func(0, n)
+        return
+
+    chunk = -(-n // n_jobs)
+    errors = []
+
+    def _thread_func(start, stop):
+        try:
+            func(start, stop)
+        except BaseException as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=_thread_func,
+                                args=(j * chunk, min(n, (j + 1) * chunk)))
+               for j in xrange(n_jobs) if j * chunk < n]
+    for t in threads:
+        t.daemon = True
+        t.start()
+    for t in threads:
+        t.join()
+    if errors:
+        raise errors[0]
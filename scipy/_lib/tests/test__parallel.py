@@ -0,0 +1,32 @@
+from __future__ import division, print_function, absolute_import
+
+from numpy.testing import assert_equal, assert_, assert_raises
+
+from scipy._lib._parallel import _num_jobs, _run_threaded
+
+
+def test__num_jobs():
+    assert_equal(_num_jobs(3), 3)
+    assert_(_num_jobs(-1) >= 1)
+    assert_raises(ValueError, _num_jobs, 0)
+    assert_raises(ValueError, _num_jobs, -2)
+
+
+def test__run_threaded():
+    for n in [0, 1, 5, 10]:
+        for n_jobs in [1, 3, 20]:
+            chunks = []
+            _run_threaded(lambda start, stop: chunks.append((start, stop)),
+                          n, n_jobs)
+            chunks.sort()
+            assert_equal(len(chunks), min(n, n_jobs))
+            assert_equal([i for a, b in chunks for i in range(a, b)],
+                         list(range(n)))
+
+
+def test__run_threaded_error():
+    def func(start, stop):
+        if start > 0:
+            raise KeyError(start)
+
+    assert_raises(KeyError, _run_threaded, func, 10, 3)
@@ -3,6 +3,7 @@ import numpy as np
 cimport numpy as np
 from libc.math cimport sqrt
 from libc.string cimport memset
+from libc.stdlib cimport qsort
 from cpython.mem cimport PyMem_Malloc, PyMem_Free
 
 cdef extern from "numpy/npy_math.h":
@@ -19,7 +20,8 @@ cdef linkage_distance_update *linkage_methods = [
     _single, _complete, _average, _centroid, _median, _ward, _weighted]
 
 
-cdef inline int condensed_index(int n, int i, int j):
+cdef inline np.npy_int64 condensed_index(np.npy_int64 n, np.npy_int64 i,
+                                        np.npy_int64 j):
     """
     Calculate the condensed index of element (i, j) in an n x n condensed
     matrix.
@@ -138,7 +140,6 @@ def cluster_maxclust_dist(double[:, :] Z, int[:] T, int n, int mc):
     """
     cdef double[:] max_dists = np.ndarray(n, dtype=np.double)
     get_max_dist_for_each_cluster(Z, max_dists, n)
-    # should use an O(n) algorithm
     cluster_maxclust_monocrit(Z, max_dists, T, n, mc)
 
 
@@ -161,74 +162,52 @@ def cluster_maxclust_monocrit(double[:, :] Z, double[:] MC, int[:] T,
     max_nc : int
         The maximum number of clusters.
     """
-    cdef int i, k, i_lc, i_rc, root, nc, lower_idx, upper_idx
-    cdef double thresh
-    cdef int[:] curr_node = np.ndarray(n, dtype=np.int32)
-
-    cdef int visited_size = (((n * 2) - 1) >> 3) + 1
-    cdef uchar *visited = <uchar *>PyMem_Malloc(visited_size)
-    if not visited:
-        raise MemoryError
-
-    max_illegal = -1
-    min_legal = MC[n - 2]
-
-    lower_idx = 0
-    upper_idx = n - 1
-    while upper_idx - lower_idx > 1:
-        i = (lower_idx + upper_idx) >> 1
-        thresh = MC[i]
+    cdef double[:] sorted_mc = np.sort(MC[:n - 1])
+    cluster_monocrit(Z, MC, T, maxclust_cutoff(sorted_mc, n, max_nc), n)
 
-        memset(visited, 0, visited_size)
-        nc = 0
-        k = 0
-        curr_node[0] = 2 * n - 2
 
-        while k >= 0:
-            root = curr_node[k] - n
-            i_lc = <int>Z[root, 0]
-            i_rc = <int>Z[root, 1]
+cdef double maxclust_cutoff(double[:] sorted_mc, int n, int max_nc):
+    """
+    The smallest cutoff forming at most `max_nc` flat clusters.
 
-            if MC[root] <= thresh:  # this subtree forms a cluster
-                nc += 1
-                if nc > max_nc:  # illegal
-                    break
-                k -= 1
-                set_visited(visited, i_lc)
-                set_visited(visited, i_rc)
-                continue
+    Every non-singleton cluster whose criterion is below the cutoff merges
+    two clusters, so that `k` of them leave ``n - k`` flat clusters.
 
-            if not is_visited(visited, i_lc):
-                set_visited(visited, i_lc)
-                if i_lc >= n:
-                    k += 1
-                    curr_node[k] = i_lc
-                    continue
-                else:  # singleton cluster
-                    nc += 1
-                    if nc > max_nc:
-                        break
+    Parameters
+    ----------
+    sorted_mc : ndarray
+        The monotonic criterion array, sorted.
+    n : int
+        The number of observations.
+    max_nc : int
+        The maximum number of clusters.
+    """
+    if max_nc >= n:
+        return -NPY_INFINITYF
+    if max_nc < 1:
+        max_nc = 1
+    return sorted_mc[n - max_nc - 1]
 
-            if not is_visited(visited, i_rc):
-                set_visited(visited, i_rc)
-                if i_rc >= n:
-                    k += 1
-                    curr_node[k] = i_rc
-                    continue
-                else:  # singleton cluster
-                    nc += 1
-                    if nc > max_nc:
-                        break
 
-            k -= 1
-
-        if nc > max_nc:
-            lower_idx = i
-        else:
-            upper_idx = i
+def maxclust_cutoffs(double[:] MC, int[:] max_nc, double[:] cutoffs, int n):
+    """
+    The smallest cutoffs forming at most `max_nc[i]` flat clusters.
 
-    PyMem_Free(visited)
-    cluster_monocrit(Z, MC, T, MC[upper_idx], n)
+    Parameters
+    ----------
+    MC : ndarray
+        The monotonic criterion array.
+    max_nc : ndarray
+        The maximum numbers of clusters.
+    cutoffs : ndarray
+        The array to store the cutoffs.
+    n : int
+        The number of observations.
+    """
+    cdef int i
+    cdef double[:] sorted_mc = np.sort(MC[:n - 1])
+    for i in range(max_nc.shape[0]):
+        cutoffs[i] = maxclust_cutoff(sorted_mc, n, max_nc[i])
 
 
 cpdef cluster_monocrit(double[:, :] Z, double[:] MC, int[:] T,
@@ -300,6 +279,156 @@ cpdef cluster_monocrit(double[:, :] Z, double[:] MC, int[:] T,
     PyMem_Free(visited)
 
 
+cpdef get_leaf_layout(double[:, :] Z, int[:] order, int[:] start, int[:] gap,
+                      int n, bint leaves_last=False):
+    """
+    Lay out the leaves of the linkage tree from left to right, as in a
+    pre-order traversal. Since a cluster is always formed after its children,
+    the nodes are visited top-down by decreasing index, without a stack.
+
+    Parameters
+    ----------
+    Z : ndarray
+        The linkage matrix.
+    order : ndarray
+        An array of length n to store the leaves from left to right.
+    start : ndarray
+        An array of length 2n-1 to store the position in `order` of the
+        leftmost leaf of each node.
+    gap : ndarray
+        An array of length n-1 to store the node joining the leaves
+        `order[k]` and `order[k + 1]`.
+    n : int
+        The number of observations.
+    leaves_last : bool
+        Whether to put a leaf after its non-singleton sibling, which is the
+        order in which `cluster_monocrit` numbers the flat clusters.
+    """
+    cdef int i, i_lc, i_rc, n_lc
+
+    start[2 * n - 2] = 0
+    for i in range(n - 2, -1, -1):
+        i_lc = <int>Z[i, 0]
+        i_rc = <int>Z[i, 1]
+        if leaves_last and i_lc < n and i_rc >= n:
+            i_lc, i_rc = i_rc, i_lc
+        if i_lc >= n:
+            n_lc = <int>Z[i_lc - n, 3]
+        else:
+            n_lc = 1
+        start[i_lc] = start[i + n]
+        start[i_rc] = start[i + n] + n_lc
+        gap[start[i_rc] - 1] = i + n
+
+    for i in range(n):
+        order[start[i]] = i
+
+
+def cluster_monocrit_multi(double[:, :] Z, double[:] MC, int[:, :] T,
+                           double[:] cutoffs, int n):
+    """
+    Form flat clusters by monocrit criterion for several cutoffs at once.
+
+    Flat clusters are contiguous in the pre-order of the leaves, and two
+    neighboring leaves belong to the same cluster when the node joining them
+    does. The clusters are numbered from left to right, with the leaves laid
+    out in the order `cluster_monocrit` visits them.
+
+    Parameters
+    ----------
+    Z : ndarray
+        The linkage matrix.
+    MC : ndarray
+        The monotonic criterion array.
+    T : ndarray
+        The array to store the cluster numbers. For the i'th cutoff, the j'th
+        observation belongs to cluster `T[i, j]`.
+    cutoffs : ndarray
+        Clusters are formed when the MC values are less than or equal to
+        `cutoffs[i]`.
+    n : int
+        The number of observations.
+    """
+    cdef int i, k, n_cluster
+    cdef double cutoff
+    cdef int[:] order = np.ndarray(n, dtype=np.int32)
+    cdef int[:] start = np.ndarray(2 * n - 1, dtype=np.int32)
+    cdef int[:] gap = np.ndarray(n, dtype=np.int32)
+    cdef double[:] gap_mc = np.ndarray(n, dtype=np.double)
+
+    get_leaf_layout(Z, order, start, gap, n, True)
+    for k in range(n - 1):
+        gap_mc[k] = MC[gap[k] - n]
+
+    for i in range(cutoffs.shape[0]):
+        cutoff = cutoffs[i]
+        n_cluster = 1
+        T[i, order[0]] = 1
+        for k in range(n - 1):
+            if gap_mc[k] > cutoff:
+                n_cluster += 1
+            T[i, order[k + 1]] = n_cluster
+
+
+def cophenetic_pairs(double[:, :] Z, int[:] I, int[:] J, double[:] d, int n):
+    """
+    Calculate the cophenetic distances between pairs of observations,
+    without forming the full matrix.
+
+    Two observations are joined by the node of highest index among the nodes
+    joining the neighboring leaves between them, which is found with a sparse
+    table of range maxima.
+
+    Parameters
+    ----------
+    Z : ndarray
+        The linkage matrix.
+    I : ndarray
+        The first observation of each pair.
+    J : ndarray
+        The second observation of each pair.
+    d : ndarray
+        The array to store the cophenetic distances.
+    n : int
+        The number of observations.
+    """
+    cdef int i, k, level, n_levels, left, right, node, other
+    cdef int[:] order = np.ndarray(n, dtype=np.int32)
+    cdef int[:] start = np.ndarray(2 * n - 1, dtype=np.int32)
+    cdef int[:] log2 = np.zeros(n, dtype=np.int32)
+    cdef int[:, :] table
+
+    n_levels = 1
+    while (1 << n_levels) < n:
+        n_levels += 1
+    table = np.ndarray((n_levels, n), dtype=np.int32)
+    get_leaf_layout(Z, order, start, table[0], n)
+
+    # table[level, k] is the highest node among gap[k:k + 2**level]
+    for level in range(1, n_levels):
+        for k in range(n - (1 << level)):
+            node = table[level - 1, k]
+            other = table[level - 1, k + (1 << (level - 1))]
+            table[level, k] = node if node > other else other
+    for k in range(2, n):
+        log2[k] = log2[k >> 1] + 1
+
+    for i in range(I.shape[0]):
+        left = start[I[i]]
+        right = start[J[i]]
+        if left == right:
+            d[i] = 0
+            continue
+        if left > right:
+            left, right = right, left
+        level = log2[right - left]
+        node = table[level, left]
+        other = table[level, right - (1 << level)]
+        if other > node:
+            node = other
+        d[i] = Z[node - n, 2]
+
+
 def cophenetic_distances(double[:, :] Z, double[:] d, int n):
     """
     Calculate the cophenetic distances between each observation
@@ -788,6 +917,240 @@ def linkage(double[:] dists, np.ndarray[double, ndim=2] Z, int n, int method):
                 D[condensed_index(n, i, x)] = NPY_INFINITYF
 
 
+cdef class LinkageUnionFind:
+    """
+    Structure for fast cluster labeling in unsorted dendrogram.
+    """
+    cdef int[:] parent
+    cdef int[:] size
+    cdef int next_label
+
+    def __init__(self, int n):
+        self.parent = np.arange(2 * n - 1, dtype=np.int32)
+        self.next_label = n
+        self.size = np.ones(2 * n - 1, dtype=np.int32)
+
+    cdef int merge(self, int x, int y):
+        self.parent[x] = self.next_label
+        self.parent[y] = self.next_label
+        cdef int size = self.size[x] + self.size[y]
+        self.size[self.next_label] = size
+        self.next_label += 1
+        return size
+
+    cdef int find(self, int x):
+        cdef int p = x
+
+        while self.parent[x] != x:
+            x = self.parent[x]
+
+        # path compression
+        while self.parent[p] != x:
+            p, self.parent[p] = self.parent[p], x
+
+        return x
+
+
+cdef label(double[:, :] Z, int n):
+    """
+    Correctly label clusters in an unsorted dendrogram.
+
+    The rows of Z must be sorted by distance, and refer to the clusters
+    they merge by any of the observations in them.
+
+    Parameters
+    ----------
+    Z : ndarray
+        The linkage matrix to relabel.
+    n : int
+        The number of observations.
+    """
+    cdef LinkageUnionFind uf = LinkageUnionFind(n)
+    cdef int i, x, y, x_root, y_root
+
+    for i in range(n - 1):
+        x, y = int(Z[i, 0]), int(Z[i, 1])
+        x_root, y_root = uf.find(x), uf.find(y)
+        if x_root < y_root:
+            Z[i, 0], Z[i, 1] = x_root, y_root
+        else:
+            Z[i, 0], Z[i, 1] = y_root, x_root
+        Z[i, 3] = uf.merge(x_root, y_root)
+
+
+def nn_chain(double[:] dists, np.ndarray[double, ndim=2] Z, int n,
+             int method):
+    """
+    Perform hierarchy clustering using the nearest-neighbor chain algorithm.
+
+    Only for the reducible methods: single, complete, average, weighted and
+    ward.  O(n^2) time, whereas the generic algorithm in `linkage` can take
+    O(n^3).
+
+    Parameters
+    ----------
+    dists : ndarray
+        A condensed matrix stores the pairwise distances of the observations.
+    Z : ndarray
+        A (n - 1) x 4 matrix to store the result (i.e. the linkage matrix).
+    n : int
+        The number of observations.
+    method : int
+        The linkage method. 0: single 1: complete 2: average 5: ward
+        6: weighted
+
+    References
+    ----------
+    D. Mullner, "Modern hierarchical, agglomerative clustering algorithms",
+    arXiv:1109.2378v1.
+    """
+    cdef int i, k, x, y, nx, ny, ni, chain_length
+    cdef double dist, current_min
+    cdef double[:] D = dists.copy()
+    # cluster sizes, 0 for clusters merged into another one
+    cdef int[:] size = np.ones(n, dtype=np.int32)
+    cdef int[:] cluster_chain = np.ndarray(n, dtype=np.int32)
+    cdef linkage_distance_update new_dist = linkage_methods[method]
+
+    chain_length = 0
+    for k in range(n - 1):
+        if chain_length == 0:
+            chain_length = 1
+            for i in range(n):
+                if size[i] > 0:
+                    cluster_chain[0] = i
+                    break
+
+        # follow the chain of nearest neighbors until two clusters are
+        # each other's nearest neighbor
+        while True:
+            x = cluster_chain[chain_length - 1]
+
+            # prefer the previous element of the chain as the minimum, to
+            # avoid cycles when there are ties
+            if chain_length > 1:
+                y = cluster_chain[chain_length - 2]
+                current_min = D[condensed_index(n, x, y)]
+            else:
+                y = -1
+                current_min = NPY_INFINITYF
+
+            for i in range(n):
+                if size[i] == 0 or x == i:
+                    continue
+
+                dist = D[condensed_index(n, x, i)]
+                if dist < current_min or y == -1:
+                    current_min = dist
+                    y = i
+
+            if chain_length > 1 and y == cluster_chain[chain_length - 2]:
+                break
+
+            cluster_chain[chain_length] = y
+            chain_length += 1
+
+        # merge clusters x and y, and pop them from the chain
+        chain_length -= 2
+
+        # the new cluster is stored in place of y, the larger index
+        if x > y:
+            x, y = y, x
+
+        nx = size[x]
+        ny = size[y]
+
+        # record the new node, in terms of observations x and y
+        Z[k, 0] = x
+        Z[k, 1] = y
+        Z[k, 2] = current_min
+        Z[k, 3] = nx + ny
+        size[x] = 0
+        size[y] = nx + ny
+
+        # update the distance matrix
+        for i in range(n):
+            ni = size[i]
+            if ni == 0 or i == y:
+                continue
+
+            D[condensed_index(n, i, y)] = new_dist(
+                D[condensed_index(n, i, x)],
+                D[condensed_index(n, i, y)],
+                current_min, nx, ny, ni)
+
+    # the merges are found out of order: sort them and number the clusters
+    Z[:] = Z[np.argsort(Z[:, 2], kind='mergesort')]
+    label(Z, n)
+
+
+def mst_single_linkage(dist_row, np.ndarray[double, ndim=2] Z, int n):
+    """
+    Perform single linkage clustering from a minimum spanning tree, built by
+    Prim's algorithm.
+
+    The distances are computed one row at a time, so that the full distance
+    matrix is never stored: O(n^2) time and O(n) memory.
+
+    Parameters
+    ----------
+    dist_row : callable
+        ``dist_row(x, out)`` stores in `out`, a 1 x n array, the distances
+        from observation x to all the observations.
+    Z : ndarray
+        A (n - 1) x 4 matrix to store the result (i.e. the linkage matrix).
+    n : int
+        The number of observations.
+    """
+    cdef int i, k, x, y
+    cdef double current_min
+    cdef np.ndarray row_arr = np.ndarray((1, n), dtype=np.double)
+    cdef double[:] row = row_arr[0]
+    # distance from each observation to the tree, and the closest
+    # observation in the tree
+    cdef double[:] D = np.ndarray(n, dtype=np.double)
+    cdef int[:] nearest = np.zeros(n, dtype=np.int32)
+
+    cdef int visited_size = (n >> 3) + 1
+    cdef uchar *visited = <uchar *>PyMem_Malloc(visited_size)
+    if not visited:
+        raise MemoryError
+    memset(visited, 0, visited_size)
+
+    try:
+        D[:] = NPY_INFINITYF
+        x = 0
+        set_visited(visited, x)
+        for k in range(n - 1):
+            dist_row(x, row_arr)
+
+            y = -1
+            current_min = NPY_INFINITYF
+            for i in range(n):
+                if is_visited(visited, i):
+                    continue
+
+                if row[i] < D[i]:
+                    D[i] = row[i]
+                    nearest[i] = x
+
+                if D[i] < current_min or y == -1:
+                    current_min = D[i]
+                    y = i
+
+            Z[k, 0] = nearest[y]
+            Z[k, 1] = y
+            Z[k, 2] = current_min
+            set_visited(visited, y)
+            x = y
+    finally:
+        PyMem_Free(visited)
+
+    # sort the edges of the tree and number the clusters
+    Z[:] = Z[np.argsort(Z[:, 2], kind='mergesort')]
+    label(Z, n)
+
+
 def prelist(double[:, :] Z, int[:] members, int n):
     """
     Perform a pre-order traversal on the linkage tree and get a list of ids
@@ -844,6 +1207,200 @@ def prelist(double[:, :] Z, int[:] members, int n):
     PyMem_Free(visited)
 
 
+cdef enum:
+    NODE_UNSEEN, NODE_REACHED, NODE_LINK, NODE_LEAF, NODE_CONTRACTED
+
+
+def dendrogram_layout(double[:, :] Z, int n, int p, int truncate_mode,
+                      int sort_mode, bint contracted, int[:] leaves,
+                      int[:] links, int[:] gaps, double[:, :] icoord,
+                      double[:, :] dcoord, double[:, :] marks):
+    """
+    Calculate the leaves and the links of a dendrogram, as the recursive
+    traversal done by `dendrogram` would. Since a cluster is always formed
+    after its children, each pass visits the nodes by index, top-down or
+    bottom-up, without a stack.
+
+    Parameters
+    ----------
+    Z : ndarray
+        The linkage matrix.
+    n : int
+        The number of observations.
+    p : int
+        The parameter of the truncation mode.
+    truncate_mode : int
+        0 for no truncation, 1 to show the last `p` clusters formed only and
+        2 to show no more than `p` levels below the root.
+    sort_mode : int
+        Which child to draw on the left: 0 the first one, 1 (2) the one with
+        fewer (more) observations and 3 (4) the one whose children are
+        closer (further apart).
+    contracted : bool
+        Whether to calculate the marks of the contracted clusters.
+    leaves : ndarray
+        An array of length n to store the nodes drawn as leaves, from left
+        to right.
+    links : ndarray
+        An array of length n-1 to store the clusters drawn as links, in the
+        order of a post-order traversal.
+    gaps : ndarray
+        An array of length n-1 to store, for each link, the number of leaves
+        on the left of its middle, which is its position in an in-order
+        traversal.
+    icoord : ndarray
+        A (n-1) x 4 array to store the independent coordinates of the links.
+    dcoord : ndarray
+        A (n-1) x 4 array to store the dependent coordinates of the links.
+    marks : ndarray
+        A (n-1) x 2 array to store the coordinates of the contraction marks,
+        from left to right and in pre-order below each leaf.
+
+    Returns
+    -------
+    n_leaves : int
+        The number of leaves.
+    n_marks : int
+        The number of contraction marks.
+    """
+    cdef int i, node, i_lc, i_rc, first, second, pos
+    cdef int n_leaves = 0, n_marks = 0, root = 2 * n - 2
+    cdef double n_first, n_second, d_first, d_second, h
+    cdef int[:] state = np.zeros(2 * n - 1, dtype=np.int32)
+    cdef int[:] level = np.zeros(2 * n - 1, dtype=np.int32)
+    cdef int[:] left = np.ndarray(n, dtype=np.int32)
+    cdef int[:] right = np.ndarray(n, dtype=np.int32)
+    cdef int[:] count = np.ones(2 * n - 1, dtype=np.int32)
+    cdef int[:] start = np.zeros(2 * n - 1, dtype=np.int32)
+    cdef int[:] post = np.zeros(2 * n - 1, dtype=np.int32)
+    cdef double[:] x = np.zeros(2 * n - 1, dtype=np.double)
+    cdef double[:] height = np.zeros(2 * n - 1, dtype=np.double)
+
+    # which nodes are drawn as links or leaves, and the order of the children
+    state[root] = NODE_REACHED
+    for i in range(n - 2, -1, -1):
+        node = i + n
+        if state[node] == NODE_CONTRACTED:
+            state[<int>Z[i, 0]] = NODE_CONTRACTED
+            state[<int>Z[i, 1]] = NODE_CONTRACTED
+            continue
+        if state[node] != NODE_REACHED:
+            continue
+        if ((truncate_mode == 1 and node < 2 * n - p) or
+                (truncate_mode == 2 and level[node] > p)):
+            state[node] = NODE_LEAF
+            state[<int>Z[i, 0]] = NODE_CONTRACTED
+            state[<int>Z[i, 1]] = NODE_CONTRACTED
+            continue
+
+        state[node] = NODE_LINK
+        first = <int>Z[i, 0]
+        second = <int>Z[i, 1]
+        if sort_mode != 0:
+            if first >= n:
+                n_first = Z[first - n, 3]
+                d_first = Z[first - n, 2]
+            else:
+                n_first = 1
+                d_first = 0
+            if second >= n:
+                n_second = Z[second - n, 3]
+                d_second = Z[second - n, 2]
+            else:
+                n_second = 1
+                d_second = 0
+            if ((sort_mode == 1 and n_first > n_second) or
+                    (sort_mode == 2 and n_first <= n_second) or
+                    (sort_mode == 3 and d_first > d_second) or
+                    (sort_mode == 4 and d_first <= d_second)):
+                first, second = second, first
+        left[i] = first
+        right[i] = second
+        state[first] = NODE_REACHED
+        state[second] = NODE_REACHED
+        level[first] = level[node] + 1
+        level[second] = level[node] + 1
+
+    for i in range(n):
+        if state[i] == NODE_REACHED:
+            state[i] = NODE_LEAF
+
+    # number of leaves below each link
+    for i in range(n - 1):
+        if state[i + n] == NODE_LINK:
+            count[i + n] = count[left[i]] + count[right[i]]
+
+    # position of the leftmost leaf, and of the first link in post-order,
+    # below each node
+    for i in range(n - 2, -1, -1):
+        node = i + n
+        if state[node] == NODE_LINK:
+            start[left[i]] = start[node]
+            start[right[i]] = start[node] + count[left[i]]
+            post[left[i]] = post[node]
+            post[right[i]] = post[node] + count[left[i]] - 1
+
+    for i in range(2 * n - 1):
+        if state[i] == NODE_LEAF:
+            leaves[start[i]] = i
+            x[i] = 5.0 + 10.0 * start[i]
+            n_leaves += 1
+
+    # coordinates of the links, bottom-up
+    for i in range(n - 1):
+        node = i + n
+        if state[node] != NODE_LINK:
+            continue
+        first = left[i]
+        second = right[i]
+        h = Z[i, 2]
+        x[node] = (x[first] + x[second]) / 2
+        height[node] = h
+        pos = post[node] + count[node] - 2
+        links[pos] = node
+        gaps[pos] = start[second] - 1
+        icoord[pos, 0] = x[first]
+        icoord[pos, 1] = x[first]
+        icoord[pos, 2] = x[second]
+        icoord[pos, 3] = x[second]
+        dcoord[pos, 0] = height[first]
+        dcoord[pos, 1] = h
+        dcoord[pos, 2] = h
+        dcoord[pos, 3] = height[second]
+
+    if not contracted:
+        return n_leaves, 0
+
+    # contraction marks: the clusters below each contracted leaf, from left
+    # to right and in pre-order, reusing start for their positions in marks
+    # and x for the position of their leaf
+    for i in range(n_leaves):
+        node = leaves[i]
+        if node >= n:
+            start[node] = n_marks - 1
+            x[node] = 5.0 + 10.0 * i
+            n_marks += <int>Z[node - n, 3] - 2
+
+    for i in range(n - 2, -1, -1):
+        node = i + n
+        if state[node] == NODE_CONTRACTED:
+            marks[start[node], 0] = x[node]
+            marks[start[node], 1] = Z[i, 2]
+        elif state[node] != NODE_LEAF:
+            continue
+        i_lc = <int>Z[i, 0]
+        i_rc = <int>Z[i, 1]
+        x[i_lc] = x[node]
+        x[i_rc] = x[node]
+        start[i_lc] = start[node] + 1
+        if i_lc >= n:
+            start[i_rc] = start[node] + <int>Z[i_lc - n, 3]
+        else:
+            start[i_rc] = start[node] + 1
+
+    return n_leaves, n_marks
+
+
 def slink(double[:] dists, double[:, :] Z, int n):
     """
     The SLINK algorithm. Single linkage in O(n^2) time complexity.
@@ -889,3 +1446,258 @@ def slink(double[:] dists, double[:, :] Z, int n):
                 Pi[j] = i
 
     from_pointer_representation(Z, Lambda, Pi, n)
+
+
+ctypedef struct Candidate:
+    double cost
+    int leaf
+
+
+cdef int compare_candidates(const void *a, const void *b) nogil:
+    cdef double cost_a = (<Candidate *>a).cost
+    cdef double cost_b = (<Candidate *>b).cost
+    return (cost_a > cost_b) - (cost_a < cost_b)
+
+
+cdef inline double pair_cost(double[:] M, int n, int u, int w):
+    """
+    The value of the condensed matrix `M` for the leaves u and w, 0 if they
+    are the same leaf.
+    """
+    if u == w:
+        return 0
+    return M[condensed_index(n, u, w)]
+
+
+cdef inline void other_side(int[:] start, int[:] split, int[:] count,
+                            int node, int pos, int *first, int *last):
+    """
+    The range of leaf positions below `node` on the other side of its split
+    than the leaf at `pos`, or that leaf alone if `node` is a leaf.
+    """
+    if count[node] == 1:
+        first[0] = pos
+        last[0] = pos + 1
+    elif pos < split[node]:
+        first[0] = split[node]
+        last[0] = start[node] + count[node]
+    else:
+        first[0] = start[node]
+        last[0] = split[node]
+
+
+def optimal_leaf_ordering(double[:, :] Z, double[:] dists, int n):
+    """
+    Reorder the children of the nodes of a linkage matrix, so that the sum
+    of the distances between neighboring leaves is minimal.
+
+    For two leaves u and w joined by node v, M(u, w) is the minimal cost of
+    an ordering of the leaves below v starting with u and ending with w.
+    With u below the left child l and w below the right child r of v,
+
+        M(u, w) = min M(u, m) + d(m, k) + M(k, w)
+
+    over the leaves m below the child of l not containing u, and k below
+    the child of r not containing w. The minimum is found in two steps,
+    through T(k) = min_m M(u, m) + d(m, k), each scanning its candidates by
+    increasing cost and stopping as soon as no candidate can improve on the
+    best one found.
+
+    Parameters
+    ----------
+    Z : ndarray
+        The linkage matrix, whose children are swapped in place.
+    dists : ndarray
+        The condensed distance matrix from which `Z` was computed.
+    n : int
+        The number of observations.
+
+    References
+    ----------
+    Z. Bar-Joseph, D. K. Gifford and T. S. Jaakkola, "Fast optimal leaf
+    ordering for hierarchical clustering", Bioinformatics 17 (suppl 1):
+    S22-S29, 2001.
+    """
+    cdef int i, j, node, l, r, u, w, k, m, pos, first, last, n_cand, side
+    cdef int a, c, b, best_m, best_k, top
+    cdef double best, cost
+    cdef int[:] order = np.ndarray(n, dtype=np.int32)
+    cdef int[:] start = np.ndarray(2 * n - 1, dtype=np.int32)
+    cdef int[:] gap = np.ndarray(n, dtype=np.int32)
+    cdef int[:] split = np.zeros(2 * n - 1, dtype=np.int32)
+    cdef int[:] count = np.ones(2 * n - 1, dtype=np.int32)
+    cdef double[:] M = np.zeros(<np.npy_int64>n * (n - 1) // 2,
+                               dtype=np.double)
+    cdef double[:] T = np.ndarray(n, dtype=np.double)
+    cdef double[:] min_cost = np.ndarray(n, dtype=np.double)
+    cdef double[:] min_dist = np.ndarray(2 * n, dtype=np.double)
+    cdef int[:] stack = np.ndarray(3 * n, dtype=np.int32)
+    cdef uchar[:] swap = np.zeros(n, dtype=np.uint8)
+
+    cdef Candidate *cand = <Candidate *>PyMem_Malloc(2 * n * sizeof(Candidate))
+    if not cand:
+        raise MemoryError
+
+    try:
+        get_leaf_layout(Z, order, start, gap, n)
+        for i in range(n - 1):
+            count[i + n] = <int>Z[i, 3]
+            split[i + n] = start[<int>Z[i, 1]]
+
+        for i in range(n - 1):
+            node = i + n
+            l = <int>Z[i, 0]
+            r = <int>Z[i, 1]
+            a = start[node]
+            c = split[node]
+            b = a + count[node]
+
+            # smallest distance from each k to each side of l, to bound step 1
+            for side in range(2):
+                if count[l] == 1:
+                    first = a
+                    last = c
+                elif side == 0:
+                    first = split[l]
+                    last = c
+                else:
+                    first = a
+                    last = split[l]
+                for pos in range(c, b):
+                    k = order[pos]
+                    best = NPY_INFINITYF
+                    for j in range(first, last):
+                        cost = dists[condensed_index(n, order[j], k)]
+                        if cost < best:
+                            best = cost
+                    min_dist[side * n + pos] = best
+
+            # smallest cost from each w to the other side of r, to bound step 2
+            for pos in range(c, b):
+                w = order[pos]
+                other_side(start, split, count, r, pos, &first, &last)
+                min_cost[pos] = NPY_INFINITYF
+                for j in range(first, last):
+                    cost = pair_cost(M, n, order[j], w)
+                    if cost < min_cost[pos]:
+                        min_cost[pos] = cost
+
+            for j in range(a, c):
+                u = order[j]
+
+                # step 1: T(k) over all k below r
+                other_side(start, split, count, l, j, &first, &last)
+                n_cand = last - first
+                for pos in range(first, last):
+                    cand[pos - first].cost = pair_cost(M, n, u, order[pos])
+                    cand[pos - first].leaf = order[pos]
+                qsort(cand, n_cand, sizeof(Candidate), compare_candidates)
+                side = 0 if count[l] == 1 or j < split[l] else 1
+                for pos in range(c, b):
+                    k = order[pos]
+                    best = NPY_INFINITYF
+                    for m in range(n_cand):
+                        if cand[m].cost + min_dist[side * n + pos] >= best:
+                            break
+                        cost = cand[m].cost + dists[
+                            condensed_index(n, cand[m].leaf, k)]
+                        if cost < best:
+                            best = cost
+                    T[pos] = best
+
+                # step 2: M(u, w), with the candidates k of each side of r
+                # sorted by T(k)
+                for pos in range(c, b):
+                    cand[pos - c].cost = T[pos]
+                    cand[pos - c].leaf = order[pos]
+                if count[r] == 1:
+                    M[condensed_index(n, u, order[c])] = T[c]
+                    continue
+                qsort(cand, split[r] - c, sizeof(Candidate),
+                      compare_candidates)
+                qsort(cand + split[r] - c, b - split[r], sizeof(Candidate),
+                      compare_candidates)
+                for pos in range(c, b):
+                    w = order[pos]
+                    if pos < split[r]:
+                        first = split[r] - c
+                        last = b - c
+                    else:
+                        first = 0
+                        last = split[r] - c
+                    best = NPY_INFINITYF
+                    for m in range(first, last):
+                        if cand[m].cost + min_cost[pos] >= best:
+                            break
+                        cost = cand[m].cost + pair_cost(M, n, cand[m].leaf, w)
+                        if cost < best:
+                            best = cost
+                    M[condensed_index(n, u, w)] = best
+    finally:
+        PyMem_Free(cand)
+
+    if n < 2:
+        return
+
+    # the best pair of outer leaves of the root
+    node = 2 * n - 2
+    best = NPY_INFINITYF
+    for j in range(start[node], split[node]):
+        for pos in range(split[node], start[node] + count[node]):
+            cost = M[condensed_index(n, order[j], order[pos])]
+            if cost < best:
+                best = cost
+                u = order[j]
+                w = order[pos]
+
+    # walk down, choosing the inner leaves m, k of each node and swapping
+    # its children when the left outer leaf is below the right child
+    top = 0
+    stack[0] = node
+    stack[1] = u
+    stack[2] = w
+    while top >= 0:
+        node = stack[3 * top]
+        u = stack[3 * top + 1]
+        w = stack[3 * top + 2]
+        top -= 1
+        if node < n:
+            continue
+
+        i = node - n
+        if start[u] < split[node]:
+            l = <int>Z[i, 0]
+            r = <int>Z[i, 1]
+        else:
+            l = <int>Z[i, 1]
+            r = <int>Z[i, 0]
+            swap[i] = 1
+
+        best = NPY_INFINITYF
+        best_m = best_k = -1
+        other_side(start, split, count, l, start[u], &a, &c)
+        other_side(start, split, count, r, start[w], &first, &last)
+        for j in range(a, c):
+            m = order[j]
+            for pos in range(first, last):
+                k = order[pos]
+                cost = (pair_cost(M, n, u, m) +
+                        dists[condensed_index(n, m, k)] +
+                        pair_cost(M, n, k, w))
+                if cost < best:
+                    best = cost
+                    best_m = m
+                    best_k = k
+
+        top += 1
+        stack[3 * top] = l
+        stack[3 * top + 1] = u
+        stack[3 * top + 2] = best_m
+        top += 1
+        stack[3 * top] = r
+        stack[3 * top + 1] = best_k
+        stack[3 * top + 2] = w
+
+    for i in range(n - 1):
+        if swap[i]:
+            Z[i, 0], Z[i, 1] = Z[i, 1], Z[i, 0]
@@ -12,9 +12,11 @@ import numpy as np
 cimport numpy as np
 from cluster_blas cimport *
 
+from scipy._lib._parallel import _run_threaded
+
 cdef extern from "math.h":
-    float sqrtf(float num)
-    double sqrt(double num)
+    float sqrtf(float num) nogil
+    double sqrt(double num) nogil
 
 ctypedef np.float64_t float64_t
 ctypedef np.float32_t float32_t
@@ -30,18 +32,24 @@ ctypedef fused vq_type:
 # switch back to the naive algorithm to avoid high overhead.
 DEF NFEATURES_CUTOFF=5
 
+# Upper bound on the size in bytes of the obs * code_book.T scratch matrix
+# used by each thread.
+DEF BLOCK_BYTES=1048576
+
 # Initialize the NumPy C API
 np.import_array()
 
+cdef double infinity = np.inf
 
-cdef inline vq_type _sqrt(vq_type x):
+
+cdef inline vq_type _sqrt(vq_type x) nogil:
     if vq_type is float32_t:
         return sqrtf(x)
     else:
         return sqrt(x)
 
 
-cdef inline vq_type vec_sqr(int n, vq_type *p):
+cdef inline vq_type vec_sqr(int n, vq_type *p) nogil:
     cdef vq_type result = 0.0
     cdef int i
     for i in range(n):
@@ -49,8 +57,17 @@ cdef inline vq_type vec_sqr(int n, vq_type *p):
     return result
 
 
+cdef inline vq_type vec_dist_sqr(int n, vq_type *p, vq_type *q) nogil:
+    cdef vq_type result = 0.0, diff
+    cdef int i
+    for i in range(n):
+        diff = p[i] - q[i]
+        result += diff * diff
+    return result
+
+
 cdef inline void cal_M(int nobs, int ncodes, int nfeat, vq_type *obs,
-                       vq_type *code_book, vq_type *M):
+                       vq_type *code_book, vq_type *M) nogil:
     """
     Calculate M = obs * code_book.T
     """
@@ -68,7 +85,8 @@ cdef inline void cal_M(int nobs, int ncodes, int nfeat, vq_type *obs,
 
 cdef void _vq(vq_type *obs, vq_type *code_book,
               int ncodes, int nfeat, int nobs,
-              int32_t *codes, vq_type *low_dist):
+              int32_t *codes, vq_type *low_dist,
+              vq_type *codes_sqr, vq_type *M) nogil:
     """
     The underlying function (template) of _vq.vq.
 
@@ -89,6 +107,10 @@ cdef void _vq(vq_type *obs, vq_type *code_book,
     low_dist : vq_type*
         low_dist[i] is the Euclidean distance from obs[i] to the corresponding
         centroid.
+    codes_sqr : vq_type*
+        codes_sqr[j] is the inner product of the j-th code with itself.
+    M : vq_type*
+        Scratch space for the nobs by ncodes matrix obs * code_book.T.
     """
     # Naive algorithm is prefered when nfeat is small
     if nfeat < NFEATURES_CUTOFF:
@@ -97,40 +119,20 @@ cdef void _vq(vq_type *obs, vq_type *code_book,
 
     cdef np.npy_intp i, j
     cdef vq_type *p_obs
-    cdef vq_type *p_codes
-    cdef vq_type dist_sqr
-    cdef np.ndarray[vq_type, ndim=1] obs_sqr, codes_sqr
-    cdef np.ndarray[vq_type, ndim=2] M
-
-    if vq_type is float32_t:
-        obs_sqr = np.ndarray(nobs, np.float32)
-        codes_sqr = np.ndarray(ncodes, np.float32)
-        M = np.ndarray((nobs, ncodes), np.float32)
-    else:
-        obs_sqr = np.ndarray(nobs, np.float64)
-        codes_sqr = np.ndarray(ncodes, np.float64)
-        M = np.ndarray((nobs, ncodes), np.float64)
-
-    p_obs = obs
-    for i in range(nobs):
-        # obs_sqr[i] is the inner product of the i-th observation with itself
-        obs_sqr[i] = vec_sqr(nfeat, p_obs)
-        p_obs += nfeat
-
-    p_codes = code_book
-    for i in range(ncodes):
-        # codes_sqr[i] is the inner product of the i-th code with itself
-        codes_sqr[i] = vec_sqr(nfeat, p_codes)
-        p_codes += nfeat
+    cdef vq_type *p_M
+    cdef vq_type obs_sqr, dist_sqr
 
     # M[i][j] is the inner product of the i-th obs and j-th code
     # M = obs * codes.T
-    cal_M(nobs, ncodes, nfeat, obs, code_book, <vq_type *>M.data)
+    cal_M(nobs, ncodes, nfeat, obs, code_book, M)
 
+    p_obs = obs
+    p_M = M
     for i in range(nobs):
+        # obs_sqr is the inner product of the i-th observation with itself
+        obs_sqr = vec_sqr(nfeat, p_obs)
         for j in range(ncodes):
-            dist_sqr = (M[i, j] +
-                    obs_sqr[i] + codes_sqr[j])
+            dist_sqr = p_M[j] + obs_sqr + codes_sqr[j]
             if dist_sqr < low_dist[i]:
                 codes[i] = j
                 low_dist[i] = dist_sqr
@@ -140,11 +142,13 @@ cdef void _vq(vq_type *obs, vq_type *code_book,
             low_dist[i] = _sqrt(low_dist[i])
         else:
             low_dist[i] = 0
+        p_obs += nfeat
+        p_M += ncodes
 
 
 cdef void _vq_small_nf(vq_type *obs, vq_type *code_book,
                        int ncodes, int nfeat, int nobs,
-                       int32_t *codes, vq_type *low_dist):
+                       int32_t *codes, vq_type *low_dist) nogil:
     """
     Vector quantization using naive algorithm.
     This is prefered when nfeat is small.
@@ -184,7 +188,82 @@ cdef void _vq_small_nf(vq_type *obs, vq_type *code_book,
         obs_offset += nfeat
 
 
-def vq(np.ndarray obs, np.ndarray codes):
+cdef void _vq_blocked(vq_type *obs, vq_type *code_book,
+                      int ncodes, int nfeat,
+                      np.npy_intp start, np.npy_intp stop, np.npy_intp block,
+                      int32_t *codes, vq_type *low_dist,
+                      vq_type *codes_sqr, vq_type *M) nogil:
+    """
+    Run _vq over obs[start:stop] in blocks of at most `block` observations,
+    so that the scratch matrix M only needs room for block * ncodes items.
+    """
+    cdef np.npy_intp i = start, n
+    while i < stop:
+        n = stop - i
+        if n > block:
+            n = block
+        _vq(obs + i * nfeat, code_book, ncodes, nfeat, <int>n,
+            codes + i, low_dist + i, codes_sqr, M)
+        i += n
+
+
+cdef int _vq_range(np.ndarray obs, np.ndarray codes, np.ndarray codes_sqr,
+                   np.ndarray outcodes, np.ndarray outdists,
+                   int ncodes, int nfeat,
+                   np.npy_intp start, np.npy_intp stop) except -1:
+    """
+    Assign codes to obs[start:stop] without holding the GIL.
+    """
+    cdef np.npy_intp block
+    cdef np.ndarray M
+
+    block = BLOCK_BYTES // (ncodes * obs.itemsize)
+    if block < 1:
+        block = 1
+    if block > stop - start:
+        block = stop - start
+    M = np.empty((block, ncodes), dtype=obs.dtype)
+
+    if obs.dtype.type is np.float32:
+        with nogil:
+            _vq_blocked(<float32_t *>obs.data, <float32_t *>codes.data,
+                        ncodes, nfeat, start, stop, block,
+                        <int32_t *>outcodes.data, <float32_t *>outdists.data,
+                        <float32_t *>codes_sqr.data, <float32_t *>M.data)
+    else:
+        with nogil:
+            _vq_blocked(<float64_t *>obs.data, <float64_t *>codes.data,
+                        ncodes, nfeat, start, stop, block,
+                        <int32_t *>outcodes.data, <float64_t *>outdists.data,
+                        <float64_t *>codes_sqr.data, <float64_t *>M.data)
+    return 0
+
+
+cdef _check_vq_input(np.ndarray obs, np.ndarray codes):
+    """
+    Validate the observation and code book arrays, returning the number of
+    features of each observation.
+    """
+    if obs.dtype != codes.dtype:
+        raise TypeError('observation and code should have same dtype')
+    if obs.dtype not in (np.float32, np.float64):
+        raise TypeError('type other than float or double not supported')
+    if obs.ndim != codes.ndim:
+        raise ValueError(
+            'observation and code should have same number of dimensions')
+
+    if obs.ndim == 1:
+        return 1
+    elif obs.ndim == 2:
+        if obs.shape[1] != codes.shape[1]:
+            raise ValueError('obs and code should have same number of '
+                             'features (columns)')
+        return obs.shape[1]
+    else:
+        raise ValueError('ndim different than 1 or 2 are not supported')
+
+
+def vq(np.ndarray obs, np.ndarray codes, np.npy_intp n_jobs=1):
     """
     Vector quantization ndarray wrapper. Only support float32 and float64.
 
@@ -194,6 +273,9 @@ def vq(np.ndarray obs, np.ndarray codes):
         The observation matrix. Each row is an observation.
     codes : ndarray
         The code book matrix.
+    n_jobs : int, optional
+        Number of threads to split the observations over. If -1 is given
+        all processors are used. Default: 1.
 
     Notes
     -----
@@ -202,33 +284,15 @@ def vq(np.ndarray obs, np.ndarray codes):
     arrays are supported.
     """
     cdef int nobs, ncodes, nfeat
-    cdef np.ndarray outcodes, outdists
+    cdef np.ndarray outcodes, outdists, codes_sqr
 
     # Ensure the arrays are contiguous
     obs = np.ascontiguousarray(obs)
     codes = np.ascontiguousarray(codes)
 
-    if obs.dtype != codes.dtype:
-        raise TypeError('observation and code should have same dtype')
-    if obs.dtype not in (np.float32, np.float64):
-        raise TypeError('type other than float or double not supported')
-    if obs.ndim != codes.ndim:
-        raise ValueError(
-            'observation and code should have same number of dimensions')
-
-    if obs.ndim == 1:
-        nfeat = 1
-        nobs = obs.shape[0]
-        ncodes = codes.shape[0]
-    elif obs.ndim == 2:
-        nfeat = obs.shape[1]
-        nobs = obs.shape[0]
-        ncodes = codes.shape[0]
-        if nfeat != codes.shape[1]:
-            raise ValueError('obs and code should have same number of '
-                             'features (columns)')
-    else:
-        raise ValueError('ndim different than 1 or 2 are not supported')
+    nfeat = _check_vq_input(obs, codes)
+    nobs = obs.shape[0]
+    ncodes = codes.shape[0]
 
     # Initialize outdists and outcodes array.
     # Outdists should be initialized as INF.
@@ -236,18 +300,174 @@ def vq(np.ndarray obs, np.ndarray codes):
     outcodes = np.empty((nobs,), dtype=np.int32)
     outdists.fill(np.inf)
 
-    if obs.dtype.type is np.float32:
-        _vq(<float32_t *>obs.data, <float32_t *>codes.data,
-            ncodes, nfeat, nobs, <int32_t *>outcodes.data,
-            <float32_t *>outdists.data)
-    elif obs.dtype.type is np.float64:
-        _vq(<float64_t *>obs.data, <float64_t *>codes.data,
-            ncodes, nfeat, nobs, <int32_t *>outcodes.data,
-            <float64_t *>outdists.data)
+    # codes_sqr[j] is the inner product of the j-th code with itself
+    codes_sqr = codes.reshape(ncodes, nfeat)
+    codes_sqr = (codes_sqr * codes_sqr).sum(axis=1)
+
+    def _thread_func(np.npy_intp start, np.npy_intp stop):
+        _vq_range(obs, codes, codes_sqr, outcodes, outdists,
+                  ncodes, nfeat, start, stop)
+
+    if ncodes > 0:
+        _run_threaded(_thread_func, nobs, n_jobs)
 
     return outcodes, outdists
 
 
+cdef void _half_separation(vq_type *code_book, int ncodes, int nfeat,
+                           vq_type *half_sep) nogil:
+    """
+    half_sep[j] is half the distance from the j-th code to its nearest
+    other code, or infinity if there is a single code.
+    """
+    cdef np.npy_intp i, j
+    cdef vq_type d
+    for i in range(ncodes):
+        half_sep[i] = infinity
+    for i in range(ncodes):
+        for j in range(i + 1, ncodes):
+            d = vec_dist_sqr(nfeat, code_book + i * nfeat,
+                             code_book + j * nfeat)
+            if d < half_sep[i]:
+                half_sep[i] = d
+            if d < half_sep[j]:
+                half_sep[j] = d
+    for i in range(ncodes):
+        half_sep[i] = 0.5 * _sqrt(half_sep[i])
+
+
+cdef void _vq_bounded(vq_type *obs, vq_type *code_book, vq_type *half_sep,
+                      int ncodes, int nfeat,
+                      np.npy_intp start, np.npy_intp stop,
+                      int32_t *labels, vq_type *lower, vq_type *dist) nogil:
+    """
+    The underlying function (template) of _vq.vq_bounded, restricted to
+    obs[start:stop].
+    """
+    cdef np.npy_intp i, j
+    cdef int32_t best
+    cdef vq_type d, d_best, d_second, bound
+    cdef vq_type *p_obs
+
+    for i in range(start, stop):
+        p_obs = obs + i * nfeat
+        best = labels[i]
+        d = _sqrt(vec_dist_sqr(nfeat, p_obs, code_book + best * nfeat))
+
+        # The current code is still the closest one if obs[i] lies within
+        # half the distance to its nearest other code, or closer than the
+        # lower bound on the distance to all other codes.
+        bound = half_sep[best]
+        if lower[i] > bound:
+            bound = lower[i]
+        if d <= bound:
+            dist[i] = d
+            continue
+
+        d_best = infinity
+        d_second = infinity
+        for j in range(ncodes):
+            d = vec_dist_sqr(nfeat, p_obs, code_book + j * nfeat)
+            if d < d_best:
+                d_second = d_best
+                d_best = d
+                best = j
+            elif d < d_second:
+                d_second = d
+
+        labels[i] = best
+        dist[i] = _sqrt(d_best)
+        lower[i] = _sqrt(d_second)
+
+
+def vq_bounded(np.ndarray obs, np.ndarray codes, np.ndarray labels,
+               np.ndarray lower, np.npy_intp n_jobs=1):
+    """
+    Vector quantization which skips most distance computations by keeping
+    lower bounds across k-means iterations (Hamerly's algorithm).
+
+    Parameters
+    ----------
+    obs : ndarray
+        The observation matrix. Each row is an observation.
+    codes : ndarray
+        The code book matrix.
+    labels : ndarray
+        The int32 codes found at the previous iteration, updated in place.
+        Use all zeros for the first iteration.
+    lower : ndarray
+        Lower bounds on the distance from each observation to every code
+        other than its own, with the same dtype as `obs`. Updated in place;
+        use all zeros for the first iteration.
+    n_jobs : int, optional
+        Number of threads to split the observations over. If -1 is given
+        all processors are used. Default: 1.
+
+    Returns
+    -------
+    dist : ndarray
+        The Euclidean distance from each observation to its code.
+
+    Notes
+    -----
+    Between two calls, the caller must decrease ``lower[i]`` by the largest
+    distance any code other than ``labels[i]`` has moved, which keeps the
+    bounds valid without looking at the observations.
+    """
+    cdef int nobs, ncodes, nfeat
+    cdef np.ndarray half_sep, outdists
+
+    obs = np.ascontiguousarray(obs)
+    codes = np.ascontiguousarray(codes)
+
+    nfeat = _check_vq_input(obs, codes)
+    nobs = obs.shape[0]
+    ncodes = codes.shape[0]
+    if ncodes < 1:
+        raise ValueError('code book must not be empty')
+    if (labels.dtype.type is not np.int32 or labels.ndim != 1 or
+            labels.shape[0] != nobs or not labels.flags.c_contiguous or not labels.flags.writeable):
+        raise ValueError('labels must be a writeable, contiguous int32 '
+                         'array with one item per observation')
+    if (lower.dtype != obs.dtype or lower.ndim != 1 or
+            lower.shape[0] != nobs or
+            not lower.flags.c_contiguous or not lower.flags.writeable):
+        raise ValueError('lower must be a writeable, contiguous array with '
+                         'the dtype of obs and one item per observation')
+    if nobs > 0 and (labels.min() < 0 or labels.max() >= ncodes):
+        raise ValueError('labels must be valid indices into the code book')
+
+    half_sep = np.empty((ncodes,), dtype=obs.dtype)
+    outdists = np.empty((nobs,), dtype=obs.dtype)
+
+    if obs.dtype.type is np.float32:
+        _half_separation(<float32_t *>codes.data, ncodes, nfeat,
+                         <float32_t *>half_sep.data)
+    else:
+        _half_separation(<float64_t *>codes.data, ncodes, nfeat,
+                         <float64_t *>half_sep.data)
+
+    def _thread_func(np.npy_intp start, np.npy_intp stop):
+        if obs.dtype.type is np.float32:
+            with nogil:
+                _vq_bounded(<float32_t *>obs.data, <float32_t *>codes.data,
+                            <float32_t *>half_sep.data, ncodes, nfeat,
+                            start, stop, <int32_t *>labels.data,
+                            <float32_t *>lower.data,
+                            <float32_t *>outdists.data)
+        else:
+            with nogil:
+                _vq_bounded(<float64_t *>obs.data, <float64_t *>codes.data,
+                            <float64_t *>half_sep.data, ncodes, nfeat,
+                            start, stop, <int32_t *>labels.data,
+                            <float64_t *>lower.data,
+                            <float64_t *>outdists.data)
+
+    _run_threaded(_thread_func, nobs, n_jobs)
+
+    return outdists
+
+
 @cython.cdivision(True)
 cdef np.ndarray _update_cluster_means(vq_type *obs, int32_t *labels,
                                       vq_type *cb, int nobs, int nc, int nfeat):
@@ -36,6 +36,7 @@ These routines compute statistics on hierarchies.
    :toctree: generated/
 
    cophenet
+   cophenet_pairs
    from_mlab_linkage
    inconsistent
    maxinconsts
@@ -58,6 +59,7 @@ tree objects.
 
    ClusterNode
    leaves_list
+   optimal_leaf_ordering
    to_tree
 
 These are predicates for checking the validity of linkage and
@@ -183,13 +185,17 @@ _cpy_non_euclid_methods = {'single': 0, 'complete': 1, 'average': 2,
 _cpy_euclid_methods = {'centroid': 3, 'median': 4, 'ward': 5}
 _cpy_linkage_methods = set(_cpy_non_euclid_methods.keys()).union(
     set(_cpy_euclid_methods.keys()))
+_cpy_linkage_method_ids = dict(_cpy_non_euclid_methods, **_cpy_euclid_methods)
+# The reducible methods, computed by the nearest-neighbor chain algorithm
+_nn_chain_methods = set(['complete', 'average', 'weighted', 'ward'])
 
 __all__ = ['ClusterNode', 'average', 'centroid', 'complete', 'cophenet',
-           'correspond', 'dendrogram', 'fcluster', 'fclusterdata',
+           'cophenet_pairs', 'correspond', 'dendrogram', 'fcluster', 'fclusterdata',
            'from_mlab_linkage', 'inconsistent', 'is_isomorphic',
            'is_monotonic', 'is_valid_im', 'is_valid_linkage', 'leaders',
            'leaves_list', 'linkage', 'maxRstat', 'maxdists', 'maxinconsts',
-           'median', 'num_obs_linkage', 'set_link_color_palette', 'single',
+           'median', 'num_obs_linkage', 'optimal_leaf_ordering',
+           'set_link_color_palette', 'single',
            'to_mlab_linkage', 'to_tree', 'ward', 'weighted', 'distance']
 
 
@@ -593,6 +599,13 @@ def linkage(y, method='single', metric='euclidean'):
     implementation may chose a different minimum than the MATLAB
     version.
 
+    The 'complete', 'average', 'weighted' and 'ward' methods use the
+    nearest-neighbor chain algorithm, and 'single' the SLINK algorithm, all
+    in :math:`O(n^2)` time.  When raw observations are given with
+    ``method='single'``, a minimum spanning tree is built from distances
+    computed as needed, so that the condensed distance matrix is never
+    stored and :math:`O(n)` memory is used.
+
     Parameters
     ----------
     y : ndarray
@@ -630,37 +643,48 @@ def linkage(y, method='single', metric='euclidean'):
         # Since the C code does not support striding using strides.
         [y] = _copy_arrays_if_base_present([y])
 
-        Z = np.zeros((d - 1, 4))
-
-        if method == 'single':
-            _hierarchy.slink(y, Z, int(d))
-        else:
-            _hierarchy.linkage(y, Z, int(d),
-                               int(_cpy_non_euclid_methods[method]))
+        Z = _linkage_condensed(y, int(d), method)
 
     elif len(s) == 2:
         X = y
         n = s[0]
         if method not in _cpy_linkage_methods:
             raise ValueError('Invalid method: %s' % method)
-        if method in _cpy_non_euclid_methods:
-            dm = distance.pdist(X, metric)
+        if method == 'single':
+            # Prim's algorithm computes the distances one row at a time,
+            # without storing the condensed distance matrix.  The parameters
+            # pdist would estimate from all the observations are computed
+            # once here.
+            [X] = _copy_arrays_if_base_present([X])
+            kwargs = {}
+            if isinstance(metric, string_types):
+                mstr = metric.lower()
+                if mstr in set(['seuclidean', 'se', 's', 'test_seuclidean']):
+                    kwargs['V'] = np.var(X, axis=0, ddof=1)
+                elif mstr in set(['mahalanobis', 'mahal', 'mah',
+                                  'test_mahalanobis']):
+                    kwargs['VI'] = np.linalg.inv(np.cov(X.T)).T
             Z = np.zeros((n - 1, 4))
-
-            if method == 'single':
-                _hierarchy.slink(dm, Z, n)
-            else:
-                _hierarchy.linkage(dm, Z, n,
-                                   int(_cpy_non_euclid_methods[method]))
-
-        elif method in _cpy_euclid_methods:
-            if metric != 'euclidean':
+            if n > 1:
+                _hierarchy.mst_single_linkage(
+                    lambda x, out: distance.cdist(X[x:x + 1], X, metric,
+                                                  out=out, **kwargs), Z, n)
+        else:
+            if method in _cpy_euclid_methods and metric != 'euclidean':
                 raise ValueError(("Method '%s' requires the distance metric "
                                  "to be euclidean") % method)
-            dm = distance.pdist(X, metric)
-            Z = np.zeros((n - 1, 4))
-            _hierarchy.linkage(dm, Z, n,
-                               int(_cpy_euclid_methods[method]))
+            Z = _linkage_condensed(distance.pdist(X, metric), n, method)
+    return Z
+
+
+def _linkage_condensed(y, n, method):
+    Z = np.zeros((n - 1, 4))
+    if method == 'single':
+        _hierarchy.slink(y, Z, n)
+    elif method in _nn_chain_methods:
+        _hierarchy.nn_chain(y, Z, n, _cpy_linkage_method_ids[method])
+    else:
+        _hierarchy.linkage(y, Z, n, _cpy_linkage_method_ids[method])
     return Z
 
 
@@ -995,6 +1019,66 @@ def cophenet(Z, Y=None):
     return (c, zz)
 
 
+def cophenet_pairs(Z, i, j):
+    """
+    Calculates the cophenetic distances between given pairs of observations.
+
+    This gives the same distances as `cophenet`, without forming the
+    condensed matrix of all :math:`n(n-1)/2` distances.
+
+    .. versionadded:: 0.16.0
+
+    Parameters
+    ----------
+    Z : ndarray
+        The hierarchical clustering encoded as an array
+        (see ``linkage`` function).
+    i, j : array_like of ints
+        The indices of the observations of each pair.  They are broadcast
+        against each other.
+
+    Returns
+    -------
+    d : ndarray
+        The cophenetic distances between observations ``i`` and ``j``.
+
+    Notes
+    -----
+    The observations are laid out in the order of the leaves of the
+    dendrogram, where the cluster joining two observations is the last
+    formed of the clusters joining the neighboring leaves between them.
+    After an :math:`O(n \\log n)` preprocessing step, each distance is
+    found in constant time.
+
+    Examples
+    --------
+    >>> from scipy.cluster.hierarchy import linkage, cophenet_pairs
+    >>> X = [[0], [1], [3], [7], [8]]
+    >>> Z = linkage(X, 'single')
+    >>> cophenet_pairs(Z, [0, 0, 3], [1, 4, 2])
+    array([ 1.,  4.,  4.])
+
+    """
+    Z = np.asarray(Z, order='c')
+    is_valid_linkage(Z, throw=True, name='Z')
+    n = Z.shape[0] + 1
+    Z = _convert_to_double(Z)
+
+    i, j = np.broadcast_arrays(np.asarray(i), np.asarray(j))
+    if i.size > 0:
+        if not (np.issubdtype(i.dtype, np.integer) and
+                np.issubdtype(j.dtype, np.integer)):
+            raise TypeError('The observation indices must be integers.')
+        if min(i.min(), j.min()) < 0 or max(i.max(), j.max()) >= n:
+            raise ValueError('The observation indices must be between 0 '
+                             'and %d.' % (n - 1))
+
+    d = np.zeros(i.size, dtype=np.double)
+    _hierarchy.cophenetic_pairs(Z, i.ravel().astype('i'),
+                                j.ravel().astype('i'), d, int(n))
+    return d.reshape(i.shape)
+
+
 def inconsistent(Z, d=2):
     """
     Calculates inconsistency statistics on a linkage.
@@ -1363,31 +1447,19 @@ def is_valid_linkage(Z, warning=False, throw=False, name=None):
 
 def _check_hierarchy_uses_cluster_before_formed(Z):
     n = Z.shape[0] + 1
-    for i in xrange(0, n - 1):
-        if Z[i, 0] >= n + i or Z[i, 1] >= n + i:
-            return True
-    return False
+    formed = n + np.arange(n - 1)
+    return bool(np.any(Z[:, :2] >= formed[:, np.newaxis]))
 
 
 def _check_hierarchy_uses_cluster_more_than_once(Z):
-    n = Z.shape[0] + 1
-    chosen = set([])
-    for i in xrange(0, n - 1):
-        if (Z[i, 0] in chosen) or (Z[i, 1] in chosen) or Z[i, 0] == Z[i, 1]:
-            return True
-        chosen.add(Z[i, 0])
-        chosen.add(Z[i, 1])
-    return False
+    children = Z[:, :2].ravel()
+    return len(np.unique(children)) != len(children)
 
 
 def _check_hierarchy_not_all_clusters_used(Z):
     n = Z.shape[0] + 1
-    chosen = set([])
-    for i in xrange(0, n - 1):
-        chosen.add(int(Z[i, 0]))
-        chosen.add(int(Z[i, 1]))
-    must_chosen = set(range(0, 2 * n - 2))
-    return len(must_chosen.difference(chosen)) > 0
+    chosen = np.unique(Z[:, :2].astype(int))
+    return len(np.setdiff1d(np.arange(2 * n - 2), chosen)) > 0
 
 
 def num_obs_linkage(Z):
@@ -1453,8 +1525,12 @@ def fcluster(Z, t, criterion='inconsistent', depth=2, R=None, monocrit=None):
     Z : ndarray
         The hierarchical clustering encoded with the matrix returned
         by the `linkage` function.
-    t : float
-        The threshold to apply when forming flat clusters.
+    t : float or array_like
+        The threshold to apply when forming flat clusters.  If a 1-D array
+        of thresholds is given, the tree is cut at all of them at once.
+
+        .. versionadded:: 0.16.0
+           Arrays of thresholds.
     criterion : str, optional
         The criterion to use in forming flat clusters. This can
         be any of the following values:
@@ -1516,19 +1592,42 @@ def fcluster(Z, t, criterion='inconsistent', depth=2, R=None, monocrit=None):
     -------
     fcluster : ndarray
         An array of length n. T[i] is the flat cluster number to
-        which original observation i belongs.
+        which original observation i belongs.  If `t` is an array, an
+        array of shape ``(len(t), n)`` whose i'th row is the flat
+        clustering for the threshold ``t[i]``.
+
+    Notes
+    -----
+    For an array of thresholds, the monotonic criterion is computed once,
+    and each threshold is applied in a single pass over the leaves in the
+    order in which they appear in the dendrogram, where every flat cluster
+    is a contiguous run of leaves.
+
+    Examples
+    --------
+    >>> from scipy.cluster.hierarchy import linkage, fcluster
+    >>> X = [[0], [1], [3], [7], [8]]
+    >>> Z = linkage(X, 'single')
+    >>> fcluster(Z, [0.5, 1.5, 3.5], criterion='distance')
+    array([[3, 4, 5, 1, 2],
+           [2, 2, 3, 1, 1],
+           [2, 2, 2, 1, 1]], dtype=int32)
 
     """
     Z = np.asarray(Z, order='c')
     is_valid_linkage(Z, throw=True, name='Z')
 
     n = Z.shape[0] + 1
-    T = np.zeros((n,), dtype='i')
 
     # Since the C code does not support striding using strides.
     # The dimensions are used instead.
     [Z] = _copy_arrays_if_base_present([Z])
 
+    if np.ndim(t) > 0:
+        return _fcluster_multi(Z, t, criterion, depth, R, monocrit, n)
+
+    T = np.zeros((n,), dtype='i')
+
     if criterion == 'inconsistent':
         if R is None:
             R = inconsistent(Z, depth)
@@ -1555,6 +1654,43 @@ def fcluster(Z, t, criterion='inconsistent', depth=2, R=None, monocrit=None):
     return T
 
 
+def _fcluster_multi(Z, t, criterion, depth, R, monocrit, n):
+    """
+    `fcluster` for a 1-D array of thresholds.
+    """
+    t = np.asarray(t)
+    if t.ndim != 1:
+        raise ValueError('The thresholds must be a scalar or a 1-D array.')
+
+    if criterion == 'inconsistent':
+        if R is None:
+            R = inconsistent(Z, depth)
+        else:
+            R = np.asarray(R, order='c')
+            is_valid_im(R, throw=True, name='R')
+            [R] = _copy_arrays_if_base_present([R])
+        MC = np.ndarray((n - 1,), dtype=np.double)
+        _hierarchy.get_max_Rfield_for_each_cluster(Z, R, MC, int(n), 3)
+    elif criterion in ('distance', 'maxclust'):
+        MC = np.ndarray((n - 1,), dtype=np.double)
+        _hierarchy.get_max_dist_for_each_cluster(Z, MC, int(n))
+    elif criterion in ('monocrit', 'maxclust_monocrit'):
+        [MC] = _copy_arrays_if_base_present([monocrit])
+    else:
+        raise ValueError('Invalid cluster formation criterion: %s'
+                         % str(criterion))
+
+    if criterion.startswith('maxclust'):
+        cutoffs = np.ndarray(t.shape, dtype=np.double)
+        _hierarchy.maxclust_cutoffs(MC, t.astype('i'), cutoffs, int(n))
+    else:
+        cutoffs = t.astype(np.double)
+
+    T = np.zeros((len(t), n), dtype='i')
+    _hierarchy.cluster_monocrit_multi(Z, MC, T, cutoffs, int(n))
+    return T
+
+
 def fclusterdata(X, t, criterion='inconsistent',
                  metric='euclidean', depth=2, method='single', R=None):
     """
@@ -1574,8 +1710,12 @@ def fclusterdata(X, t, criterion='inconsistent',
     ----------
     X : (N, M) ndarray
         N by M data matrix with N observations in M dimensions.
-    t : float
-        The threshold to apply when forming flat clusters.
+    t : float or array_like
+        The threshold to apply when forming flat clusters.  If a 1-D array
+        of thresholds is given, the tree is cut at all of them at once.
+
+        .. versionadded:: 0.16.0
+           Arrays of thresholds.
     criterion : str, optional
         Specifies the criterion for forming flat clusters.  Valid
         values are 'inconsistent' (default), 'distance', or 'maxclust'
@@ -1665,6 +1805,85 @@ _drotationsortedkeys = list(_drotation.keys())
 _drotationsortedkeys.sort()
 
 
+def optimal_leaf_ordering(Z, y, metric='euclidean'):
+    """
+    Reorders the children of a linkage so that the leaves are in the
+    optimal order.
+
+    The order of the leaves of a dendrogram is fixed up to swapping the two
+    children of each cluster.  Among the :math:`2^{n-1}` orders, the optimal
+    one minimizes the sum of the distances between neighboring leaves.
+
+    .. versionadded:: 0.16.0
+
+    Parameters
+    ----------
+    Z : ndarray
+        The hierarchical clustering encoded as a linkage matrix (see
+        ``linkage``).
+    y : ndarray
+        The condensed distance matrix from which ``Z`` was computed, or the
+        :math:`m` by :math:`n` array of the :math:`m` observations, as
+        accepted by ``linkage``.
+    metric : str or function, optional
+        The distance metric to use when ``y`` is a collection of
+        observations.  See the ``distance.pdist`` function for a list of
+        valid distance metrics.
+
+    Returns
+    -------
+    Z_ordered : ndarray
+        A copy of the linkage matrix ``Z``, with the children of its
+        clusters reordered.  The leaves of its dendrogram, and
+        ``leaves_list(Z_ordered)``, are in the optimal order.
+
+    Notes
+    -----
+    The optimal order is found by the dynamic programming algorithm of
+    Bar-Joseph et al. [1]_, which takes :math:`O(n^3)` time and stores
+    :math:`O(n^2)` costs in the condensed layout of ``y``.  The candidates
+    of each step are scanned by increasing cost, and the scan stops as soon
+    as no candidate can improve on the best one, which in practice leaves
+    out most of them.
+
+    References
+    ----------
+    .. [1] Z. Bar-Joseph, D. K. Gifford and T. S. Jaakkola, "Fast optimal
+       leaf ordering for hierarchical clustering", Bioinformatics 17
+       (suppl 1), pp. S22-S29, 2001.
+
+    Examples
+    --------
+    >>> from scipy.cluster.hierarchy import (linkage, leaves_list,
+    ...                                      optimal_leaf_ordering)
+    >>> X = [[0], [10], [1], [11], [5]]
+    >>> Z = linkage(X, 'single')
+    >>> leaves_list(Z)
+    array([1, 3, 4, 0, 2], dtype=int32)
+    >>> leaves_list(optimal_leaf_ordering(Z, X))
+    array([3, 1, 4, 2, 0], dtype=int32)
+
+    """
+    Z = np.array(Z, dtype=np.double, order='c')
+    is_valid_linkage(Z, throw=True, name='Z')
+    n = Z.shape[0] + 1
+
+    y = _convert_to_double(np.asarray(y, order='c'))
+    if y.ndim == 1:
+        distance.is_valid_y(y, throw=True, name='y')
+        [y] = _copy_arrays_if_base_present([y])
+    elif y.ndim == 2:
+        y = distance.pdist(y, metric)
+    else:
+        raise ValueError("`y` must be 1 or 2 dimensional.")
+    if distance.num_obs_y(y) != n:
+        raise ValueError("The number of observations of the linkage and "
+                         "of the distances do not match.")
+
+    _hierarchy.optimal_leaf_ordering(Z, y, int(n))
+    return Z
+
+
 def _remove_dups(L):
     """
     Removes duplicates AND preserves the original order of the elements.
@@ -2112,6 +2331,13 @@ def dendrogram(Z, p=30, truncate_mode=None, color_threshold=None,
           ``i``-th leaf node corresponds to an original observation.
           Otherwise, it corresponds to a non-singleton cluster.
 
+    Notes
+    -----
+    The leaves and links are laid out in a few passes over the nodes in the
+    order in which the clusters were formed, without recursion, so that
+    the dendrograms of large linkages, and their truncations, are computed
+    quickly.
+
     """
     # Features under consideration.
     #
@@ -2147,55 +2373,75 @@ def dendrogram(Z, p=30, truncate_mode=None, color_threshold=None,
         if p <= 0:
             p = np.inf
 
-    if get_leaves:
-        lvs = []
+    if truncate_mode == 'lastp':
+        truncate = 1
+    elif truncate_mode in ('mtica', 'level'):
+        truncate = 2
+        # no node is deeper than n - 1 levels
+        p = min(p, n)
     else:
-        lvs = None
+        truncate = 0
 
-    icoord_list = []
-    dcoord_list = []
-    color_list = []
-    current_color = [0]
-    currently_below_threshold = [False]
-    if no_leaves:
-        ivl = None
+    if count_sort == 'ascending' or count_sort == True:
+        sort_mode = 1
+    elif count_sort == 'descending':
+        sort_mode = 2
+    elif distance_sort == 'ascending' or distance_sort == True:
+        sort_mode = 3
+    elif distance_sort == 'descending':
+        sort_mode = 4
     else:
-        ivl = []
+        sort_mode = 0
 
     if color_threshold is None or \
        (isinstance(color_threshold, string_types) and
                            color_threshold == 'default'):
-        color_threshold = max(Z[:, 2]) * 0.7
+        color_threshold = Z[:, 2].max() * 0.7
+
+    leaves = np.ndarray((n,), dtype='i')
+    links = np.ndarray((n - 1,), dtype='i')
+    gaps = np.ndarray((n - 1,), dtype='i')
+    icoord = np.ndarray((n - 1, 4), dtype=np.double)
+    dcoord = np.ndarray((n - 1, 4), dtype=np.double)
+    marks = np.ndarray((n - 1, 2), dtype=np.double)
+    n_leaves, n_marks = _hierarchy.dendrogram_layout(
+        _convert_to_double(Z), int(n), int(p), truncate, sort_mode,
+        bool(show_contracted), leaves, links, gaps, icoord, dcoord, marks)
+    leaves = leaves[:n_leaves]
+    links = links[:n_leaves - 1]
+    gaps = gaps[:n_leaves - 1]
+    icoord = icoord[:n_leaves - 1]
+    dcoord = dcoord[:n_leaves - 1]
+
+    color_list = _link_colors(links, gaps, dcoord[:, 1], color_threshold,
+                              link_color_func, above_threshold_color)
+
+    if no_leaves:
+        ivl = None
+    elif leaf_label_func:
+        ivl = [leaf_label_func(int(i)) for i in leaves]
+    else:
+        ivl = []
+        for i in leaves:
+            if i < n:
+                ivl.append(str(i) if labels is None else labels[i])
+            elif show_leaf_counts:
+                ivl.append("(" + str(int(Z[i - n, 3])) + ")")
+            else:
+                ivl.append("")
+
+    icoord_list = icoord.tolist()
+    dcoord_list = dcoord.tolist()
     R = {'icoord': icoord_list, 'dcoord': dcoord_list, 'ivl': ivl,
-         'leaves': lvs, 'color_list': color_list}
+         'leaves': leaves.tolist() if get_leaves else None,
+         'color_list': color_list}
     if show_contracted:
-        contraction_marks = []
+        contraction_marks = marks[:n_marks]
     else:
         contraction_marks = None
 
-    _dendrogram_calculate_info(
-        Z=Z, p=p,
-        truncate_mode=truncate_mode,
-        color_threshold=color_threshold,
-        get_leaves=get_leaves,
-        orientation=orientation,
-        labels=labels,
-        count_sort=count_sort,
-        distance_sort=distance_sort,
-        show_leaf_counts=show_leaf_counts,
-        i=2 * n - 2, iv=0.0, ivl=ivl, n=n,
-        icoord_list=icoord_list,
-        dcoord_list=dcoord_list, lvs=lvs,
-        current_color=current_color,
-        color_list=color_list,
-        currently_below_threshold=currently_below_threshold,
-        leaf_label_func=leaf_label_func,
-        contraction_marks=contraction_marks,
-        link_color_func=link_color_func,
-        above_threshold_color=above_threshold_color)
-
     if not no_plot:
-        mh = max(Z[:, 2])
+        mh = Z[:, 2].max()
         _plot_dendrogram(icoord_list, dcoord_list, ivl, p, n, mh, orientation,
                          no_labels, color_list,
                          leaf_font_size=leaf_font_size,
@@ -2207,294 +2453,40 @@ def dendrogram(Z, p=30, truncate_mode=None, color_threshold=None,
     return R
 
 
-def _append_singleton_leaf_node(Z, p, n, level, lvs, ivl, leaf_label_func,
-                                i, labels):
-    # If the leaf id structure is not None and is a list then the caller
-    # to dendrogram has indicated that cluster id's corresponding to the
-    # leaf nodes should be recorded.
-
-    if lvs is not None:
-        lvs.append(int(i))
-
-    # If leaf node labels are to be displayed...
-    if ivl is not None:
-        # If a leaf_label_func has been provided, the label comes from the
-        # string returned from the leaf_label_func, which is a function
-        # passed to dendrogram.
-        if leaf_label_func:
-            ivl.append(leaf_label_func(int(i)))
-        else:
-            # Otherwise, if the dendrogram caller has passed a labels list
-            # for the leaf nodes, use it.
-            if labels is not None:
-                ivl.append(labels[int(i - n)])
-            else:
-                # Otherwise, use the id as the label for the leaf.x
-                ivl.append(str(int(i)))
-
-
-def _append_nonsingleton_leaf_node(Z, p, n, level, lvs, ivl, leaf_label_func,
-                                   i, labels, show_leaf_counts):
-    # If the leaf id structure is not None and is a list then the caller
-    # to dendrogram has indicated that cluster id's corresponding to the
-    # leaf nodes should be recorded.
-
-    if lvs is not None:
-        lvs.append(int(i))
-    if ivl is not None:
-        if leaf_label_func:
-            ivl.append(leaf_label_func(int(i)))
-        else:
-            if show_leaf_counts:
-                ivl.append("(" + str(int(Z[i - n, 3])) + ")")
-            else:
-                ivl.append("")
-
-
-def _append_contraction_marks(Z, iv, i, n, contraction_marks):
-    _append_contraction_marks_sub(Z, iv, int(Z[i - n, 0]), n, contraction_marks)
-    _append_contraction_marks_sub(Z, iv, int(Z[i - n, 1]), n, contraction_marks)
-
-
-def _append_contraction_marks_sub(Z, iv, i, n, contraction_marks):
-    if i >= n:
-        contraction_marks.append((iv, Z[i - n, 2]))
-        _append_contraction_marks_sub(Z, iv, int(Z[i - n, 0]), n, contraction_marks)
-        _append_contraction_marks_sub(Z, iv, int(Z[i - n, 1]), n, contraction_marks)
-
-
-def _dendrogram_calculate_info(Z, p, truncate_mode,
-                               color_threshold=np.inf, get_leaves=True,
-                               orientation='top', labels=None,
-                               count_sort=False, distance_sort=False,
-                               show_leaf_counts=False, i=-1, iv=0.0,
-                               ivl=[], n=0, icoord_list=[], dcoord_list=[],
-                               lvs=None, mhr=False,
-                               current_color=[], color_list=[],
-                               currently_below_threshold=[],
-                               leaf_label_func=None, level=0,
-                               contraction_marks=None,
-                               link_color_func=None,
-                               above_threshold_color='b'):
-    """
-    Calculates the endpoints of the links as well as the labels for the
-    the dendrogram rooted at the node with index i. iv is the independent
-    variable value to plot the left-most leaf node below the root node i
-    (if orientation='top', this would be the left-most x value where the
-    plotting of this root node i and its descendents should begin).
-
-    ivl is a list to store the labels of the leaf nodes. The leaf_label_func
-    is called whenever ivl != None, labels == None, and
-    leaf_label_func != None. When ivl != None and labels != None, the
-    labels list is used only for labeling the leaf nodes. When
-    ivl == None, no labels are generated for leaf nodes.
-
-    When get_leaves==True, a list of leaves is built as they are visited
-    in the dendrogram.
-
-    Returns a tuple with l being the independent variable coordinate that
-    corresponds to the midpoint of cluster to the left of cluster i if
-    i is non-singleton, otherwise the independent coordinate of the leaf
-    node if i is a leaf node.
-
-    Returns
-    -------
-    A tuple (left, w, h, md), where:
-
-      * left is the independent variable coordinate of the center of the
-        the U of the subtree
-
-      * w is the amount of space used for the subtree (in independent
-        variable units)
-
-      * h is the height of the subtree in dependent variable units
-
-      * md is the max(Z[*,2]) for all nodes * below and including
-        the target node.
-
+def _link_colors(links, gaps, heights, color_threshold, link_color_func,
+                 above_threshold_color):
     """
-    if n == 0:
-        raise ValueError("Invalid singleton cluster count n.")
-
-    if i == -1:
-        raise ValueError("Invalid root cluster index i.")
+    Colors of the links of a dendrogram, given in post-order.
 
-    if truncate_mode == 'lastp':
-        # If the node is a leaf node but corresponds to a non-single cluster,
-        # it's label is either the empty string or the number of original
-        # observations belonging to cluster i.
-        if i < 2 * n - p and i >= n:
-            d = Z[i - n, 2]
-            _append_nonsingleton_leaf_node(Z, p, n, level, lvs, ivl,
-                                           leaf_label_func, i, labels,
-                                           show_leaf_counts)
-            if contraction_marks is not None:
-                _append_contraction_marks(Z, iv + 5.0, i, n, contraction_marks)
-            return (iv + 5.0, 10.0, 0.0, d)
-        elif i < n:
-            _append_singleton_leaf_node(Z, p, n, level, lvs, ivl,
-                                        leaf_label_func, i, labels)
-            return (iv + 5.0, 10.0, 0.0, 0.0)
-    elif truncate_mode in ('mtica', 'level'):
-        if i > n and level > p:
-            d = Z[i - n, 2]
-            _append_nonsingleton_leaf_node(Z, p, n, level, lvs, ivl,
-                                           leaf_label_func, i, labels,
-                                           show_leaf_counts)
-            if contraction_marks is not None:
-                _append_contraction_marks(Z, iv + 5.0, i, n, contraction_marks)
-            return (iv + 5.0, 10.0, 0.0, d)
-        elif i < n:
-            _append_singleton_leaf_node(Z, p, n, level, lvs, ivl,
-                                        leaf_label_func, i, labels)
-            return (iv + 5.0, 10.0, 0.0, 0.0)
-    elif truncate_mode in ('mlab',):
-        pass
-
-    # Otherwise, only truncate if we have a leaf node.
-    #
-    # If the truncate_mode is mlab, the linkage has been modified
-    # with the truncated tree.
-    #
-    # Only place leaves if they correspond to original observations.
-    if i < n:
-        _append_singleton_leaf_node(Z, p, n, level, lvs, ivl,
-                                    leaf_label_func, i, labels)
-        return (iv + 5.0, 10.0, 0.0, 0.0)
-
-    # !!! Otherwise, we don't have a leaf node, so work on plotting a
-    # non-leaf node.
-    # Actual indices of a and b
-    aa = int(Z[i - n, 0])
-    ab = int(Z[i - n, 1])
-    if aa > n:
-        # The number of singletons below cluster a
-        na = Z[aa - n, 3]
-        # The distance between a's two direct children.
-        da = Z[aa - n, 2]
-    else:
-        na = 1
-        da = 0.0
-    if ab > n:
-        nb = Z[ab - n, 3]
-        db = Z[ab - n, 2]
-    else:
-        nb = 1
-        db = 0.0
-
-    if count_sort == 'ascending' or count_sort == True:
-        # If a has a count greater than b, it and its descendents should
-        # be drawn to the right. Otherwise, to the left.
-        if na > nb:
-            # The cluster index to draw to the left (ua) will be ab
-            # and the one to draw to the right (ub) will be aa
-            ua = ab
-            ub = aa
-        else:
-            ua = aa
-            ub = ab
-    elif count_sort == 'descending':
-        # If a has a count less than or equal to b, it and its
-        # descendents should be drawn to the left. Otherwise, to
-        # the right.
-        if na > nb:
-            ua = aa
-            ub = ab
-        else:
-            ua = ab
-            ub = aa
-    elif distance_sort == 'ascending' or distance_sort == True:
-        # If a has a distance greater than b, it and its descendents should
-        # be drawn to the right. Otherwise, to the left.
-        if da > db:
-            ua = ab
-            ub = aa
-        else:
-            ua = aa
-            ub = ab
-    elif distance_sort == 'descending':
-        # If a has a distance less than or equal to b, it and its
-        # descendents should be drawn to the left. Otherwise, to
-        # the right.
-        if da > db:
-            ua = aa
-            ub = ab
-        else:
-            ua = ab
-            ub = aa
-    else:
-        ua = aa
-        ub = ab
-
-    # Updated iv variable and the amount of space used.
-    (uiva, uwa, uah, uamd) = \
-        _dendrogram_calculate_info(
-            Z=Z, p=p,
-            truncate_mode=truncate_mode,
-            color_threshold=color_threshold,
-            get_leaves=get_leaves,
-            orientation=orientation,
-            labels=labels,
-            count_sort=count_sort,
-            distance_sort=distance_sort,
-            show_leaf_counts=show_leaf_counts,
-            i=ua, iv=iv, ivl=ivl, n=n,
-            icoord_list=icoord_list,
-            dcoord_list=dcoord_list, lvs=lvs,
-            current_color=current_color,
-            color_list=color_list,
-            currently_below_threshold=currently_below_threshold,
-            leaf_label_func=leaf_label_func,
-            level=level + 1, contraction_marks=contraction_marks,
-            link_color_func=link_color_func,
-            above_threshold_color=above_threshold_color)
-
-    h = Z[i - n, 2]
-    if h >= color_threshold or color_threshold <= 0:
-        c = above_threshold_color
-
-        if currently_below_threshold[0]:
-            current_color[0] = (current_color[0] + 1) % len(_link_line_colors)
-        currently_below_threshold[0] = False
-    else:
-        currently_below_threshold[0] = True
-        c = _link_line_colors[current_color[0]]
-
-    (uivb, uwb, ubh, ubmd) = \
-        _dendrogram_calculate_info(
-            Z=Z, p=p,
-            truncate_mode=truncate_mode,
-            color_threshold=color_threshold,
-            get_leaves=get_leaves,
-            orientation=orientation,
-            labels=labels,
-            count_sort=count_sort,
-            distance_sort=distance_sort,
-            show_leaf_counts=show_leaf_counts,
-            i=ub, iv=iv + uwa, ivl=ivl, n=n,
-            icoord_list=icoord_list,
-            dcoord_list=dcoord_list, lvs=lvs,
-            current_color=current_color,
-            color_list=color_list,
-            currently_below_threshold=currently_below_threshold,
-            leaf_label_func=leaf_label_func,
-            level=level + 1, contraction_marks=contraction_marks,
-            link_color_func=link_color_func,
-            above_threshold_color=above_threshold_color)
-
-    max_dist = max(uamd, ubmd, h)
-
-    icoord_list.append([uiva, uiva, uivb, uivb])
-    dcoord_list.append([uah, h, h, ubh])
+    Going through the links from left to right (in-order), the links below
+    the color threshold take the next color of the palette whenever a link
+    above the threshold has been met since the previous one.
+    """
     if link_color_func is not None:
-        v = link_color_func(int(i))
-        if not isinstance(v, string_types):
-            raise TypeError("link_color_func must return a matplotlib "
-                            "color string!")
-        color_list.append(v)
+        color_list = []
+        for i in links:
+            v = link_color_func(int(i))
+            if not isinstance(v, string_types):
+                raise TypeError("link_color_func must return a matplotlib "
+                                "color string!")
+            color_list.append(v)
+        return color_list
+
+    above = np.zeros(len(links), dtype=bool)
+    if color_threshold <= 0:
+        above[:] = True
     else:
-        color_list.append(c)
-    return (((uiva + uivb) / 2), uwa + uwb, h, max_dist)
+        above[gaps] = heights >= color_threshold
+    color_list = np.empty(len(links), dtype=object)
+    color_list[:] = above_threshold_color
+    below = ~above[gaps]
+    if below.any():
+        palette = np.empty(len(_link_line_colors), dtype=object)
+        palette[:] = _link_line_colors
+        changes = np.cumsum(above[1:] & ~above[:-1])
+        color_index = np.concatenate([[0], changes]) % len(palette)
+        color_list[below] = palette[color_index[gaps[below]]]
+    return color_list.tolist()
 
 
 def is_isomorphic(T1, T2):
@@ -34,6 +34,8 @@
 # SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 from __future__ import division, print_function, absolute_import
 
+import itertools
+
 import numpy as np
 from numpy.testing import (TestCase, run_module_suite, dec, assert_raises,
                            assert_allclose, assert_equal, assert_)
@@ -43,11 +45,12 @@ from scipy._lib.six import xrange, u
 import scipy.cluster.hierarchy
 from scipy.cluster.hierarchy import (
     linkage, from_mlab_linkage, to_mlab_linkage, num_obs_linkage, inconsistent,
-    cophenet, fclusterdata, fcluster, is_isomorphic, single, leaders,
+    cophenet, cophenet_pairs, fclusterdata, fcluster, is_isomorphic, single, leaders,
     correspond, is_monotonic, maxdists, maxinconsts, maxRstat,
     is_valid_linkage, is_valid_im, to_tree, leaves_list, dendrogram,
-    set_link_color_palette)
-from scipy.spatial.distance import pdist
+    set_link_color_palette, optimal_leaf_ordering)
+from scipy.cluster import _hierarchy
+from scipy.spatial.distance import pdist, squareform
 
 import hierarchy_test_data
 
@@ -91,6 +94,44 @@ class TestLinkage(object):
         expectedZ = getattr(hierarchy_test_data, 'linkage_X_' + method)
         assert_allclose(Z, expectedZ, atol=1e-06)
 
+    def test_linkage_nn_chain(self):
+        for method in ['complete', 'average', 'weighted', 'ward']:
+            yield self.check_linkage_nn_chain, method
+
+    def check_linkage_nn_chain(self, method):
+        # The nearest-neighbor chain algorithm gives the same result as the
+        # generic one
+        np.random.seed(1234)
+        X = np.random.rand(50, 3)
+        y = pdist(X)
+        Z = linkage(y if method != 'ward' else X, method)
+        method_id = scipy.cluster.hierarchy._cpy_linkage_method_ids[method]
+        expectedZ = np.zeros((49, 4))
+        _hierarchy.linkage(y, expectedZ, 50, method_id)
+        assert_allclose(Z, expectedZ, atol=1e-10)
+
+    def test_linkage_single_mst(self):
+        # single linkage from raw observations, without the condensed matrix
+        np.random.seed(1234)
+        X = np.random.rand(100, 4)
+        for metric in ['euclidean', 'cityblock', 'seuclidean', 'cosine',
+                       'mahalanobis']:
+            Z = linkage(X, 'single', metric)
+            assert_allclose(Z, linkage(pdist(X, metric), 'single'),
+                            atol=1e-10)
+        Z = linkage(X[::2, 1:], 'single')
+        assert_allclose(Z, linkage(pdist(X[::2, 1:]), 'single'), atol=1e-10)
+
+    def test_linkage_single_mst_estimated(self):
+        # metrics whose parameters are estimated from all the observations
+        np.random.seed(1234)
+        X = np.random.rand(30, 3)
+        for metric in ['seuclidean', 'se', 's', 'mahalanobis', 'mahal', 'mah',
+                       'test_mahalanobis']:
+            Z = linkage(X, 'single', metric)
+            assert_allclose(Z, linkage(pdist(X, metric), 'single'),
+                            atol=1e-10)
+
 
 class TestInconsistent(object):
     def test_inconsistent_tdist(self):
@@ -122,6 +163,23 @@ class TestCopheneticDistance(object):
         assert_allclose(c, expectedc, atol=1e-10)
         assert_allclose(M, expectedM, atol=1e-10)
 
+    def test_cophenet_pairs(self):
+        # Tests cophenet_pairs(Z, i, j) against the full cophenetic matrix.
+        np.random.seed(1234)
+        X = np.random.rand(50, 3)
+        for method in ['single', 'complete', 'average', 'centroid', 'ward']:
+            Z = linkage(X, method)
+            D = squareform(cophenet(Z))
+            i = np.random.randint(0, 50, size=(20, 10))
+            j = np.random.randint(0, 50, size=(20, 10))
+            assert_equal(cophenet_pairs(Z, i, j), D[i, j])
+            assert_equal(cophenet_pairs(Z, np.arange(50), 3), D[:, 3])
+
+        Z = hierarchy_test_data.linkage_ytdist_single
+        assert_raises(ValueError, cophenet_pairs, Z, [0, 6], [1, 2])
+        assert_raises(ValueError, cophenet_pairs, Z, [-1], [1])
+        assert_raises(TypeError, cophenet_pairs, Z, [0.5], [1])
+
 
 class TestMLabLinkageConversion(object):
     def test_mlab_linkage_conversion_empty(self):
@@ -200,6 +258,37 @@ class TestFcluster(object):
         T = fcluster(Z, t, criterion='maxclust_monocrit', monocrit=maxdists(Z))
         assert_(is_isomorphic(T, expectedT))
 
+    def test_fcluster_multiple_thresholds(self):
+        # Tests fcluster with an array of thresholds against one at a time.
+        np.random.seed(1234)
+        X = np.random.rand(100, 2)
+        for method in ['single', 'complete', 'average', 'centroid', 'ward']:
+            Z = linkage(X, method)
+            R = inconsistent(Z)
+            thresholds = {
+                'distance': np.linspace(0, 1.1 * Z[-1, 2], 10),
+                'inconsistent': [0, 0.5, 0.8, 1, 1.2, 2],
+                'maxclust': [1, 2, 3, 10, 50, 99, 100, 120],
+                'monocrit': np.linspace(0, 1.1 * Z[-1, 2], 10),
+                'maxclust_monocrit': [1, 4, 20, 99]}
+            for criterion, t in thresholds.items():
+                T = fcluster(Z, t, criterion=criterion, R=R,
+                             monocrit=maxdists(Z))
+                assert_equal(T.shape, (len(t), 100))
+                for k in range(len(t)):
+                    assert_equal(T[k], fcluster(Z, t[k], criterion=criterion,
+                                                R=R, monocrit=maxdists(Z)))
+
+        assert_raises(ValueError, fcluster, Z, [[1]], criterion='distance')
+        assert_raises(ValueError, fcluster, Z, [1], criterion='foo')
+
+    def test_fcluster_maxclust_all_singletons(self):
+        # Tests that maxclust can form one cluster per observation.
+        Z = hierarchy_test_data.linkage_ytdist_single
+        for t in [6, 7]:
+            assert_equal(np.sort(fcluster(Z, t, criterion='maxclust')),
+                         np.arange(1, 7))
+
 
 class TestLeaders(object):
     def test_leaders_single(self):
@@ -492,6 +581,42 @@ class TestLeavesList(object):
                                         + node.get_right().pre_order()))
 
 
+class TestOptimalLeafOrdering(object):
+    def test_optimal_leaf_ordering(self):
+        for method in ['single', 'complete', 'average', 'ward']:
+            yield self.check_optimal_leaf_ordering, method
+
+    def check_optimal_leaf_ordering(self, method):
+        # Compares with all the orders obtained by swapping children.
+        np.random.seed(1234)
+        X = np.random.rand(8, 2)
+        y = pdist(X)
+        D = squareform(y)
+        Z = linkage(X, method)
+
+        def path_length(Z):
+            order = leaves_list(Z)
+            return D[order[:-1], order[1:]].sum()
+
+        best = np.inf
+        for flips in itertools.product([False, True], repeat=len(Z)):
+            Zf = Z.copy()
+            Zf[np.array(flips), :2] = Zf[np.array(flips), 1::-1]
+            best = min(best, path_length(Zf))
+
+        Zo = optimal_leaf_ordering(Z, y)
+        assert_allclose(path_length(Zo), best)
+        assert_equal(np.sort(Zo[:, :2], axis=1), np.sort(Z[:, :2], axis=1))
+        assert_equal(Zo[:, 2:], Z[:, 2:])
+        assert_equal(optimal_leaf_ordering(Z, X), Zo)
+
+    def test_optimal_leaf_ordering_mismatch(self):
+        X = hierarchy_test_data.Q_X
+        Z = linkage(X, 'single')
+        assert_raises(ValueError, optimal_leaf_ordering, Z, X[:-1])
+        assert_raises(ValueError, optimal_leaf_ordering, Z, X[np.newaxis])
+
+
 class TestCorrespond(TestCase):
     def test_correspond_empty(self):
         # Tests correspond(Z, y) with empty linkage and condensed distance matrix.
@@ -825,6 +950,27 @@ class TestDendrogram(object):
         color_list = R['color_list']
         assert_equal(color_list, ['c', 'm', 'g', 'g', 'g'])
 
+    def test_dendrogram_deep(self):
+        # Tests a dendrogram deeper than the recursion limit.
+        n = 5000
+        Z = np.zeros((n - 1, 4))
+        Z[0] = [0, 1, 1, 2]
+        for i in xrange(1, n - 1):
+            Z[i] = [i + 1, n + i - 1, i + 1, i + 2]
+
+        R = dendrogram(Z, no_plot=True)
+        assert_equal(R['leaves'], list(range(n - 1, 1, -1)) + [0, 1])
+        assert_equal(R['icoord'][0], [10.0 * n - 15, 10.0 * n - 15,
+                                      10.0 * n - 5, 10.0 * n - 5])
+        assert_equal(R['dcoord'][-1], [0.0, n - 1, n - 1, n - 2])
+
+        R = dendrogram(Z, 3, 'lastp', no_plot=True)
+        assert_equal(R['leaves'], [n - 1, n - 2, 2 * n - 4])
+        assert_equal(R['ivl'], [str(n - 1), str(n - 2), '(%d)' % (n - 2)])
+
+        R = dendrogram(Z, 2, 'level', no_plot=True, count_sort=True)
+        assert_equal(R['leaves'], [n - 1, n - 2, n - 3, 2 * n - 5])
+
 
 def calculate_maximum_distances(Z):
     # Used for testing correctness of maxdists.
@@ -12,8 +12,8 @@ from numpy.testing import (assert_array_equal, assert_array_almost_equal,
     TestCase, run_module_suite, assert_raises, assert_allclose, assert_equal,
     assert_)
 
-from scipy.cluster.vq import (kmeans, kmeans2, py_vq, py_vq2, vq, whiten,
-    ClusterError)
+from scipy.cluster.vq import (kmeans, kmeans2, kmeans_minibatch, py_vq,
+    py_vq2, vq, vq_chunks, whiten, ClusterError)
 from scipy.cluster import _vq
 
 # Optional:
@@ -125,6 +125,40 @@ class TestVq(TestCase):
         assert_allclose(dis0, dis1, 1e-5)
         assert_array_equal(codes0, codes1)
 
+    def test_vq_n_jobs(self):
+        X = np.random.rand(1000, 10)
+        code_book = np.random.rand(30, 10)
+        codes0, dis0 = _vq.vq(X, code_book)
+        for n_jobs in [2, 3, -1]:
+            codes1, dis1 = vq(X, code_book, n_jobs=n_jobs)
+            assert_array_equal(codes0, codes1)
+            assert_allclose(dis0, dis1, rtol=1e-12)
+        assert_raises(ValueError, vq, X, code_book, n_jobs=0)
+
+    def test_vq_chunks(self):
+        X = np.random.rand(100, 10)
+        code_book = np.random.rand(7, 10)
+        codes0, dis0 = vq(X, code_book)
+
+        for chunk_size in [1, 30, 100, None]:
+            blocks = list(vq_chunks(X, code_book, chunk_size=chunk_size))
+            assert_array_equal(np.concatenate([b[0] for b in blocks]),
+                               codes0)
+            assert_allclose(np.concatenate([b[1] for b in blocks]), dis0)
+
+        # float32 observations stay in single precision
+        X32 = X.astype(np.float32)
+        chunks = (X32[i:i + 40] for i in range(0, 100, 40))
+        blocks = list(vq_chunks(chunks, code_book, n_jobs=2))
+        assert_equal(len(blocks), 3)
+        for code, dist in blocks:
+            assert_equal(dist.dtype, np.float32)
+        assert_array_equal(np.concatenate([b[0] for b in blocks]), codes0)
+        assert_allclose(np.concatenate([b[1] for b in blocks]), dis0,
+                        rtol=1e-5)
+
+        assert_raises(ValueError, vq_chunks, X, code_book, chunk_size=0)
+
     def test_vq_large_features(self):
         X = np.random.rand(10, 5) * 1000000
         code_book = np.random.rand(2, 5) * 1000000
@@ -214,6 +248,59 @@ class TestKMean(TestCase):
             kmeans2(data, 3, minit='random')
             kmeans2(data[:, :1], 3, minit='random')  # special case (1-D)
 
+    def test_kmeans2_kpp(self):
+        data = np.fromfile(DATAFILE1, sep=", ")
+        data = data.reshape((200, 2))
+
+        code, label = kmeans2(data, 3, minit='++')
+        assert_equal(code.shape, (3, 2))
+        assert_equal(label.shape, (200,))
+        code, label = kmeans2(data[:, 0], 3, minit='++')
+        assert_equal(code.shape, (3,))
+
+    def test_kmeans2_pruned(self):
+        # The bounds used to skip distance computations must not change the
+        # result of the plain Lloyd iteration
+        np.random.seed(1234)
+        centers = 5 * np.random.randn(10, 6)
+        data = np.repeat(centers, 100, axis=0) + np.random.randn(1000, 6)
+        code = data[np.random.permutation(1000)[:10]]
+        for dtype in [np.float64, np.float32]:
+            data = data.astype(dtype)
+            code = code.astype(dtype)
+            code0 = code
+            for i in range(15):
+                label0 = vq(data, code0)[0]
+                code0 = _vq.update_cluster_means(data, label0, 10)[0]
+            for n_jobs in [1, 3]:
+                code1, label1 = kmeans2(data, code, iter=15, minit='matrix',
+                                        n_jobs=n_jobs)
+                assert_equal(code1.dtype, dtype)
+                assert_array_equal(label0, label1)
+                assert_allclose(code0, code1, rtol=1e-5)
+
+    def test_kmeans_minibatch(self):
+        np.random.seed(1234)
+        centers = np.array([[0., 0.], [10., 0.], [0., 10.]])
+        data = np.repeat(centers, 300, axis=0) + np.random.randn(900, 2)
+        data = data[np.random.permutation(900)]
+
+        code, count = kmeans_minibatch(data, 3, batch_size=100)
+        assert_equal(count.sum(), 900)
+        assert_allclose(np.sort(count), [300, 300, 300])
+        code = code[np.argsort(np.dot(code, [1, 2]))]
+        assert_allclose(code, centers, atol=0.3)
+
+        chunks = (data[i:i + 128].astype(np.float32)
+                  for i in range(0, 900, 128))
+        code, count = kmeans_minibatch(chunks, centers)
+        assert_equal(code.dtype, np.float32)
+        assert_allclose(code, centers, atol=0.3)
+
+        assert_raises(ValueError, kmeans_minibatch, [], 3)
+        assert_raises(ClusterError, kmeans_minibatch, [data],
+                      np.vstack([centers, [[1e6, 1e6]]]), missing='raise')
+
     def test_kmeans2_empty(self):
         # Regression test for gh-1032.
         assert_raises(ValueError, kmeans2, [], 2)
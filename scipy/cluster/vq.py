@@ -12,9 +12,11 @@ centroids in a code book.
 
    whiten -- Normalize a group of observations so each feature has unit variance
    vq -- Calculate code book membership of a set of observation vectors
+   vq_chunks -- Calculate code book membership block by block
    kmeans -- Performs k-means on a set of observation vectors forming k clusters
    kmeans2 -- A different implementation of k-means with more methods
            -- for initializing centroids
+   kmeans_minibatch -- Mini-batch k-means over a stream of observation chunks
 
 Background information
 ======================
@@ -70,7 +72,8 @@ from __future__ import division, print_function, absolute_import
 
 __docformat__ = 'restructuredtext'
 
-__all__ = ['whiten', 'vq', 'kmeans', 'kmeans2']
+__all__ = ['whiten', 'vq', 'vq_chunks', 'kmeans', 'kmeans2',
+           'kmeans_minibatch']
 
 # TODO:
 #   - implements high level method for running several times k-means with
@@ -81,8 +84,8 @@ __all__ = ['whiten', 'vq', 'kmeans', 'kmeans2']
 import warnings
 
 from numpy.random import randint
-from numpy import (shape, zeros, sqrt, argmin, minimum, array, newaxis,
-    common_type, single, double, take, std, mean)
+from numpy import (shape, zeros, sqrt, argmin, argmax, minimum, array,
+    newaxis, common_type, single, double, take, std, mean)
 import numpy as np
 
 from . import _vq
@@ -141,7 +144,7 @@ def whiten(obs):
     return obs / std_dev
 
 
-def vq(obs, code_book):
+def vq(obs, code_book, n_jobs=1):
     """
     Assign codes from a code book to observations.
 
@@ -172,6 +175,12 @@ def vq(obs, code_book):
          ...             [  1.,   2.,   3.,   4.],  #c1
          ...             [  1.,   2.,   3.,   4.]]  #c2
 
+    n_jobs : int, optional
+        Number of threads used to assign the observations. If -1 is given
+        all processors are used. Default: 1.
+
+        .. versionadded:: 0.16.0
+
     Returns
     -------
     code : ndarray
@@ -209,12 +218,105 @@ def vq(obs, code_book):
         c_code_book = code_book
 
     if ct in (single, double):
-        results = _vq.vq(c_obs, c_code_book)
+        results = _vq.vq(c_obs, c_code_book, n_jobs)
     else:
         results = py_vq(obs, code_book)
     return results
 
 
+# Default number of bytes of observations assigned at a time by vq_chunks
+_CHUNK_BYTES = 1 << 24
+
+
+def vq_chunks(obs, code_book, chunk_size=None, n_jobs=1):
+    """
+    Assign codes from a code book to observations, block by block.
+
+    Works like `vq`, but yields the codes and distances of consecutive
+    blocks of observations, so that only one block needs to be in memory
+    at a time. Float32 observations are compared with the code book in
+    single precision and never copied to double precision.
+
+    .. versionadded:: 0.16.0
+
+    Parameters
+    ----------
+    obs : ndarray or iterable of ndarrays
+        A 'M' by 'N' array of observations, for instance a memory-mapped
+        one, which is read `chunk_size` rows at a time, or an iterable of
+        'M_i' by 'N' blocks of observations.
+    code_book : ndarray
+        The code book, see `vq`. If the observations are float32 or
+        float64, the code book is cast to their dtype.
+    chunk_size : int, optional
+        Number of observations per block when `obs` is an array. By
+        default blocks of about 16 MB are used.
+    n_jobs : int, optional
+        Number of threads used to assign each block. If -1 is given all
+        processors are used. Default: 1.
+
+    Yields
+    ------
+    code : ndarray
+        The code book index of each observation of the block.
+    dist : ndarray
+        The distance between each observation of the block and its nearest
+        code, in the dtype of the observations.
+
+    See Also
+    --------
+    vq : assign codes to all the observations at once.
+
+    Notes
+    -----
+    The blocks are assigned with the GIL released, so several threads may
+    consume different `vq_chunks` generators concurrently.
+
+    Examples
+    --------
+    >>> from scipy.cluster.vq import vq_chunks
+    >>> code_book = np.array([[1., 1., 1.],
+    ...                       [2., 2., 2.]])
+    >>> features = np.array([[1.9, 2.3, 1.7],
+    ...                      [1.5, 2.5, 2.2],
+    ...                      [0.8, 0.6, 1.7]], dtype=np.float32)
+    >>> for code, dist in vq_chunks(features, code_book, chunk_size=2):
+    ...     print(code, dist)
+    [1 1] [ 0.43588984  0.73484695]
+    [0] [ 0.8306624]
+
+    """
+    code_book = np.asarray(code_book)
+    if chunk_size is not None and int(chunk_size) < 1:
+        raise ValueError("chunk_size must be a positive integer")
+    if isinstance(obs, np.ndarray):
+        if chunk_size is None:
+            row_bytes = obs.itemsize * max(1, int(np.prod(obs.shape[1:])))
+            chunk_size = max(1, _CHUNK_BYTES // row_bytes)
+        obs = _iter_batches(obs, int(chunk_size))
+    return _vq_chunks(obs, code_book, n_jobs)
+
+
+def _iter_batches(data, batch_size):
+    """Split an array into consecutive batches of at most batch_size rows."""
+    for start in range(0, data.shape[0], batch_size):
+        yield data[start:start + batch_size]
+
+
+def _vq_chunks(chunks, code_book, n_jobs):
+    books = {}
+    for chunk in chunks:
+        chunk = np.asarray(chunk)
+        if chunk.dtype.type in (single, double):
+            # Cast the code book rather than the observations, once per dtype
+            if chunk.dtype not in books:
+                books[chunk.dtype] = np.ascontiguousarray(code_book,
+                                                          dtype=chunk.dtype)
+            yield _vq.vq(chunk, books[chunk.dtype], n_jobs)
+        else:
+            yield vq(chunk, code_book, n_jobs)
+
+
 def py_vq(obs, code_book):
     """ Python version of vq algorithm.
 
@@ -359,7 +461,7 @@ def py_vq2(obs, code_book):
     return code, min_dist
 
 
-def _kmeans(obs, guess, thresh=1e-5):
+def _kmeans(obs, guess, thresh=1e-5, n_jobs=1):
     """ "raw" version of k-means.
 
     Returns
@@ -392,25 +494,70 @@ def _kmeans(obs, guess, thresh=1e-5):
 
     """
 
-    code_book = array(guess, copy=True)
+    obs, code_book = _as_kmeans_input(obs, guess)
+    obs_code, lower = _init_bounds(obs)
     avg_dist = []
     diff = thresh+1.
     while diff > thresh:
         nc = code_book.shape[0]
         # compute membership and distances between obs and code_book
-        obs_code, distort = vq(obs, code_book)
+        distort = _vq.vq_bounded(obs, code_book, obs_code, lower, n_jobs)
         avg_dist.append(mean(distort, axis=-1))
         # recalc code_book as centroids of associated obs
         if(diff > thresh):
-            code_book, has_members = _vq.update_cluster_means(obs, obs_code, nc)
-            code_book = code_book.compress(has_members, axis=0)
+            new_book, has_members = _vq.update_cluster_means(obs, obs_code, nc)
+            if not has_members.all():
+                # drop the empty clusters and renumber the remaining codes
+                code_book = code_book.compress(has_members, axis=0)
+                new_book = new_book.compress(has_members, axis=0)
+                renumber = np.cumsum(has_members, dtype=np.int32) - 1
+                obs_code[...] = renumber[obs_code]
+            _update_bounds(code_book, new_book, obs_code, lower)
+            code_book = new_book
         if len(avg_dist) > 1:
             diff = avg_dist[-2] - avg_dist[-1]
     # print avg_dist
     return code_book, avg_dist[-1]
 
 
-def kmeans(obs, k_or_guess, iter=20, thresh=1e-5):
+def _as_kmeans_input(obs, code_book):
+    """Return obs and a copy of code_book with a common floating point dtype.
+
+    Float32 observations are kept as is, and the code book is cast to their
+    dtype rather than upcasting the observations.
+
+    """
+    obs = np.asarray(obs)
+    code_book = np.asarray(code_book)
+    if obs.dtype.type not in (single, double):
+        obs = obs.astype(common_type(obs, code_book))
+    return obs, code_book.astype(obs.dtype)
+
+
+def _init_bounds(obs):
+    """Allocate the labels and lower bounds used by `_vq.vq_bounded`."""
+    n = obs.shape[0]
+    return np.zeros(n, dtype=np.int32), np.zeros(n, dtype=obs.dtype)
+
+
+def _update_bounds(old, new, labels, lower):
+    """Keep the lower bounds of `_vq.vq_bounded` valid after the codes move.
+
+    The distance from an observation to any code other than its own
+    decreases at most by the largest distance moved by one of those codes.
+
+    """
+    if old.shape[0] < 2:
+        return
+    diff = (new - old).reshape(old.shape[0], -1)
+    shift = sqrt(np.sum(diff * diff, axis=1))
+    far = argmax(shift)
+    largest = shift[far]
+    shift[far] = 0
+    lower -= np.where(labels == far, shift.max(), largest).astype(lower.dtype)
+
+
+def kmeans(obs, k_or_guess, iter=20, thresh=1e-5, n_jobs=1):
     """
     Performs k-means on a set of observation vectors forming k clusters.
 
@@ -450,6 +597,12 @@ def kmeans(obs, k_or_guess, iter=20, thresh=1e-5):
        distortion since the last k-means iteration is less than
        or equal to thresh.
 
+    n_jobs : int, optional
+       Number of threads used to assign the observations to the
+       centroids. If -1 is given all processors are used. Default: 1.
+
+       .. versionadded:: 0.16.0
+
     Returns
     -------
     codebook : ndarray
@@ -506,7 +659,7 @@ def kmeans(obs, k_or_guess, iter=20, thresh=1e-5):
         if guess.size < 1:
             raise ValueError("Asked for 0 cluster ? initial book was %s" %
                              guess)
-        result = _kmeans(obs, guess, thresh=thresh)
+        result = _kmeans(obs, guess, thresh=thresh, n_jobs=n_jobs)
     else:
         # initialize best distance value to a large value
         best_dist = np.inf
@@ -517,7 +670,7 @@ def kmeans(obs, k_or_guess, iter=20, thresh=1e-5):
         for i in range(iter):
             # the initial code book is randomly selected from observations
             guess = take(obs, randint(0, No, k), 0)
-            book, dist = _kmeans(obs, guess, thresh=thresh)
+            book, dist = _kmeans(obs, guess, thresh=thresh, n_jobs=n_jobs)
             if dist < best_dist:
                 best_book = book
                 best_dist = dist
@@ -592,7 +745,54 @@ def _krandinit(data, k):
     else:
         return init_rankn(data)
 
-_valid_init_meth = {'random': _krandinit, 'points': _kpoints}
+
+def _kpp(data, k):
+    """Pick k points in data with the k-means++ seeding method.
+
+    The first point is chosen uniformly at random, and each following one
+    is drawn with probability proportional to its squared distance to the
+    nearest point already chosen. This spreads the initial centroids over
+    the data and gives an O(log k) competitive expected distortion.
+
+    Parameters
+    ----------
+    data : ndarray
+        Expect a rank 1 or 2 array. Rank 1 are assumed to describe one
+        dimensional data, rank 2 multidimensional data, in which case one
+        row is one observation.
+    k : int
+        Number of samples to generate.
+
+    References
+    ----------
+    .. [1] D. Arthur and S. Vassilvitskii, "k-means++: the advantages of
+       careful seeding", Proceedings of the Eighteenth Annual ACM-SIAM
+       Symposium on Discrete Algorithms, 2007.
+
+    """
+    n = data.shape[0]
+    x = data.reshape(n, -1)
+    init = np.empty((k, x.shape[1]), dtype=x.dtype)
+    init[0] = x[randint(0, n)]
+    d2 = np.empty(n)
+    d2.fill(np.inf)
+    for i in range(1, k):
+        diff = x - init[i - 1]
+        d2 = np.minimum(d2, np.sum(diff * diff, axis=1))
+        cumd2 = np.cumsum(d2)
+        if cumd2[-1] > 0:
+            j = np.searchsorted(cumd2, np.random.random_sample() * cumd2[-1],
+                                side='right')
+            init[i] = x[min(j, n - 1)]
+        else:
+            # all the observations are already chosen
+            init[i] = x[randint(0, n)]
+
+    if data.ndim == 1:
+        return init[:, 0]
+    return init
+
+_valid_init_meth = {'random': _krandinit, 'points': _kpoints, '++': _kpp}
 
 
 def _missing_warn():
@@ -610,7 +810,7 @@ _valid_miss_meth = {'warn': _missing_warn, 'raise': _missing_raise}
 
 
 def kmeans2(data, k, iter=10, thresh=1e-5, minit='random',
-        missing='warn'):
+        missing='warn', n_jobs=1):
     """
     Classify a set of observations into k clusters using the k-means algorithm.
 
@@ -636,7 +836,7 @@ def kmeans2(data, k, iter=10, thresh=1e-5, minit='random',
         (not used yet)
     minit : string
         Method for initialization. Available methods are 'random',
-        'points', 'uniform', and 'matrix':
+        'points', '++', 'uniform', and 'matrix':
 
         'random': generate k centroids from a Gaussian with mean and
         variance estimated from the data.
@@ -644,6 +844,9 @@ def kmeans2(data, k, iter=10, thresh=1e-5, minit='random',
         'points': choose k observations (rows) at random from data for
         the initial centroids.
 
+        '++': choose k observations accordingly to the kmeans++ method
+        (careful seeding).
+
         'uniform': generate k observations from the data from a uniform
         distribution defined by the data set (unsupported).
 
@@ -656,6 +859,11 @@ def kmeans2(data, k, iter=10, thresh=1e-5, minit='random',
         'warn': give a warning and continue.
 
         'raise': raise an ClusterError and terminate the algorithm.
+    n_jobs : int, optional
+        Number of threads used to assign the observations to the
+        centroids. If -1 is given all processors are used. Default: 1.
+
+        .. versionadded:: 0.16.0
 
     Returns
     -------
@@ -666,6 +874,14 @@ def kmeans2(data, k, iter=10, thresh=1e-5, minit='random',
         label[i] is the code or index of the centroid the
         i'th observation is closest to.
 
+    Notes
+    -----
+    Each iteration keeps, for every observation, a lower bound on its
+    distance to the centroids other than its own (Hamerly's algorithm).
+    Observations whose centroid is provably still the closest one are not
+    compared with the other centroids, which skips most of the distance
+    computations once the centroids start to settle.
+
     """
     if missing not in _valid_miss_meth:
         raise ValueError("Unkown missing method: %s" % str(missing))
@@ -710,30 +926,155 @@ def kmeans2(data, k, iter=10, thresh=1e-5, minit='random',
             init = _valid_init_meth[minit]
         except KeyError:
             raise ValueError("unknown init method %s" % str(minit))
-        clusters = init(data, k)
+        clusters = init(data, nc)
 
     if int(iter) < 1:
         raise ValueError("iter = %s is not valid.  iter must be a positive integer." % iter)
 
-    return _kmeans2(data, clusters, iter, nc, _valid_miss_meth[missing])
+    return _kmeans2(data, clusters, iter, nc, _valid_miss_meth[missing],
+                    n_jobs)
 
 
-def _kmeans2(data, code, niter, nc, missing):
+def _kmeans2(data, code, niter, nc, missing, n_jobs=1):
     """ "raw" version of kmeans2. Do not use directly.
 
     Run k-means with a given initial codebook.
 
     """
+    data, code = _as_kmeans_input(data, code)
+    label, lower = _init_bounds(data)
     for i in range(niter):
         # Compute the nearest neighbour for each obs
         # using the current code book
-        label = vq(data, code)[0]
+        _vq.vq_bounded(data, code, label, lower, n_jobs)
         # Update the code by computing centroids using the new code book
         new_code, has_members = _vq.update_cluster_means(data, label, nc)
         if not has_members.all():
             missing()
             # Set the empty clusters to their previous positions
             new_code[~has_members] = code[~has_members]
+        _update_bounds(code, new_code, label, lower)
         code = new_code
 
     return code, label
+
+
+def kmeans_minibatch(chunks, k, minit='++', missing='warn', batch_size=1024,
+                     n_jobs=1):
+    """
+    Mini-batch k-means over a stream of observation chunks.
+
+    Each chunk of observations is assigned to the nearest centroids, which
+    then move towards the mean of their new members with a per-centroid
+    learning rate of one over the number of observations it has received
+    so far [1]_. Only one chunk is held in memory at a time, so data sets
+    larger than memory can be clustered in a single pass.
+
+    .. versionadded:: 0.16.0
+
+    Parameters
+    ----------
+    chunks : iterable of ndarrays or ndarray
+        Blocks of observations, each a 'M_i' by 'N' array (or a length
+        'M_i' array of one-dimensional observations). A single array, for
+        instance a memory-mapped one, is split into blocks of `batch_size`
+        observations. Iterate over the data several times, e.g. with
+        ``itertools.chain``, to make several passes.
+    k : int or ndarray
+        The number of clusters to form, or a 'k' by 'N' array of initial
+        centroids.
+    minit : string, optional
+        Method used to initialize the centroids from the first chunk when
+        `k` is an integer. Available methods are 'random', 'points' and
+        '++', see `kmeans2`. Default is '++'.
+    missing : string, optional
+        Method to deal with clusters that received no observation at all,
+        'warn' or 'raise', see `kmeans2`.
+    batch_size : int, optional
+        Number of observations per block when `chunks` is an array.
+    n_jobs : int, optional
+        Number of threads used to assign the observations to the
+        centroids. If -1 is given all processors are used. Default: 1.
+
+    Returns
+    -------
+    centroid : ndarray
+        A 'k' by 'N' array of centroids.
+    count : ndarray
+        count[i] is the number of observations assigned to the i'th
+        centroid over the whole stream.
+
+    See Also
+    --------
+    kmeans2 : k-means over observations that fit in memory.
+
+    References
+    ----------
+    .. [1] D. Sculley, "Web-scale k-means clustering", Proceedings of the
+       19th International Conference on World Wide Web, 2010.
+
+    Examples
+    --------
+    >>> from scipy.cluster.vq import kmeans_minibatch
+    >>> np.random.seed(1234)
+    >>> chunks = (np.random.randn(1000, 2) + [[5, 0]] * (i % 2)
+    ...           for i in range(10))
+    >>> centroid, count = kmeans_minibatch(chunks, 2)
+    >>> count.sum()
+    10000
+
+    """
+    if missing not in _valid_miss_meth:
+        raise ValueError("Unkown missing method: %s" % str(missing))
+    if int(batch_size) < 1:
+        raise ValueError("batch_size must be a positive integer")
+    if isinstance(chunks, np.ndarray):
+        chunks = _iter_batches(chunks, int(batch_size))
+
+    code = None
+    for chunk in chunks:
+        chunk = np.asarray(chunk)
+        if chunk.ndim not in (1, 2):
+            raise ValueError("Input of rank > 2 not supported")
+        if chunk.shape[0] == 0:
+            continue
+
+        if code is None:
+            if np.size(k) > 1:
+                code = np.asarray(k)
+            else:
+                nc = int(k)
+                if nc < 1:
+                    raise ValueError("kmeans_minibatch for 0 clusters ? "
+                                     "(k was %s)" % str(k))
+                try:
+                    init = _valid_init_meth[minit]
+                except KeyError:
+                    raise ValueError("unknown init method %s" % str(minit))
+                code = init(chunk, nc)
+            chunk, code = _as_kmeans_input(chunk, code)
+            if chunk.ndim != code.ndim or chunk.shape[1:] != code.shape[1:]:
+                raise ValueError("k is not an int and has not same rank "
+                                 "than data")
+            nc = code.shape[0]
+            count = np.zeros(nc, dtype=np.intp)
+        elif chunk.dtype != code.dtype:
+            chunk = chunk.astype(code.dtype)
+
+        label = _vq.vq(chunk, code, n_jobs)[0]
+        means, has_members = _vq.update_cluster_means(chunk, label, nc)
+        counts = np.bincount(label, minlength=nc)
+        count += counts
+
+        # Move each centroid towards the mean of its new members, as if the
+        # observations had been added one at a time
+        rate = counts[has_members] / count[has_members]
+        rate = rate.reshape((-1,) + (1,) * (code.ndim - 1)).astype(code.dtype)
+        code[has_members] += rate * (means[has_members] - code[has_members])
+
+    if code is None:
+        raise ValueError("Input has 0 items.")
+    if not count.all():
+        _valid_miss_meth[missing]()
+
+    return code, count
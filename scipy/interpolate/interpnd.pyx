@@ -195,7 +195,7 @@ def _ndim_coords_from_arrays(points, ndim=None):
 
 class LinearNDInterpolator(NDInterpolatorBase):
     """
-    LinearNDInterpolator(points, values, fill_value=np.nan, rescale=False)
+    LinearNDInterpolator(points, values, fill_value=np.nan, rescale=False, n_jobs=1)
 
     Piecewise linear interpolant in N dimensions.
 
@@ -219,12 +219,20 @@ class LinearNDInterpolator(NDInterpolatorBase):
         Rescale points to unit cube before performing interpolation.
         This is useful if some of the input dimensions have
         incommensurable units and differ by many orders of magnitude.
+    n_jobs : int, optional
+        Number of threads locating the points where the interpolant is
+        evaluated.  If -1 is given all processors are used.  Default: 1.
+
+        .. versionadded:: 0.16.0
 
     Notes
     -----
     The interpolant is constructed by triangulating the input data
     with Qhull [1]_, and on each triangle performing linear
-    barycentric interpolation.
+    barycentric interpolation.  The triangles containing the points
+    where the interpolant is evaluated are found by
+    `scipy.spatial.Delaunay.find_simplex`, visiting the points along a
+    Z-order curve.
 
     References
     ----------
@@ -232,11 +240,13 @@ class LinearNDInterpolator(NDInterpolatorBase):
 
     """
 
-    def __init__(self, points, values, fill_value=np.nan, rescale=False):
+    def __init__(self, points, values, fill_value=np.nan, rescale=False,
+                 n_jobs=1):
         NDInterpolatorBase.__init__(self, points, values, fill_value=fill_value,
                 rescale=rescale)
         if self.tri is None:
             self.tri = qhull.Delaunay(self.points)
+        self.n_jobs = n_jobs
 
     def _evaluate_double(self, xi):
         return self._do_evaluate(xi, 1.0)
@@ -251,14 +261,13 @@ class LinearNDInterpolator(NDInterpolatorBase):
         cdef double_or_complex[:,::1] out
         cdef double[:,::1] points = self.points
         cdef int[:,::1] simplices = self.tri.simplices
+        cdef int[::1] isimplices
         cdef double c[NPY_MAXDIMS]
         cdef double_or_complex fill_value
-        cdef int i, j, k, m, ndim, isimplex, inside, start, nvalues
+        cdef int i, j, k, m, ndim, isimplex, nvalues
         cdef qhull.DelaunayInfo_t info
-        cdef double eps, eps_broad
 
         ndim = xi.shape[1]
-        start = 0
         fill_value = self.fill_value
 
         qhull._get_delaunay_info(&info, self.tri, 1, 0, 0)
@@ -267,17 +276,14 @@ class LinearNDInterpolator(NDInterpolatorBase):
                        dtype=self.values.dtype)
         nvalues = out.shape[1]
 
-        eps = np.finfo(np.double).eps * 100
-        eps_broad = sqrt(np.finfo(np.double).eps)
+        # 1) Find the simplices
+
+        isimplices = self.tri.find_simplex(np.asarray(xi), n_jobs=self.n_jobs,
+                                           walk_start='sorted')
 
         with nogil:
             for i in xrange(xi.shape[0]):
-
-                # 1) Find the simplex
-
-                isimplex = qhull._find_simplex(&info, c,
-                                               &xi[0,0] + i*ndim,
-                                               &start, eps, eps_broad)
+                isimplex = isimplices[i]
 
                 # 2) Linear barycentric interpolation
 
@@ -287,6 +293,10 @@ class LinearNDInterpolator(NDInterpolatorBase):
                         out[i,k] = fill_value
                     continue
 
+                qhull._barycentric_coordinates(
+                    ndim, info.transform + isimplex*ndim*(ndim+1),
+                    &xi[i,0], c)
+
                 for k in xrange(nvalues):
                     out[i,k] = 0
 
@@ -770,7 +780,7 @@ cdef double_or_complex _clough_tocher_2d_single(qhull.DelaunayInfo_t *d,
 
 class CloughTocher2DInterpolator(NDInterpolatorBase):
     """
-    CloughTocher2DInterpolator(points, values, tol=1e-6)
+    CloughTocher2DInterpolator(points, values, tol=1e-6, n_jobs=1)
 
     Piecewise cubic, C1 smooth, curvature-minimizing interpolant in 2D.
 
@@ -798,6 +808,11 @@ class CloughTocher2DInterpolator(NDInterpolatorBase):
         Rescale points to unit cube before performing interpolation.
         This is useful if some of the input dimensions have
         incommensurable units and differ by many orders of magnitude.
+    n_jobs : int, optional
+        Number of threads locating the points where the interpolant is
+        evaluated.  If -1 is given all processors are used.  Default: 1.
+
+        .. versionadded:: 0.16.0
 
     Notes
     -----
@@ -836,11 +851,12 @@ class CloughTocher2DInterpolator(NDInterpolatorBase):
     """
 
     def __init__(self, points, values, fill_value=np.nan,
-                 tol=1e-6, maxiter=400, rescale=False):
+                 tol=1e-6, maxiter=400, rescale=False, n_jobs=1):
         NDInterpolatorBase.__init__(self, points, values, ndim=2,
                                     fill_value=fill_value, rescale=rescale)
         if self.tri is None:
             self.tri = qhull.Delaunay(self.points)
+        self.n_jobs = n_jobs
         self.grad = estimate_gradients_2d_global(self.tri, self.values,
                                                  tol=tol, maxiter=maxiter)
 
@@ -863,12 +879,11 @@ class CloughTocher2DInterpolator(NDInterpolatorBase):
         cdef double_or_complex df[2*NPY_MAXDIMS+2]
         cdef double_or_complex w
         cdef double_or_complex fill_value
-        cdef int i, j, k, m, ndim, isimplex, inside, start, nvalues
+        cdef int[::1] isimplices
+        cdef int i, j, k, m, ndim, isimplex, nvalues
         cdef qhull.DelaunayInfo_t info
-        cdef double eps, eps_broad
 
         ndim = xi.shape[1]
-        start = 0
         fill_value = self.fill_value
 
         qhull._get_delaunay_info(&info, self.tri, 1, 1, 0)
@@ -877,16 +892,14 @@ class CloughTocher2DInterpolator(NDInterpolatorBase):
                        dtype=self.values.dtype)
         nvalues = out.shape[1]
 
-        eps = np.finfo(np.double).eps * 100
-        eps_broad = sqrt(eps)
+        # 1) Find the simplices
+
+        isimplices = self.tri.find_simplex(np.asarray(xi), n_jobs=self.n_jobs,
+                                           walk_start='sorted')
 
         with nogil:
             for i in xrange(xi.shape[0]):
-                # 1) Find the simplex
-
-                isimplex = qhull._find_simplex(&info, c,
-                                               &xi[i,0],
-                                               &start, eps, eps_broad)
+                isimplex = isimplices[i]
 
                 # 2) Clough-Tocher interpolation
 
@@ -896,6 +909,10 @@ class CloughTocher2DInterpolator(NDInterpolatorBase):
                         out[i,k] = fill_value
                     continue
 
+                qhull._barycentric_coordinates(
+                    ndim, info.transform + isimplex*ndim*(ndim+1),
+                    &xi[i,0], c)
+
                 for k in xrange(nvalues):
                     for j in xrange(ndim+1):
                         f[j] = values[simplices[isimplex,j],k]
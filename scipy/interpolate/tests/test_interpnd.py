@@ -5,7 +5,7 @@ import warnings
 
 import numpy as np
 from numpy.testing import assert_equal, assert_allclose, assert_almost_equal, \
-        run_module_suite, assert_raises
+        run_module_suite, assert_raises, assert_
 
 import scipy.interpolate.interpnd as interpnd
 import scipy.spatial.qhull as qhull
@@ -171,6 +171,28 @@ class TestLinearNDInterpolation(object):
 
         assert_almost_equal(ip(0.5, 0.5), ip2(0.5, 0.5))
 
+    def test_n_jobs(self):
+        # Points in random order, some outside the triangulation
+        np.random.seed(1234)
+        x = np.random.rand(300, 3)
+        y = np.random.rand(300) + 1j*np.random.rand(300)
+        xi = np.random.rand(5000, 3)*1.2 - 0.1
+
+        ip = interpnd.LinearNDInterpolator(x, y)
+        ip3 = interpnd.LinearNDInterpolator(x, y, n_jobs=3)
+        z = ip(xi)
+        assert_allclose(ip3(xi), z)
+
+        # compare with barycentric coordinates of the simplices found
+        isimplex = ip.tri.find_simplex(xi)
+        inside = isimplex != -1
+        T = ip.tri.transform[isimplex[inside]]
+        c = (T[:,:3] * (xi[inside] - T[:,3])[:,None,:]).sum(axis=2)
+        c = np.c_[c, 1 - c.sum(axis=1)]
+        assert_allclose(z[inside],
+                        (c * y[ip.tri.simplices[isimplex[inside]]]).sum(axis=1))
+        assert_(np.isnan(z[~inside]).all())
+
 
 class TestEstimateGradients2DGlobal(object):
     def test_smoketest(self):
@@ -354,5 +376,15 @@ class TestCloughTocher2DInterpolator(object):
 
         assert_almost_equal(ip(0.5, 0.5), ip2(0.5, 0.5))
 
+    def test_n_jobs(self):
+        np.random.seed(1234)
+        x = np.random.rand(300, 2)
+        y = np.random.rand(300)
+        xi = np.random.rand(5000, 2)*1.2 - 0.1
+
+        ip = interpnd.CloughTocher2DInterpolator(x, y)
+        ip3 = interpnd.CloughTocher2DInterpolator(x, y, n_jobs=3)
+        assert_allclose(ip3(xi), ip(xi))
+
 if __name__ == "__main__":
     run_module_suite()
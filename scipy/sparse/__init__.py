@@ -23,6 +23,7 @@ Sparse matrix classes
    dia_matrix - Sparse matrix with DIAgonal storage
    dok_matrix - Dictionary Of Keys based sparse matrix
    lil_matrix - Row-based linked list sparse matrix
+   sell_matrix - Sliced ELLPACK (SELL-C-sigma) sparse matrix
 
 Functions
 ---------
@@ -36,6 +37,10 @@ Building sparse matrices:
    identity - Identity matrix in sparse format
    kron - kronecker product of two sparse matrices
    kronsum - kronecker sum of sparse matrices
+   spmatmul - Sparse matrix product with control over its memory
+   spmatmul_nnz - Number of stored values in each row of a product
+   from_coo_chunks - Build a CSR or CSC matrix from chunks of triplets
+   SparseBuilder - Incremental builder of a sparse matrix from batches of entries
    diags - Return a sparse matrix from diagonals
    spdiags - Return a sparse matrix from diagonals
    block_diag - Build a block diagonal sparse matrix
@@ -53,6 +58,22 @@ Sparse matrix tools:
 
    find
 
+Save and load sparse matrices:
+
+.. autosummary::
+   :toctree: generated/
+
+   save_npz
+   load_npz
+
+Threads used by matrix products:
+
+.. autosummary::
+   :toctree: generated/
+
+   get_num_jobs
+   set_num_jobs
+
 Identifying sparse matrices:
 
 .. autosummary::
@@ -67,6 +88,7 @@ Identifying sparse matrices:
    isspmatrix_dok
    isspmatrix_coo
    isspmatrix_dia
+   isspmatrix_sell
 
 Submodules
 ----------
@@ -90,7 +112,7 @@ Exceptions
 Usage information
 =================
 
-There are seven available sparse matrix types:
+There are eight available sparse matrix types:
 
     1. csc_matrix: Compressed Sparse Column format
     2. csr_matrix: Compressed Sparse Row format
@@ -99,6 +121,7 @@ There are seven available sparse matrix types:
     5. dok_matrix: Dictionary of Keys format
     6. coo_matrix: COOrdinate format (aka IJV, triplet format)
     7. dia_matrix: DIAgonal format
+    8. sell_matrix: Sliced ELLPACK format (SELL-C-sigma)
 
 To construct a matrix efficiently, use either dok_matrix or lil_matrix.
 The lil_matrix class supports basic slicing and fancy
@@ -216,8 +239,11 @@ from .dok import *
 from .coo import *
 from .dia import *
 from .bsr import *
+from .sell import *
 from .construct import *
+from .builder import *
 from .extract import *
+from ._matrix_io import *
 
 # for backward compatibility with v0.10.  This function is marked as deprecated
 from .csgraph import cs_graph_components
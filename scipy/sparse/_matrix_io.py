@@ -0,0 +1,215 @@
+"""Saving and loading sparse matrices in ``.npz`` files"""
+from __future__ import division, print_function, absolute_import
+
+__all__ = ['save_npz', 'load_npz']
+
+import struct
+import zipfile
+
+import numpy as np
+from numpy.lib import format as npy_format
+
+from .csr import csr_matrix
+from .csc import csc_matrix
+from .bsr import bsr_matrix
+from .coo import coo_matrix
+from .dia import dia_matrix
+
+
+# The arrays stored for each format, besides 'format', 'shape' and 'data'
+_FORMAT_ARRAYS = {'csr': ('indices', 'indptr'),
+                  'csc': ('indices', 'indptr'),
+                  'bsr': ('indices', 'indptr'),
+                  'coo': ('row', 'col'),
+                  'dia': ('offsets',)}
+
+
+def save_npz(file, matrix, compressed=True):
+    """
+    Save a sparse matrix to a file using ``.npz`` format.
+
+    The arrays of the matrix are stored as they are, without conversion, so
+    that saving and loading take little more than the time to write and read
+    them.
+
+    .. versionadded:: 0.16.0
+
+    Parameters
+    ----------
+    file : str or file
+        Either the file name (string) or an open file (file-like object)
+        where the data will be saved.  If file is a string, the ``.npz``
+        extension will be appended to the file name if it is not already
+        there.
+    matrix : spmatrix
+        The sparse matrix to save, in CSC, CSR, BSR, DIA or COO format.
+    compressed : bool, optional
+        Whether to compress the arrays with zlib.  Uncompressed files are
+        larger, but can be memory-mapped by `load_npz`.  Default: True.
+
+    See Also
+    --------
+    load_npz
+    numpy.savez, numpy.savez_compressed
+
+    Notes
+    -----
+    The file is a zip archive of ``.npy`` files, which can also be read with
+    `numpy.load`: ``format`` and ``shape`` hold the format and the shape of
+    the matrix, and ``data``, ``indices``, ``indptr``, ``row``, ``col`` or
+    ``offsets`` its arrays, depending on the format.
+
+    Examples
+    --------
+    >>> import scipy.sparse
+    >>> A = scipy.sparse.csr_matrix([[0, 0, 3], [4, 0, 0]])
+    >>> scipy.sparse.save_npz('/tmp/sparse_matrix.npz', A)
+    >>> B = scipy.sparse.load_npz('/tmp/sparse_matrix.npz')
+    >>> B.toarray()
+    array([[0, 0, 3],
+           [4, 0, 0]])
+
+    """
+    if matrix.format not in _FORMAT_ARRAYS:
+        raise NotImplementedError("save_npz is not implemented for sparse "
+                                  "matrices of format %s" % matrix.format)
+
+    arrays = dict(format=np.array(matrix.format.encode('ascii')),
+                  shape=np.array(matrix.shape),
+                  data=matrix.data)
+    for name in _FORMAT_ARRAYS[matrix.format]:
+        arrays[name] = getattr(matrix, name)
+
+    if compressed:
+        np.savez_compressed(file, **arrays)
+    else:
+        np.savez(file, **arrays)
+
+
+def load_npz(file, mmap_mode=None):
+    """
+    Load a sparse matrix from a file saved by `save_npz`.
+
+    .. versionadded:: 0.16.0
+
+    Parameters
+    ----------
+    file : str or file
+        Either the file name (string) or an open file (file-like object)
+        where the data will be loaded.
+    mmap_mode : {None, 'r', 'c'}, optional
+        If not None, the arrays of the matrix are memory-mapped with the
+        given mode (see `numpy.memmap`) instead of read into memory.
+        Loading is then nearly instantaneous whatever the size of the
+        matrix (except for COO matrices, whose indices are checked), and
+        processes mapping the same file with mode 'r' share its pages.
+        The file must have been saved with ``compressed=False``.  Mode
+        'r+' is not allowed, as writing to the arrays would leave the
+        checksums of the file wrong.
+
+    Returns
+    -------
+    result : csc_matrix, csr_matrix, bsr_matrix, dia_matrix or coo_matrix
+        A sparse matrix containing the loaded data.
+
+    See Also
+    --------
+    save_npz
+    numpy.load, numpy.memmap
+
+    Examples
+    --------
+    >>> import scipy.sparse
+    >>> A = scipy.sparse.csr_matrix([[0, 0, 3], [4, 0, 0]])
+    >>> scipy.sparse.save_npz('/tmp/sparse_matrix.npz', A, compressed=False)
+    >>> B = scipy.sparse.load_npz('/tmp/sparse_matrix.npz', mmap_mode='r')
+    >>> B.toarray()
+    array([[0, 0, 3],
+           [4, 0, 0]])
+
+    """
+    if mmap_mode is None:
+        loaded = np.load(file)
+        try:
+            arrays = dict((name, loaded[name]) for name in loaded.files)
+        finally:
+            loaded.close()
+    elif mmap_mode in ('r', 'c'):
+        arrays = _mmap_npz(file, mmap_mode)
+    else:
+        raise ValueError("mmap_mode must be None, 'r' or 'c'")
+
+    try:
+        matrix_format = arrays['format'].item()
+    except KeyError:
+        raise ValueError("the file does not contain a sparse matrix")
+    if not isinstance(matrix_format, str):
+        matrix_format = matrix_format.decode('ascii')
+    if matrix_format not in _FORMAT_ARRAYS:
+        raise ValueError("unknown sparse matrix format %r" % matrix_format)
+
+    shape = tuple(int(n) for n in arrays['shape'])
+    data = arrays['data']
+
+    if matrix_format == 'coo':
+        return coo_matrix((data, (arrays['row'], arrays['col'])),
+                          shape=shape)
+    elif matrix_format == 'dia':
+        return dia_matrix((data, arrays['offsets']), shape=shape)
+
+    cls = {'csr': csr_matrix, 'csc': csc_matrix,
+           'bsr': bsr_matrix}[matrix_format]
+    return cls((data, arrays['indices'], arrays['indptr']), shape=shape)
+
+
+def _mmap_npz(file, mmap_mode):
+    """
+    Memory-maps the arrays of an uncompressed ``.npz`` file.
+
+    The members of such a zip archive are stored as they are, so the data of
+    each ``.npy`` member can be mapped at its offset in the file.  Empty and
+    0-d arrays are read instead.
+    """
+    own_fid = not hasattr(file, 'read')
+    fid = open(file, 'rb') if own_fid else file
+    try:
+        archive = zipfile.ZipFile(fid)
+        arrays = {}
+        for info in archive.infolist():
+            name = info.filename
+            if name.endswith('.npy'):
+                name = name[:-4]
+
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError("compressed files cannot be memory-mapped, "
+                                 "use save_npz(..., compressed=False)")
+
+            # The local header of a member is 30 bytes long, followed by
+            # the member name and an extra field; their lengths are the
+            # last two fields of the header
+            fid.seek(info.header_offset + 26)
+            name_length, extra_length = struct.unpack('<HH', fid.read(4))
+            fid.seek(info.header_offset + 30 + name_length + extra_length)
+
+            version = npy_format.read_magic(fid)
+            if version == (1, 0):
+                header = npy_format.read_array_header_1_0(fid)
+            else:
+                header = npy_format.read_array_header_2_0(fid)
+            shape, fortran_order, dtype = header
+
+            if dtype.hasobject:
+                raise ValueError("arrays of objects cannot be memory-mapped")
+
+            if len(shape) == 0 or np.prod(shape) == 0:
+                arrays[name] = npy_format.read_array(archive.open(info))
+            else:
+                arrays[name] = np.memmap(fid, dtype=dtype, mode=mmap_mode,
+                                         offset=fid.tell(), shape=shape,
+                                         order='F' if fortran_order else 'C')
+        archive.close()
+    finally:
+        if own_fid:
+            fid.close()
+
+    return arrays
@@ -2,9 +2,11 @@
 from __future__ import division, print_function, absolute_import
 
 __all__ = ['spmatrix', 'isspmatrix', 'issparse',
-        'SparseWarning','SparseEfficiencyWarning']
+        'SparseWarning','SparseEfficiencyWarning',
+        'get_num_jobs', 'set_num_jobs']
 
 import sys
+from multiprocessing import cpu_count
 
 import numpy as np
 
@@ -24,6 +26,72 @@ class SparseEfficiencyWarning(SparseWarning):
     pass
 
 
+# Number of threads used by the sparse matrix products, see `set_num_jobs`.
+_num_jobs = 1
+
+
+def set_num_jobs(n_jobs):
+    """
+    Sets the number of threads used by sparse matrix products.
+
+    Products of CSR and CSC matrices with vectors and dense matrices split
+    the rows (or columns) of the sparse matrix into parts with similar
+    numbers of stored values, and compute the parts in separate threads with
+    the GIL released.  Small products are computed by fewer threads, or
+    serially.
+
+    .. versionadded:: 0.16.0
+
+    Parameters
+    ----------
+    n_jobs : int
+        Number of threads to use.  If -1, all CPUs are used.  The default is
+        1, which computes all products serially in the calling thread.
+
+    Returns
+    -------
+    old_n_jobs : int
+        The previous setting.
+
+    See Also
+    --------
+    get_num_jobs
+
+    Examples
+    --------
+    >>> from scipy.sparse import set_num_jobs, rand
+    >>> A = rand(10**5, 10**5, density=1e-4, format='csr')
+    >>> x = np.ones(A.shape[1])
+    >>> old = set_num_jobs(4)
+    >>> y = A * x
+    >>> set_num_jobs(old)
+    4
+
+    """
+    global _num_jobs
+    n_jobs = int(n_jobs)
+    if n_jobs != -1 and n_jobs < 1:
+        raise ValueError("n_jobs must be a positive integer or -1")
+    old_n_jobs = _num_jobs
+    _num_jobs = n_jobs
+    return old_n_jobs
+
+
+def get_num_jobs():
+    """
+    Returns the number of threads used by sparse matrix products.
+
+    This is the value set with `set_num_jobs`, with -1 replaced by the number
+    of CPUs.
+
+    .. versionadded:: 0.16.0
+
+    """
+    if _num_jobs == -1:
+        return cpu_count()
+    return _num_jobs
+
+
 # The formats that we might potentially understand.
 _formats = {'csc':[0, "Compressed Sparse Column"],
             'csr':[1, "Compressed Sparse Row"],
@@ -44,7 +112,8 @@ _formats = {'csc':[0, "Compressed Sparse Column"],
             'jad':[16, "JAgged Diagonal"],
             'uss':[17, "Unsymmetric Sparse Skyline"],
             'vbr':[18, "Variable Block Row"],
-            'und':[19, "Undefined"]
+            'und':[19, "Undefined"],
+            'sell':[20, "Sliced ELLpack"]
             }
 
 
@@ -657,6 +726,9 @@ class spmatrix(object):
     def tobsr(self, blocksize=None):
         return self.tocsr().tobsr(blocksize=blocksize)
 
+    def tosell(self, slice_height=None, sigma=None):
+        return self.tocsr().tosell(slice_height=slice_height, sigma=sigma)
+
     def copy(self):
         return self.__class__(self,copy=True)
 
@@ -686,14 +758,23 @@ class spmatrix(object):
 
         if axis < 0:
             axis += 2
+        if axis == 0 or axis == 1:
+            return self._sum_axis(axis, res_dtype)
+        else:
+            raise ValueError("axis out of bounds")
+
+    def _sum_axis(self, axis, dtype):
+        """Sum the matrix over axis 0 (the rows of the result are the sums
+        of the columns) or 1, accumulating in `dtype`.  Formats with a
+        faster method should override this function.
+        """
+        m, n = self.shape
         if axis == 0:
             # sum over columns
-            return np.asmatrix(np.ones((1, m), dtype=res_dtype)) * self
-        elif axis == 1:
-            # sum over rows
-            return self * np.asmatrix(np.ones((n, 1), dtype=res_dtype))
+            return np.asmatrix(np.ones((1, m), dtype=dtype)) * self
         else:
-            raise ValueError("axis out of bounds")
+            # sum over rows
+            return self * np.asmatrix(np.ones((n, 1), dtype=dtype))
 
     def mean(self, axis=None):
         """Average the matrix over the given axis.  If the axis is None,
@@ -714,13 +795,9 @@ class spmatrix(object):
 
         if axis < 0:
             axis += 2
-        if axis == 0:
-            mean = self.astype(res_dtype).sum(0)
-            mean *= 1.0 / self.shape[0]
-            return mean
-        elif axis == 1:
-            mean = self.astype(res_dtype).sum(1)
-            mean *= 1.0 / self.shape[1]
+        if axis == 0 or axis == 1:
+            mean = self._sum_axis(axis, res_dtype)
+            mean *= 1.0 / self.shape[axis]
             return mean
         else:
             raise ValueError("axis out of bounds")
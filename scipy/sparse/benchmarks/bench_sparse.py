@@ -213,6 +213,54 @@ class BenchmarkSparse(TestCase):
 
             print(fmt % (A.format,name,shape,A.nnz,MFLOPs))
 
+    def bench_matvec_threads(self):
+        matrices = []
+        matrices.append(('Poisson5pt', poisson2d(1000,format='csr')))
+        matrices.append(('Poisson5pt', poisson2d(1000,format='csc')))
+        matrices.append(('Rand10', random_sparse(10**6,10**6,10)))
+        matrices.append(('Rand10', random_sparse(10**6,10**6,10).tocsc()))
+
+        n_jobs = [1, 2, 4, 8]
+        n_vecs = [1, 10]
+
+        print()
+        print('                  Threaded Sparse Matrix Vector Product')
+        print('==================================================================')
+        print(' type |    name      | vecs | threads |    nnz   |  MFLOPs | speedup ')
+        print('------------------------------------------------------------------')
+        fmt = '  %3s | %12s | %4d | %7d | %8d |  %6.1f |  %5.2f '
+
+        old_n_jobs = sparse.set_num_jobs(1)
+        try:
+            for name,A in matrices:
+                for k in n_vecs:
+                    if k == 1:
+                        x = ones(A.shape[1],dtype=A.dtype)
+                    else:
+                        x = ones((A.shape[1],k),dtype=A.dtype)
+
+                    serial = None
+                    for j in n_jobs:
+                        sparse.set_num_jobs(j)
+                        y = A*x  # warmup
+
+                        start = time.time()
+                        iter = 0
+                        while iter < 5 or time.time() < start + 1:
+                            y = A*x
+                            iter += 1
+                        end = time.time()
+
+                        del y
+
+                        MFLOPs = (2*k*A.nnz*iter/(end-start))/float(1e6)
+                        if serial is None:
+                            serial = MFLOPs
+                        print(fmt % (A.format,name.center(12),k,j,A.nnz,
+                                     MFLOPs,MFLOPs/serial))
+        finally:
+            sparse.set_num_jobs(old_n_jobs)
+
     def bench_construction(self):
         """build matrices by inserting single values"""
         matrices = []
@@ -362,6 +410,48 @@ class BenchmarkSparse(TestCase):
         print('           Sparse Matrix fancy __getitem__')
         self._getset_bench(kernel, ['csr', 'csc', 'lil'])
 
+    def bench_fancy_getitem(self):
+        A = random_sparse(10**6, 10**5, 10)
+        random.seed(0)
+
+        print()
+        print('                  Sparse Matrix Row and Column Selection')
+        print('==================================================================')
+        print(' type |      index       |    N    | threads | time (msec) ')
+        print('------------------------------------------------------------------')
+        fmt = '  %3s | %16s | %7d | %7d |  %9.2f '
+
+        old_n_jobs = sparse.set_num_jobs(1)
+        try:
+            for N in [100, 10000, 100000]:
+                rows = random.randint(0, A.shape[0], N)
+                cols = random.randint(0, A.shape[1], N)
+                mask = zeros(A.shape[0], dtype=bool)
+                mask[rows] = True
+                for name, key in [('A[rows]', rows),
+                                  ('A[mask]', mask),
+                                  ('A[:, cols]', (slice(None), cols)),
+                                  ('A[ix_(rows, cols)]',
+                                   numpy.ix_(rows, cols[:100]))]:
+                    for B in [A, A.tocsc()]:
+                        if B.format == 'csc' and name == 'A[mask]':
+                            continue
+                        for j in [1, 4]:
+                            sparse.set_num_jobs(j)
+                            B[key]  # warmup
+
+                            start = time.time()
+                            iter = 0
+                            while iter < 3 or time.time() < start + 0.5:
+                                B[key]
+                                iter += 1
+                            end = time.time()
+
+                            print(fmt % (B.format, name.center(16), N, j,
+                                         1e3*(end-start)/iter))
+        finally:
+            sparse.set_num_jobs(old_n_jobs)
+
     def bench_large(self):
         H1, W1 = 1, 100000
         H2, W2 = W1, 1000
@@ -317,9 +317,14 @@ class bsr_matrix(_cs_matrix, _minmax_mixin):
 
         result = np.zeros(self.shape[0], dtype=upcast(self.dtype, other.dtype))
 
-        bsr_matvec(M//R, N//C, R, C,
-            self.indptr, self.indices, self.data.ravel(),
-            other, result)
+        # cast once here, rather than in each thread
+        data = np.asarray(self.data, dtype=result.dtype).ravel()
+        other = np.asarray(other, dtype=result.dtype)
+
+        def kernel(n_brow, n_bcol, indptr, x, y):
+            bsr_matvec(n_brow, n_bcol, R, C, indptr, self.indices, data, x, y)
+
+        self._matvec_threaded(kernel, other, result, 1)
 
         return result
 
@@ -330,9 +335,15 @@ class bsr_matrix(_cs_matrix, _minmax_mixin):
 
         result = np.zeros((M,n_vecs), dtype=upcast(self.dtype,other.dtype))
 
-        bsr_matvecs(M//R, N//C, n_vecs, R, C,
-                self.indptr, self.indices, self.data.ravel(),
-                other.ravel(), result.ravel())
+        # cast once here, rather than in each thread
+        data = np.asarray(self.data, dtype=result.dtype).ravel()
+        other = np.asarray(other, dtype=result.dtype)
+
+        def kernel(n_brow, n_bcol, indptr, x, y):
+            bsr_matvecs(n_brow, n_bcol, n_vecs, R, C, indptr, self.indices,
+                        data, x, y)
+
+        self._matvec_threaded(kernel, other.ravel(), result.ravel(), n_vecs)
 
         return result
 
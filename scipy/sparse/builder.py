@@ -0,0 +1,162 @@
+"""Incremental construction of sparse matrices from batches of entries"""
+
+from __future__ import division, print_function, absolute_import
+
+__docformat__ = "restructuredtext en"
+
+__all__ = ['SparseBuilder']
+
+import numpy as np
+
+from .coo import coo_matrix
+from .sputils import getdtype, isshape, get_index_dtype
+
+
+class SparseBuilder(object):
+    """
+    Incremental builder of a sparse matrix from batches of entries.
+
+    The entries are appended to typed arrays, which grow geometrically as
+    needed, so that they take the memory of their values and indices only,
+    instead of the Python objects of `dok_matrix` or `lil_matrix`.  The
+    matrix is then built in one pass, as from a `coo_matrix`: duplicate
+    entries are summed together.
+
+    .. versionadded:: 0.16.0
+
+    Parameters
+    ----------
+    shape : tuple of int
+        The shape of the matrix.
+    dtype : dtype, optional
+        The data type of the matrix.  Default: float64.
+    capacity : int, optional
+        The number of entries for which memory is allocated at first.
+
+    Attributes
+    ----------
+    shape : tuple of int
+        The shape of the matrix.
+    dtype : dtype
+        The data type of the matrix.
+    row, col, data : ndarray
+        The entries appended so far.
+
+    See Also
+    --------
+    coo_matrix, from_coo_chunks
+
+    Examples
+    --------
+    >>> from scipy.sparse import SparseBuilder
+    >>> builder = SparseBuilder((3, 4), dtype=int)
+    >>> builder.append([0, 1, 2], [0, 2, 3], [1, 2, 3])
+    >>> builder.append(0, [0, 1], 5)
+    >>> len(builder)
+    5
+    >>> builder.tocsr().toarray()
+    array([[6, 5, 0, 0],
+           [0, 0, 2, 0],
+           [0, 0, 0, 3]], dtype=int64)
+
+    """
+
+    def __init__(self, shape, dtype=None, capacity=0):
+        if not isshape(shape):
+            raise TypeError("invalid shape")
+        self.shape = (int(shape[0]), int(shape[1]))
+        self.dtype = getdtype(dtype, default=float)
+
+        idx_dtype = get_index_dtype(maxval=max(self.shape))
+        capacity = max(int(capacity), 16)
+        self._row = np.empty(capacity, dtype=idx_dtype)
+        self._col = np.empty(capacity, dtype=idx_dtype)
+        self._data = np.empty(capacity, dtype=self.dtype)
+        self._nnz = 0
+
+    def __len__(self):
+        return self._nnz
+
+    @property
+    def row(self):
+        return self._row[:self._nnz]
+
+    @property
+    def col(self):
+        return self._col[:self._nnz]
+
+    @property
+    def data(self):
+        return self._data[:self._nnz]
+
+    def append(self, row, col, data):
+        """
+        Appends a batch of entries.
+
+        Parameters
+        ----------
+        row, col : array_like of int
+            The row and column indices of the entries.
+        data : array_like
+            The values of the entries.
+
+        `row`, `col` and `data` are broadcast against each other, so that for
+        instance all the entries of a row can be given its index once, or
+        the same value given to all the entries.
+        """
+        row, col, data = np.broadcast_arrays(np.asarray(row),
+                                             np.asarray(col),
+                                             np.asarray(data))
+        n = row.size
+        if n == 0:
+            return
+
+        for idx, dim, name in ((row, self.shape[0], 'row'),
+                               (col, self.shape[1], 'column')):
+            if idx.dtype.kind not in 'iu':
+                raise TypeError("%s indices must be integers" % name)
+            if idx.min() < 0 or idx.max() >= dim:
+                raise IndexError("%s index out of range" % name)
+
+        self._reserve(self._nnz + n)
+        stop = self._nnz + n
+        self._row[self._nnz:stop] = row.ravel()
+        self._col[self._nnz:stop] = col.ravel()
+        self._data[self._nnz:stop] = data.ravel()
+        self._nnz = stop
+
+    def _reserve(self, capacity):
+        """
+        Grows the arrays so that they can hold `capacity` entries, at least
+        doubling their size.
+        """
+        if capacity <= len(self._data):
+            return
+        capacity = max(capacity, 2 * len(self._data))
+        for name in ('_row', '_col', '_data'):
+            old = getattr(self, name)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[:self._nnz] = old[:self._nnz]
+            setattr(self, name, new)
+
+    def clear(self):
+        """Removes all the entries, keeping the allocated memory."""
+        self._nnz = 0
+
+    def tocoo(self, copy=True):
+        """
+        Returns the matrix in COOrdinate format.
+
+        With ``copy=False``, the matrix shares the arrays of the builder, so
+        that the builder must not be appended to while it is in use.
+        """
+        return coo_matrix((self.data, (self.row, self.col)),
+                          shape=self.shape, copy=copy)
+
+    def tocsr(self):
+        """Returns the matrix in Compressed Sparse Row format."""
+        return self.tocoo(copy=False).tocsr()
+
+    def tocsc(self):
+        """Returns the matrix in Compressed Sparse Column format."""
+        return self.tocoo(copy=False).tocsc()
@@ -9,13 +9,13 @@ import operator
 import numpy as np
 from scipy._lib.six import xrange, zip as izip
 
-from .base import spmatrix, isspmatrix, SparseEfficiencyWarning
+from .base import spmatrix, isspmatrix, SparseEfficiencyWarning, get_num_jobs
 from .data import _data_matrix, _minmax_mixin
 from .dia import dia_matrix
 from . import _sparsetools
 from .sputils import upcast, upcast_char, to_native, isdense, isshape, \
      getdtype, isscalarlike, isintlike, IndexMixin, get_index_dtype, \
-     downcast_intp_index, _compat_unique
+     downcast_intp_index, _compat_unique, _balanced_bounds, _run_parts
 
 
 class _cs_matrix(_data_matrix, _minmax_mixin, IndexMixin):
@@ -464,7 +464,15 @@ class _cs_matrix(_data_matrix, _minmax_mixin, IndexMixin):
 
         # csr_matvec or csc_matvec
         fn = getattr(_sparsetools,self.format + '_matvec')
-        fn(M, N, self.indptr, self.indices, self.data, other, result)
+
+        # cast once here, rather than in each thread
+        data = np.asarray(self.data, dtype=result.dtype)
+        other = np.asarray(other, dtype=result.dtype)
+
+        def kernel(n_row, n_col, indptr, x, y):
+            fn(n_row, n_col, indptr, self.indices, data, x, y)
+
+        self._matvec_threaded(kernel, other, result, 1)
 
         return result
 
@@ -477,48 +485,220 @@ class _cs_matrix(_data_matrix, _minmax_mixin, IndexMixin):
 
         # csr_matvecs or csc_matvecs
         fn = getattr(_sparsetools,self.format + '_matvecs')
-        fn(M, N, n_vecs, self.indptr, self.indices, self.data, other.ravel(), result.ravel())
+
+        # cast once here, rather than in each thread
+        data = np.asarray(self.data, dtype=result.dtype)
+        other = np.asarray(other, dtype=result.dtype)
+
+        def kernel(n_row, n_col, indptr, x, y):
+            fn(n_row, n_col, n_vecs, indptr, self.indices, data, x, y)
+
+        self._matvec_threaded(kernel, other.ravel(), result.ravel(), n_vecs)
 
         return result
 
+    def _matvec_threaded(self, kernel, x, y, n_vecs):
+        """
+        Adds the product of the matrix with the `n_vecs` vectors in `x` to
+        `y`, in ``get_num_jobs()`` threads.
+
+        ``kernel(n_row, n_col, indptr, x, y)`` computes the product of the
+        major axis slice given by `indptr`.  The rows of a CSR matrix are split
+        into parts with similar numbers of stored values, each writing its
+        own slice of `y`, and so are the block rows of a BSR matrix, for
+        which `n_row` and `n_col` count blocks.  The columns of a CSC matrix
+        are split likewise, but each part adds to all of `y`, so the parts go
+        to separate buffers that are summed at the end.
+        """
+        M,N = self.shape
+        R,C = getattr(self, 'blocksize', (1, 1))
+        M,N = M // R, N // C
+        indptr = self.indptr
+        bounds = _balanced_bounds(indptr, get_num_jobs(), R*C)
+        n_parts = len(bounds) - 1
+
+        if n_parts <= 1:
+            kernel(M, N, indptr, x, y)
+        elif self.format != 'csc':
+            row_size = R * n_vecs
+
+            def part(j):
+                start, stop = bounds[j], bounds[j + 1]
+                kernel(stop - start, N, indptr[start:stop + 1], x,
+                       y[start*row_size:stop*row_size])
+
+            _run_parts(part, n_parts)
+        else:
+            buffers = np.zeros((n_parts, y.size), dtype=y.dtype)
+
+            def part(j):
+                start, stop = bounds[j], bounds[j + 1]
+                kernel(M, stop - start, indptr[start:stop + 1],
+                       x[start*n_vecs:stop*n_vecs], buffers[j])
+
+            _run_parts(part, n_parts)
+            buffers.sum(axis=0, out=y)
+
     def _mul_sparse_matrix(self, other):
-        M, K1 = self.shape
-        K2, N = other.shape
+        return self._matmat(self.__class__(other))
 
-        major_axis = self._swap((M,N))[0]
-        other = self.__class__(other)  # convert to this format
+    def _matmat_operands(self, other):
+        """
+        Returns the operands ``(A, B)`` of the product with `other`, which
+        has the format of the matrix, such that the CSR product of the arrays
+        of ``A`` and ``B`` gives the arrays of the result.
 
-        idx_dtype = get_index_dtype((self.indptr, self.indices,
-                                     other.indptr, other.indices),
-                                    maxval=M*N)
-        indptr = np.empty(major_axis + 1, dtype=idx_dtype)
+        The product of CSC matrices is computed as the CSR product
+        ``other.T * self.T``, which has the same arrays.
+        """
+        if self.format == 'csr':
+            return self, other
+        return other, self
 
-        fn = getattr(_sparsetools, self.format + '_matmat_pass1')
-        fn(M, N,
-           np.asarray(self.indptr, dtype=idx_dtype),
-           np.asarray(self.indices, dtype=idx_dtype),
-           np.asarray(other.indptr, dtype=idx_dtype),
-           np.asarray(other.indices, dtype=idx_dtype),
-           indptr)
+    def _matmat_nnz(self, other):
+        """
+        Returns the number of stored values in each row (CSR) or column (CSC)
+        of the product with `other`, which has the format of the matrix.
 
-        nnz = indptr[-1]
-        idx_dtype = get_index_dtype((self.indptr, self.indices,
-                                     other.indptr, other.indices),
-                                    maxval=nnz)
-        indptr = np.asarray(indptr, dtype=idx_dtype)
-        indices = np.empty(nnz, dtype=idx_dtype)
-        data = np.empty(nnz, dtype=upcast(self.dtype, other.dtype))
+        This is the first, symbolic pass of the product.  Values that cancel
+        out are counted, so the counts are upper bounds.  The major axis is
+        split between ``get_num_jobs()`` threads.
+        """
+        A, B = self._matmat_operands(other)
+        n_row, n_col = self._swap((self.shape[0], other.shape[1]))
 
-        fn = getattr(_sparsetools, self.format + '_matmat_pass2')
-        fn(M, N, np.asarray(self.indptr, dtype=idx_dtype),
-           np.asarray(self.indices, dtype=idx_dtype),
-           self.data,
-           np.asarray(other.indptr, dtype=idx_dtype),
-           np.asarray(other.indices, dtype=idx_dtype),
-           other.data,
-           indptr, indices, data)
+        idx_dtype = get_index_dtype((A.indptr, A.indices,
+                                     B.indptr, B.indices),
+                                    maxval=n_row*n_col)
+        Ap = np.asarray(A.indptr, dtype=idx_dtype)
+        Aj = np.asarray(A.indices, dtype=idx_dtype)
+        Bp = np.asarray(B.indptr, dtype=idx_dtype)
+        Bj = np.asarray(B.indices, dtype=idx_dtype)
+
+        bounds = _balanced_bounds(Ap, get_num_jobs())
+        nnz = np.empty(n_row, dtype=np.intp)
 
-        return self.__class__((data,indices,indptr),shape=(M,N))
+        def part(j):
+            start, stop = bounds[j], bounds[j + 1]
+            indptr = np.empty(stop - start + 1, dtype=idx_dtype)
+            _sparsetools.csr_matmat_pass1(stop - start, n_col,
+                                          Ap[start:stop + 1], Aj, Bp, Bj,
+                                          indptr)
+            nnz[start:stop] = np.diff(indptr)
+
+        _run_parts(part, len(bounds) - 1)
+
+        return nnz
+
+    def _matmat(self, other, dtype=None, nnz=None):
+        """
+        Returns the product with `other`, which has the format of the matrix.
+
+        `nnz` is the output of ``_matmat_nnz``, which is computed if not
+        given.  The values are accumulated in `dtype`, by default the upcast
+        of the dtypes of the operands.  The major axis is split between
+        ``get_num_jobs()`` threads, each writing to the part of the result
+        reserved for it by `nnz`.
+        """
+        M, N = self.shape[0], other.shape[1]
+        n_row, n_col = self._swap((M, N))
+        A, B = self._matmat_operands(other)
+
+        if dtype is None:
+            dtype = upcast(self.dtype, other.dtype)
+        if nnz is None:
+            nnz = self._matmat_nnz(other)
+
+        idx_dtype = get_index_dtype((A.indptr, A.indices,
+                                     B.indptr, B.indices),
+                                    maxval=int(np.sum(nnz)))
+        indptr = np.empty(n_row + 1, dtype=idx_dtype)
+        indptr[0] = 0
+        np.cumsum(nnz, out=indptr[1:])
+        indices = np.empty(indptr[-1], dtype=idx_dtype)
+        data = np.empty(indptr[-1], dtype=dtype)
+
+        Ap = np.asarray(A.indptr, dtype=idx_dtype)
+        Aj = np.asarray(A.indices, dtype=idx_dtype)
+        Ax = np.asarray(A.data, dtype=dtype)
+        Bp = np.asarray(B.indptr, dtype=idx_dtype)
+        Bj = np.asarray(B.indices, dtype=idx_dtype)
+        Bx = np.asarray(B.data, dtype=dtype)
+
+        bounds = _balanced_bounds(Ap, get_num_jobs())
+        n_parts = len(bounds) - 1
+        firsts = indptr[bounds]
+        part_indptrs = [None] * n_parts
+
+        def part(j):
+            start, stop = bounds[j], bounds[j + 1]
+            first, last = firsts[j], firsts[j + 1]
+            part_indptr = np.empty(stop - start + 1, dtype=idx_dtype)
+            # the kernel stops at the end of the space reserved for the
+            # part, in case nnz was given and is too small
+            if _sparsetools.csr_matmat_pass2_bounded(stop - start, n_col,
+                                                     int(last - first),
+                                                     Ap[start:stop + 1],
+                                                     Aj, Ax, Bp, Bj, Bx,
+                                                     part_indptr,
+                                                     indices[first:last],
+                                                     data[first:last]):
+                raise ValueError("nnz is smaller than the number of stored "
+                                 "values of the product")
+            part_indptrs[j] = part_indptr
+
+        _run_parts(part, n_parts)
+
+        # Zero sums are not stored, so the parts may not fill the space
+        # reserved for them
+        nnz = _join_parts(indptr, indices, data, bounds, firsts, part_indptrs)
+
+        return self.__class__((data[:nnz], indices[:nnz], indptr),
+                              shape=(M, N))
+
+    def _matmat_masked(self, other, mask, data):
+        """
+        Computes the entries of the product with `other` at the positions
+        stored in `mask`, and writes them to `data`, which is indexed like
+        ``mask.indices``.
+
+        `other` and `mask` have the format of the matrix, and `mask` has no
+        duplicate entries.  The values are accumulated in the dtype of
+        `data`.  The major axis is split between ``get_num_jobs()`` threads.
+        """
+        n_row, n_col = self._swap((self.shape[0], other.shape[1]))
+        A, B = self._matmat_operands(other)
+
+        # each thread writes to its own rows of a single native, contiguous
+        # array, which must not be copied by the kernel
+        out = np.require(data, dtype=data.dtype.newbyteorder('='),
+                         requirements=['C', 'W'])
+
+        idx_dtype = get_index_dtype((A.indptr, A.indices,
+                                     B.indptr, B.indices,
+                                     mask.indptr, mask.indices))
+        Ap = np.asarray(A.indptr, dtype=idx_dtype)
+        Aj = np.asarray(A.indices, dtype=idx_dtype)
+        Ax = np.asarray(A.data, dtype=out.dtype)
+        Bp = np.asarray(B.indptr, dtype=idx_dtype)
+        Bj = np.asarray(B.indices, dtype=idx_dtype)
+        Bx = np.asarray(B.data, dtype=out.dtype)
+        Mp = np.asarray(mask.indptr, dtype=idx_dtype)
+        Mj = np.asarray(mask.indices, dtype=idx_dtype)
+
+        bounds = _balanced_bounds(Ap, get_num_jobs())
+
+        def part(j):
+            start, stop = bounds[j], bounds[j + 1]
+            _sparsetools.csr_matmat_masked(stop - start, n_col,
+                                           Ap[start:stop + 1], Aj, Ax,
+                                           Bp, Bj, Bx,
+                                           Mp[start:stop + 1], Mj, out)
+
+        _run_parts(part, len(bounds) - 1)
+
+        if out is not data:
+            data[...] = out
 
     def diagonal(self):
         """Returns the main diagonal of the matrix
@@ -573,47 +753,121 @@ class _cs_matrix(_data_matrix, _minmax_mixin, IndexMixin):
         """Sum the matrix over the given axis.  If the axis is None, sum
         over both rows and columns, returning a scalar.
         """
-        # The spmatrix base class already does axis=0 and axis=1 efficiently
-        # so we only do the case axis=None here
+        # The sums over axis=0 and axis=1 are done by _sum_axis, so we only
+        # do the case axis=None here
         if axis is None:
             return self.data.sum()
-        elif (not hasattr(self, 'blocksize') and
-              axis in self._swap(((1, -1), (0, 2)))[0]):
-            # faster than multiplication for large minor axis in CSC/CSR
-            dtype = self.dtype
-            if np.issubdtype(dtype, np.bool_):
-                dtype = np.int_
-            ret = np.zeros(len(self.indptr) - 1, dtype=dtype)
-            major_index, value = self._minor_reduce(np.add)
-            ret[major_index] = value
-            ret = np.asmatrix(ret)
-            if axis % 2 == 1:
-                ret = ret.T
-            return ret
         else:
             return spmatrix.sum(self, axis)
 
-    def _minor_reduce(self, ufunc):
-        """Reduce nonzeros with a ufunc over the minor axis when non-empty
-
-        Warning: this does not call sum_duplicates()
-
-        Returns
-        -------
-        major_index : array of ints
-            Major indices where nonzero
+    def _sum_axis(self, axis, dtype):
+        if hasattr(self, 'blocksize'):
+            return spmatrix._sum_axis(self, axis, dtype)
 
-        value : array of self.dtype
-            Reduce result for nonzeros in each major_index
-        """
-        major_index = np.flatnonzero(np.diff(self.indptr))
-        if self.data.size == 0 and major_index.size == 0:
-            # Numpy < 1.8.0 don't handle empty arrays in reduceat
-            value = np.zeros_like(self.data)
+        M, N = self._swap(self.shape)
+        indptr = self.indptr
+        data = self.data
+        if data.dtype != dtype:
+            data = data.astype(dtype)
+        bounds = _balanced_bounds(indptr, get_num_jobs())
+        n_parts = len(bounds) - 1
+
+        if axis == self._swap((1, 0))[0]:
+            # sum over the minor axis, each thread summing its own rows
+            ret = np.empty(M, dtype=dtype)
+
+            def part(j):
+                start, stop = bounds[j], bounds[j + 1]
+                _sparsetools.csr_row_sums(stop - start,
+                                          indptr[start:stop + 1],
+                                          data, ret[start:stop])
         else:
-            value = ufunc.reduceat(self.data,
-                                   downcast_intp_index(self.indptr[major_index]))
-        return major_index, value
+            # sum over the major axis, each thread accumulating its rows
+            # into a separate array
+            ret = np.zeros(N, dtype=dtype)
+            partial = [ret] + [np.zeros(N, dtype=dtype)
+                               for j in xrange(1, n_parts)]
+
+            def part(j):
+                start, stop = bounds[j], bounds[j + 1]
+                _sparsetools.csr_column_sums(stop - start,
+                                             indptr[start:stop + 1],
+                                             self.indices, data, partial[j])
+        _run_parts(part, n_parts)
+
+        if axis != self._swap((1, 0))[0]:
+            for other in partial[1:]:
+                ret += other
+
+        ret = np.asmatrix(ret)
+        if axis == 1:
+            ret = ret.T
+        return ret
+
+    def _minmax_axis(self, axis, is_max):
+        if hasattr(self, 'blocksize'):
+            return self.tocsr()._minmax_axis(axis, is_max)
+
+        if self.shape[axis] == 0:
+            raise ValueError("zero-size array to reduction operation")
+
+        self.sum_duplicates()
+        M, N = self._swap(self.shape)
+        is_max = int(bool(is_max))
+        bounds = _balanced_bounds(self.indptr, get_num_jobs())
+        n_parts = len(bounds) - 1
+
+        if axis == self._swap((1, 0))[0]:
+            # reduce over the minor axis, each thread reducing its own rows
+            value = np.empty(M, dtype=self.dtype)
+            index = np.empty(M, dtype=self.indices.dtype)
+
+            def part(j):
+                start, stop = bounds[j], bounds[j + 1]
+                _sparsetools.csr_row_minmax(stop - start, N,
+                                            self.indptr[start:stop + 1],
+                                            self.indices, self.data, is_max,
+                                            value[start:stop],
+                                            index[start:stop])
+            _run_parts(part, n_parts)
+            return value, index
+
+        # reduce over the major axis: each thread finds the best stored value
+        # of each column and the first row not storing it in its part of
+        # the rows, then the parts are combined in order
+        parts = [None] * n_parts
+
+        def part(j):
+            start, stop = bounds[j], bounds[j + 1]
+            Yx = np.zeros(N, dtype=self.dtype)
+            Yi = np.empty(N, dtype=self.indices.dtype)
+            Yi.fill(-1)
+            Yz = np.empty(N, dtype=self.indices.dtype)
+            Yz.fill(start)
+            _sparsetools.csr_column_minmax(stop - start, start,
+                                           self.indptr[start:stop + 1],
+                                           self.indices, self.data, is_max,
+                                           Yx, Yi, Yz)
+            parts[j] = (Yx, Yi, np.where(Yz < stop, Yz, M))
+        _run_parts(part, n_parts)
+
+        value, index, first_zero = parts[0]
+        for Yx, Yi, Yz in parts[1:]:
+            take = (Yi >= 0) & ((index < 0) |
+                                _minmax_before(Yx, value, is_max))
+            value = np.where(take, Yx, value)
+            index = np.where(take, Yi, index)
+            first_zero = np.where(first_zero < M, first_zero, Yz)
+
+        # the implicit zeros come in when they beat the stored values, or
+        # tie with them at a smaller index
+        zero = np.zeros_like(value)
+        has_zero = first_zero < M
+        take = has_zero & ((index < 0) | _minmax_before(zero, value, is_max))
+        tie = has_zero & (value == 0) & (first_zero < index)
+        value[take] = 0
+        index = np.where(take | tie, first_zero, index)
+        return value, index
 
     #######################
     # Getting and Setting #
@@ -913,6 +1167,82 @@ class _cs_matrix(_data_matrix, _minmax_mixin, IndexMixin):
 
         return self.__class__((data, indices, indptr), shape=shape)
 
+    def _gather(self, major=None, minor=None):
+        """
+        Returns the submatrix at the intersection of the rows `major` and the
+        columns `minor` (the converse for CSC), in the order given.
+
+        `major` and `minor` are 1-D arrays of indices, which may be negative
+        or repeated, or None to select all the rows or columns.  Only the
+        selected rows are read, and they are split between
+        ``get_num_jobs()`` threads.  The indices of the result are sorted if
+        those of the matrix are known to be and `minor` is nondecreasing.
+        """
+        M, N = self._swap(self.shape)
+        if major is None:
+            major = np.arange(M)
+        else:
+            major = _check_index_array(major, M)
+        if minor is not None:
+            minor = _check_index_array(minor, N)
+
+        lengths = np.diff(self.indptr)[major]
+        if minor is None:
+            maxval = int(np.sum(lengths))
+        else:
+            # The selected entries of a column of the matrix are put at the
+            # positions col_order[col_offsets[j]:col_offsets[j+1]]
+            col_order = np.argsort(minor, kind='mergesort')
+            col_offsets = np.searchsorted(minor[col_order], np.arange(N + 1))
+            col_counts = np.diff(col_offsets)
+            max_count = int(col_counts.max()) if N > 0 else 0
+            maxval = max(int(np.sum(lengths)) * max_count, len(minor))
+        idx_dtype = get_index_dtype((self.indptr, self.indices),
+                                    maxval=maxval)
+
+        Ap = np.asarray(self.indptr, dtype=idx_dtype)
+        Aj = np.asarray(self.indices, dtype=idx_dtype)
+        rows = np.asarray(major, dtype=idx_dtype)
+        indptr = np.empty(len(rows) + 1, dtype=idx_dtype)
+        if minor is None:
+            indptr[0] = 0
+            np.cumsum(lengths, out=indptr[1:])
+        else:
+            col_offsets = np.asarray(col_offsets, dtype=idx_dtype)
+            col_order = np.asarray(col_order, dtype=idx_dtype)
+            _sparsetools.csr_column_index1(len(rows), rows, Ap, Aj,
+                                           col_counts.astype(idx_dtype),
+                                           indptr)
+        indices = np.empty(indptr[-1], dtype=idx_dtype)
+        data = np.empty(indptr[-1], dtype=self.dtype)
+
+        bounds = _balanced_bounds(indptr, get_num_jobs())
+        firsts = indptr[bounds].tolist()
+
+        def part(j):
+            start, stop = bounds[j], bounds[j + 1]
+            first, last = firsts[j], firsts[j + 1]
+            if minor is None:
+                _sparsetools.csr_row_index(stop - start, rows[start:stop],
+                                           Ap, Aj, self.data,
+                                           indices[first:last],
+                                           data[first:last])
+            else:
+                _sparsetools.csr_column_index2(stop - start, rows[start:stop],
+                                               Ap, Aj, self.data,
+                                               col_offsets, col_order,
+                                               indices[first:last],
+                                               data[first:last])
+
+        _run_parts(part, len(bounds) - 1)
+
+        shape = self._swap((len(rows), N if minor is None else len(minor)))
+        A = self.__class__((data, indices, indptr), shape=shape)
+        if (getattr(self, '_has_sorted_indices', False) and
+                (minor is None or np.all(minor[1:] >= minor[:-1]))):
+            A.has_sorted_indices = True
+        return A
+
     ######################
     # Conversion methods #
     ######################
@@ -1002,13 +1332,41 @@ class _cs_matrix(_data_matrix, _minmax_mixin, IndexMixin):
         """
         if self.has_canonical_format:
             return
-        self.sort_indices()
 
-        fn = _sparsetools.csr_sum_duplicates
         M,N = self._swap(self.shape)
-        fn(M, N, self.indptr, self.indices, self.data)
+        bounds = _balanced_bounds(self.indptr, get_num_jobs())
+        if len(bounds) <= 2:
+            self.sort_indices()
+            _sparsetools.csr_sum_duplicates(M, N, self.indptr, self.indices,
+                                            self.data)
+        else:
+            # The major axis is split between threads, each sorting and
+            # summing its part in place, and the parts are then moved
+            # together
+            n_parts = len(bounds) - 1
+            firsts = self.indptr[bounds].tolist()
+            part_indptrs = [None] * n_parts
+            is_sorted = self.has_sorted_indices
+
+            def part(j):
+                start, stop = bounds[j], bounds[j + 1]
+                first, last = firsts[j], firsts[j + 1]
+                part_indptr = self.indptr[start:stop + 1] - first
+                part_indices = self.indices[first:last]
+                part_data = self.data[first:last]
+                if not is_sorted:
+                    _sparsetools.csr_sort_indices(stop - start, part_indptr,
+                                                  part_indices, part_data)
+                _sparsetools.csr_sum_duplicates(stop - start, N, part_indptr,
+                                                part_indices, part_data)
+                part_indptrs[j] = part_indptr
+
+            _run_parts(part, n_parts)
+            _join_parts(self.indptr, self.indices, self.data, bounds, firsts,
+                        part_indptrs)
 
         self.prune()  # nnz may have changed
+        self.has_sorted_indices = True
         self.has_canonical_format = True
 
     def __get_sorted(self):
@@ -1148,3 +1506,60 @@ class _cs_matrix(_data_matrix, _minmax_mixin, IndexMixin):
             out = r
 
         return out
+
+
+def _check_index_array(idx, n):
+    """
+    Returns the array of integer indices `idx` into a dimension of length
+    `n`, with negative indices wrapped around.
+    """
+    idx = np.asarray(idx)
+    if idx.size == 0:
+        return idx.astype(np.intp)
+    if idx.dtype.kind not in 'iu':
+        raise IndexError('invalid index')
+    max_idx = idx.max()
+    if max_idx >= n:
+        raise IndexError('index (%d) out of range' % max_idx)
+    min_idx = idx.min()
+    if min_idx < -n:
+        raise IndexError('index (%d) out of range' % (n + min_idx))
+    if min_idx < 0:
+        idx = np.where(idx < 0, idx + n, idx)
+    return idx
+
+
+def _join_parts(indptr, indices, data, bounds, firsts, part_indptrs):
+    """
+    Moves together the parts of a compressed matrix computed by separate
+    threads, and returns the number of stored values.
+
+    The part of the major axis between ``bounds[j]`` and ``bounds[j + 1]``
+    was given the space starting at ``firsts[j]`` in `indices` and `data`,
+    and `part_indptrs[j]` is its index pointer relative to that position.
+    `indptr`, `indices` and `data` are modified in place.
+    """
+    nnz = 0
+    for j in xrange(len(part_indptrs)):
+        start, stop = bounds[j], bounds[j + 1]
+        first, count = firsts[j], part_indptrs[j][-1]
+        indptr[start + 1:stop + 1] = part_indptrs[j][1:] + nnz
+        if first != nnz:
+            indices[nnz:nnz + count] = indices[first:first + count].copy()
+            data[nnz:nnz + count] = data[first:first + count].copy()
+        nnz += count
+    return nnz
+
+
+def _minmax_before(x, y, is_max):
+    """
+    Whether the values of `x` come before those of `y` in a maximum (or
+    minimum) reduction, NaNs coming first as they propagate.
+    """
+    x_nan = (x != x)
+    y_nan = (y != y)
+    if is_max:
+        before = x > y
+    else:
+        before = x < y
+    return np.where(x_nan, ~y_nan, before)
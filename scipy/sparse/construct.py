@@ -5,7 +5,8 @@ from __future__ import division, print_function, absolute_import
 __docformat__ = "restructuredtext en"
 
 __all__ = ['spdiags', 'eye', 'identity', 'kron', 'kronsum',
-            'hstack', 'vstack', 'bmat', 'rand', 'diags', 'block_diag']
+            'hstack', 'vstack', 'bmat', 'rand', 'diags', 'block_diag',
+            'spmatmul', 'spmatmul_nnz', 'from_coo_chunks']
 
 
 import numpy as np
@@ -14,8 +15,8 @@ from scipy._lib.six import xrange
 
 from .sputils import upcast, get_index_dtype
 
-from .csr import csr_matrix
-from .csc import csc_matrix
+from .csr import csr_matrix, isspmatrix_csr
+from .csc import csc_matrix, isspmatrix_csc
 from .bsr import bsr_matrix
 from .coo import coo_matrix
 from .dia import dia_matrix
@@ -395,6 +396,310 @@ def kronsum(A, B, format=None):
     return (L+R).asformat(format)  # since L + R is not always same format
 
 
+def _spmatmul_operands(A, B):
+    """
+    Converts the operands of a sparse matrix product to CSR format, or both
+    to CSC format if `A` is a CSC matrix.
+    """
+    if not (isspmatrix_csr(A) or isspmatrix_csc(A)):
+        A = csr_matrix(A)
+    B = A.__class__(B)
+
+    if A.shape[1] != B.shape[0]:
+        raise ValueError('dimension mismatch')
+
+    return A, B
+
+
+def spmatmul_nnz(A, B):
+    """
+    Number of stored values in each row of a sparse matrix product.
+
+    This is the first pass of ``spmatmul(A, B)``, which finds the sparsity
+    structure of the product.  It allows checking the memory needed by the
+    product before computing it.
+
+    .. versionadded:: 0.16.0
+
+    Parameters
+    ----------
+    A, B : sparse or dense matrix
+        The operands of the product ``A * B``.
+
+    Returns
+    -------
+    nnz : ndarray of intp
+        The number of stored values in each row of the product, or in each
+        column if `A` is a CSC matrix.  Entries of the product that cancel
+        out are counted, so these are upper bounds.
+
+    See Also
+    --------
+    spmatmul
+
+    Examples
+    --------
+    >>> from scipy.sparse import csr_matrix, spmatmul, spmatmul_nnz
+    >>> A = csr_matrix([[1, 0, 2], [0, 3, 0], [4, 0, 0]])
+    >>> nnz = spmatmul_nnz(A, A.T)
+    >>> nnz
+    array([2, 1, 2])
+    >>> nbytes = nnz.sum() * (A.indices.itemsize + A.data.itemsize)
+    >>> spmatmul(A, A.T, nnz=nnz).toarray()
+    array([[ 5,  0,  4],
+           [ 0,  9,  0],
+           [ 4,  0, 16]], dtype=int64)
+
+    """
+    A, B = _spmatmul_operands(A, B)
+    return A._matmat_nnz(B)
+
+
+def spmatmul(A, B, dtype=None, mask=None, out=None, nnz=None):
+    """
+    Sparse matrix product with control over its memory.
+
+    The product ``A * B`` is computed in two passes over the rows of `A`:
+    the first counts the stored values of each row of the product (see
+    `spmatmul_nnz`), the second computes them.  Both passes split the rows
+    between the threads set with `set_num_jobs`.
+
+    .. versionadded:: 0.16.0
+
+    Parameters
+    ----------
+    A, B : sparse or dense matrix
+        The operands of the product.
+    dtype : dtype, optional
+        The data type of the result, in which the products are summed.  By
+        default, the upcast of the data types of `A` and `B`.
+    mask : sparse matrix, optional
+        If given, only the entries of the product at the positions stored in
+        `mask` are computed, and the first pass is skipped.
+    out : csr_matrix or csc_matrix, optional
+        If given, the stored values of `out` are overwritten with the entries
+        of the product at their positions, as for `mask`, and `out` is
+        returned.  Nothing is allocated for the result, and it is computed
+        in the dtype of `out`.  Typically, `out` is the result of a previous
+        product of matrices with the same sparsity structures.
+    nnz : ndarray, optional
+        The output of ``spmatmul_nnz(A, B)``.  If given, the first pass is
+        skipped.  A ValueError is raised if the space it reserves for the
+        result is too small.
+
+    Returns
+    -------
+    C : csr_matrix or csc_matrix
+        The product, in CSC format if `A` is a CSC matrix and in CSR format
+        otherwise.  Entries that are zero are not stored, except in `out`.
+
+    See Also
+    --------
+    spmatmul_nnz, set_num_jobs
+
+    Notes
+    -----
+    With `mask` or `out`, the entries of the product are summed in a buffer
+    indexed by the positions of the stored entries in a row of the mask, and
+    the cost is proportional to the number of multiplications, as for the
+    full product, but the memory is that of the mask.
+
+    Examples
+    --------
+    >>> from scipy.sparse import csr_matrix, spmatmul
+    >>> A = csr_matrix([[1, 0, 2], [0, 3, 0], [4, 0, 0]])
+
+    Only the diagonal of ``A * A.T``:
+
+    >>> spmatmul(A, A.T, mask=csr_matrix(np.eye(3))).toarray()
+    array([[ 5,  0,  0],
+           [ 0,  9,  0],
+           [ 0,  0, 16]], dtype=int64)
+
+    Compute the product again, in place, after changing the values of `A`:
+
+    >>> C = spmatmul(A, A.T)
+    >>> A.data *= 2
+    >>> spmatmul(A, A.T, out=C).toarray()
+    array([[20,  0, 16],
+           [ 0, 36,  0],
+           [16,  0, 64]], dtype=int64)
+
+    """
+    A, B = _spmatmul_operands(A, B)
+    shape = (A.shape[0], B.shape[1])
+
+    if out is not None:
+        if mask is not None or nnz is not None:
+            raise ValueError("out cannot be combined with mask or nnz")
+        if out.format != A.format or out.shape != shape:
+            raise ValueError("out must be a %s_matrix of shape %s"
+                             % (A.format, shape))
+        out.sum_duplicates()
+        A._matmat_masked(B, out, out.data)
+        return out
+
+    if mask is not None:
+        if nnz is not None:
+            raise ValueError("mask cannot be combined with nnz")
+        mask = A.__class__(mask)
+        if mask.shape != shape:
+            raise ValueError("mask must have the shape %s of the product"
+                             % (shape,))
+        if not mask.has_canonical_format:
+            mask = mask.copy()
+            mask.sum_duplicates()
+        if dtype is None:
+            dtype = upcast(A.dtype, B.dtype)
+        data = np.empty(mask.nnz, dtype=dtype)
+        A._matmat_masked(B, mask, data)
+        C = A.__class__((data, mask.indices.copy(), mask.indptr.copy()),
+                        shape=shape)
+        C.eliminate_zeros()
+        return C
+
+    if nnz is not None:
+        nnz = np.asarray(nnz)
+        if nnz.shape != (A._swap(shape)[0],):
+            raise ValueError("nnz does not match the shape of the product")
+        if np.any(nnz < 0):
+            raise ValueError("nnz must not be negative")
+
+    return A._matmat(B, dtype=dtype, nnz=nnz)
+
+
+def from_coo_chunks(chunks, shape, format='csr', dtype=None,
+                    index_dtype=None, buffer_nnz=1 << 22):
+    """
+    Build a CSR or CSC matrix from chunks of (row, column, value) triplets.
+
+    The triplets are gathered in a buffer, which is converted to a matrix
+    with its duplicates summed each time it holds `buffer_nnz` triplets.
+    These partial matrices are summed as they are built, two partial
+    matrices of the same number of buffers at a time, as in a merge sort,
+    so that at most about ``log2(nnz / buffer_nnz)`` of them are held at
+    once.  The memory used thus grows with `buffer_nnz` and the number of
+    stored values of the result, not with the number of triplets.
+
+    .. versionadded:: 0.16.0
+
+    Parameters
+    ----------
+    chunks : iterable
+        The chunks of triplets, each either a tuple ``(data, (row, col))``
+        as accepted by `coo_matrix`, or a sparse matrix of shape `shape`.
+    shape : tuple of int
+        The shape of the matrix.
+    format : {'csr', 'csc'}, optional
+        The format of the matrix.  Default: 'csr'.
+    dtype : dtype, optional
+        The data type of the matrix.  By default, the upcast of the data
+        types of the chunks.
+    index_dtype : {None, int32, int64}, optional
+        The data type of the index arrays of the matrix.  By default, int32
+        if the matrix allows it, int64 otherwise.
+    buffer_nnz : int, optional
+        The number of triplets buffered before they are converted.
+        Default: ``2**22``.
+
+    Returns
+    -------
+    A : csr_matrix or csc_matrix
+        The sum of the triplets.  Entries whose sum over several buffers is
+        zero may not be stored.
+
+    See Also
+    --------
+    coo_matrix.tocsr, coo_matrix.tocsc
+
+    Examples
+    --------
+    >>> from scipy.sparse import from_coo_chunks
+    >>> chunks = [([1, 2], ([0, 1], [1, 2])), ([3, 4], ([0, 2], [1, 0]))]
+    >>> from_coo_chunks(chunks, shape=(3, 3)).toarray()
+    array([[0, 4, 0],
+           [0, 0, 2],
+           [4, 0, 0]], dtype=int64)
+
+    """
+    if format not in ('csr', 'csc'):
+        raise ValueError("format must be 'csr' or 'csc'")
+    if index_dtype is not None:
+        index_dtype = np.dtype(index_dtype)
+        if index_dtype not in (np.dtype(np.int32), np.dtype(np.int64)):
+            raise ValueError("index_dtype must be int32 or int64")
+    shape = tuple(shape)
+
+    # partial matrices, with the number of buffers summed in each as a
+    # power of two, in decreasing order
+    stack = []
+
+    def push(part, level):
+        while stack and stack[-1][0] == level:
+            part = _coo_chunks_index_dtype(stack.pop()[1] + part, index_dtype)
+            level += 1
+        stack.append((level, part))
+
+    buffered = []
+    n_buffered = 0
+    for chunk in chunks:
+        if issparse(chunk):
+            if chunk.shape != shape:
+                raise ValueError("chunk of shape %s does not match shape %s"
+                                 % (chunk.shape, shape))
+            chunk = chunk.tocoo()
+            data, row, col = chunk.data, chunk.row, chunk.col
+        else:
+            data, (row, col) = chunk
+        data = np.asarray(data, dtype=dtype)
+        buffered.append((data, np.asarray(row), np.asarray(col)))
+        n_buffered += len(data)
+        if n_buffered >= buffer_nnz:
+            part = _coo_chunks_part(buffered, shape, format)
+            buffered = []
+            n_buffered = 0
+            push(_coo_chunks_index_dtype(part, index_dtype), 0)
+    if buffered or not stack:
+        part = _coo_chunks_part(buffered, shape, format, dtype)
+        push(_coo_chunks_index_dtype(part, index_dtype), 0)
+
+    A = stack.pop()[1]
+    while stack:
+        A = _coo_chunks_index_dtype(stack.pop()[1] + A, index_dtype)
+    return A
+
+
+def _coo_chunks_index_dtype(A, index_dtype):
+    """
+    Casts the index arrays of a matrix built by `from_coo_chunks` to
+    `index_dtype`, or to the smallest index dtype allowed if it is None.
+    """
+    needed_dtype = np.dtype(get_index_dtype(maxval=max((A.nnz,) + A.shape)))
+    if index_dtype is None:
+        index_dtype = needed_dtype
+    elif index_dtype.itemsize < needed_dtype.itemsize:
+        raise ValueError("the matrix needs %s indices" % needed_dtype.name)
+    A.indptr = np.asarray(A.indptr, dtype=index_dtype)
+    A.indices = np.asarray(A.indices, dtype=index_dtype)
+    return A
+
+
+def _coo_chunks_part(buffered, shape, format, dtype=None):
+    """
+    Converts a list of ``(data, row, col)`` triplets to a matrix of the
+    given format with its duplicates summed.
+    """
+    if not buffered:
+        part = coo_matrix(shape, dtype=dtype)
+    elif len(buffered) == 1:
+        data, row, col = buffered[0]
+        part = coo_matrix((data, (row, col)), shape=shape)
+    else:
+        data, row, col = [np.concatenate(arrays) for arrays in zip(*buffered)]
+        part = coo_matrix((data, (row, col)), shape=shape)
+    return part.tocsr() if format == 'csr' else part.tocsc()
+
+
 def _compressed_sparse_stack(blocks, axis):
     """
     Stacking fast path for CSR/CSC matrices
@@ -11,11 +11,12 @@ import numpy as np
 
 from scipy._lib.six import xrange, zip as izip
 
-from ._sparsetools import coo_tocsr, coo_todense, coo_matvec
-from .base import isspmatrix
+from ._sparsetools import coo_tocsr, coo_todense, coo_matvec, csr_column_sums
+from .base import isspmatrix, get_num_jobs
 from .data import _data_matrix, _minmax_mixin
 from .sputils import (upcast, upcast_char, to_native, isshape, getdtype,
-        isintlike, get_index_dtype, downcast_intp_index)
+        isintlike, get_index_dtype, downcast_intp_index, _MIN_NNZ_PER_JOB,
+        _run_parts)
 
 
 class coo_matrix(_data_matrix, _minmax_mixin):
@@ -154,8 +155,8 @@ class coo_matrix(_data_matrix, _minmax_mixin):
                     self.shape = (M, N)
 
                 idx_dtype = get_index_dtype(maxval=max(self.shape))
-                self.row = self.row.astype(idx_dtype)
-                self.col = self.col.astype(idx_dtype)
+                self.row = np.asarray(self.row, dtype=idx_dtype)
+                self.col = np.asarray(self.col, dtype=idx_dtype)
                 self.has_canonical_format = False
 
         elif arg1 is None:
@@ -305,22 +306,7 @@ class coo_matrix(_data_matrix, _minmax_mixin):
             return csc_matrix(self.shape, dtype=self.dtype)
         else:
             M,N = self.shape
-            idx_dtype = get_index_dtype((self.col, self.row),
-                                        maxval=max(self.nnz, M))
-            indptr = np.empty(N + 1, dtype=idx_dtype)
-            indices = np.empty(self.nnz, dtype=idx_dtype)
-            data = np.empty(self.nnz, dtype=upcast(self.dtype))
-
-            coo_tocsr(N, M, self.nnz,
-                      self.col.astype(idx_dtype),
-                      self.row.astype(idx_dtype),
-                      self.data,
-                      indptr, indices, data)
-
-            A = csc_matrix((data, indices, indptr), shape=self.shape)
-            A.sum_duplicates()
-
-            return A
+            return self._tocompressed(csc_matrix, self.col, self.row, N, M)
 
     def tocsr(self):
         """Return a copy of this matrix in Compressed Sparse Row format
@@ -347,24 +333,40 @@ class coo_matrix(_data_matrix, _minmax_mixin):
             return csr_matrix(self.shape, dtype=self.dtype)
         else:
             M,N = self.shape
-            idx_dtype = get_index_dtype((self.row, self.col),
-                                        maxval=max(self.nnz, N))
-            indptr = np.empty(M + 1, dtype=idx_dtype)
-            indices = np.empty(self.nnz, dtype=idx_dtype)
-            data = np.empty(self.nnz, dtype=upcast(self.dtype))
-
-            coo_tocsr(M, N, self.nnz,
-                      self.row.astype(idx_dtype),
-                      self.col.astype(idx_dtype),
-                      self.data,
-                      indptr,
-                      indices,
-                      data)
-
-            A = csr_matrix((data, indices, indptr), shape=self.shape)
-            A.sum_duplicates()
+            return self._tocompressed(csr_matrix, self.row, self.col, M, N)
 
-            return A
+    def _tocompressed(self, cls, major, minor, n_major, n_minor):
+        """
+        Converts to `cls`, csr_matrix or csc_matrix, whose major and minor
+        indices are `major` and `minor` and dimensions `n_major` and
+        `n_minor`, summing duplicates.
+
+        The entries are counting-sorted along the major axis, then each part
+        of it is sorted and its duplicates summed by a separate thread.  The
+        index arrays must hold values up to the number of stored values
+        during the conversion, but are cast back to int32 if possible once
+        the duplicates are summed.
+        """
+        idx_dtype = get_index_dtype((major, minor),
+                                    maxval=max(self.nnz, n_minor))
+        indptr = np.empty(n_major + 1, dtype=idx_dtype)
+        indices = np.empty(self.nnz, dtype=idx_dtype)
+        data = np.empty(self.nnz, dtype=upcast(self.dtype))
+
+        coo_tocsr(n_major, n_minor, self.nnz,
+                  np.asarray(major, dtype=idx_dtype),
+                  np.asarray(minor, dtype=idx_dtype),
+                  self.data,
+                  indptr, indices, data)
+
+        A = cls((data, indices, indptr), shape=self.shape)
+        A.sum_duplicates()
+
+        small_dtype = get_index_dtype(maxval=max(A.nnz, n_major, n_minor))
+        if small_dtype != idx_dtype:
+            A.indptr = A.indptr.astype(small_dtype)
+            A.indices = A.indices.astype(small_dtype)
+        return A
 
     def tocoo(self, copy=False):
         if copy:
@@ -483,6 +485,37 @@ class coo_matrix(_data_matrix, _minmax_mixin):
         self.data = np.add.reduceat(self.data, unique_inds, dtype=self.dtype)
         self.has_canonical_format = True
 
+    def _sum_axis(self, axis, dtype):
+        # add each value to the sum of its row (axis=1) or column (axis=0),
+        # the entries being split between threads summing into separate
+        # arrays
+        if axis == 0:
+            index, n = self.col, self.shape[1]
+        else:
+            index, n = self.row, self.shape[0]
+        data = self.data
+        if data.dtype != dtype:
+            data = data.astype(dtype)
+        nnz = len(data)
+        n_parts = max(1, min(get_num_jobs(), nnz // _MIN_NNZ_PER_JOB))
+        bounds = np.linspace(0, nnz, n_parts + 1).astype(index.dtype)
+        partial = [np.zeros(n, dtype=dtype) for j in xrange(n_parts)]
+
+        def part(j):
+            # the entries of a part are summed as a single row of a CSR
+            # matrix with the column indices `index`
+            csr_column_sums(1, bounds[j:j + 2], index, data, partial[j])
+
+        _run_parts(part, n_parts)
+
+        ret = partial[0]
+        for other in partial[1:]:
+            ret += other
+        ret = np.asmatrix(ret)
+        if axis == 1:
+            ret = ret.T
+        return ret
+
     ###########################
     # Multiplication handlers #
     ###########################
@@ -11,7 +11,8 @@ from scipy._lib.six import xrange
 
 from ._sparsetools import csc_tocsr
 from . import _sparsetools
-from .sputils import upcast, isintlike, IndexMixin, get_index_dtype
+from .sputils import (upcast, isintlike, IndexMixin, get_index_dtype,
+                      _is_outer_index)
 
 from .compressed import _cs_matrix
 
@@ -148,6 +149,8 @@ class csc_matrix(_cs_matrix, IndexMixin):
         # Use CSR to implement fancy indexing.
 
         row, col = self._unpack_index(key)
+        if _is_outer_index(row, col):
+            return self._gather(np.ravel(col), row[:, 0])
         # Things that return submatrices. row or col is a int or slice.
         if (isinstance(row, slice) or isinstance(col, slice) or
                 isintlike(row) or isintlike(col)):
@@ -11,8 +11,9 @@ import numpy as np
 from scipy._lib.six import xrange
 
 from ._sparsetools import csr_tocsc, csr_tobsr, csr_count_blocks, \
-        get_csr_submatrix, csr_sample_values
-from .sputils import upcast, isintlike, IndexMixin, issequence, get_index_dtype
+        get_csr_submatrix, csr_sample_values, csr_tosell
+from .sputils import (upcast, isintlike, IndexMixin, issequence,
+                      get_index_dtype, _is_outer_index)
 
 from .compressed import _cs_matrix
 
@@ -177,7 +178,7 @@ class csr_matrix(_cs_matrix, IndexMixin):
 
         if blocksize is None:
             from .spfuncs import estimate_blocksize
-            return self.tobsr(blocksize=estimate_blocksize(self))
+            return self.tobsr(blocksize=estimate_blocksize(self), copy=copy)
 
         elif blocksize == (1,1):
             arg1 = (self.data.reshape(-1,1,1),self.indices,self.indptr)
@@ -206,6 +207,42 @@ class csr_matrix(_cs_matrix, IndexMixin):
 
             return bsr_matrix((data,indices,indptr), shape=self.shape)
 
+    def tosell(self, slice_height=None, sigma=None):
+        from .sell import sell_matrix
+
+        C = 8 if slice_height is None else int(slice_height)
+        sigma = 256 if sigma is None else int(sigma)
+        if C < 1 or sigma < 1:
+            raise ValueError('slice_height and sigma must be positive')
+        # sort within whole slices, so that the first row of each slice
+        # is its longest
+        sigma = -(-sigma // C) * C
+
+        M,N = self.shape
+        row_nnz = np.diff(self.indptr)
+        row_perm = np.lexsort((-row_nnz, np.arange(M) // sigma))
+        row_nnz = row_nnz[row_perm]
+
+        n_slice = -(-M // C)
+        widths = row_nnz[::C].astype(np.intp)
+        size = int(widths.sum()) * C
+
+        idx_dtype = get_index_dtype((self.indptr, self.indices),
+                                    maxval=max(size, M, N))
+        slice_ptr = np.zeros(n_slice + 1, dtype=idx_dtype)
+        np.cumsum(widths * C, out=slice_ptr[1:])
+        row_perm = row_perm.astype(idx_dtype)
+        row_nnz = row_nnz.astype(idx_dtype)
+        indices = np.zeros(size, dtype=idx_dtype)
+        data = np.zeros(size, dtype=self.dtype)
+
+        csr_tosell(M, C, self.indptr.astype(idx_dtype),
+                   self.indices.astype(idx_dtype), self.data,
+                   row_perm, slice_ptr, indices, data)
+
+        return sell_matrix((data, indices, slice_ptr, row_perm, row_nnz),
+                           shape=self.shape, slice_height=C)
+
     # these functions are used by the parent class (_cs_matrix)
     # to remove redudancy between csc_matrix and csr_matrix
     def _swap(self,x):
@@ -241,24 +278,6 @@ class csr_matrix(_cs_matrix, IndexMixin):
 
             return (min_indx,max_indx)
 
-        def extractor(indices,N):
-            """Return a sparse matrix P so that P*self implements
-            slicing of the form self[[1,2,3],:]
-            """
-            indices = asindices(indices)
-
-            (min_indx,max_indx) = check_bounds(indices,N)
-
-            if min_indx < 0:
-                indices = indices.copy()
-                indices[indices < 0] += N
-
-            indptr = np.arange(len(indices)+1, dtype=indices.dtype)
-            data = np.ones(len(indices), dtype=self.dtype)
-            shape = (len(indices),N)
-
-            return csr_matrix((data,indices,indptr), shape=shape)
-
         row, col = self._unpack_index(key)
 
         # First attempt to use original row optimized methods
@@ -272,8 +291,7 @@ class csr_matrix(_cs_matrix, IndexMixin):
                 return self._get_row_slice(row, col)
             # [i, [1, 2]]
             elif issequence(col):
-                P = extractor(col,self.shape[1]).T
-                return self[row, :] * P
+                return self._gather([row], col)
         elif isinstance(row, slice):
             # [1:2,??]
             if ((isintlike(col) and row.step in (1, None)) or
@@ -283,14 +301,24 @@ class csr_matrix(_cs_matrix, IndexMixin):
                 # col is int or slice with step 1, row is slice with step 1.
                 return self._get_submatrix(row, col)
             elif issequence(col):
-                P = extractor(col,self.shape[1]).T        # [1:2,[1,2]]
-                # row is slice, col is sequence.
-                return self[row,:]*P
+                # [1:2,[1,2]]
+                return self._gather(self._slicetoarange(row, self.shape[0]),
+                                    col)
         elif issequence(row):
             # [[1,2],??]
-            if isintlike(col) or isinstance(col,slice):
-                P = extractor(row, self.shape[0])     # [[1,2],j] or [[1,2],1:2]
-                return (P*self)[:,col]
+            if isintlike(col):
+                # [[1,2],j]
+                return self._gather(row, [col])
+            elif isinstance(col, slice):
+                if col == slice(None):
+                    # [[1,2],:]
+                    return self._gather(row)
+                # [[1,2],1:2]
+                return self._gather(row, self._slicetoarange(col,
+                                                             self.shape[1]))
+        elif _is_outer_index(row, col):
+            # [[[1],[2]],[1,2]], as given by np.ix_
+            return self._gather(row[:, 0], np.ravel(col))
 
         if not (issequence(col) and issequence(row)):
             # Sample elementwise
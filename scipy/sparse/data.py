@@ -98,22 +98,23 @@ class _minmax_mixin(object):
     These are not implemented for dia_matrix, hence the separate class.
     """
 
+    def _minmax_axis(self, axis, is_max):
+        """Maximum (or minimum) of each column (axis=0) or row (axis=1),
+        implicit zeros included, and the index of its first occurrence,
+        as 1-D arrays.  The CSR and CSC formats compute them natively.
+        """
+        return self.tocsr()._minmax_axis(axis, is_max)
+
     def _min_or_max_axis(self, axis, min_or_max):
         N = self.shape[axis]
         if N == 0:
             raise ValueError("zero-size array to reduction operation")
         M = self.shape[1 - axis]
 
-        mat = self.tocsc() if axis == 0 else self.tocsr()
-        mat.sum_duplicates()
+        value, _ = self._minmax_axis(axis, min_or_max is np.maximum)
 
-        major_index, value = mat._minor_reduce(min_or_max)
-        not_full = np.diff(mat.indptr)[major_index] < N
-        value[not_full] = min_or_max(value[not_full], 0)
-
-        mask = value != 0
-        major_index = np.compress(mask, major_index)
-        value = np.compress(mask, value)
+        major_index = np.flatnonzero(value)
+        value = value[major_index]
 
         from . import coo_matrix
         if axis == 0:
@@ -166,3 +167,69 @@ class _minmax_mixin(object):
             Minimum element.
         """
         return self._min_or_max(axis, np.minimum)
+
+    def _arg_min_or_max(self, axis, is_max):
+        if 0 in self.shape:
+            raise ValueError("Can't apply argmax/argmin to an empty matrix")
+
+        if axis is None:
+            # the first best row, and the first best column in that row
+            value, index = self._minmax_axis(1, is_max)
+            if is_max:
+                i = np.argmax(value)
+            else:
+                i = np.argmin(value)
+            return int(i) * self.shape[1] + int(index[i])
+
+        if axis < 0:
+            axis += 2
+        if (axis == 0) or (axis == 1):
+            _, index = self._minmax_axis(axis, is_max)
+            ret = np.asmatrix(index.astype(np.intp))
+            if axis == 1:
+                ret = ret.T
+            return ret
+        else:
+            raise ValueError("invalid axis, use 0 for rows, or 1 for columns")
+
+    def argmax(self, axis=None):
+        """Return indices of maximum elements along an axis.
+
+        Implicit zero elements are also taken into account. If there are
+        several maximum values, the index of the first occurrence is returned.
+
+        .. versionadded:: 0.16.0
+
+        Parameters
+        ----------
+        axis : {-2, -1, 0, 1, None}, optional
+            Axis along which the argmax is computed. If None (default), index
+            of the maximum element in the flatten data is returned.
+
+        Returns
+        -------
+        ind : np.matrix or int
+            Indices of maximum elements. If matrix, its size along `axis` is 1.
+        """
+        return self._arg_min_or_max(axis, True)
+
+    def argmin(self, axis=None):
+        """Return indices of minimum elements along an axis.
+
+        Implicit zero elements are also taken into account. If there are
+        several minimum values, the index of the first occurrence is returned.
+
+        .. versionadded:: 0.16.0
+
+        Parameters
+        ----------
+        axis : {-2, -1, 0, 1, None}, optional
+            Axis along which the argmin is computed. If None (default), index
+            of the minimum element in the flatten data is returned.
+
+        Returns
+        -------
+        ind : np.matrix or int
+            Indices of minimum elements. If matrix, its size along `axis` is 1.
+        """
+        return self._arg_min_or_max(axis, False)
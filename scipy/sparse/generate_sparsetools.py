@@ -74,6 +74,8 @@ csc_ge_csc          v iiIITIIT*I*I*B
 CSR_ROUTINES = """
 csr_matmat_pass1    v iiIIII*I
 csr_matmat_pass2    v iiIITIIT*I*I*T
+csr_matmat_pass2_bounded i iiiIITIIT*I*I*T
+csr_matmat_masked   v iiIITIITII*T
 csr_diagonal        v iiIIT*T
 csr_tocsc           v iiIIT*I*I*T
 csr_tobsr           v iiiiIIT*I*I*T
@@ -95,6 +97,13 @@ csr_scale_columns   v iiII*TT
 csr_sort_indices    v iI*I*T
 csr_eliminate_zeros v ii*I*I*T
 csr_sum_duplicates  v ii*I*I*T
+csr_row_sums        v iIT*T
+csr_column_sums     v iIIT*T
+csr_row_minmax      v iiIITi*T*I
+csr_column_minmax   v iiIITi*T*I*I
+csr_row_index       v iIIIT*I*T
+csr_column_index1   v iIIII*I
+csr_column_index2   v iIIITII*I*T
 get_csr_submatrix   v iiIITiiii*V*V*W
 csr_sample_values   v iiIITiII*T
 csr_count_blocks    i iiiiII
@@ -105,7 +114,7 @@ csr_has_sorted_indices    i iII
 csr_has_canonical_format  i iII
 """
 
-# coo.h, dia.h, csgraph.h
+# coo.h, dia.h, csgraph.h, sell.h
 OTHER_ROUTINES = """
 coo_tocsr           v iiiIIT*I*I*T
 coo_tocsc           v iiiIIT*I*I*T
@@ -114,6 +123,10 @@ coo_matvec          v iIITT*T
 coo_count_diagonals i iII
 dia_matvec          v iiiiITT*T
 cs_graph_components i iII*I
+csr_tosell          v iiIITII*I*T
+sell_tocsr          v iiIITIII*I*T
+sell_matvec         v iiIITIIT*T
+sell_matvecs        v iiiIITIIT*T
 """
 
 # List of compilation units
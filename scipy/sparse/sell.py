@@ -0,0 +1,357 @@
+"""Sliced ELLPACK (SELL-C-sigma) sparse matrix format"""
+
+from __future__ import division, print_function, absolute_import
+
+__docformat__ = "restructuredtext en"
+
+__all__ = ['sell_matrix', 'isspmatrix_sell']
+
+import numpy as np
+
+from .base import isspmatrix, _formats, get_num_jobs
+from .data import _data_matrix
+from .sputils import (isshape, upcast_char, getdtype, get_index_dtype,
+                      _balanced_bounds, _run_parts)
+from ._sparsetools import sell_tocsr, sell_matvec, sell_matvecs
+
+
+class sell_matrix(_data_matrix):
+    """Sliced ELLPACK sparse matrix (SELL-C-sigma)
+
+    The rows of the matrix are grouped in slices of `slice_height` rows.
+    Each slice is stored as a dense array, in column-major order, whose
+    width is the largest number of values of the rows of the slice, the
+    shorter rows being padded.  Before slicing, the rows are sorted by
+    decreasing number of values within windows of `sigma` rows, so that
+    the rows of a slice have similar lengths and little padding is
+    needed.
+
+    Products with vectors and dense matrices process the k-th values of
+    all the rows of a slice together, with unit stride, instead of one
+    row after the other as in the CSR format.  This suits matrices whose
+    rows have similar numbers of values, such as stencils or k-nearest
+    neighbors graphs.
+
+    This can be instantiated in several ways:
+        sell_matrix(D, [slice_height, sigma])
+            with a dense matrix
+
+        sell_matrix(S, [slice_height, sigma])
+            with another sparse matrix S (equivalent to
+            S.tosell(slice_height, sigma))
+
+        sell_matrix((M, N), [dtype, slice_height])
+            to construct an empty matrix with shape (M, N),
+            dtype is optional, defaulting to dtype='d'.
+
+        sell_matrix((data, indices, slice_ptr, row_perm, row_nnz),
+                    shape=(M, N), slice_height=C)
+            where the values and the column indices of slice ``s`` are
+            ``data[slice_ptr[s]:slice_ptr[s+1]]`` and the corresponding
+            part of ``indices``, in column-major order, and the row of
+            the matrix stored at position ``p`` is ``row_perm[p]``, with
+            ``row_nnz[p]`` values.  The numbers of values of the rows of
+            each slice must be decreasing.
+
+    .. versionadded:: 0.16.0
+
+    Parameters
+    ----------
+    slice_height : int, optional
+        The number of rows of each slice.  Default: 8.
+    sigma : int, optional
+        The number of rows within which the rows are sorted by number of
+        values, rounded up to a multiple of `slice_height`.  The rows are
+        always sorted within each slice.  Default: 256.
+
+    Attributes
+    ----------
+    dtype : dtype
+        Data type of the matrix
+    shape : 2-tuple
+        Shape of the matrix
+    ndim : int
+        Number of dimensions (this is always 2)
+    nnz
+        Number of nonzero elements
+    data
+        SELL format data array of the matrix, padding included
+    indices
+        SELL format column indices array of the matrix
+    slice_ptr
+        SELL format slice pointer array of the matrix
+    row_perm
+        Row of the matrix stored at each position
+    row_nnz
+        Number of values of the row stored at each position
+    slice_height
+        Number of rows of each slice
+
+    Notes
+    -----
+
+    Sparse matrices can be used in arithmetic operations, through
+    conversion to the CSR format for all but products with vectors and
+    dense matrices.  A `sell_matrix` can be passed to the solvers of
+    `scipy.sparse.linalg` as is, or wrapped with
+    `scipy.sparse.linalg.aslinearoperator`.
+
+    Examples
+    --------
+
+    >>> import numpy as np
+    >>> from scipy.sparse import csr_matrix, sell_matrix
+    >>> A = csr_matrix([[1, 2, 0], [0, 0, 3], [4, 0, 5]])
+    >>> S = sell_matrix(A, slice_height=2)
+    >>> S.row_perm
+    array([0, 2, 1], dtype=int32)
+    >>> S.slice_ptr
+    array([0, 4, 6], dtype=int32)
+    >>> S.dot(np.array([1, 0, -1]))
+    array([ 1, -3, -1], dtype=int64)
+
+    """
+
+    def __init__(self, arg1, shape=None, dtype=None, copy=False,
+                 slice_height=None, sigma=None):
+        _data_matrix.__init__(self)
+        # not the first three letters of the class name, as for the others
+        self.format = 'sell'
+
+        if isspmatrix_sell(arg1) and slice_height is None and sigma is None:
+            if copy:
+                arg1 = arg1.copy()
+            self._set_self(arg1)
+        elif isspmatrix(arg1):
+            self._set_self(arg1.tosell(slice_height=slice_height,
+                                       sigma=sigma))
+        elif isinstance(arg1, tuple):
+            if isshape(arg1):
+                # It's a tuple of matrix dimensions (M, N)
+                # create empty matrix
+                self.shape = arg1   # spmatrix checks for errors here
+                M = self.shape[0]
+                C = 8 if slice_height is None else int(slice_height)
+                n_slice = -(-M // C)
+                idx_dtype = get_index_dtype(maxval=max(self.shape))
+                self.data = np.zeros(0, getdtype(dtype, default=float))
+                self.indices = np.zeros(0, dtype=idx_dtype)
+                self.slice_ptr = np.zeros(n_slice + 1, dtype=idx_dtype)
+                self.row_perm = np.arange(M, dtype=idx_dtype)
+                self.row_nnz = np.zeros(M, dtype=idx_dtype)
+                self.slice_height = C
+            else:
+                try:
+                    # Try interpreting it as
+                    # (data, indices, slice_ptr, row_perm, row_nnz)
+                    data, indices, slice_ptr, row_perm, row_nnz = arg1
+                except:
+                    raise ValueError('unrecognized form for sell_matrix '
+                                     'constructor')
+                else:
+                    if shape is None:
+                        raise ValueError('expected a shape argument')
+                    if slice_height is None:
+                        raise ValueError('expected a slice_height argument')
+                    self.shape = shape
+                    idx_dtype = get_index_dtype((indices, slice_ptr,
+                                                 row_perm, row_nnz),
+                                                maxval=max(self.shape))
+                    self.data = np.array(data, dtype=dtype, copy=copy)
+                    self.indices = np.array(indices, dtype=idx_dtype,
+                                            copy=copy)
+                    self.slice_ptr = np.array(slice_ptr, dtype=idx_dtype,
+                                              copy=copy)
+                    self.row_perm = np.array(row_perm, dtype=idx_dtype,
+                                             copy=copy)
+                    self.row_nnz = np.array(row_nnz, dtype=idx_dtype,
+                                            copy=copy)
+                    self.slice_height = int(slice_height)
+        else:
+            #must be dense, convert to CSR first, then to SELL
+            try:
+                arg1 = np.asarray(arg1)
+            except:
+                raise ValueError("unrecognized form for"
+                        " %s_matrix constructor" % self.format)
+            from .csr import csr_matrix
+            self._set_self(csr_matrix(arg1, dtype=dtype).tosell(
+                slice_height=slice_height, sigma=sigma))
+
+        if dtype is not None:
+            self.data = self.data.astype(dtype)
+
+        self.check_format()
+
+    def _set_self(self, other):
+        """take the member variables of other and assign them to self"""
+        self.data = other.data
+        self.indices = other.indices
+        self.slice_ptr = other.slice_ptr
+        self.row_perm = other.row_perm
+        self.row_nnz = other.row_nnz
+        self.slice_height = other.slice_height
+        self.shape = other.shape
+
+    def check_format(self):
+        """check whether the matrix format is valid"""
+        M = self.shape[0]
+        C = self.slice_height
+        n_slice = -(-M // C) if C > 0 else 0
+
+        for name in ('data', 'indices', 'slice_ptr', 'row_perm', 'row_nnz'):
+            if getattr(self, name).ndim != 1:
+                raise ValueError('%s array must have rank 1' % name)
+        if C < 1:
+            raise ValueError('slice_height must be positive')
+        if len(self.slice_ptr) != n_slice + 1:
+            raise ValueError('slice_ptr should have %d entries, not %d'
+                             % (n_slice + 1, len(self.slice_ptr)))
+        if len(self.row_perm) != M or len(self.row_nnz) != M:
+            raise ValueError('row_perm and row_nnz should have %d entries'
+                             % M)
+        if self.slice_ptr[0] != 0:
+            raise ValueError('slice_ptr[0] should be 0')
+        if (len(self.indices) != self.slice_ptr[-1] or
+                len(self.data) != self.slice_ptr[-1]):
+            raise ValueError('indices and data should have size '
+                             'slice_ptr[-1]')
+
+        if M > 0:
+            # the products write to the rows given by row_perm
+            if self.row_perm.min() < 0 or self.row_perm.max() >= M:
+                raise ValueError('row_perm out of range')
+            if np.any(np.bincount(self.row_perm, minlength=M) != 1):
+                raise ValueError('row_perm must be a permutation of the rows')
+
+            # each slice holds its longest row, which comes first
+            widths, rest = np.divmod(np.diff(self.slice_ptr), C)
+            if np.any(rest != 0) or np.any(widths < self.row_nnz[::C]):
+                raise ValueError('slices too small for their rows')
+            decrease = np.diff(self.row_nnz) <= 0
+            decrease[C - 1::C] = True
+            if not decrease.all() or self.row_nnz.min() < 0:
+                raise ValueError('the numbers of values of the rows of '
+                                 'each slice must be decreasing')
+
+    def __repr__(self):
+        format = self.getformat()
+        return "<%dx%d sparse matrix of type '%s'\n" \
+               "\twith %d stored elements (%d slices of %d rows) in %s " \
+               "format>" % \
+               (self.shape + (self.dtype.type, self.nnz,
+                              len(self.slice_ptr) - 1, self.slice_height,
+                              _formats[format][1],))
+
+    def getnnz(self):
+        """number of nonzero values
+
+        explicit zero values are included in this number, the padding is
+        not
+        """
+        return int(self.row_nnz.sum())
+
+    nnz = property(fget=getnnz)
+
+    def _mul_vector(self, other):
+        result = np.zeros(self.shape[0], dtype=upcast_char(self.dtype.char,
+                                                            other.dtype.char))
+
+        # cast once here, rather than in each thread
+        data = np.asarray(self.data, dtype=result.dtype)
+        other = np.asarray(other, dtype=result.dtype)
+
+        def kernel(n_row, slice_ptr, row_perm, row_nnz):
+            sell_matvec(n_row, self.slice_height, slice_ptr, self.indices,
+                        data, row_perm, row_nnz, other, result)
+
+        self._matvec_threaded(kernel)
+
+        return result
+
+    def _mul_multivector(self, other):
+        n_vecs = other.shape[1]  # number of column vectors
+
+        result = np.zeros((self.shape[0], n_vecs),
+                          dtype=upcast_char(self.dtype.char,
+                                            other.dtype.char))
+
+        # cast once here, rather than in each thread
+        data = np.asarray(self.data, dtype=result.dtype)
+        other = np.ascontiguousarray(other, dtype=result.dtype)
+
+        def kernel(n_row, slice_ptr, row_perm, row_nnz):
+            sell_matvecs(n_row, n_vecs, self.slice_height, slice_ptr,
+                         self.indices, data, row_perm, row_nnz,
+                         other.ravel(), result.ravel())
+
+        self._matvec_threaded(kernel)
+
+        return result
+
+    def _matvec_threaded(self, kernel):
+        """
+        Computes a product in ``get_num_jobs()`` threads.
+
+        ``kernel(n_row, slice_ptr, row_perm, row_nnz)`` computes the product
+        of the rows of the slices given by `slice_ptr`.  The slices are
+        split into parts with similar numbers of stored values, whose rows
+        are distinct, so that the parts can write to the same result.
+        """
+        M = self.shape[0]
+        C = self.slice_height
+        bounds = _balanced_bounds(self.slice_ptr, get_num_jobs())
+
+        def part(j):
+            start, stop = bounds[j], bounds[j + 1]
+            kernel(min(stop * C, M) - start * C,
+                   self.slice_ptr[start:stop + 1],
+                   self.row_perm[start * C:], self.row_nnz[start * C:])
+
+        _run_parts(part, len(bounds) - 1)
+
+    def tosell(self, slice_height=None, sigma=None, copy=False):
+        if slice_height is None and sigma is None:
+            if copy:
+                return self.copy()
+            else:
+                return self
+        return self.tocsr().tosell(slice_height=slice_height, sigma=sigma)
+
+    def tocsr(self):
+        M, N = self.shape
+        idx_dtype = self.indices.dtype
+
+        indptr = np.zeros(M + 1, dtype=idx_dtype)
+        indptr[1:][self.row_perm] = self.row_nnz
+        np.cumsum(indptr, out=indptr)
+        indices = np.empty(indptr[-1], dtype=idx_dtype)
+        data = np.empty(indptr[-1], dtype=self.dtype)
+
+        sell_tocsr(M, self.slice_height, self.slice_ptr, self.indices,
+                   self.data, self.row_perm, self.row_nnz, indptr,
+                   indices, data)
+
+        from .csr import csr_matrix
+        return csr_matrix((data, indices, indptr), shape=self.shape)
+
+    def tocsc(self):
+        return self.tocsr().tocsc()
+
+    def tocoo(self):
+        return self.tocsr().tocoo(copy=False)
+
+    # needed by _data_matrix
+    def _with_data(self, data, copy=True):
+        """Returns a matrix with the same sparsity structure as self,
+        but with different data.  By default the structure arrays are copied.
+        """
+        arrays = (self.indices, self.slice_ptr, self.row_perm, self.row_nnz)
+        if copy:
+            arrays = tuple(a.copy() for a in arrays)
+        return sell_matrix((data,) + arrays, shape=self.shape,
+                           slice_height=self.slice_height)
+
+
+def isspmatrix_sell(x):
+    return isinstance(x, sell_matrix)
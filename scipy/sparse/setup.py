@@ -43,6 +43,7 @@ def configuration(parent_package='',top_path=None):
                'dense.h',
                'dia.h',
                'py3k.h',
+               'sell.h',
                'sparsetools.h',
                'util.h']
     depends = [os.path.join('sparsetools', hdr) for hdr in depends],
@@ -721,6 +721,107 @@ void bsr_minimum_bsr(const I n_row, const I n_col, const I R, const I C,
 //}
 
 
+/*
+ * Compute Y += A*X for BSR matrix A with R x C blocks and dense vectors X,Y
+ *
+ * The block size is a template parameter, so that the loops over each
+ * block are unrolled and the sums of a block row are kept in registers.
+ *
+ * Input Arguments:
+ *   I  n_brow              - number of row blocks in A
+ *   I  Ap[n_brow+1]        - row pointer
+ *   I  Aj[nblks(A)]        - column indices
+ *   T  Ax[nnz(A)]          - nonzeros
+ *   T  Xx[C*n_bcol]        - input vector
+ *
+ * Output Arguments:
+ *   T  Yx[R*n_brow]        - output vector
+ *
+ * Note:
+ *   Ap may point into a larger array
+ *
+ */
+template <class I, class T, int R, int C>
+void bsr_matvec_fixed(const I n_brow,
+                      const I Ap[],
+                      const I Aj[],
+                      const T Ax[],
+                      const T Xx[],
+                            T Yx[])
+{
+    for(I i = 0; i < n_brow; i++){
+        T * y = Yx + (npy_intp)R * i;
+        T sum[R];
+        for(int r = 0; r < R; r++){
+            sum[r] = y[r];
+        }
+        for(I jj = Ap[i]; jj < Ap[i+1]; jj++){
+            const T * A = Ax + (npy_intp)(R*C) * jj;
+            const T * x = Xx + (npy_intp)C * Aj[jj];
+            for(int r = 0; r < R; r++){
+                for(int c = 0; c < C; c++){
+                    sum[r] += A[r*C + c] * x[c];
+                }
+            }
+        }
+        for(int r = 0; r < R; r++){
+            y[r] = sum[r];
+        }
+    }
+}
+
+
+/*
+ * Compute Y += A*X for BSR matrix A with R x C blocks and dense block
+ * vectors X,Y
+ *
+ * The block size is a template parameter, as in bsr_matvec_fixed.  The
+ * innermost loop runs over the contiguous vectors of a row of X and Y.
+ *
+ * Input Arguments:
+ *   I  n_brow              - number of row blocks in A
+ *   I  n_vecs              - number of column vectors in X and Y
+ *   I  Ap[n_brow+1]        - row pointer
+ *   I  Aj[nblks(A)]        - column indices
+ *   T  Ax[nnz(A)]          - nonzeros
+ *   T  Xx[C*n_bcol,n_vecs] - input vector
+ *
+ * Output Arguments:
+ *   T  Yx[R*n_brow,n_vecs] - output vector
+ *
+ * Note:
+ *   Ap may point into a larger array
+ *
+ */
+template <class I, class T, int R, int C>
+void bsr_matvecs_fixed(const I n_brow,
+                       const I n_vecs,
+                       const I Ap[],
+                       const I Aj[],
+                       const T Ax[],
+                       const T Xx[],
+                             T Yx[])
+{
+    for(I i = 0; i < n_brow; i++){
+        T * y = Yx + (npy_intp)R * n_vecs * i;
+        for(I jj = Ap[i]; jj < Ap[i+1]; jj++){
+            const T * A = Ax + (npy_intp)(R*C) * jj;
+            const T * x = Xx + (npy_intp)C * n_vecs * Aj[jj];
+            for(int r = 0; r < R; r++){
+                T * y_r = y + (npy_intp)n_vecs * r;
+                for(int c = 0; c < C; c++){
+                    const T a = A[r*C + c];
+                    const T * x_c = x + (npy_intp)n_vecs * c;
+                    for(I k = 0; k < n_vecs; k++){
+                        y_r[k] += a * x_c[k];
+                    }
+                }
+            }
+        }
+    }
+}
+
+
 template <class I, class T>
 void bsr_matvec(const I n_brow,
 	            const I n_bcol, 
@@ -740,6 +841,16 @@ void bsr_matvec(const I n_brow,
         return;
     }
 
+    if( R == C ){
+        //use unrolled kernels for common square blocksizes
+        switch(R){
+            case 2: bsr_matvec_fixed<I,T,2,2>(n_brow, Ap, Aj, Ax, Xx, Yx); return;
+            case 3: bsr_matvec_fixed<I,T,3,3>(n_brow, Ap, Aj, Ax, Xx, Yx); return;
+            case 4: bsr_matvec_fixed<I,T,4,4>(n_brow, Ap, Aj, Ax, Xx, Yx); return;
+            case 6: bsr_matvec_fixed<I,T,6,6>(n_brow, Ap, Aj, Ax, Xx, Yx); return;
+        }
+    }
+
     const npy_intp RC = (npy_intp)R*C;
     for(I i = 0; i < n_brow; i++){
         T * y = Yx + (npy_intp)R * i;
@@ -792,6 +903,16 @@ void bsr_matvecs(const I n_brow,
         return;
     }
 
+    if( R == C ){
+        //use unrolled kernels for common square blocksizes
+        switch(R){
+            case 2: bsr_matvecs_fixed<I,T,2,2>(n_brow, n_vecs, Ap, Aj, Ax, Xx, Yx); return;
+            case 3: bsr_matvecs_fixed<I,T,3,3>(n_brow, n_vecs, Ap, Aj, Ax, Xx, Yx); return;
+            case 4: bsr_matvecs_fixed<I,T,4,4>(n_brow, n_vecs, Ap, Aj, Ax, Xx, Yx); return;
+            case 6: bsr_matvecs_fixed<I,T,6,6>(n_brow, n_vecs, Ap, Aj, Ax, Xx, Yx); return;
+        }
+    }
+
     const npy_intp A_bs = (npy_intp)R*C;      //Ax blocksize
     const npy_intp Y_bs = (npy_intp)n_vecs*R; //Yx blocksize
     const npy_intp X_bs = (npy_intp)C*n_vecs; //Xx blocksize
@@ -3,6 +3,7 @@
 
 #include <set>
 #include <vector>
+#include <limits>
 #include <algorithm>
 #include <functional>
 
@@ -563,22 +564,41 @@ void csr_matmat_pass1(const I n_row,
 }
 
 /*
- * Pass 2 computes CSR entries for matrix C = A*B using the 
- * row pointer Cp[] computed in Pass 1.
+ * Pass 2 of the product C = A*B, writing at most max_nnz entries
+ *
+ * Input Arguments:
+ *   I  n_row       - number of rows in A
+ *   I  n_col       - number of columns in B (hence C is n_row by n_col)
+ *   I  max_nnz     - space available in Cj and Cx
+ *   I  Ap[n_row+1] - row pointer
+ *   I  Aj[nnz(A)]  - column indices
+ *   T  Ax[nnz(A)]  - nonzeros
+ *   I  Bp[?]       - row pointer
+ *   I  Bj[nnz(B)]  - column indices
+ *   T  Bx[nnz(B)]  - nonzeros
+ * Output Arguments:
+ *   I  Cp[n_row+1] - row pointer
+ *   I  Cj[max_nnz] - column indices
+ *   T  Cx[max_nnz] - nonzeros
+ *
+ * Returns:
+ *   0, or 1 if C has more than max_nnz entries, in which case the
+ *   computation stops when Cj and Cx are full
  *
  */
 template <class I, class T>
-void csr_matmat_pass2(const I n_row,
-      	              const I n_col, 
-      	              const I Ap[], 
-      	              const I Aj[], 
-      	              const T Ax[],
-      	              const I Bp[],
-      	              const I Bj[],
-      	              const T Bx[],
-      	                    I Cp[],
-      	                    I Cj[],
-      	                    T Cx[])
+int csr_matmat_pass2_bounded(const I n_row,
+                             const I n_col,
+                             const I max_nnz,
+                             const I Ap[],
+                             const I Aj[],
+                             const T Ax[],
+                             const I Bp[],
+                             const I Bj[],
+                             const T Bx[],
+                                   I Cp[],
+                                   I Cj[],
+                                   T Cx[])
 {
     std::vector<I> next(n_col,-1);
     std::vector<T> sums(n_col, 0);
@@ -615,6 +635,9 @@ void csr_matmat_pass2(const I n_row,
         for(I jj = 0; jj < length; jj++){
 
             if(sums[head] != 0){
+                if(nnz == max_nnz){
+                    return 1;
+                }
                 Cj[nnz] = head;
                 Cx[nnz] = sums[head];
                 nnz++;
@@ -629,6 +652,109 @@ void csr_matmat_pass2(const I n_row,
 
         Cp[i+1] = nnz;
     }
+
+    return 0;
+}
+
+
+/*
+ * Pass 2 computes CSR entries for matrix C = A*B using the 
+ * row pointer Cp[] computed in Pass 1.
+ *
+ */
+template <class I, class T>
+void csr_matmat_pass2(const I n_row,
+      	              const I n_col, 
+      	              const I Ap[], 
+      	              const I Aj[], 
+      	              const T Ax[],
+      	              const I Bp[],
+      	              const I Bj[],
+      	              const T Bx[],
+      	                    I Cp[],
+      	                    I Cj[],
+      	                    T Cx[])
+{
+    csr_matmat_pass2_bounded(n_row, n_col, std::numeric_limits<I>::max(),
+                             Ap, Aj, Ax, Bp, Bj, Bx, Cp, Cj, Cx);
+}
+
+
+/*
+ * Compute the entries of C = A*B for CSR matrices A,B at the
+ * positions stored in the CSR matrix M
+ *
+ *
+ * Input Arguments:
+ *   I  n_row       - number of rows in A
+ *   I  n_col       - number of columns in B (hence C is n_row by n_col)
+ *   I  Ap[n_row+1] - row pointer
+ *   I  Aj[nnz(A)]  - column indices
+ *   T  Ax[nnz(A)]  - nonzeros
+ *   I  Bp[?]       - row pointer
+ *   I  Bj[nnz(B)]  - column indices
+ *   T  Bx[nnz(B)]  - nonzeros
+ *   I  Mp[n_row+1] - row pointer
+ *   I  Mj[nnz(M)]  - column indices
+ * Output Arguments:
+ *   T  Cx[nnz(M)]  - values of C at the positions of M
+ *
+ * Note:
+ *   Output array Cx must be preallocated
+ *   Entries of A*B that are not stored in M are not computed
+ *
+ * Note:
+ *   Input:  A, B and M column indices are not assumed to be in sorted order
+ *   Input:  M must not contain duplicate entries
+ *   Input:  Ap and Mp may point into larger arrays, Cx is indexed like Mj
+ *
+ * Note:
+ *   Complexity: at most O(nnz(M) + n_row * K + nnz(A) * K), where K
+ *   is the maximum number of nonzeros in a row of B.
+ *
+ */
+template <class I, class T>
+void csr_matmat_masked(const I n_row,
+                       const I n_col,
+                       const I Ap[],
+                       const I Aj[],
+                       const T Ax[],
+                       const I Bp[],
+                       const I Bj[],
+                       const T Bx[],
+                       const I Mp[],
+                       const I Mj[],
+                             T Cx[])
+{
+    // position of each column in the current row of M, positions
+    // left over from earlier rows are smaller than Mp[i]
+    std::vector<I> pos(n_col, -1);
+
+    for(I i = 0; i < n_row; i++){
+        const I row_start = Mp[i];
+        const I row_end   = Mp[i+1];
+
+        if(row_start == row_end){
+            continue;
+        }
+
+        for(I mm = row_start; mm < row_end; mm++){
+            pos[Mj[mm]] = mm;
+            Cx[mm] = 0;
+        }
+
+        for(I jj = Ap[i]; jj < Ap[i+1]; jj++){
+            I j = Aj[jj];
+            T v = Ax[jj];
+
+            for(I kk = Bp[j]; kk < Bp[j+1]; kk++){
+                I mm = pos[Bj[kk]];
+                if(mm >= row_start){
+                    Cx[mm] += v*Bx[kk];
+                }
+            }
+        }
+    }
 }
 
 
@@ -1140,6 +1266,348 @@ void csr_matvecs(const I n_row,
 
 
 
+/*
+ * Sum the rows of a CSR matrix
+ *
+ * Input Arguments:
+ *   I  n_row         - number of rows in A
+ *   I  Ap[n_row+1]   - row pointer
+ *   T  Ax[nnz(A)]    - nonzeros
+ *
+ * Output Arguments:
+ *   T  Yx[n_row]     - sums of the rows
+ *
+ * Note:
+ *   Output array Yx must be preallocated
+ *   Ap may point into a larger array
+ *
+ */
+template <class I, class T>
+void csr_row_sums(const I n_row,
+                  const I Ap[],
+                  const T Ax[],
+                        T Yx[])
+{
+    for(I i = 0; i < n_row; i++){
+        T sum = 0;
+        for(I jj = Ap[i]; jj < Ap[i+1]; jj++){
+            sum += Ax[jj];
+        }
+        Yx[i] = sum;
+    }
+}
+
+
+/*
+ * Sum the columns of a CSR matrix, adding to Yx
+ *
+ * Input Arguments:
+ *   I  n_row         - number of rows in A
+ *   I  Ap[n_row+1]   - row pointer
+ *   I  Aj[nnz(A)]    - column indices
+ *   T  Ax[nnz(A)]    - nonzeros
+ *
+ * Output Arguments:
+ *   T  Yx[n_col]     - sums of the columns
+ *
+ * Note:
+ *   Output array Yx must be preallocated and initialized
+ *   Ap may point into a larger array
+ *
+ */
+template <class I, class T>
+void csr_column_sums(const I n_row,
+                     const I Ap[],
+                     const I Aj[],
+                     const T Ax[],
+                           T Yx[])
+{
+    for(I i = 0; i < n_row; i++){
+        for(I jj = Ap[i]; jj < Ap[i+1]; jj++){
+            Yx[Aj[jj]] += Ax[jj];
+        }
+    }
+}
+
+
+/*
+ * Whether x is a larger (is_max) or smaller value than y, for the
+ * min/max reductions.  NaNs come before any other value, as in NumPy.
+ */
+template <class T>
+inline bool minmax_before(const T& x, const T& y, const bool is_max)
+{
+    if(!(x == x)){
+        return (y == y);
+    }
+    return is_max ? (x > y) : (x < y);
+}
+
+
+/*
+ * Compute the maximum (or minimum) of each row of a CSR matrix and
+ * the column of its first occurrence, implicit zeros included
+ *
+ * Input Arguments:
+ *   I  n_row         - number of rows in A
+ *   I  n_col         - number of columns in A
+ *   I  Ap[n_row+1]   - row pointer
+ *   I  Aj[nnz(A)]    - column indices
+ *   T  Ax[nnz(A)]    - nonzeros
+ *   I  is_max        - compute the maximum (1) or the minimum (0)
+ *
+ * Output Arguments:
+ *   T  Yx[n_row]     - maximum (minimum) of each row
+ *   I  Yj[n_row]     - column of the maximum (minimum) of each row
+ *
+ * Note:
+ *   Output arrays Yx and Yj must be preallocated
+ *   Ap may point into a larger array
+ *
+ * Note:
+ *   Input: A must be in canonical format and n_col > 0
+ *
+ */
+template <class I, class T>
+void csr_row_minmax(const I n_row,
+                    const I n_col,
+                    const I Ap[],
+                    const I Aj[],
+                    const T Ax[],
+                    const I is_max,
+                          T Yx[],
+                          I Yj[])
+{
+    const T zero = 0;
+    for(I i = 0; i < n_row; i++){
+        const I row_start = Ap[i];
+        const I row_end   = Ap[i+1];
+
+        // the first column that is not stored, if any
+        I first_zero = 0;
+        for(I jj = row_start; jj < row_end && Aj[jj] == first_zero; jj++){
+            first_zero++;
+        }
+
+        if(row_start == row_end){
+            Yx[i] = zero;
+            Yj[i] = 0;
+            continue;
+        }
+
+        T best = Ax[row_start];
+        I best_j = Aj[row_start];
+        for(I jj = row_start + 1; jj < row_end; jj++){
+            if(minmax_before(Ax[jj], best, is_max)){
+                best = Ax[jj];
+                best_j = Aj[jj];
+            }
+        }
+
+        if(first_zero < n_col){
+            if(minmax_before(zero, best, is_max)){
+                best = zero;
+                best_j = first_zero;
+            } else if(best == zero && first_zero < best_j){
+                best_j = first_zero;
+            }
+        }
+
+        Yx[i] = best;
+        Yj[i] = best_j;
+    }
+}
+
+
+/*
+ * Compute the maximum (or minimum) of the stored values of each column
+ * of a CSR matrix and the row of its first occurrence, and the first
+ * row in which each column has no stored value, starting from row
+ * row_offset.
+ *
+ * Input Arguments:
+ *   I  n_row         - number of rows in A
+ *   I  row_offset    - index of the first row of A
+ *   I  Ap[n_row+1]   - row pointer
+ *   I  Aj[nnz(A)]    - column indices
+ *   T  Ax[nnz(A)]    - nonzeros
+ *   I  is_max        - compute the maximum (1) or the minimum (0)
+ *
+ * Output Arguments:
+ *   T  Yx[n_col]     - maximum (minimum) stored value of each column
+ *   I  Yi[n_col]     - row of the maximum (minimum), or -1 if none
+ *   I  Yz[n_col]     - first row without a stored value in each
+ *                      column, or row_offset + n_row if none
+ *
+ * Note:
+ *   Output arrays must be preallocated, Yi initialized to -1 and Yz
+ *   to row_offset
+ *   Ap may point into a larger array
+ *
+ * Note:
+ *   Input: A must be in canonical format
+ *
+ */
+template <class I, class T>
+void csr_column_minmax(const I n_row,
+                       const I row_offset,
+                       const I Ap[],
+                       const I Aj[],
+                       const T Ax[],
+                       const I is_max,
+                             T Yx[],
+                             I Yi[],
+                             I Yz[])
+{
+    for(I i = 0; i < n_row; i++){
+        const I row = row_offset + i;
+        for(I jj = Ap[i]; jj < Ap[i+1]; jj++){
+            const I j = Aj[jj];
+            if(Yz[j] == row){
+                Yz[j] = row + 1;
+            }
+            if(Yi[j] < 0 || minmax_before(Ax[jj], Yx[j], is_max)){
+                Yx[j] = Ax[jj];
+                Yi[j] = row;
+            }
+        }
+    }
+}
+
+
+/*
+ * Gather rows of a CSR matrix
+ *
+ *   B = A[rows, :]
+ *
+ * Input Arguments:
+ *   I  n_row_idx       - number of rows to gather
+ *   I  rows[n_row_idx] - indices of the rows of A, in range
+ *   I  Ap[?]           - row pointer
+ *   I  Aj[nnz(A)]      - column indices
+ *   T  Ax[nnz(A)]      - nonzeros
+ *
+ * Output Arguments:
+ *   I  Bj[nnz(B)]      - column indices
+ *   T  Bx[nnz(B)]      - nonzeros
+ *
+ * Note:
+ *   Output arrays Bj and Bx must be preallocated, the row pointer of B
+ *   is the cumulative sum of the lengths of the gathered rows
+ *
+ * Note:
+ *   Complexity: Linear.  Specifically O(n_row_idx + nnz(B))
+ *
+ */
+template <class I, class T>
+void csr_row_index(const I n_row_idx,
+                   const I rows[],
+                   const I Ap[],
+                   const I Aj[],
+                   const T Ax[],
+                         I Bj[],
+                         T Bx[])
+{
+    for(I i = 0; i < n_row_idx; i++){
+        const I row_start = Ap[rows[i]];
+        const I row_end   = Ap[rows[i]+1];
+        Bj = std::copy(Aj + row_start, Aj + row_end, Bj);
+        Bx = std::copy(Ax + row_start, Ax + row_end, Bx);
+    }
+}
+
+
+/*
+ * Count the entries of each row of B = A[rows, :][:, cols]
+ *
+ * Input Arguments:
+ *   I  n_row_idx         - number of rows to gather
+ *   I  rows[n_row_idx]   - indices of the rows of A, in range
+ *   I  Ap[?]             - row pointer
+ *   I  Aj[nnz(A)]        - column indices
+ *   I  col_counts[n_col] - number of times each column of A is in cols
+ *
+ * Output Arguments:
+ *   I  Bp[n_row_idx+1]   - row pointer
+ *
+ * Note:
+ *   Complexity: Linear.  Specifically O(n_row_idx + nnz(A[rows, :]))
+ *
+ */
+template <class I>
+void csr_column_index1(const I n_row_idx,
+                       const I rows[],
+                       const I Ap[],
+                       const I Aj[],
+                       const I col_counts[],
+                             I Bp[])
+{
+    I nnz = 0;
+    Bp[0] = 0;
+    for(I i = 0; i < n_row_idx; i++){
+        for(I jj = Ap[rows[i]]; jj < Ap[rows[i]+1]; jj++){
+            nnz += col_counts[Aj[jj]];
+        }
+        Bp[i+1] = nnz;
+    }
+}
+
+
+/*
+ * Gather the entries of B = A[rows, :][:, cols], with the row
+ * pointer of B computed by csr_column_index1
+ *
+ * Input Arguments:
+ *   I  n_row_idx            - number of rows to gather
+ *   I  rows[n_row_idx]      - indices of the rows of A, in range
+ *   I  Ap[?]                - row pointer
+ *   I  Aj[nnz(A)]           - column indices
+ *   T  Ax[nnz(A)]           - nonzeros
+ *   I  col_offsets[n_col+1] - cumulative sum of the column counts
+ *   I  col_order[?]         - positions in cols of its entries,
+ *                             ordered by column of A (stable argsort)
+ *
+ * Output Arguments:
+ *   I  Bj[nnz(B)]           - column indices
+ *   T  Bx[nnz(B)]           - nonzeros
+ *
+ * Note:
+ *   Output arrays Bj and Bx must be preallocated
+ *
+ * Note:
+ *   The column indices of a row of B are sorted if those of the row of
+ *   A are and cols is nondecreasing
+ *
+ * Note:
+ *   Complexity: Linear.  Specifically O(n_row_idx + nnz(A[rows, :]) + nnz(B))
+ *
+ */
+template <class I, class T>
+void csr_column_index2(const I n_row_idx,
+                       const I rows[],
+                       const I Ap[],
+                       const I Aj[],
+                       const T Ax[],
+                       const I col_offsets[],
+                       const I col_order[],
+                             I Bj[],
+                             T Bx[])
+{
+    I n = 0;
+    for(I i = 0; i < n_row_idx; i++){
+        for(I jj = Ap[rows[i]]; jj < Ap[rows[i]+1]; jj++){
+            const I j = Aj[jj];
+            const T x = Ax[jj];
+            for(I k = col_offsets[j]; k < col_offsets[j+1]; k++){
+                Bj[n] = col_order[k];
+                Bx[n] = x;
+                n++;
+            }
+        }
+    }
+}
+
+
 template<class I, class T>
 void get_csr_submatrix(const I n_row,
 		               const I n_col,
@@ -0,0 +1,276 @@
+#ifndef __SELL_H__
+#define __SELL_H__
+
+#include <algorithm>
+
+#include "dense.h"
+
+
+/*
+ * Convert a CSR matrix to SELL format
+ *
+ * The rows of A are stored in the order given by Ar, in slices of C
+ * rows.  Each slice is stored as a dense array of shape (width, C) in
+ * column-major order, so that the k-th values of the rows of a slice
+ * are contiguous.
+ *
+ * Input Arguments:
+ *   I  n_row         - number of rows in A
+ *   I  C             - number of rows per slice
+ *   I  Ap[n_row+1]   - row pointer
+ *   I  Aj[nnz(A)]    - column indices
+ *   T  Ax[nnz(A)]    - nonzeros
+ *   I  Br[n_row]     - row of A stored at each position
+ *   I  Bs[n_slice+1] - slice pointer
+ *
+ * Output Arguments:
+ *   I  Bj[Bs[n_slice]] - column indices
+ *   T  Bx[Bs[n_slice]] - values
+ *
+ * Note:
+ *   Output arrays Bj and Bx must be preallocated, and the padding
+ *   initialized
+ *
+ */
+template <class I, class T>
+void csr_tosell(const I n_row,
+                const I C,
+                const I Ap[],
+                const I Aj[],
+                const T Ax[],
+                const I Br[],
+                const I Bs[],
+                      I Bj[],
+                      T Bx[])
+{
+    for(I p = 0; p < n_row; p++){
+        const I i = Br[p];
+        npy_intp pos = (npy_intp)Bs[p / C] + p % C;
+        for(I jj = Ap[i]; jj < Ap[i+1]; jj++){
+            Bj[pos] = Aj[jj];
+            Bx[pos] = Ax[jj];
+            pos += C;
+        }
+    }
+}
+
+
+/*
+ * Convert a SELL matrix to CSR format
+ *
+ * Input Arguments:
+ *   I  n_row         - number of rows in A
+ *   I  C             - number of rows per slice
+ *   I  As[n_slice+1] - slice pointer
+ *   I  Aj[As[n_slice]] - column indices
+ *   T  Ax[As[n_slice]] - values
+ *   I  Ar[n_row]     - row of A stored at each position
+ *   I  An[n_row]     - number of values of the row at each position
+ *   I  Bp[n_row+1]   - row pointer
+ *
+ * Output Arguments:
+ *   I  Bj[nnz(A)]    - column indices
+ *   T  Bx[nnz(A)]    - nonzeros
+ *
+ * Note:
+ *   Output arrays Bj and Bx must be preallocated
+ *
+ */
+template <class I, class T>
+void sell_tocsr(const I n_row,
+                const I C,
+                const I As[],
+                const I Aj[],
+                const T Ax[],
+                const I Ar[],
+                const I An[],
+                const I Bp[],
+                      I Bj[],
+                      T Bx[])
+{
+    for(I p = 0; p < n_row; p++){
+        npy_intp pos = (npy_intp)As[p / C] + p % C;
+        I jj = Bp[Ar[p]];
+        for(I k = 0; k < An[p]; k++){
+            Bj[jj] = Aj[pos];
+            Bx[jj] = Ax[pos];
+            jj++;
+            pos += C;
+        }
+    }
+}
+
+
+/*
+ * Compute Y += A*X for SELL matrix A with slices of C rows and dense
+ * vectors X,Y
+ *
+ * The slice height is a template parameter.  The k-th values of the
+ * rows of a slice are processed together, with unit stride, as long as
+ * all the rows of the slice have k values or more.  The rows of a slice
+ * are stored by decreasing number of values, so the rows that are
+ * complete come last and are dropped after that, and the padding is
+ * never read.
+ *
+ * Input Arguments:
+ *   I  n_row         - number of rows in A
+ *   I  As[n_slice+1] - slice pointer
+ *   I  Aj[As[n_slice]] - column indices
+ *   T  Ax[As[n_slice]] - values
+ *   I  Ar[n_row]     - row of A stored at each position
+ *   I  An[n_row]     - number of values of the row at each position
+ *   T  Xx[n_col]     - input vector
+ *
+ * Output Arguments:
+ *   T  Yx[n_row]     - output vector
+ *
+ * Note:
+ *   As, Ar and An may point into larger arrays
+ *
+ */
+template <class I, class T, int C>
+void sell_matvec_fixed(const I n_row,
+                       const I As[],
+                       const I Aj[],
+                       const T Ax[],
+                       const I Ar[],
+                       const I An[],
+                       const T Xx[],
+                             T Yx[])
+{
+    for(I start = 0, s = 0; start < n_row; start += C, s++){
+        const I rows = std::min((I)C, n_row - start);
+        const I * Sj = Aj + As[s];
+        const T * Sx = Ax + As[s];
+
+        T sums[C];
+        for(int r = 0; r < C; r++){
+            sums[r] = 0;
+        }
+
+        // all the rows of a full slice have at least as many values as
+        // its last row
+        I k = 0;
+        if(rows == C){
+            for(; k < An[start + C - 1]; k++){
+                for(int r = 0; r < C; r++){
+                    sums[r] += Sx[(npy_intp)C * k + r] * Xx[Sj[(npy_intp)C * k + r]];
+                }
+            }
+        }
+
+        I active = rows;
+        for(; ; k++){
+            while(active > 0 && An[start + active - 1] <= k){
+                active--;
+            }
+            if(active == 0){
+                break;
+            }
+            for(I r = 0; r < active; r++){
+                sums[r] += Sx[(npy_intp)C * k + r] * Xx[Sj[(npy_intp)C * k + r]];
+            }
+        }
+
+        for(I r = 0; r < rows; r++){
+            Yx[Ar[start + r]] += sums[r];
+        }
+    }
+}
+
+
+/*
+ * Compute Y += A*X for SELL matrix A and dense vectors X,Y
+ *
+ * Input Arguments:
+ *   I  n_row         - number of rows in A
+ *   I  C             - number of rows per slice
+ *   I  As[n_slice+1] - slice pointer
+ *   I  Aj[As[n_slice]] - column indices
+ *   T  Ax[As[n_slice]] - values
+ *   I  Ar[n_row]     - row of A stored at each position
+ *   I  An[n_row]     - number of values of the row at each position
+ *   T  Xx[n_col]     - input vector
+ *
+ * Output Arguments:
+ *   T  Yx[n_row]     - output vector
+ *
+ * Note:
+ *   Output array Yx must be preallocated
+ *   As, Ar and An may point into larger arrays
+ *
+ */
+template <class I, class T>
+void sell_matvec(const I n_row,
+                 const I C,
+                 const I As[],
+                 const I Aj[],
+                 const T Ax[],
+                 const I Ar[],
+                 const I An[],
+                 const T Xx[],
+                       T Yx[])
+{
+    switch(C){
+        //use unrolled kernels for common slice heights
+        case 4: sell_matvec_fixed<I,T,4>(n_row, As, Aj, Ax, Ar, An, Xx, Yx); return;
+        case 8: sell_matvec_fixed<I,T,8>(n_row, As, Aj, Ax, Ar, An, Xx, Yx); return;
+    }
+
+    for(I p = 0; p < n_row; p++){
+        npy_intp pos = (npy_intp)As[p / C] + p % C;
+        T sum = 0;
+        for(I k = 0; k < An[p]; k++){
+            sum += Ax[pos] * Xx[Aj[pos]];
+            pos += C;
+        }
+        Yx[Ar[p]] += sum;
+    }
+}
+
+
+/*
+ * Compute Y += A*X for SELL matrix A and dense block vectors X,Y
+ *
+ * Input Arguments:
+ *   I  n_row         - number of rows in A
+ *   I  n_vecs        - number of column vectors in X and Y
+ *   I  C             - number of rows per slice
+ *   I  As[n_slice+1] - slice pointer
+ *   I  Aj[As[n_slice]] - column indices
+ *   T  Ax[As[n_slice]] - values
+ *   I  Ar[n_row]     - row of A stored at each position
+ *   I  An[n_row]     - number of values of the row at each position
+ *   T  Xx[n_col,n_vecs] - input vectors
+ *
+ * Output Arguments:
+ *   T  Yx[n_row,n_vecs] - output vectors
+ *
+ * Note:
+ *   Output array Yx must be preallocated
+ *   As, Ar and An may point into larger arrays
+ *
+ */
+template <class I, class T>
+void sell_matvecs(const I n_row,
+                  const I n_vecs,
+                  const I C,
+                  const I As[],
+                  const I Aj[],
+                  const T Ax[],
+                  const I Ar[],
+                  const I An[],
+                  const T Xx[],
+                        T Yx[])
+{
+    for(I p = 0; p < n_row; p++){
+        npy_intp pos = (npy_intp)As[p / C] + p % C;
+        T * y = Yx + (npy_intp)n_vecs * Ar[p];
+        for(I k = 0; k < An[p]; k++){
+            axpy(n_vecs, Ax[pos], Xx + (npy_intp)n_vecs * Aj[pos], y);
+            pos += C;
+        }
+    }
+}
+
+#endif
@@ -10,6 +10,7 @@ import warnings
 import numpy as np
 
 from scipy._lib._version import NumpyVersion
+from scipy._lib._parallel import _run_threaded
 
 # keep this list syncronized with sparsetools
 #supported_dtypes = ['bool', 'int8', 'uint8', 'int16', 'uint16', 'int32', 'uint32',
@@ -220,6 +221,17 @@ def issequence(t):
            or (isinstance(t, np.ndarray) and (t.ndim == 1))
 
 
+def _is_outer_index(row, col):
+    """
+    Whether indexing with `row` and `col` selects the submatrix at the
+    intersection of rows and columns, as with ``np.ix_(rows, cols)``.
+    """
+    return (isinstance(row, np.ndarray) and row.ndim == 2 and
+            row.shape[1] == 1 and row.dtype.kind in 'iu' and
+            isinstance(col, np.ndarray) and col.dtype.kind in 'iu' and
+            (col.ndim == 1 or (col.ndim == 2 and col.shape[0] == 1)))
+
+
 def ismatrix(t):
     return ((issequence(t) and issequence(t[0]) and (len(t[0]) == 0 or np.isscalar(t[0][0])))
             or (isinstance(t, np.ndarray) and t.ndim == 2))
@@ -415,3 +427,38 @@ if NumpyVersion(np.__version__) > '1.7.0-dev':
     _compat_unique = np.unique
 else:
     _compat_unique = _compat_unique_impl
+
+
+# A product is only split between threads if each of them gets at least this
+# many stored values, as starting a thread costs about as much as a product
+# with a few ten thousand values.
+_MIN_NNZ_PER_JOB = 1 << 16
+
+
+def _balanced_bounds(indptr, n_jobs, blocksize=1):
+    """
+    Splits the major axis of a compressed matrix with index pointer `indptr`
+    into at most `n_jobs` contiguous parts holding similar numbers of stored
+    values, and returns the list of the boundaries of the parts.
+
+    The number of parts is reduced so that each part holds at least
+    ``_MIN_NNZ_PER_JOB`` values, and empty parts are dropped.  `blocksize`
+    is the number of values of each entry of `indptr`, for BSR matrices.
+    """
+    nnz = int(indptr[-1])
+    n_jobs = max(1, min(n_jobs, nnz * blocksize // _MIN_NNZ_PER_JOB))
+    targets = np.arange(1, n_jobs) * (nnz / n_jobs)
+    bounds = np.searchsorted(indptr, targets)
+    return np.unique(np.concatenate(([0], bounds, [len(indptr) - 1]))).tolist()
+
+
+def _run_parts(func, n):
+    """
+    Calls ``func(j)`` for each ``j`` in ``range(n)``, each call in its own
+    thread, and waits for all of them.
+
+    `func` is expected to release the GIL for the bulk of its work.  An
+    exception raised in any of the threads is re-raised in the calling thread.
+    """
+    if n > 0:
+        _run_threaded(lambda start, stop: func(start), n, n)
@@ -38,7 +38,7 @@ import scipy.linalg
 
 import scipy.sparse as sparse
 from scipy.sparse import (csc_matrix, csr_matrix, dok_matrix,
-        coo_matrix, lil_matrix, dia_matrix, bsr_matrix,
+        coo_matrix, lil_matrix, dia_matrix, bsr_matrix, sell_matrix,
         eye, isspmatrix, SparseEfficiencyWarning, issparse)
 from scipy.sparse.sputils import supported_dtypes, isscalarlike, get_index_dtype
 from scipy.sparse.linalg import splu, expm, inv
@@ -3658,6 +3658,89 @@ class TestDIA(sparse_test_class(getset=False, slicing=False, slicing_assign=Fals
         assert_equal(m.offsets.dtype, np.int64)
 
 
+class TestSELL(sparse_test_class(getset=False, slicing=False,
+                                 slicing_assign=False, fancy_indexing=False,
+                                 fancy_assign=False, minmax=False,
+                                 nnz_axis=False)):
+    spmatrix = sell_matrix
+    checked_dtypes = [np.int_, np.float_, np.complex_]
+
+    def test_constructor1(self):
+        # check native SELL format constructor
+        D = matrix([[1, 2, 0],
+                    [0, 0, 3],
+                    [4, 0, 5]])
+        data = np.array([1, 4, 2, 5, 3, 0])
+        indices = np.array([0, 0, 1, 2, 2, 0])
+        slice_ptr = np.array([0, 4, 6])
+        row_perm = np.array([0, 2, 1])
+        row_nnz = np.array([2, 2, 1])
+        A = sell_matrix((data, indices, slice_ptr, row_perm, row_nnz),
+                        shape=(3, 3), slice_height=2)
+        assert_equal(A.todense(), D)
+        assert_equal(A.nnz, 5)
+
+        B = sell_matrix(D, slice_height=2)
+        for name in ['data', 'indices', 'slice_ptr', 'row_perm', 'row_nnz']:
+            assert_equal(getattr(B, name), locals()[name])
+
+        # the rows of a slice must come by decreasing number of values
+        assert_raises(ValueError, sell_matrix,
+                      (data, indices, slice_ptr, [2, 0, 1], [2, 2, 1]),
+                      shape=(3, 3), slice_height=1)
+        assert_raises(ValueError, sell_matrix,
+                      (data, indices, slice_ptr, [1, 0, 2], [1, 2, 2]),
+                      shape=(3, 3), slice_height=2)
+        assert_raises(ValueError, sell_matrix,
+                      (data, indices, slice_ptr, [0, 2, 2], row_nnz),
+                      shape=(3, 3), slice_height=2)
+
+    def test_slice_height_sigma(self):
+        np.random.seed(1234)
+        D = np.random.random((53, 40))
+        D[D > np.random.random((53, 1))] = 0
+        D[7] = 0
+        x = np.random.random(40)
+        X = np.random.random((40, 3))
+        for slice_height in [1, 3, 4, 8]:
+            for sigma in [1, 10, 256]:
+                A = sell_matrix(D, slice_height=slice_height, sigma=sigma)
+                assert_equal(A.slice_height, slice_height)
+                assert_equal(A.toarray(), D)
+                assert_array_almost_equal(A * x, D.dot(x))
+                assert_array_almost_equal(A * X, D.dot(X))
+                assert_equal(len(A.data), A.slice_ptr[-1])
+
+        # with sigma covering all the rows, the padding is minimal
+        A = sell_matrix(D, slice_height=4, sigma=53)
+        lengths = np.sort((D != 0).sum(axis=1))[::-1]
+        assert_equal(A.row_nnz, lengths)
+        assert_equal(len(A.data), 4 * lengths[::4].sum())
+
+    def test_matvec_threaded(self):
+        # large enough to be split between threads
+        np.random.seed(1234)
+        A = sparse.rand(3000, 2000, density=0.05, format='csr')
+        x = np.random.random(2000)
+        X = np.random.random((2000, 3))
+        old_n_jobs = sparse.set_num_jobs(3)
+        try:
+            for slice_height in [5, 8]:
+                B = A.tosell(slice_height=slice_height)
+                assert_array_almost_equal(B * x, A * x)
+                assert_array_almost_equal(B * X, A * X)
+        finally:
+            sparse.set_num_jobs(old_n_jobs)
+
+    # SELL does not have a __getitem__ to support iteration
+    def test_iterator(self):
+        pass
+
+    @dec.knownfailureif(True, "SELL does not support item assignment")
+    def test_setdiag(self):
+        pass
+
+
 class TestBSR(sparse_test_class(getset=False,
                                 slicing=False, slicing_assign=False,
                                 fancy_indexing=False, fancy_assign=False,
@@ -3733,6 +3816,28 @@ class TestBSR(sparse_test_class(getset=False,
         x = arange(A.shape[1]*6).reshape(-1,6)
         assert_equal(A*x, A.todense()*x)
 
+    def test_bsr_matvec_fixed_blocksize(self):
+        # the square blocksizes with unrolled kernels, large enough to be
+        # split between threads
+        np.random.seed(1234)
+        pattern = sparse.rand(3000, 3000, density=1e-2, format='csr')
+        for R in [2, 3, 4, 6]:
+            block = np.random.random((R, R))
+            A = sparse.kron(pattern, block, format='csr')
+            B = A.tobsr()
+            assert_equal(B.blocksize, (R, R))
+            x = np.random.random(A.shape[1])
+            X = np.random.random((A.shape[1], 3))
+
+            old_n_jobs = sparse.set_num_jobs(3)
+            try:
+                assert_array_almost_equal(B*x, A*x)
+                assert_array_almost_equal(B*X, A*X)
+                assert_array_almost_equal(B.astype(np.complex64)*x, A*x,
+                                          decimal=4)
+            finally:
+                sparse.set_num_jobs(old_n_jobs)
+
     @dec.knownfailureif(True, "BSR not implemented")
     def test_iterator(self):
         pass
@@ -4072,7 +4177,7 @@ class Test64Bit(object):
             yield t
 
     def test_downcast_intp(self):
-        # Check that bincount and ufunc.reduceat intp downcasts are
+        # Check that bincount intp downcasts are
         # dealt with. The point here is to trigger points in the code
         # that can fail on 32-bit systems when using 64-bit indices,
         # due to use of functions that only work with intp-size
@@ -4084,7 +4189,6 @@ class Test64Bit(object):
             # These involve indices larger than `downcast_maxval`
             a = csc_matrix([[1, 2], [3, 4], [5, 6]])
             assert_raises(AssertionError, a.getnnz, axis=1)
-            assert_raises(AssertionError, a.sum, axis=0)
 
             a = csr_matrix([[1, 2, 3], [3, 4, 6]])
             assert_raises(AssertionError, a.getnnz, axis=0)
@@ -0,0 +1,67 @@
+from __future__ import division, print_function, absolute_import
+
+import numpy as np
+from numpy.testing import (TestCase, run_module_suite, assert_,
+        assert_equal, assert_array_equal, assert_raises)
+
+from scipy.sparse import SparseBuilder, coo_matrix
+
+
+class TestSparseBuilder(TestCase):
+    def test_append(self):
+        np.random.seed(1234)
+        shape = (50, 40)
+        builder = SparseBuilder(shape)
+        expected = np.zeros(shape)
+        n = 0
+        for k in range(30):
+            m = np.random.randint(0, 20)
+            row = np.random.randint(0, shape[0], m)
+            col = np.random.randint(0, shape[1], m)
+            data = np.random.rand(m)
+            builder.append(row, col, data)
+            expected += coo_matrix((data, (row, col)), shape=shape).toarray()
+            n += m
+        assert_equal(len(builder), n)
+        assert_equal(builder.data.dtype, np.float64)
+
+        for fmt in ['coo', 'csr', 'csc']:
+            A = getattr(builder, 'to' + fmt)()
+            assert_equal(A.format, fmt)
+            assert_equal(A.shape, shape)
+            assert_equal(A.indices.dtype if fmt != 'coo' else A.row.dtype,
+                         np.int32)
+            assert_array_equal(A.toarray(), expected)
+
+        builder.clear()
+        assert_equal(len(builder), 0)
+        assert_equal(builder.tocsr().nnz, 0)
+
+    def test_broadcast(self):
+        builder = SparseBuilder((3, 4), dtype=np.int8, capacity=1)
+        builder.append(1, np.arange(4), 2)
+        builder.append([0, 2], 3, [5, 7])
+        builder.append([], [], [])
+        assert_equal(builder.tocsr().dtype, np.int8)
+        assert_array_equal(builder.tocsr().toarray(),
+                           [[0, 0, 0, 5], [2, 2, 2, 2], [0, 0, 0, 7]])
+
+    def test_tocoo_no_copy(self):
+        builder = SparseBuilder((2, 2))
+        builder.append([0, 1], [1, 0], [1., 2.])
+        A = builder.tocoo(copy=False)
+        assert_(np.may_share_memory(A.data, builder.data))
+        assert_(not np.may_share_memory(builder.tocoo().data, builder.data))
+
+    def test_errors(self):
+        builder = SparseBuilder((3, 4))
+        assert_raises(IndexError, builder.append, 3, 0, 1.)
+        assert_raises(IndexError, builder.append, 0, -1, 1.)
+        assert_raises(TypeError, builder.append, 0.5, 0, 1.)
+        assert_raises(ValueError, builder.append, [0, 1], [0, 1, 2], 1.)
+        assert_equal(len(builder), 0)
+        assert_raises(TypeError, SparseBuilder, (3,))
+
+
+if __name__ == "__main__":
+    run_module_suite()
@@ -5,9 +5,10 @@ from __future__ import division, print_function, absolute_import
 import numpy as np
 from numpy import array, matrix
 from numpy.testing import TestCase, run_module_suite, assert_equal, \
-        assert_array_equal, assert_raises, assert_array_almost_equal_nulp
+        assert_array_equal, assert_raises, assert_array_almost_equal_nulp, \
+        assert_array_almost_equal, assert_
 
-from scipy.sparse import csr_matrix, coo_matrix
+from scipy.sparse import csr_matrix, coo_matrix, set_num_jobs
 
 from scipy.sparse import construct
 from scipy.sparse.construct import rand as sprand
@@ -381,6 +382,111 @@ class TestConstructUtils(TestCase):
         assert_raises(ValueError, lambda: sprand(5, 10, 1.1))
         assert_raises(ValueError, lambda: sprand(5, 10, -0.1))
 
+    def test_spmatmul(self):
+        np.random.seed(1234)
+        A = sprand(600, 400, density=0.6)
+        B = sprand(400, 300, density=0.1)
+        mask = sprand(600, 300, density=0.2)
+        AB = A.toarray().dot(B.toarray())
+
+        # large enough to be split between threads
+        for n_jobs in [1, 3]:
+            old_n_jobs = set_num_jobs(n_jobs)
+            try:
+                for fmt in ['csr', 'csc']:
+                    A1, B1 = A.asformat(fmt), B.asformat(fmt)
+                    C = construct.spmatmul(A1, B1)
+                    assert_equal(C.format, fmt)
+                    assert_array_almost_equal(C.toarray(), AB)
+
+                    nnz = construct.spmatmul_nnz(A1, B1)
+                    assert_array_equal(nnz, np.diff(C.indptr))
+                    C = construct.spmatmul(A1, B1, nnz=nnz)
+                    assert_array_almost_equal(C.toarray(), AB)
+
+                    # too little space for the result is detected before
+                    # anything is written out of it
+                    assert_raises(ValueError, construct.spmatmul, A1, B1,
+                                  nnz=np.ones_like(nnz))
+                    assert_raises(ValueError, construct.spmatmul, A1, B1,
+                                  nnz=nnz - 1)
+
+                    C = construct.spmatmul(A1, B1, mask=mask)
+                    assert_array_almost_equal(
+                        C.toarray(), AB * (mask.toarray() != 0))
+
+                    C = construct.spmatmul(A1, B1)
+                    C.data[:] = 0
+                    assert_(construct.spmatmul(A1 * 2, B1, out=C) is C)
+                    assert_array_almost_equal(C.toarray(), 2 * AB)
+            finally:
+                set_num_jobs(old_n_jobs)
+
+        # zero sums are not stored
+        A = csr_matrix([[1, 1], [1, 0]])
+        B = csr_matrix([[1, 0], [-1, 2]])
+        C = construct.spmatmul(A, B)
+        assert_array_equal(C.toarray(), [[0, 2], [1, 0]])
+        assert_equal(C.nnz, 2)
+        assert_array_equal(construct.spmatmul_nnz(A, B), [2, 1])
+
+        C = construct.spmatmul(A, B, dtype=np.float32)
+        assert_equal(C.dtype, np.float32)
+        A = csr_matrix([[True, True], [False, True]])
+        assert_array_equal(construct.spmatmul(A, A.T, dtype=int).toarray(),
+                           [[2, 1], [1, 1]])
+
+        assert_raises(ValueError, construct.spmatmul, A, B[:1])
+        assert_raises(ValueError, construct.spmatmul, A, B, mask=B[:1])
+        assert_raises(ValueError, construct.spmatmul, A, B, out=B.tocsc())
+        assert_raises(ValueError, construct.spmatmul, A, B, nnz=[1])
+        assert_raises(ValueError, construct.spmatmul, A, B, nnz=[3, -1])
+
+    def test_from_coo_chunks(self):
+        np.random.seed(1234)
+        shape = (300, 200)
+        chunks = []
+        for k in range(7):
+            n = np.random.randint(1, 5000)
+            chunks.append((np.random.randint(-3, 4, n),
+                           (np.random.randint(0, shape[0], n),
+                            np.random.randint(0, shape[1], n))))
+        chunks.append(sprand(shape[0], shape[1], density=0.1))
+        expected = sum(coo_matrix(c, shape=shape).toarray() for c in chunks)
+
+        for n_jobs in [1, 3]:
+            old_n_jobs = set_num_jobs(n_jobs)
+            try:
+                for fmt in ['csr', 'csc']:
+                    for buffer_nnz in [1, 5000, 1 << 22]:
+                        A = construct.from_coo_chunks(iter(chunks), shape,
+                                                      format=fmt,
+                                                      buffer_nnz=buffer_nnz)
+                        assert_equal(A.format, fmt)
+                        assert_(A.has_canonical_format)
+                        assert_equal(A.indices.dtype, np.int32)
+                        assert_equal(A.indptr.dtype, np.int32)
+                        assert_array_almost_equal(A.toarray(), expected)
+            finally:
+                set_num_jobs(old_n_jobs)
+
+        A = construct.from_coo_chunks(chunks[:2], shape, dtype=np.float32,
+                                      index_dtype=np.int64, buffer_nnz=1)
+        assert_equal(A.dtype, np.float32)
+        assert_equal(A.indices.dtype, np.int64)
+        assert_equal(A.indptr.dtype, np.int64)
+
+        A = construct.from_coo_chunks([], shape)
+        assert_equal(A.shape, shape)
+        assert_equal(A.nnz, 0)
+
+        assert_raises(ValueError, construct.from_coo_chunks, chunks, shape,
+                      format='coo')
+        assert_raises(ValueError, construct.from_coo_chunks, chunks, shape,
+                      index_dtype=np.int16)
+        assert_raises(ValueError, construct.from_coo_chunks,
+                      [csr_matrix((2, 2))], shape)
+
 
 if __name__ == "__main__":
     run_module_suite()
@@ -1,8 +1,9 @@
 from __future__ import division, print_function, absolute_import
 
 import numpy as np
-from numpy.testing import assert_array_almost_equal, run_module_suite, assert_
-from scipy.sparse import csr_matrix, csc_matrix
+from numpy.testing import (assert_array_almost_equal, run_module_suite,
+                           assert_, assert_equal)
+from scipy.sparse import csr_matrix, csc_matrix, set_num_jobs
 
 
 def test_csc_getrow():
@@ -35,5 +36,26 @@ def test_csc_getcol():
         assert_(type(csc_col) is csc_matrix)
 
 
+def test_csc_matvec_threaded():
+    # large enough to be split between threads
+    np.random.seed(0)
+    X = np.random.random((700, 600))
+    X[X > 0.5] = 0
+    X[:, 10] = 0
+    X[10, :] = 0
+    Xcsc = csc_matrix(X)
+    x = np.random.random(600)
+    Y = np.random.random((600, 3)) + 1j
+
+    old_n_jobs = set_num_jobs(3)
+    try:
+        assert_array_almost_equal(Xcsc * x, X.dot(x))
+        assert_array_almost_equal(Xcsc * Y, X.dot(Y))
+        assert_equal((Xcsc * Y).dtype, np.complex128)
+        assert_equal(csc_matrix((0, 600)) * x, np.zeros(0))
+    finally:
+        set_num_jobs(old_n_jobs)
+
+
 if __name__ == "__main__":
     run_module_suite()
@@ -1,8 +1,9 @@
 from __future__ import division, print_function, absolute_import
 
 import numpy as np
-from numpy.testing import assert_array_almost_equal, run_module_suite, assert_
-from scipy.sparse import csr_matrix
+from numpy.testing import (assert_array_almost_equal, run_module_suite,
+                           assert_, assert_equal)
+from scipy.sparse import csr_matrix, coo_matrix, set_num_jobs
 
 
 def _check_csr_rowslice(i, sl, X, Xcsr):
@@ -59,5 +60,142 @@ def test_csr_getcol():
         assert_(type(csr_col) is csr_matrix)
 
 
+def test_csr_matvec_threaded():
+    # large enough to be split between threads
+    np.random.seed(0)
+    X = np.random.random((700, 600))
+    X[X > 0.5] = 0
+    X[:, 10] = 0
+    X[10, :] = 0
+    Xcsr = csr_matrix(X)
+    x = np.random.random(600)
+    Y = np.random.random((600, 3)) + 1j
+
+    old_n_jobs = set_num_jobs(3)
+    try:
+        assert_array_almost_equal(Xcsr * x, X.dot(x))
+        assert_array_almost_equal(Xcsr * Y, X.dot(Y))
+        assert_equal((Xcsr * Y).dtype, np.complex128)
+        assert_equal(csr_matrix((0, 600)) * x, np.zeros(0))
+    finally:
+        set_num_jobs(old_n_jobs)
+
+
+def test_csr_sum_duplicates_threaded():
+    # large enough to be split between threads
+    np.random.seed(0)
+    n = 300000
+    row = np.random.randint(0, 500, n)
+    col = np.random.randint(0, 400, n)
+    data = np.random.randint(-2, 3, n).astype(float)
+    X = coo_matrix((data, (row, col)), shape=(500, 400)).toarray()
+
+    for fmt in ['csr', 'csc']:
+        A = coo_matrix((data, (row, col)), shape=X.shape).asformat(fmt)
+        old_n_jobs = set_num_jobs(3)
+        try:
+            B = coo_matrix((data, (row, col)), shape=X.shape).asformat(fmt)
+        finally:
+            set_num_jobs(old_n_jobs)
+
+        # summed zeros are kept, as by the serial conversion
+        assert_(B.has_canonical_format)
+        assert_equal(B.indptr, A.indptr)
+        assert_equal(B.indices, A.indices)
+        assert_equal(B.data, A.data)
+        assert_equal(B.indptr.dtype, np.int32)
+        assert_equal(B.indices.dtype, np.int32)
+        assert_array_almost_equal(B.toarray(), X)
+
+
+def test_coo_sum_axis_threaded():
+    # large enough to be split between threads, with duplicates
+    np.random.seed(0)
+    n = 300000
+    row = np.random.randint(0, 500, n)
+    col = np.random.randint(0, 400, n)
+    data = np.random.randint(-2, 3, n).astype(float)
+    A = coo_matrix((data, (row, col)), shape=(500, 400))
+    X = A.todense()
+
+    for n_jobs in [1, 3]:
+        old_n_jobs = set_num_jobs(n_jobs)
+        try:
+            for axis in [0, 1]:
+                assert_array_almost_equal(A.sum(axis=axis), X.sum(axis=axis))
+                assert_array_almost_equal(A.mean(axis=axis), X.mean(axis=axis))
+        finally:
+            set_num_jobs(old_n_jobs)
+
+    B = coo_matrix((3, 0))
+    assert_equal(B.sum(axis=0).shape, (1, 0))
+    assert_equal(B.sum(axis=1), np.zeros((3, 1)))
+
+
+def test_csr_gather():
+    # large enough to be split between threads
+    np.random.seed(0)
+    X = np.random.random((2000, 300))
+    X[X > 0.3] = 0
+    Xcsr = csr_matrix(X)
+    rows = np.random.randint(-2000, 2000, 1500)
+    cols = np.random.randint(-300, 300, 200)
+    sorted_cols = np.sort(cols % 300)
+
+    for n_jobs in [1, 3]:
+        old_n_jobs = set_num_jobs(n_jobs)
+        try:
+            assert_equal(Xcsr[rows].toarray(), X[rows])
+            assert_equal(Xcsr[:, cols].toarray(), X[:, cols])
+            assert_equal(Xcsr[rows, ::3].toarray(), X[rows, ::3])
+            assert_equal(Xcsr[::-2, cols].toarray(), X[::-2, cols])
+            assert_equal(Xcsr[np.ix_(rows, cols)].toarray(),
+                         X[np.ix_(rows, cols)])
+            assert_equal(Xcsr.tocsc()[np.ix_(rows, cols)].toarray(),
+                         X[np.ix_(rows, cols)])
+
+            Xcsr.has_sorted_indices = True
+            assert_(Xcsr[rows].has_sorted_indices)
+            A = Xcsr[np.ix_(rows, sorted_cols)]
+            assert_(A.has_sorted_indices)
+            assert_equal(A.toarray(), X[np.ix_(rows, sorted_cols)])
+            assert_(not Xcsr[:, cols].has_sorted_indices)
+        finally:
+            set_num_jobs(old_n_jobs)
+
+
+def test_csr_axis_reductions_threaded():
+    # large enough to be split between threads
+    np.random.seed(0)
+    X = np.random.randint(-3, 4, (1000, 400)).astype(float)
+    X[np.random.random(X.shape) > 0.6] = 0
+    X[:, 5] = 0
+    X[7, :] = 0
+    X[:600, 9] = 1
+    X[200, 11] = np.nan
+    X[900, 12] = np.nan
+
+    for n_jobs in [1, 3]:
+        old_n_jobs = set_num_jobs(n_jobs)
+        try:
+            for A in [csr_matrix(X), csr_matrix(X).tocsc()]:
+                for axis in [0, 1]:
+                    shape = (1, -1) if axis == 0 else (-1, 1)
+                    assert_array_almost_equal(A.sum(axis=axis),
+                                              X.sum(axis=axis).reshape(shape))
+                    assert_array_almost_equal(A.mean(axis=axis),
+                                              X.mean(axis=axis).reshape(shape))
+                    for name in ['max', 'min']:
+                        assert_equal(getattr(A, name)(axis=axis).toarray(),
+                                     getattr(X, name)(axis=axis).reshape(shape))
+                    for name in ['argmax', 'argmin']:
+                        assert_equal(getattr(A, name)(axis=axis),
+                                     getattr(X, name)(axis=axis).reshape(shape))
+                assert_equal(A.argmax(), X.argmax())
+                assert_equal(A.argmin(), X.argmin())
+        finally:
+            set_num_jobs(old_n_jobs)
+
+
 if __name__ == "__main__":
     run_module_suite()
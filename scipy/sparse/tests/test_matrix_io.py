@@ -0,0 +1,84 @@
+from __future__ import division, print_function, absolute_import
+
+import os
+import shutil
+from tempfile import mkdtemp
+
+import numpy as np
+from numpy.testing import (TestCase, run_module_suite, assert_,
+        assert_equal, assert_raises)
+
+import scipy.sparse
+from scipy.sparse import save_npz, load_npz
+
+
+def _is_memmap(a):
+    while a is not None:
+        if isinstance(a, np.memmap):
+            return True
+        a = a.base
+    return False
+
+
+class TestSaveLoadNpz(TestCase):
+    def setUp(self):
+        self.tmpdir = mkdtemp()
+        self.fn = os.path.join(self.tmpdir, 'matrix.npz')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _check_roundtrip(self, A, compressed, mmap_mode=None):
+        save_npz(self.fn, A, compressed=compressed)
+        B = load_npz(self.fn, mmap_mode=mmap_mode)
+        assert_equal(B.format, A.format)
+        assert_equal(B.shape, A.shape)
+        assert_equal(B.dtype, A.dtype)
+        assert_equal(B.toarray(), A.toarray())
+        return B
+
+    def test_roundtrip(self):
+        np.random.seed(1234)
+        A = scipy.sparse.rand(20, 30, density=0.2, format='csr')
+        for fmt in ['csr', 'csc', 'coo', 'dia']:
+            for compressed in [True, False]:
+                self._check_roundtrip(A.asformat(fmt), compressed)
+        for compressed in [True, False]:
+            self._check_roundtrip(A.tobsr(blocksize=(2, 3)), compressed)
+            self._check_roundtrip(scipy.sparse.csr_matrix((0, 4)), compressed)
+            self._check_roundtrip(A.astype(np.complex64), compressed)
+
+    def test_mmap(self):
+        np.random.seed(1234)
+        A = scipy.sparse.rand(20, 30, density=0.2, format='csr')
+        for mmap_mode in ['r', 'c']:
+            B = self._check_roundtrip(A, False, mmap_mode=mmap_mode)
+            assert_(_is_memmap(B.data))
+            assert_(_is_memmap(B.indices))
+            assert_(_is_memmap(B.indptr))
+
+        B = self._check_roundtrip(A.tocoo(), False, mmap_mode='r')
+        assert_(_is_memmap(B.row) and _is_memmap(B.col))
+
+        # Writing to a copy-on-write mapping leaves the file untouched
+        B = load_npz(self.fn, mmap_mode='c')
+        B.data[:] = 0
+        assert_equal(load_npz(self.fn).toarray(), A.toarray())
+
+        self._check_roundtrip(scipy.sparse.csr_matrix((3, 4)), False,
+                              mmap_mode='r')
+
+    def test_errors(self):
+        A = scipy.sparse.eye(3, format='csr')
+        assert_raises(NotImplementedError, save_npz, self.fn, A.tolil())
+
+        save_npz(self.fn, A, compressed=True)
+        assert_raises(ValueError, load_npz, self.fn, mmap_mode='r')
+        assert_raises(ValueError, load_npz, self.fn, mmap_mode='r+')
+
+        np.savez(self.fn, a=np.arange(3))
+        assert_raises(ValueError, load_npz, self.fn)
+
+
+if __name__ == "__main__":
+    run_module_suite()
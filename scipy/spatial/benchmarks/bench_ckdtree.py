@@ -11,8 +11,8 @@ class TestBuild(TestCase):
     def bench_build(self):
         print()
         print('        Constructing kd-tree')
-        print('=====================================')
-        print(' dim | # points |  KDTree  | cKDTree ')
+        print('=================================================================')
+        print(' dim | # points |  KDTree  | cKDTree | balanced cKDTree | 2 threads')
 
         for (m, n, repeat) in [(3,10000,3), (8,10000,3), (16,10000,3)]:
             print('%4s | %7s ' % (m, n), end=' ')
@@ -25,6 +25,11 @@ class TestBuild(TestCase):
             sys.stdout.flush()
             print('| %6.3fs' % (measure('T2 = cKDTree(data)', repeat) / repeat), end=' ')
             sys.stdout.flush()
+            print('| %6.3fs        ' % (measure('T3 = cKDTree(data, balanced_tree=True)',
+                                                 repeat) / repeat), end=' ')
+            sys.stdout.flush()
+            print('| %6.3fs' % (measure('T4 = cKDTree(data, n_jobs=2)', repeat) / repeat), end=' ')
+            sys.stdout.flush()
             print('')
 
 
@@ -88,6 +93,35 @@ class TestQueryBallPoint(TestCase):
                 print('')
 
 
+class TestQueryThreaded(TestCase):
+    def bench_query_threaded(self):
+        print()
+        print('              Querying kd-tree with multiple jobs')
+        print('================================================================')
+        print(' dim | # points | # queries |  n_jobs | query  | query_ball_point')
+
+        for (m, n, r, repeat) in [(3,100000,100000,3),
+                                  (8,100000,100000,1)]:
+            data = np.concatenate((np.random.randn(n//2,m),
+                                   np.random.randn(n-n//2,m)+np.ones(m)))
+            queries = np.concatenate((np.random.randn(r//2,m),
+                                      np.random.randn(r-r//2,m)+np.ones(m)))
+            T = cKDTree(data)
+            probe_radius = 0.2
+
+            for n_jobs in (1, 2, 4, -1):
+                print('%4s | %8s | %9s | %7s ' % (m, n, r, n_jobs), end=' ')
+                sys.stdout.flush()
+                print('| %6.3fs' % (measure('T.query(queries, n_jobs=n_jobs)',
+                                            repeat) / repeat), end=' ')
+                sys.stdout.flush()
+                print('| %6.3fs' % (measure('T.query_ball_point(queries, '
+                                            'probe_radius, n_jobs=n_jobs)',
+                                            repeat) / repeat), end=' ')
+                sys.stdout.flush()
+                print('')
+
+
 class TestQueryPairs(TestCase):
     def bench_query_pairs(self):
         print()
@@ -180,5 +214,29 @@ class TestCountNeighbors(TestCase):
                 sys.stdout.flush()
                 print('')
 
+    def bench_count_neighbors_histogram(self):
+        print()
+        print('           Pair-distance histogram, cKDTree.count_neighbors')
+        print('====================================================================')
+        print(' dim | # points | # bins | cumulative | non-cumulative | weighted')
+
+        for (m, n, nbins, repeat) in [(3,10000,10,3),
+                                      (3,10000,100,3),
+                                      (8,10000,10,3)]:
+            data = np.random.rand(n,m)
+            weights = np.random.rand(n)
+            r = np.linspace(0, 0.2, nbins)
+            T = cKDTree(data)
+
+            print('%4s | %8s | %6s ' % (m, n, nbins), end=' ')
+            sys.stdout.flush()
+            print('| %9.3fs ' % (measure('T.count_neighbors(T, r)', repeat) / repeat), end=' ')
+            sys.stdout.flush()
+            print('| %13.3fs ' % (measure('T.count_neighbors(T, r, cumulative=False)', repeat) / repeat), end=' ')
+            sys.stdout.flush()
+            print('| %7.3fs' % (measure('T.count_neighbors(T, r, weights=weights)', repeat) / repeat), end=' ')
+            sys.stdout.flush()
+            print('')
+
 if __name__ == "__main__":
     Tester().bench()
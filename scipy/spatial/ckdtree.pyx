@@ -7,6 +7,9 @@ import scipy.sparse
 cimport numpy as np
 cimport libc.stdlib as stdlib
 cimport cython
+from libc.math cimport floor, ceil
+
+from scipy._lib._parallel import _num_jobs, _run_threaded
 
 cdef extern from "limits.h":
     long LONG_MAX
@@ -64,6 +67,21 @@ cdef inline int list_append(list results, np.intp_t i) except -1:
     
 
 
+# Raising exceptions from nogil code
+# ==================================
+# These live in functions of their own: a nogil function containing a
+# "with gil" block acquires the GIL on every call, which is what we are
+# trying to avoid in the tree traversals.
+
+cdef int _raise_memory_error() nogil except -1:
+    with gil:
+        raise MemoryError
+
+cdef int _raise_stack_underflow() nogil except -1:
+    with gil:
+        raise AssertionError("pop from empty stack")
+
+
 # Priority queue
 # ==============
 cdef union heapcontents:    # FIXME: Unions are not always portable, verify this 
@@ -93,19 +111,20 @@ cdef class heap(object):
         if self.heap != <heapitem*> NULL:
             stdlib.free(self.heap)
 
-    cdef inline int _resize(heap self, np.intp_t new_space) except -1:
+    cdef inline int _resize(heap self, np.intp_t new_space) nogil except -1:
         cdef void *tmp
         if new_space < self.n:
-            raise ValueError("Heap containing %d items cannot be resized to %d" % (int(self.n), int(new_space)))
+            with gil:
+                raise ValueError("Heap containing %d items cannot be resized to %d" % (int(self.n), int(new_space)))
         self.space = new_space
         tmp = stdlib.realloc(<void*>self.heap, new_space*sizeof(heapitem))
         if tmp == NULL:
-            raise MemoryError
+            _raise_memory_error()
         self.heap = <heapitem*> tmp
         return 0
 
     @cython.cdivision(True)
-    cdef inline int push(heap self, heapitem item) except -1:
+    cdef inline int push(heap self, heapitem item) nogil except -1:
         cdef np.intp_t i
         cdef heapitem t
 
@@ -124,12 +143,12 @@ cdef class heap(object):
         return 0
     
     
-    cdef heapitem peek(heap self):
+    cdef heapitem peek(heap self) nogil:
         return self.heap[0]
     
     
     @cython.cdivision(True)
-    cdef int remove(heap self) except -1:
+    cdef int remove(heap self) nogil except -1:
         cdef heapitem t
         cdef np.intp_t i, j, k, l
     
@@ -158,7 +177,7 @@ cdef class heap(object):
             k = 2*i+2
         return 0
     
-    cdef int pop(heap self, heapitem *it) except -1:
+    cdef int pop(heap self, heapitem *it) nogil except -1:
         it[0] = self.peek()
         self.remove()
         return 0
@@ -166,13 +185,19 @@ cdef class heap(object):
 
 # Utility functions
 # =================
-cdef inline np.float64_t dmax(np.float64_t x, np.float64_t y):
+cdef inline np.float64_t dmax(np.float64_t x, np.float64_t y) nogil:
     if x>y:
         return x
     else:
         return y
+
+cdef inline np.float64_t dmin(np.float64_t x, np.float64_t y) nogil:
+    if x<y:
+        return x
+    else:
+        return y
         
-cdef inline np.float64_t dabs(np.float64_t x):
+cdef inline np.float64_t dabs(np.float64_t x) nogil:
     if x>0:
         return x
     else:
@@ -228,11 +253,51 @@ cdef class coo_entries:
                                        shape=shape)
 
 
+# Utility for collecting indices without holding the GIL
+cdef class index_buffer:
+    cdef:
+        np.intp_t n, n_max
+        np.intp_t *data
+
+    def __init__(self):
+        cdef void *tmp
+        self.n = 0
+        self.n_max = 10
+        tmp = stdlib.malloc(sizeof(np.intp_t) * self.n_max)
+        if tmp == NULL:
+            raise MemoryError
+        self.data = <np.intp_t*> tmp
+
+    def __dealloc__(self):
+        if self.data != <np.intp_t*> NULL:
+            stdlib.free(self.data)
+
+    cdef int add(index_buffer self, np.intp_t i) nogil except -1:
+        cdef void *tmp
+        if self.n == self.n_max:
+            tmp = stdlib.realloc(<void*> self.data,
+                                 2 * self.n_max * sizeof(np.intp_t))
+            if tmp == NULL:
+                _raise_memory_error()
+            self.data = <np.intp_t*> tmp
+            self.n_max *= 2
+        self.data[self.n] = i
+        self.n += 1
+        return 0
+
+    cdef list to_list(index_buffer self, np.intp_t start, np.intp_t stop):
+        cdef np.intp_t k
+        cdef list results = []
+        for k in range(start, stop):
+            list_append(results, self.data[k])
+        return results
+
+
 # Measuring distances
 # ===================
 cdef inline np.float64_t _distance_p(np.float64_t *x, np.float64_t *y,
                                      np.float64_t p, np.intp_t k,
-                                     np.float64_t upperbound):
+                                     np.float64_t upperbound) nogil:
     """Compute the distance between x and y
 
     Computes the Minkowski p-distance to the power p between two points.
@@ -265,6 +330,69 @@ cdef inline np.float64_t _distance_p(np.float64_t *x, np.float64_t *y,
                 return r
     return r
 
+cdef inline np.float64_t _wrap(np.float64_t z, np.float64_t box) nogil:
+    # Fold a coordinate difference |z| < box into [-box/2, box/2].  An
+    # infinite box leaves z unchanged.
+    cdef np.float64_t half = 0.5 * box
+    if z > half:
+        return z - box
+    elif z < -half:
+        return z + box
+    return z
+
+cdef np.float64_t _distance_p_periodic_impl(np.float64_t *x, np.float64_t *y,
+                                            np.float64_t p, np.intp_t k,
+                                            np.float64_t upperbound,
+                                            np.float64_t *boxsize) nogil:
+    """Compute the distance between x and y in a periodic box
+
+    As _distance_p, with the difference along dimension i wrapped around
+    boxsize[i].  x and y must lie in the box.
+    """
+    cdef np.intp_t i
+    cdef np.float64_t r, z
+    r = 0
+    if p==2:
+        for i in range(k):
+            z = _wrap(x[i] - y[i], boxsize[i])
+            r += z*z
+            if r>upperbound:
+                return r 
+    elif p==infinity:
+        for i in range(k):
+            r = dmax(r,dabs(_wrap(x[i] - y[i], boxsize[i])))
+            if r>upperbound:
+                return r
+    elif p==1:
+        for i in range(k):
+            r += dabs(_wrap(x[i] - y[i], boxsize[i]))
+            if r>upperbound:
+                return r
+    else:
+        for i in range(k):
+            r += dabs(_wrap(x[i] - y[i], boxsize[i]))**p
+            if r>upperbound:
+                return r
+    return r
+
+# The periodic code paths are called through function pointers.  This keeps
+# the C compiler from inlining them into the small dispatching functions,
+# which would make those too large to be inlined into the tree traversals
+# and slow down the common, non-periodic case.
+ctypedef np.float64_t (*periodic_distance_func)(
+    np.float64_t *x, np.float64_t *y, np.float64_t p, np.intp_t k,
+    np.float64_t upperbound, np.float64_t *boxsize) nogil
+cdef periodic_distance_func _distance_p_periodic = _distance_p_periodic_impl
+
+cdef inline np.float64_t _distance_p_box(np.float64_t *x, np.float64_t *y,
+                                         np.float64_t p, np.intp_t k,
+                                         np.float64_t upperbound,
+                                         np.float64_t *boxsize) nogil:
+    # Dispatch on whether the tree is periodic (boxsize is not NULL)
+    if boxsize == NULL:
+        return _distance_p(x, y, p, k, upperbound)
+    return _distance_p_periodic(x, y, p, k, upperbound, boxsize)
+
 
 # Interval arithmetic
 # ===================
@@ -273,53 +401,116 @@ cdef class Rectangle:
     cdef np.intp_t m
     cdef np.float64_t *mins
     cdef np.float64_t *maxes
-    cdef np.ndarray mins_arr, maxes_arr
+    cdef np.float64_t *boxsize
+    cdef np.ndarray mins_arr, maxes_arr, boxsize_arr
 
-    def __init__(self, mins_arr, maxes_arr):
+    def __init__(self, mins_arr, maxes_arr, boxsize_arr=None):
         # Copy array data
         self.mins_arr = np.array(mins_arr, dtype=np.float64, order='C')
         self.maxes_arr = np.array(maxes_arr, dtype=np.float64, order='C')
         self.mins = <np.float64_t*>np.PyArray_DATA(self.mins_arr)
         self.maxes = <np.float64_t*>np.PyArray_DATA(self.maxes_arr)
         self.m = self.mins_arr.shape[0]
+        # In a periodic space distances along dimension i wrap around
+        # boxsize[i] (infinite for non-periodic dimensions)
+        if boxsize_arr is None:
+            self.boxsize = <np.float64_t*> NULL
+        else:
+            self.boxsize_arr = np.array(boxsize_arr, dtype=np.float64, order='C')
+            self.boxsize = <np.float64_t*>np.PyArray_DATA(self.boxsize_arr)
+
+# Distances between intervals in a periodic space.  The differences between
+# points of two intervals (or a point and an interval) form an interval
+# [lo, hi]; these give the smallest and largest absolute difference in it
+# once differences are wrapped into [-box/2, box/2].  For an infinite box
+# they reduce to the usual non-periodic distances.
+@cython.cdivision(True)
+cdef np.float64_t _min_wrapped_impl(np.float64_t lo, np.float64_t hi,
+                                    np.float64_t box) nogil:
+    cdef np.float64_t n
+    if box == infinity:
+        return dmax(0, dmax(lo, -hi))
+    if hi - lo >= box:
+        return 0
+    # zero is reached if the interval contains a multiple of box
+    n = ceil(lo / box)
+    if n * box <= hi:
+        return 0
+    return dmin(dabs(_wrap(lo - floor(lo / box) * box, box)),
+                dabs(_wrap(hi - floor(hi / box) * box, box)))
+
+@cython.cdivision(True)
+cdef np.float64_t _max_wrapped_impl(np.float64_t lo, np.float64_t hi,
+                                    np.float64_t box) nogil:
+    cdef np.float64_t n
+    if box == infinity:
+        return dmax(hi, -lo)
+    if hi - lo >= box:
+        return 0.5 * box
+    # box/2 is reached if the interval contains an odd multiple of box/2
+    n = ceil(lo / box - 0.5)
+    if (n + 0.5) * box <= hi:
+        return 0.5 * box
+    return dmax(dabs(_wrap(lo - floor(lo / box) * box, box)),
+                dabs(_wrap(hi - floor(hi / box) * box, box)))
+
+# see _distance_p_periodic
+ctypedef np.float64_t (*wrapped_func)(np.float64_t lo, np.float64_t hi,
+                                      np.float64_t box) nogil
+cdef wrapped_func _min_wrapped = _min_wrapped_impl
+cdef wrapped_func _max_wrapped = _max_wrapped_impl
 
 # 1-d pieces
 # These should only be used if p != infinity
 cdef inline np.float64_t min_dist_point_interval_p(np.float64_t* x,
                                                    Rectangle rect,
                                                    np.intp_t k,
-                                                   np.float64_t p):    
+                                                   np.float64_t p) nogil:    
     """Compute the minimum distance along dimension k between x and
     a point in the hyperrectangle.
     """
+    if rect.boxsize != NULL:
+        return _min_wrapped(x[k] - rect.maxes[k], x[k] - rect.mins[k],
+                            rect.boxsize[k]) ** p
     return dmax(0, dmax(rect.mins[k] - x[k], x[k] - rect.maxes[k])) ** p
 
 cdef inline np.float64_t max_dist_point_interval_p(np.float64_t* x,
                                                    Rectangle rect,
                                                    np.intp_t k,
-                                                   np.float64_t p):
+                                                   np.float64_t p) nogil:
     """Compute the maximum distance along dimension k between x and
     a point in the hyperrectangle.
     """
+    if rect.boxsize != NULL:
+        return _max_wrapped(x[k] - rect.maxes[k], x[k] - rect.mins[k],
+                            rect.boxsize[k]) ** p
     return dmax(rect.maxes[k] - x[k], x[k] - rect.mins[k]) ** p
 
 cdef inline np.float64_t min_dist_interval_interval_p(Rectangle rect1,
                                                       Rectangle rect2,
                                                       np.intp_t k,
-                                                      np.float64_t p):
+                                                      np.float64_t p) nogil:
     """Compute the minimum distance along dimension k between points in
     two hyperrectangles.
     """
+    if rect1.boxsize != NULL:
+        return _min_wrapped(rect1.mins[k] - rect2.maxes[k],
+                            rect1.maxes[k] - rect2.mins[k],
+                            rect1.boxsize[k]) ** p
     return dmax(0, dmax(rect1.mins[k] - rect2.maxes[k],
                         rect2.mins[k] - rect1.maxes[k])) ** p
 
 cdef inline np.float64_t max_dist_interval_interval_p(Rectangle rect1,
                                                       Rectangle rect2,
                                                       np.intp_t k,
-                                                      np.float64_t p):
+                                                      np.float64_t p) nogil:
     """Compute the maximum distance along dimension k between points in
     two hyperrectangles.
     """
+    if rect1.boxsize != NULL:
+        return _max_wrapped(rect1.mins[k] - rect2.maxes[k],
+                            rect1.maxes[k] - rect2.mins[k],
+                            rect1.boxsize[k]) ** p
     return dmax(rect1.maxes[k] - rect2.mins[k], rect2.maxes[k] - rect1.mins[k]) ** p
 
 # Interval arithmetic in m-D
@@ -327,38 +518,62 @@ cdef inline np.float64_t max_dist_interval_interval_p(Rectangle rect1,
 
 # These should be used only for p == infinity
 cdef inline np.float64_t min_dist_point_rect_p_inf(np.float64_t* x,
-                                                   Rectangle rect):
+                                                   Rectangle rect) nogil:
     """Compute the minimum distance between x and the given hyperrectangle."""
     cdef np.intp_t i
     cdef np.float64_t min_dist = 0.
+    if rect.boxsize != NULL:
+        for i in range(rect.m):
+            min_dist = dmax(min_dist, _min_wrapped(x[i] - rect.maxes[i],
+                                                   x[i] - rect.mins[i],
+                                                   rect.boxsize[i]))
+        return min_dist
     for i in range(rect.m):
         min_dist = dmax(min_dist, dmax(rect.mins[i]-x[i], x[i]-rect.maxes[i]))
     return min_dist
 
 cdef inline np.float64_t max_dist_point_rect_p_inf(np.float64_t* x,
-                                                   Rectangle rect):
+                                                   Rectangle rect) nogil:
     """Compute the maximum distance between x and the given hyperrectangle."""
     cdef np.intp_t i
     cdef np.float64_t max_dist = 0.
+    if rect.boxsize != NULL:
+        for i in range(rect.m):
+            max_dist = dmax(max_dist, _max_wrapped(x[i] - rect.maxes[i],
+                                                   x[i] - rect.mins[i],
+                                                   rect.boxsize[i]))
+        return max_dist
     for i in range(rect.m):
         max_dist = dmax(max_dist, dmax(rect.maxes[i]-x[i], x[i]-rect.mins[i]))
     return max_dist
 
 cdef inline np.float64_t min_dist_rect_rect_p_inf(Rectangle rect1,
-                                                  Rectangle rect2):
+                                                  Rectangle rect2) nogil:
     """Compute the minimum distance between points in two hyperrectangles."""
     cdef np.intp_t i
     cdef np.float64_t min_dist = 0.
+    if rect1.boxsize != NULL:
+        for i in range(rect1.m):
+            min_dist = dmax(min_dist, _min_wrapped(rect1.mins[i] - rect2.maxes[i],
+                                                   rect1.maxes[i] - rect2.mins[i],
+                                                   rect1.boxsize[i]))
+        return min_dist
     for i in range(rect1.m):
         min_dist = dmax(min_dist, dmax(rect1.mins[i] - rect2.maxes[i],
                                        rect2.mins[i] - rect1.maxes[i]))
     return min_dist
 
 cdef inline np.float64_t max_dist_rect_rect_p_inf(Rectangle rect1,
-                                                  Rectangle rect2):
+                                                  Rectangle rect2) nogil:
     """Compute the maximum distance between points in two hyperrectangles."""
     cdef np.intp_t i
     cdef np.float64_t max_dist = 0.
+    if rect1.boxsize != NULL:
+        for i in range(rect1.m):
+            max_dist = dmax(max_dist, _max_wrapped(rect1.mins[i] - rect2.maxes[i],
+                                                   rect1.maxes[i] - rect2.mins[i],
+                                                   rect1.boxsize[i]))
+        return max_dist
     for i in range(rect1.m):
         max_dist = dmax(max_dist, dmax(rect1.maxes[i] - rect2.mins[i],
                                        rect2.maxes[i] - rect1.mins[i]))
@@ -409,24 +624,24 @@ cdef class RectRectDistanceTracker(object):
     cdef RR_stack_item *stack
 
     # Stack handling
-    cdef int _init_stack(self) except -1:
+    cdef int _init_stack(self) nogil except -1:
         cdef void *tmp
         self.stack_max_size = 10
         tmp = stdlib.malloc(sizeof(RR_stack_item) *
                             self.stack_max_size)
         if tmp == NULL:
-            raise MemoryError
+            _raise_memory_error()
         self.stack = <RR_stack_item*> tmp
         self.stack_size = 0
         return 0
 
-    cdef int _resize_stack(self, np.intp_t new_max_size) except -1:
+    cdef int _resize_stack(self, np.intp_t new_max_size) nogil except -1:
         cdef void *tmp
         self.stack_max_size = new_max_size
         tmp = stdlib.realloc(<RR_stack_item*> self.stack,
                              new_max_size * sizeof(RR_stack_item))
         if tmp == NULL:
-            raise MemoryError
+            _raise_memory_error()
         self.stack = <RR_stack_item*> tmp
         return 0
     
@@ -478,13 +693,16 @@ cdef class RectRectDistanceTracker(object):
 
     cdef int push(self, np.intp_t which, np.intp_t direction,
                   np.intp_t split_dim,
-                  np.float64_t split_val) except -1:
+                  np.float64_t split_val) nogil except -1:
 
-        cdef Rectangle rect
+        cdef np.float64_t *mins
+        cdef np.float64_t *maxes
         if which == 1:
-            rect = self.rect1
+            mins = self.rect1.mins
+            maxes = self.rect1.maxes
         else:
-            rect = self.rect2
+            mins = self.rect2.mins
+            maxes = self.rect2.maxes
 
         # Push onto stack
         if self.stack_size == self.stack_max_size:
@@ -496,8 +714,8 @@ cdef class RectRectDistanceTracker(object):
         item.split_dim = split_dim
         item.min_distance = self.min_distance
         item.max_distance = self.max_distance
-        item.min_along_dim = rect.mins[split_dim]
-        item.max_along_dim = rect.maxes[split_dim]
+        item.min_along_dim = mins[split_dim]
+        item.max_along_dim = maxes[split_dim]
 
         # Update min/max distances
         if self.p != infinity:
@@ -505,9 +723,9 @@ cdef class RectRectDistanceTracker(object):
             self.max_distance -= max_dist_interval_interval_p(self.rect1, self.rect2, split_dim, self.p)
 
         if direction == LESS:
-            rect.maxes[split_dim] = split_val
+            maxes[split_dim] = split_val
         else:
-            rect.mins[split_dim] = split_val
+            mins[split_dim] = split_val
 
         if self.p != infinity:
             self.min_distance += min_dist_interval_interval_p(self.rect1, self.rect2, split_dim, self.p)
@@ -520,19 +738,20 @@ cdef class RectRectDistanceTracker(object):
 
     
     cdef inline int push_less_of(self, np.intp_t which,
-                                 innernode *node) except -1:
+                                 innernode *node) nogil except -1:
         return self.push(which, LESS, node.split_dim, node.split)
 
     
     cdef inline int push_greater_of(self, np.intp_t which,
-                                    innernode *node) except -1:
+                                    innernode *node) nogil except -1:
         return self.push(which, GREATER, node.split_dim, node.split)
 
     
-    cdef inline int pop(self) except -1:
+    cdef inline int pop(self) nogil except -1:
         # Pop from stack
         self.stack_size -= 1
-        assert self.stack_size >= 0
+        if self.stack_size < 0:
+            _raise_stack_underflow()
         
         cdef RR_stack_item* item = &self.stack[self.stack_size]
         self.min_distance = item.min_distance
@@ -589,24 +808,24 @@ cdef class PointRectDistanceTracker(object):
     cdef RP_stack_item *stack
 
     # Stack handling
-    cdef int _init_stack(self) except -1:
+    cdef int _init_stack(self) nogil except -1:
         cdef void *tmp
         self.stack_max_size = 10
         tmp = stdlib.malloc(sizeof(RP_stack_item) *
                             self.stack_max_size)
         if tmp == NULL:
-            raise MemoryError
+            _raise_memory_error()
         self.stack = <RP_stack_item*> tmp
         self.stack_size = 0
         return 0
 
-    cdef int _resize_stack(self, np.intp_t new_max_size) except -1:
+    cdef int _resize_stack(self, np.intp_t new_max_size) nogil except -1:
         cdef void *tmp
         self.stack_max_size = new_max_size
         tmp = stdlib.realloc(<RP_stack_item*> self.stack,
                               new_max_size * sizeof(RP_stack_item))
         if tmp == NULL:
-            raise MemoryError
+            _raise_memory_error()
         self.stack = <RP_stack_item*> tmp
         return 0
     
@@ -618,9 +837,20 @@ cdef class PointRectDistanceTracker(object):
     cdef init(self, np.float64_t *pt, Rectangle rect,
               np.float64_t p, np.float64_t eps, np.float64_t upper_bound):
 
-        self.pt = pt
         self.rect = rect
+        self._init_stack()
+        self.reset(pt, p, eps, upper_bound)
+
+    @cython.cdivision(True)
+    cdef int reset(self, np.float64_t *pt, np.float64_t p, np.float64_t eps,
+                   np.float64_t upper_bound) nogil except -1:
+        # Reuse the tracker for a new point.  The rectangle is restored
+        # to its initial state by the pops of a complete traversal.
+        cdef np.intp_t i
+
+        self.pt = pt
         self.p = p
+        self.stack_size = 0
         
         # internally we represent all distances as distance ** p
         if p != infinity and upper_bound != infinity:
@@ -636,25 +866,24 @@ cdef class PointRectDistanceTracker(object):
         else:
             self.epsfac = 1 / (1 + eps) ** p
 
-        self._init_stack()
-
         # Compute initial min and max distances
         if self.p == infinity:
-            self.min_distance = min_dist_point_rect_p_inf(pt, rect)
-            self.max_distance = max_dist_point_rect_p_inf(pt, rect)
+            self.min_distance = min_dist_point_rect_p_inf(pt, self.rect)
+            self.max_distance = max_dist_point_rect_p_inf(pt, self.rect)
         else:
             self.min_distance = 0.
             self.max_distance = 0.
-            for i in range(rect.m):
-                self.min_distance += min_dist_point_interval_p(pt, rect, i, p)
-                self.max_distance += max_dist_point_interval_p(pt, rect, i, p)
+            for i in range(self.rect.m):
+                self.min_distance += min_dist_point_interval_p(pt, self.rect, i, p)
+                self.max_distance += max_dist_point_interval_p(pt, self.rect, i, p)
+        return 0
 
     def __dealloc__(self):
         self._free_stack()
 
     cdef int push(self, np.intp_t direction,
                   np.intp_t split_dim,
-                  np.float64_t split_val) except -1:
+                  np.float64_t split_val) nogil except -1:
 
         # Push onto stack
         if self.stack_size == self.stack_max_size:
@@ -688,17 +917,18 @@ cdef class PointRectDistanceTracker(object):
         return 0
 
     
-    cdef inline int push_less_of(self, innernode* node) except -1:
+    cdef inline int push_less_of(self, innernode* node) nogil except -1:
         return self.push(LESS, node.split_dim, node.split)
 
     
-    cdef inline int push_greater_of(self, innernode* node) except -1:
+    cdef inline int push_greater_of(self, innernode* node) nogil except -1:
         return self.push(GREATER, node.split_dim, node.split)
 
     
-    cdef inline int pop(self) except -1:
+    cdef inline int pop(self) nogil except -1:
         self.stack_size -= 1
-        assert self.stack_size >= 0
+        if self.stack_size < 0:
+            _raise_stack_underflow()
         
         cdef RP_stack_item* item = &self.stack[self.stack_size]
         self.min_distance = item.min_distance
@@ -732,11 +962,81 @@ cdef struct nodeinfo:
     np.float64_t side_distances[0]  # FIXME: Only valid in C99, invalid C++ and C89
 
 
+# Pair counting
+# =============
+#
+# State of a count_neighbors traversal.  The radii r, as distance ** p,
+# are sorted, and results[l] accumulates the weight of the pairs with
+# r[l-1] < distance <= r[l]; results[n_r] collects the pairs beyond the
+# largest radius.  w1 and w2 hold the weights of the points in tree order
+# and cw1 and cw2 their cumulative sums, so that the points start..end
+# of a tree weigh cw[end] - cw[start].  All four are NULL for unit weights.
+# Unweighted counts are accumulated exactly in counts instead of results,
+# which is then NULL.
+
+cdef struct pair_count_state:
+    np.float64_t *r
+    np.intp_t n_r
+    np.float64_t *results
+    np.intp_t *counts
+    np.float64_t *w1
+    np.float64_t *w2
+    np.float64_t *cw1
+    np.float64_t *cw2
+
+cdef inline np.float64_t _point_weight(np.float64_t *w, np.intp_t i) nogil:
+    if w == NULL:
+        return 1.
+    return w[i]
+
+cdef inline np.float64_t _node_weight(np.float64_t *cw, np.intp_t start,
+                                      np.intp_t count) nogil:
+    if cw == NULL:
+        return count
+    return cw[start + count] - cw[start]
+
+
+# Flat tree representation
+# ========================
+#
+# Used for pickling and for saving a tree to disk.  Nodes are numbered in
+# depth-first order with the root first.  For an inner node, lo and hi are
+# the numbers of its less and greater children; for a leaf node they are
+# the start and end indices into the index permutation.
+
+cdef struct flatnode:
+    np.int64_t split_dim
+    np.int64_t children
+    np.float64_t split
+    np.int64_t lo
+    np.int64_t hi
+
+node_dtype = np.dtype([('split_dim', np.int64),
+                       ('children', np.int64),
+                       ('split', np.float64),
+                       ('lo', np.int64),
+                       ('hi', np.int64)])
+
+# On-disk layout written by cKDTree.save: a header of _FILE_HEADER_SIZE
+# little-endian int64 words (magic, version, n, m, leafsize, number of
+# nodes, whether the tree is periodic), followed by the mins, maxes,
+# boxsize (periodic trees only), node array, index permutation and data,
+# all little-endian and contiguous.
+_FILE_MAGIC = 0x45455254444b43  # 'CKDTREE' in little-endian ASCII
+_FILE_VERSION = 2
+_FILE_HEADER_SIZE = 7
+
+
+def _new_ckdtree(cls):
+    # Unpickling helper: create an instance without building a tree
+    return cls.__new__(cls)
+
+
 # Main class
 # ==========
 cdef class cKDTree:
     """
-    cKDTree(data, int leafsize=10)
+    cKDTree(data, int leafsize=10, balanced_tree=False, int n_jobs=1, boxsize=None)
 
     kd-tree for quick nearest-neighbor lookup
 
@@ -752,7 +1052,10 @@ cdef class cKDTree:
 
     During construction, the axis and splitting point are chosen by the 
     "sliding midpoint" rule, which ensures that the cells do not all
-    become long and thin. 
+    become long and thin.  Alternatively, with ``balanced_tree=True``,
+    points are split at their median along the axis of largest spread,
+    which gives a balanced tree; this is slower to build but can be
+    faster to query on clustered data.
 
     The tree can be queried for the r closest neighbors of any given point 
     (optionally returning only those within some maximum distance of the 
@@ -773,6 +1076,26 @@ cdef class cKDTree:
     leafsize : positive integer
         The number of points at which the algorithm switches over to
         brute-force.
+    balanced_tree : bool, optional
+        If True, split nodes at the median of their points instead of
+        using the sliding midpoint rule.  Default: False.
+    n_jobs : int, optional
+        Number of threads used to build the tree. If -1 is given all
+        processors are used. Default: 1.
+    boxsize : array_like or scalar, optional
+        Apply a periodic (toroidal) topology to the space: along dimension
+        i, points ``boxsize[i]`` apart are identical, and all distances are
+        computed with wrap-around.  An infinite entry leaves that dimension
+        non-periodic.  The data must lie in ``[0, boxsize[i])`` along each
+        periodic dimension; query points are wrapped into the box.  Trees
+        combined by the two-tree methods must have the same boxsize.
+        Default: None, no periodicity.
+
+    Attributes
+    ----------
+    boxsize : ndarray or None
+        The periodic box size along each dimension (infinite for
+        non-periodic ones), or None.
 
     """
 
@@ -787,16 +1110,32 @@ cdef class cKDTree:
     cdef np.float64_t* raw_mins
     cdef np.ndarray indices
     cdef np.intp_t* raw_indices
+    cdef innernode* tree_buffer
+    cdef bint balanced
+    cdef readonly object boxsize
+    cdef np.float64_t* raw_boxsize
 
-    def __init__(cKDTree self, data, np.intp_t leafsize=10):
+    def __init__(cKDTree self, data, np.intp_t leafsize=10,
+                 balanced_tree=False, np.intp_t n_jobs=1, boxsize=None):
         cdef np.ndarray[np.float64_t, ndim=2] data_arr = \
             np.ascontiguousarray(data, dtype=np.float64)
+        cdef np.intp_t levels
+        cdef list tasks
         self.data = data_arr
         self.n = data_arr.shape[0]
         self.m = data_arr.shape[1]
         self.leafsize = leafsize
         if self.leafsize<1:
             raise ValueError("leafsize must be at least 1")
+        self.balanced = bool(balanced_tree)
+        n_jobs = _num_jobs(n_jobs)
+        self.__set_boxsize(boxsize)
+        if self.boxsize is not None:
+            periodic = np.isfinite(self.boxsize)
+            if np.any((self.data[:, periodic] < 0) |
+                      (self.data[:, periodic] >= self.boxsize[periodic])):
+                raise ValueError("data must lie in [0, boxsize) along the "
+                                 "periodic dimensions")
         self.maxes = np.ascontiguousarray(np.amax(self.data,axis=0), dtype=np.float64)
         self.mins = np.ascontiguousarray(np.amin(self.data,axis=0), dtype=np.float64)
         self.indices = np.ascontiguousarray(np.arange(self.n,dtype=np.intp))
@@ -806,141 +1145,633 @@ cdef class cKDTree:
         self.raw_mins = <np.float64_t*>np.PyArray_DATA(self.mins)
         self.raw_indices = <np.intp_t*>np.PyArray_DATA(self.indices)
 
-        self.tree = self.__build(0, self.n, self.raw_maxes, self.raw_mins)
+        if n_jobs == 1 or self.n <= 4 * n_jobs * self.leafsize:
+            with nogil:
+                self.tree = self.__build(0, self.n, self.raw_maxes,
+                                         self.raw_mins)
+            return
 
-    cdef innernode* __build(cKDTree self, np.intp_t start_idx, np.intp_t end_idx,
-                            np.float64_t* maxes, np.float64_t* mins) except? <innernode*> NULL:
-        cdef leafnode* n
-        cdef innernode* ni
+        # Split the top levels serially, then build the subtrees below
+        # them in parallel.  Aim for a few subtrees per thread so that
+        # unbalanced splits do not leave threads idle.
+        levels = 2
+        while (1 << levels) < 4 * n_jobs:
+            levels += 1
+        tasks = []
+        self.tree = self.__build_top(0, self.n, self.raw_maxes,
+                                     self.raw_mins, levels, tasks)
+
+        def _thread_func(np.intp_t start, np.intp_t stop):
+            for task in tasks[start:stop]:
+                self.__build_task(task)
+
+        try:
+            _run_threaded(_thread_func, len(tasks), n_jobs)
+        except:
+            self.__free_tree(self.tree)
+            self.tree = <innernode*> NULL
+            raise
+
+    cdef int __set_boxsize(cKDTree self, object boxsize) except -1:
+        cdef np.ndarray box
+        if boxsize is None:
+            self.boxsize = None
+            self.raw_boxsize = <np.float64_t*> NULL
+            return 0
+        box = np.empty(self.m, dtype=np.float64)
+        box[...] = boxsize
+        if not np.all(box > 0):
+            raise ValueError("boxsize must be positive")
+        self.boxsize = box
+        self.raw_boxsize = <np.float64_t*>np.PyArray_DATA(box)
+        return 0
+
+    cdef np.ndarray __wrap_points(cKDTree self, np.ndarray x):
+        # Map points of shape (n, m) into the periodic box
+        if self.boxsize is None:
+            return x
+        periodic = np.isfinite(self.boxsize)
+        x = x.copy()
+        x[:, periodic] %= self.boxsize[periodic]
+        return x
+
+    cdef int __check_compatible(cKDTree self, cKDTree other,
+                                str method) except -1:
+        if self.m != other.m:
+            raise ValueError("Trees passed to %s have different "
+                             "dimensionality" % method)
+        if not (self.boxsize is None and other.boxsize is None or
+                self.boxsize is not None and other.boxsize is not None and
+                np.array_equal(self.boxsize, other.boxsize)):
+            raise ValueError("Trees passed to %s have different boxsize"
+                             % method)
+        return 0
+
+    @cython.cdivision(True)
+    cdef void __select(cKDTree self, np.intp_t start_idx, np.intp_t end_idx,
+                       np.intp_t kth, np.intp_t d) nogil:
+        # Reorder indices[start_idx:end_idx] so that indices[kth] is the
+        # point that would be there if they were sorted along dimension d,
+        # with no larger values before it and no smaller values after it
+        # (Hoare's selection algorithm).
+        cdef np.intp_t lo = start_idx, hi = end_idx - 1, i, j, t
+        cdef np.float64_t pivot
+        while hi > lo:
+            pivot = self.raw_data[self.raw_indices[lo + (hi - lo) // 2]*self.m+d]
+            i = lo
+            j = hi
+            while i <= j:
+                while self.raw_data[self.raw_indices[i]*self.m+d] < pivot:
+                    i += 1
+                while self.raw_data[self.raw_indices[j]*self.m+d] > pivot:
+                    j -= 1
+                if i <= j:
+                    t = self.raw_indices[i]
+                    self.raw_indices[i] = self.raw_indices[j]
+                    self.raw_indices[j] = t
+                    i += 1
+                    j -= 1
+            if kth <= j:
+                hi = j
+            elif kth >= i:
+                lo = i
+            else:
+                break
+
+    @cython.cdivision(True)
+    cdef int __partition(cKDTree self, np.intp_t start_idx, np.intp_t end_idx,
+                         np.float64_t* maxes, np.float64_t* mins,
+                         np.intp_t* split_dim, np.float64_t* split_val,
+                         np.intp_t* split_idx) nogil:
+        # Choose how to split indices[start_idx:end_idx] and partition them
+        # accordingly.  Returns 0 if the points should go in a leaf, and
+        # otherwise 1, with points [start_idx, split_idx) going to the
+        # less child and points [split_idx, end_idx) to the greater child.
         cdef np.intp_t i, j, t, p, q, d
-        cdef np.float64_t size, split, minval, maxval
-        cdef np.float64_t*mids
+        cdef np.float64_t size, split, minval, maxval, v
+
         if end_idx-start_idx<=self.leafsize:
-            n = <leafnode*>stdlib.malloc(sizeof(leafnode))
-            if n == <leafnode*> NULL: 
-                raise MemoryError
-            n.split_dim = -1
-            n.children = end_idx - start_idx
-            n.start_idx = start_idx
-            n.end_idx = end_idx
-            return <innernode*>n
-        else:
-            d = 0 
-            size = 0
+            return 0
+
+        d = 0 
+        size = 0
+        if self.balanced:
+            # split along the dimension in which the points themselves,
+            # rather than the cell, are most spread out
             for i in range(self.m):
-                if maxes[i]-mins[i] > size:
+                minval = maxval = self.raw_data[self.raw_indices[start_idx]*self.m+i]
+                for j in range(start_idx+1, end_idx):
+                    v = self.raw_data[self.raw_indices[j]*self.m+i]
+                    if v < minval:
+                        minval = v
+                    elif v > maxval:
+                        maxval = v
+                if maxval-minval > size:
                     d = i
-                    size =  maxes[i]-mins[i]
-            maxval = maxes[d]
-            minval = mins[d]
-            if maxval==minval:
-                # all points are identical; warn user?
-                n = <leafnode*>stdlib.malloc(sizeof(leafnode))
-                if n == <leafnode*> NULL: 
-                    raise MemoryError
-                n.split_dim = -1
-                n.children = end_idx - start_idx
-                n.start_idx = start_idx
-                n.end_idx = end_idx
-                return <innernode*>n
-
-            split = (maxval+minval)/2
-
-            p = start_idx
-            q = end_idx-1
-            while p<=q:
-                if self.raw_data[self.raw_indices[p]*self.m+d]<split:
-                    p+=1
-                elif self.raw_data[self.raw_indices[q]*self.m+d]>=split:
-                    q-=1
-                else:
-                    t = self.raw_indices[p]
-                    self.raw_indices[p] = self.raw_indices[q]
-                    self.raw_indices[q] = t
-                    p+=1
-                    q-=1
-
-            # slide midpoint if necessary
-            if p==start_idx:
-                # no points less than split
-                j = start_idx
-                split = self.raw_data[self.raw_indices[j]*self.m+d]
-                for i in range(start_idx+1, end_idx):
-                    if self.raw_data[self.raw_indices[i]*self.m+d]<split:
-                        j = i
-                        split = self.raw_data[self.raw_indices[j]*self.m+d]
-                t = self.raw_indices[start_idx]
-                self.raw_indices[start_idx] = self.raw_indices[j]
-                self.raw_indices[j] = t
-                p = start_idx+1
-                q = start_idx
-            elif p==end_idx:
-                # no points greater than split
-                j = end_idx-1
-                split = self.raw_data[self.raw_indices[j]*self.m+d]
-                for i in range(start_idx, end_idx-1):
-                    if self.raw_data[self.raw_indices[i]*self.m+d]>split:
-                        j = i
-                        split = self.raw_data[self.raw_indices[j]*self.m+d]
-                t = self.raw_indices[end_idx-1]
-                self.raw_indices[end_idx-1] = self.raw_indices[j]
-                self.raw_indices[j] = t
-                p = end_idx-1
-                q = end_idx-2
-
-            # construct new node representation
-            ni = <innernode*>stdlib.malloc(sizeof(innernode))
-            if ni ==  <innernode*> NULL:
-                raise MemoryError
-
-            try:
-                mids = <np.float64_t*>stdlib.malloc(sizeof(np.float64_t)*self.m)
-                if mids == <np.float64_t*> NULL:
-                    raise MemoryError
-                        
-                for i in range(self.m):
-                    mids[i] = maxes[i]
-                mids[d] = split
-                ni.less = self.__build(start_idx,p,mids,mins)
+                    size = maxval-minval
+            if size == 0:
+                # all points are identical
+                return 0
+
+            p = start_idx + (end_idx-start_idx) // 2
+            self.__select(start_idx, end_idx, p, d)
+            split_dim[0] = d
+            split_val[0] = self.raw_data[self.raw_indices[p]*self.m+d]
+            split_idx[0] = p
+            return 1
+
+        for i in range(self.m):
+            if maxes[i]-mins[i] > size:
+                d = i
+                size =  maxes[i]-mins[i]
+        maxval = maxes[d]
+        minval = mins[d]
+        if maxval==minval:
+            # all points are identical; warn user?
+            return 0
+
+        split = (maxval+minval)/2
+
+        p = start_idx
+        q = end_idx-1
+        while p<=q:
+            if self.raw_data[self.raw_indices[p]*self.m+d]<split:
+                p+=1
+            elif self.raw_data[self.raw_indices[q]*self.m+d]>=split:
+                q-=1
+            else:
+                t = self.raw_indices[p]
+                self.raw_indices[p] = self.raw_indices[q]
+                self.raw_indices[q] = t
+                p+=1
+                q-=1
+
+        # slide midpoint if necessary
+        if p==start_idx:
+            # no points less than split
+            j = start_idx
+            split = self.raw_data[self.raw_indices[j]*self.m+d]
+            for i in range(start_idx+1, end_idx):
+                if self.raw_data[self.raw_indices[i]*self.m+d]<split:
+                    j = i
+                    split = self.raw_data[self.raw_indices[j]*self.m+d]
+            t = self.raw_indices[start_idx]
+            self.raw_indices[start_idx] = self.raw_indices[j]
+            self.raw_indices[j] = t
+            p = start_idx+1
+            q = start_idx
+        elif p==end_idx:
+            # no points greater than split
+            j = end_idx-1
+            split = self.raw_data[self.raw_indices[j]*self.m+d]
+            for i in range(start_idx, end_idx-1):
+                if self.raw_data[self.raw_indices[i]*self.m+d]>split:
+                    j = i
+                    split = self.raw_data[self.raw_indices[j]*self.m+d]
+            t = self.raw_indices[end_idx-1]
+            self.raw_indices[end_idx-1] = self.raw_indices[j]
+            self.raw_indices[j] = t
+            p = end_idx-1
+            q = end_idx-2
+
+        split_dim[0] = d
+        split_val[0] = split
+        split_idx[0] = p
+        return 1
+
+    cdef innernode* __new_leaf(cKDTree self, np.intp_t start_idx,
+                               np.intp_t end_idx) nogil except? <innernode*> NULL:
+        cdef leafnode* n
+        n = <leafnode*>stdlib.malloc(sizeof(leafnode))
+        if n == <leafnode*> NULL: 
+            _raise_memory_error()
+        n.split_dim = -1
+        n.children = end_idx - start_idx
+        n.start_idx = start_idx
+        n.end_idx = end_idx
+        return <innernode*>n
+
+    cdef innernode* __build(cKDTree self, np.intp_t start_idx, np.intp_t end_idx,
+                            np.float64_t* maxes, np.float64_t* mins) nogil except? <innernode*> NULL:
+        cdef innernode* ni
+        cdef np.intp_t i, d, p
+        cdef np.float64_t split
+        cdef np.float64_t* mids
+
+        if not self.__partition(start_idx, end_idx, maxes, mins,
+                                &d, &split, &p):
+            return self.__new_leaf(start_idx, end_idx)
+
+        # construct new node representation
+        ni = <innernode*>stdlib.malloc(sizeof(innernode))
+        if ni == <innernode*> NULL:
+            _raise_memory_error()
+        ni.split_dim = d
+        ni.split = split
+        ni.less = ni.greater = <innernode*> NULL
+
+        mids = <np.float64_t*>stdlib.malloc(sizeof(np.float64_t)*self.m)
+        if mids == <np.float64_t*> NULL:
+            stdlib.free(ni)
+            _raise_memory_error()
+
+        try:
+            for i in range(self.m):
+                mids[i] = maxes[i]
+            mids[d] = split
+            ni.less = self.__build(start_idx,p,mids,mins)
+
+            for i in range(self.m):
+                mids[i] = mins[i]
+            mids[d] = split
+            ni.greater = self.__build(p,end_idx,maxes,mids)
+
+            ni.children = ni.less.children + ni.greater.children
+        finally:
+            stdlib.free(mids)
+            if ni.greater == <innernode*> NULL:
+                # building a subtree failed; free ni as it cannot be returned
+                self.__free_tree(ni)
+
+        return ni
+
+    cdef innernode* __build_top(cKDTree self, np.intp_t start_idx,
+                                np.intp_t end_idx, np.float64_t* maxes,
+                                np.float64_t* mins, np.intp_t levels,
+                                list tasks) except? <innernode*> NULL:
+        # Build the top levels of the tree.  Instead of building the
+        # subtrees below them, append (start_idx, end_idx, maxes, mins,
+        # address of the child pointer) to tasks; see __build_task.
+        cdef innernode* ni
+        cdef np.intp_t d, p
+        cdef np.float64_t split
+        cdef np.ndarray less_maxes, greater_mins
 
-                for i in range(self.m):
-                    mids[i] = mins[i]
-                mids[d] = split
-                ni.greater = self.__build(p,end_idx,maxes,mids)
+        if not self.__partition(start_idx, end_idx, maxes, mins,
+                                &d, &split, &p):
+            return self.__new_leaf(start_idx, end_idx)
 
+        ni = <innernode*>stdlib.malloc(sizeof(innernode))
+        if ni == <innernode*> NULL:
+            raise MemoryError
+        ni.split_dim = d
+        ni.split = split
+        ni.less = ni.greater = <innernode*> NULL
+
+        try:
+            less_maxes = np.array(<np.float64_t[:self.m]> maxes)
+            less_maxes[d] = split
+            greater_mins = np.array(<np.float64_t[:self.m]> mins)
+            greater_mins[d] = split
+            if levels > 1:
+                ni.less = self.__build_top(
+                    start_idx, p, <np.float64_t*>np.PyArray_DATA(less_maxes),
+                    mins, levels - 1, tasks)
+                ni.greater = self.__build_top(
+                    p, end_idx, maxes,
+                    <np.float64_t*>np.PyArray_DATA(greater_mins),
+                    levels - 1, tasks)
                 ni.children = ni.less.children + ni.greater.children
-            
-            except:
-                # free ni if it cannot be returned
-                if ni !=  <innernode*> NULL:
-                    stdlib.free(mids)
-                if mids != <np.float64_t*> NULL:
-                    stdlib.free(mids)
-                raise
             else:
-                if mids != <np.float64_t*> NULL:
-                    stdlib.free(mids)
+                tasks.append((start_idx, p, less_maxes,
+                              np.array(<np.float64_t[:self.m]> mins),
+                              <np.intp_t> &ni.less))
+                tasks.append((p, end_idx,
+                              np.array(<np.float64_t[:self.m]> maxes),
+                              greater_mins, <np.intp_t> &ni.greater))
+                ni.children = end_idx - start_idx
+        except:
+            self.__free_tree(ni)
+            raise
+        return ni
+
+    cdef int __build_task(cKDTree self, tuple task) except -1:
+        # Build one of the subtrees left over by __build_top, without the GIL
+        cdef np.intp_t start_idx = task[0], end_idx = task[1]
+        cdef np.ndarray maxes = task[2], mins = task[3]
+        cdef innernode** slot = <innernode**> <np.intp_t> task[4]
+        cdef np.float64_t* raw_maxes = <np.float64_t*>np.PyArray_DATA(maxes)
+        cdef np.float64_t* raw_mins = <np.float64_t*>np.PyArray_DATA(mins)
+        with nogil:
+            slot[0] = self.__build(start_idx, end_idx, raw_maxes, raw_mins)
+        return 0
 
-            ni.split_dim = d
-            ni.split = split
-            return ni
-                    
-    cdef __free_tree(cKDTree self, innernode* node):
+    cdef void __free_tree(cKDTree self, innernode* node) nogil:
+        # children may be NULL in a partially built tree
+        if node == <innernode*> NULL:
+            return
         if node.split_dim!=-1:
             self.__free_tree(node.less)
             self.__free_tree(node.greater)
         stdlib.free(node)
 
+    cdef int __tree_stats(cKDTree self, innernode* node, np.intp_t depth,
+                          np.intp_t* stats) except -1:
+        # stats holds [max depth, number of nodes, number of leaves,
+        #              largest leaf]
+        stats[1] += 1
+        if node.split_dim == -1:
+            stats[0] = max(stats[0], depth)
+            stats[2] += 1
+            stats[3] = max(stats[3], node.children)
+        else:
+            self.__tree_stats(node.less, depth + 1, stats)
+            self.__tree_stats(node.greater, depth + 1, stats)
+        return 0
+
+    def tree_stats(cKDTree self):
+        """tree_stats(self)
+
+        Statistics describing the shape of the tree.
+
+        Returns
+        -------
+        stats : dict
+            A dictionary with the keys
+
+            ``depth``
+                The number of levels below the root of the deepest leaf.
+            ``n_nodes``
+                The total number of nodes, inner nodes and leaves.
+            ``n_leaves``
+                The number of leaf nodes.
+            ``mean_leaf_size``
+                The average number of points per leaf.
+            ``max_leaf_size``
+                The number of points in the largest leaf.  This can exceed
+                `leafsize` only when the leaf holds identical points.
+
+        """
+        cdef np.intp_t stats[4]
+        stats[0] = stats[1] = stats[2] = stats[3] = 0
+        self.__tree_stats(self.tree, 0, stats)
+        return {'depth': int(stats[0]),
+                'n_nodes': int(stats[1]),
+                'n_leaves': int(stats[2]),
+                'mean_leaf_size': self.n / float(stats[2]),
+                'max_leaf_size': int(stats[3])}
+
     def __dealloc__(cKDTree self):
+        if self.tree_buffer != <innernode*> NULL:
+            # nodes of a reloaded tree live in a single block
+            stdlib.free(self.tree_buffer)
+            return
         if <np.intp_t>(self.tree) == 0:
             # should happen only if __init__ was never called
             return
         self.__free_tree(self.tree)
 
+    # -------------------------
+    # pickling and file storage
+    # -------------------------
+
+    cdef np.intp_t __count_nodes(cKDTree self, innernode* node):
+        if node.split_dim == -1:
+            return 1
+        return (1 + self.__count_nodes(node.less) +
+                self.__count_nodes(node.greater))
+
+    cdef np.intp_t __flatten(cKDTree self, innernode* node,
+                             flatnode* nodes, np.intp_t pos):
+        # Store node at nodes[pos] and its subtrees after it; returns the
+        # position following the last node written
+        cdef leafnode* lnode
+        cdef np.intp_t next_pos
+        nodes[pos].split_dim = node.split_dim
+        nodes[pos].children = node.children
+        if node.split_dim == -1:
+            lnode = <leafnode*> node
+            nodes[pos].split = 0
+            nodes[pos].lo = lnode.start_idx
+            nodes[pos].hi = lnode.end_idx
+            return pos + 1
+        nodes[pos].split = node.split
+        nodes[pos].lo = pos + 1
+        next_pos = self.__flatten(node.less, nodes, pos + 1)
+        nodes[pos].hi = next_pos
+        return self.__flatten(node.greater, nodes, next_pos)
+
+    def _flat_tree(cKDTree self):
+        """Return the nodes of the tree as an array of dtype `node_dtype`"""
+        cdef np.ndarray nodes
+        nodes = np.empty(self.__count_nodes(self.tree), dtype=node_dtype)
+        self.__flatten(self.tree, <flatnode*> np.PyArray_DATA(nodes), 0)
+        return nodes
+
+    cdef int __set_state(cKDTree self, data, np.intp_t leafsize, indices,
+                         nodes, mins, maxes, boxsize) except -1:
+        # Attach arrays describing an already built tree, rebuilding the
+        # node pointers in a single allocation
+        cdef np.intp_t i, n_nodes
+        cdef flatnode* flat
+        cdef flatnode* fn
+        cdef innernode* inode
+        cdef leafnode* lnode
+        cdef np.ndarray nodes_arr
+
+        if self.tree != <innernode*> NULL:
+            raise ValueError("cKDTree is already initialized")
+
+        if isinstance(data, np.ndarray) and data.dtype == np.float64:
+            # keep memory-mapped arrays as they are
+            data = data if data.flags.c_contiguous else np.ascontiguousarray(data)
+        else:
+            data = np.ascontiguousarray(data, dtype=np.float64)
+        if (isinstance(indices, np.ndarray) and indices.dtype == np.intp and
+                indices.flags.c_contiguous):
+            pass
+        else:
+            indices = np.ascontiguousarray(indices, dtype=np.intp)
+        nodes_arr = np.ascontiguousarray(nodes, dtype=node_dtype)
+
+        if data.ndim != 2 or indices.shape != (data.shape[0],):
+            raise ValueError("inconsistent cKDTree state")
+        self.data = data
+        self.n = data.shape[0]
+        self.m = data.shape[1]
+        self.leafsize = leafsize
+        self.indices = indices
+        mins = np.ascontiguousarray(mins, dtype=np.float64)
+        maxes = np.ascontiguousarray(maxes, dtype=np.float64)
+        if mins.shape != (self.m,) or maxes.shape != (self.m,):
+            raise ValueError("inconsistent cKDTree state")
+        self.mins = mins
+        self.maxes = maxes
+        self.__set_boxsize(boxsize)
+
+        self.raw_data = <np.float64_t*>np.PyArray_DATA(self.data)
+        self.raw_maxes = <np.float64_t*>np.PyArray_DATA(self.maxes)
+        self.raw_mins = <np.float64_t*>np.PyArray_DATA(self.mins)
+        self.raw_indices = <np.intp_t*>np.PyArray_DATA(self.indices)
+
+        n_nodes = nodes_arr.shape[0]
+        if n_nodes < 1:
+            raise ValueError("inconsistent cKDTree state")
+        flat = <flatnode*> np.PyArray_DATA(nodes_arr)
+
+        # check everything before touching any pointers
+        for i in range(n_nodes):
+            fn = &flat[i]
+            if fn.split_dim == -1:
+                if not (0 <= fn.lo <= fn.hi <= self.n):
+                    raise ValueError("corrupt cKDTree node array")
+            elif not (0 <= fn.split_dim < self.m and
+                      i < fn.lo < n_nodes and i < fn.hi < n_nodes):
+                raise ValueError("corrupt cKDTree node array")
+
+        self.tree_buffer = <innernode*> stdlib.malloc(n_nodes * sizeof(innernode))
+        if self.tree_buffer == <innernode*> NULL:
+            raise MemoryError
+        for i in range(n_nodes):
+            fn = &flat[i]
+            if fn.split_dim == -1:
+                lnode = <leafnode*> &self.tree_buffer[i]
+                lnode.split_dim = -1
+                lnode.children = fn.children
+                lnode.start_idx = fn.lo
+                lnode.end_idx = fn.hi
+            else:
+                inode = &self.tree_buffer[i]
+                inode.split_dim = fn.split_dim
+                inode.children = fn.children
+                inode.split = fn.split
+                inode.less = &self.tree_buffer[fn.lo]
+                inode.greater = &self.tree_buffer[fn.hi]
+        self.tree = self.tree_buffer
+        return 0
+
+    def __getstate__(cKDTree self):
+        return (self.data, self.leafsize, self.indices, self._flat_tree(),
+                self.mins, self.maxes, self.boxsize)
+
+    def __setstate__(cKDTree self, state):
+        data, leafsize, indices, nodes, mins, maxes, boxsize = state
+        self.__set_state(data, leafsize, indices, nodes, mins, maxes, boxsize)
+
+    def __reduce__(cKDTree self):
+        return (_new_ckdtree, (type(self),), self.__getstate__())
+
+    def save(cKDTree self, file):
+        """save(self, file)
+
+        Save the tree to a binary file.
+
+        The file holds the node array, the index permutation and the data
+        in a flat layout, so that it can be reloaded with `cKDTree.load`
+        without rebuilding the tree, optionally by memory-mapping it.
+
+        Parameters
+        ----------
+        file : str or file
+            Filename or open file object (opened in binary mode) where the
+            tree is written.
+
+        See Also
+        --------
+        load
+
+        """
+        header = np.array([_FILE_MAGIC, _FILE_VERSION, self.n, self.m,
+                           self.leafsize, 0, self.boxsize is not None],
+                          dtype='<i8')
+        nodes = self._flat_tree()
+        header[5] = nodes.shape[0]
+        arrays = [(header, '<i8'), (self.mins, '<f8'), (self.maxes, '<f8')]
+        if self.boxsize is not None:
+            arrays.append((self.boxsize, '<f8'))
+        arrays += [(nodes, node_dtype.newbyteorder('<')),
+                   (self.indices, '<i8'),
+                   (self.data, '<f8')]
+
+        own_fid = not hasattr(file, 'write')
+        fid = open(file, 'wb') if own_fid else file
+        try:
+            for arr, dtype in arrays:
+                fid.write(np.ascontiguousarray(arr, dtype=dtype).tostring())
+        finally:
+            if own_fid:
+                fid.close()
+
+    @staticmethod
+    def load(file, mmap_mode='r'):
+        """load(file, mmap_mode='r')
+
+        Load a tree written by `cKDTree.save`.
+
+        Parameters
+        ----------
+        file : str
+            Name of the file to read.
+        mmap_mode : {None, 'r', 'c'}, optional
+            If not None, the index permutation and the data are
+            memory-mapped instead of read into memory, with the given mode
+            (see `numpy.memmap`; the tree cannot be modified in place so
+            'r+' and 'w+' are not allowed).  Loading is then nearly
+            instantaneous, and processes mapping the same file share its
+            pages.  Only the node array is copied.  Default is 'r'.
+
+        Returns
+        -------
+        tree : cKDTree
+            The reloaded tree.
+
+        See Also
+        --------
+        save
+
+        """
+        cdef cKDTree tree
+        cdef np.intp_t n, m, leafsize, n_nodes, offset
+
+        if mmap_mode not in (None, 'r', 'c'):
+            raise ValueError("mmap_mode must be None, 'r' or 'c'")
+
+        def read(dtype, count):
+            dtype = np.dtype(dtype)
+            if mmap_mode is None:
+                with open(file, 'rb') as fid:
+                    fid.seek(offset)
+                    arr = np.fromfile(fid, dtype=dtype, count=count)
+                if arr.shape[0] != count:
+                    raise ValueError("%s: file is truncated" % (file,))
+            elif count == 0:
+                arr = np.empty(0, dtype=dtype)
+            else:
+                arr = np.memmap(file, dtype=dtype, mode=mmap_mode,
+                                offset=offset, shape=(count,))
+            return arr, offset + count * dtype.itemsize
+
+        offset = 0
+        with open(file, 'rb') as fid:
+            header = np.fromfile(fid, dtype='<i8', count=_FILE_HEADER_SIZE)
+        if header.shape[0] != _FILE_HEADER_SIZE or header[0] != _FILE_MAGIC:
+            raise ValueError("%s is not a cKDTree file" % (file,))
+        if header[1] != _FILE_VERSION:
+            raise ValueError("unsupported cKDTree file version %d"
+                             % int(header[1]))
+        n, m, leafsize, n_nodes, periodic = header[2:]
+        offset = _FILE_HEADER_SIZE * 8
+
+        mins, offset = read('<f8', m)
+        maxes, offset = read('<f8', m)
+        boxsize = None
+        if periodic:
+            boxsize, offset = read('<f8', m)
+            boxsize = np.array(boxsize)
+        nodes, offset = read(node_dtype.newbyteorder('<'), n_nodes)
+        indices, offset = read('<i8', n)
+        data, offset = read('<f8', n * m)
+
+        tree = _new_ckdtree(cKDTree)
+        tree.__set_state(data.reshape(n, m), leafsize, indices, nodes,
+                         mins, maxes, boxsize)
+        return tree
+
     # -----
     # query
     # -----
 
+    @cython.cdivision(True)
     cdef int __query(cKDTree self, 
             np.float64_t*result_distances, 
             np.intp_t*result_indices, 
@@ -948,12 +1779,11 @@ cdef class cKDTree:
             np.intp_t k, 
             np.float64_t eps, 
             np.float64_t p, 
-            np.float64_t distance_upper_bound) except -1:
-
-        cdef heap q
-        cdef heap neighbors
+            np.float64_t distance_upper_bound,
+            heap q,
+            heap neighbors) nogil except -1:
 
-        cdef np.intp_t i, j
+        cdef np.intp_t i, j, nbuf
         cdef np.float64_t t
         cdef nodeinfo* inf
         cdef nodeinfo* inf2
@@ -961,6 +1791,8 @@ cdef class cKDTree:
         cdef np.float64_t epsfac
         cdef np.float64_t min_distance
         cdef np.float64_t far_min_distance
+        cdef np.float64_t split_distance, less_distance, greater_distance
+        cdef np.float64_t* box = self.raw_boxsize
         cdef heapitem it, it2, neighbor
         cdef leafnode* node
         cdef innernode* inode
@@ -969,35 +1801,47 @@ cdef class cKDTree:
         cdef np.float64_t* side_distances
 
 
-        # priority queue for chasing nodes
+        # q is the priority queue for chasing nodes
         # entries are:
         #  minimum distance between the cell and the target
         #  distances between the nearest side of the cell and the target
         #  the head node of the cell
-        q = heap(12)
-
-        # priority queue for the nearest neighbors
+        #
+        # neighbors is the priority queue for the nearest neighbors
         # furthest known neighbor first
         # entries are (-distance**p, i)
-        neighbors = heap(k)
+        #
+        # Both are provided by the caller so that they can be reused
+        # across queries; they are expected to be empty on entry.
+        #
+        # In a periodic tree the side distances no longer follow from the
+        # split values alone, so a nodeinfo also carries the bounds of its
+        # cell: side_distances[m:2m] are the mins, [2m:3m] the maxes.
 
         inf = inf2 = <nodeinfo*> NULL    
+        nbuf = self.m if box == NULL else 3 * self.m
 
         try:
             # set up first nodeinfo
-            inf = <nodeinfo*>stdlib.malloc(sizeof(nodeinfo)+self.m*sizeof(np.float64_t))
+            inf = <nodeinfo*>stdlib.malloc(sizeof(nodeinfo)+nbuf*sizeof(np.float64_t))
             if inf == <nodeinfo*> NULL:
-                raise MemoryError
+                _raise_memory_error()
             inf.node = self.tree
             for i in range(self.m):
                 inf.side_distances[i] = 0
-                t = x[i]-self.raw_maxes[i]
-                if t>inf.side_distances[i]:
-                    inf.side_distances[i] = t
+                if box != NULL:
+                    inf.side_distances[i] = _min_wrapped(
+                        x[i] - self.raw_maxes[i], x[i] - self.raw_mins[i], box[i])
+                    inf.side_distances[self.m + i] = self.raw_mins[i]
+                    inf.side_distances[2 * self.m + i] = self.raw_maxes[i]
                 else:
-                    t = self.raw_mins[i]-x[i]
+                    t = x[i]-self.raw_maxes[i]
                     if t>inf.side_distances[i]:
                         inf.side_distances[i] = t
+                    else:
+                        t = self.raw_mins[i]-x[i]
+                        if t>inf.side_distances[i]:
+                            inf.side_distances[i] = t
                 if p!=1 and p!=infinity:
                     inf.side_distances[i]=inf.side_distances[i]**p
 
@@ -1027,9 +1871,9 @@ cdef class cKDTree:
 
                     # brute-force
                     for i in range(node.start_idx,node.end_idx):
-                        d = _distance_p(
+                        d = _distance_p_box(
                                 self.raw_data+self.raw_indices[i]*self.m,
-                                x,p,self.m,distance_upper_bound)
+                                x,p,self.m,distance_upper_bound,box)
                             
                         if d<distance_upper_bound:
                             # replace furthest neighbor
@@ -1073,12 +1917,31 @@ cdef class cKDTree:
                         break
 
                     # set up children for searching
-                    if x[inode.split_dim]<inode.split:
-                        near = inode.less
-                        far = inode.greater
+                    j = inode.split_dim
+                    if box == NULL:
+                        if x[j]<inode.split:
+                            near = inode.less
+                            far = inode.greater
+                        else:
+                            near = inode.greater
+                            far = inode.less
+                        split_distance = dabs(inode.split-x[j])
                     else:
-                        near = inode.greater
-                        far = inode.less
+                        # the nearer child may lie across the boundary
+                        less_distance = _min_wrapped(
+                            x[j] - inode.split,
+                            x[j] - inf.side_distances[self.m + j], box[j])
+                        greater_distance = _min_wrapped(
+                            x[j] - inf.side_distances[2 * self.m + j],
+                            x[j] - inode.split, box[j])
+                        if less_distance <= greater_distance:
+                            near = inode.less
+                            far = inode.greater
+                            split_distance = greater_distance
+                        else:
+                            near = inode.greater
+                            far = inode.less
+                            split_distance = less_distance
 
                     # near child is at the same distance as the current node
                     # we're going here next, so no point pushing it on the queue
@@ -1088,30 +1951,38 @@ cdef class cKDTree:
                     # far child is further by an amount depending only
                     # on the split value; compute its distance and side_distances
                     # and push it on the queue if it's near enough
-                    inf2 = <nodeinfo*>stdlib.malloc(sizeof(nodeinfo)+self.m*sizeof(np.float64_t))
+                    inf2 = <nodeinfo*>stdlib.malloc(sizeof(nodeinfo)+nbuf*sizeof(np.float64_t))
                     if inf2 == <nodeinfo*> NULL:
-                        raise MemoryError
+                        _raise_memory_error()
             
                     it2.contents.ptrdata = <char*> inf2
                     inf2.node = far
                     # most side distances unchanged
-                    for i in range(self.m):
+                    for i in range(nbuf):
                         inf2.side_distances[i] = inf.side_distances[i]
 
+                    if box != NULL:
+                        # split the cell bounds between the children
+                        if far == inode.greater:
+                            inf.side_distances[2 * self.m + j] = inode.split
+                            inf2.side_distances[self.m + j] = inode.split
+                        else:
+                            inf.side_distances[self.m + j] = inode.split
+                            inf2.side_distances[2 * self.m + j] = inode.split
+
                     # one side distance changes
                     # we can adjust the minimum distance without recomputing
                     if p == infinity:
                         # we never use side_distances in the l_infinity case
-                        # inf2.side_distances[inode.split_dim] = dabs(inode.split-x[inode.split_dim])
-                        far_min_distance = dmax(min_distance, dabs(inode.split-x[inode.split_dim]))
+                        # inf2.side_distances[inode.split_dim] = split_distance
+                        far_min_distance = dmax(min_distance, split_distance)
                     elif p == 1:
-                        inf2.side_distances[inode.split_dim] = dabs(inode.split-x[inode.split_dim])
+                        inf2.side_distances[inode.split_dim] = split_distance
                         far_min_distance = min_distance - \
                             inf.side_distances[inode.split_dim] + \
                             inf2.side_distances[inode.split_dim]
                     else:
-                        inf2.side_distances[inode.split_dim] = dabs(inode.split - 
-                                                                    x[inode.split_dim])**p
+                        inf2.side_distances[inode.split_dim] = split_distance**p
                         far_min_distance = min_distance - \
                             inf.side_distances[inode.split_dim] + \
                             inf2.side_distances[inode.split_dim]
@@ -1146,13 +2017,45 @@ cdef class cKDTree:
             if inf != <nodeinfo*> NULL:
                 stdlib.free(inf)
 
+            # free the nodes left on the heap if we bailed out early
+            for i in range(q.n):
+                stdlib.free(q.heap[i].contents.ptrdata)
+            q.n = 0
+            neighbors.n = 0
+
+        return 0
+
+    cdef int __query_range(cKDTree self,
+                           np.ndarray dd_arr,
+                           np.ndarray ii_arr,
+                           np.ndarray xx_arr,
+                           np.intp_t start,
+                           np.intp_t stop,
+                           np.intp_t k,
+                           np.float64_t eps,
+                           np.float64_t p,
+                           np.float64_t distance_upper_bound) except -1:
+        # Answer the queries xx[start:stop]; the work is done without
+        # the GIL so that several ranges can be processed concurrently
+        cdef np.float64_t *dd = <np.float64_t*>np.PyArray_DATA(dd_arr)
+        cdef np.intp_t *ii = <np.intp_t*>np.PyArray_DATA(ii_arr)
+        cdef np.float64_t *xx = <np.float64_t*>np.PyArray_DATA(xx_arr)
+        cdef heap q = heap(12)
+        cdef heap neighbors = heap(k)
+        cdef np.intp_t c
+        with nogil:
+            for c in range(start, stop):
+                self.__query(dd + c*k, ii + c*k, xx + c*self.m,
+                             k, eps, p, distance_upper_bound,
+                             q, neighbors)
         return 0
 
 
     @cython.boundscheck(False)
     def query(cKDTree self, object x, np.intp_t k=1, np.float64_t eps=0,
-              np.float64_t p=2, np.float64_t distance_upper_bound=infinity):
-        """query(self, x, k=1, eps=0, p=2, distance_upper_bound=np.inf)
+              np.float64_t p=2, np.float64_t distance_upper_bound=infinity,
+              np.intp_t n_jobs=1):
+        """query(self, x, k=1, eps=0, p=2, distance_upper_bound=np.inf, n_jobs=1)
         
         Query the kd-tree for nearest neighbors
 
@@ -1176,6 +2079,9 @@ cdef class cKDTree:
             tree searches, so if you are doing a series of nearest-neighbor
             queries, it may help to supply the distance to the nearest neighbor
             of the most recent point.
+        n_jobs : int, optional
+            Number of jobs to schedule for parallel processing. If -1 is given
+            all processors are used. Default: 1.
 
         Returns
         -------
@@ -1193,6 +2099,7 @@ cdef class cKDTree:
         cdef np.ndarray[np.float64_t, ndim=2] dd
         cdef np.ndarray[np.float64_t, ndim=2] xx
         cdef np.intp_t c, n, i, j
+        cdef object dd_arr, ii_arr, xx_arr
         cdef np.ndarray x_arr = np.asarray(x, dtype=np.float64)
         if x_arr.ndim == 0 or x_arr.shape[x_arr.ndim - 1] != self.m:
             raise ValueError("x must consist of vectors of length %d but "
@@ -1206,14 +2113,19 @@ cdef class cKDTree:
             single = False
         retshape = np.shape(x)[:-1]
         n = <np.intp_t> np.prod(retshape)
-        xx = np.ascontiguousarray(x_arr).reshape(n, self.m)
+        xx = self.__wrap_points(np.ascontiguousarray(x_arr).reshape(n, self.m))
         dd = np.empty((n,k),dtype=np.float64)
         dd.fill(infinity)
         ii = np.empty((n,k),dtype=np.intp)
         ii.fill(self.n)
-        for c in range(n):
-            self.__query(&dd[c, 0], &ii[c, 0], &xx[c, 0],
-                         k, eps, p, distance_upper_bound)
+
+        dd_arr, ii_arr, xx_arr = dd, ii, xx
+
+        def _thread_func(np.intp_t start, np.intp_t stop):
+            self.__query_range(dd_arr, ii_arr, xx_arr, start, stop,
+                               k, eps, p, distance_upper_bound)
+
+        _run_threaded(_thread_func, n, n_jobs)
 
         if single:
             if k==1:
@@ -1257,15 +2169,15 @@ cdef class cKDTree:
     # query_ball_point
     # ----------------
     cdef int __query_ball_point_traverse_no_checking(cKDTree self,
-                                                     list results,
-                                                     innernode* node) except -1:
+                                                     index_buffer results,
+                                                     innernode* node) nogil except -1:
         cdef leafnode* lnode
         cdef np.intp_t i
 
         if node.split_dim == -1:  # leaf node
             lnode = <leafnode*> node
             for i in range(lnode.start_idx, lnode.end_idx):
-                list_append(results, self.raw_indices[i])
+                results.add(self.raw_indices[i])
         else:
             self.__query_ball_point_traverse_no_checking(results, node.less)
             self.__query_ball_point_traverse_no_checking(results, node.greater)
@@ -1275,9 +2187,9 @@ cdef class cKDTree:
 
     @cython.cdivision(True)
     cdef int __query_ball_point_traverse_checking(cKDTree self,
-                                                  list results,
+                                                  index_buffer results,
                                                   innernode* node,
-                                                  PointRectDistanceTracker tracker) except -1:
+                                                  PointRectDistanceTracker tracker) nogil except -1:
         cdef leafnode* lnode
         cdef np.float64_t d
         cdef np.intp_t i
@@ -1290,11 +2202,12 @@ cdef class cKDTree:
             lnode = <leafnode*>node
             # brute-force
             for i in range(lnode.start_idx, lnode.end_idx):
-                d = _distance_p(
+                d = _distance_p_box(
                     self.raw_data + self.raw_indices[i] * self.m,
-                    tracker.pt, tracker.p, self.m, tracker.upper_bound)
+                    tracker.pt, tracker.p, self.m, tracker.upper_bound,
+                    self.raw_boxsize)
                 if d <= tracker.upper_bound:
-                    list_append(results, self.raw_indices[i])
+                    results.add(self.raw_indices[i])
         else:
             tracker.push_less_of(node)
             self.__query_ball_point_traverse_checking(
@@ -1309,25 +2222,46 @@ cdef class cKDTree:
         return 0
 
 
-    cdef list __query_ball_point(cKDTree self,
-                                 np.float64_t* x,
-                                 np.float64_t r,
-                                 np.float64_t p,
-                                 np.float64_t eps):
-
-        tracker = PointRectDistanceTracker()
-        tracker.init(x, Rectangle(self.mins, self.maxes),
+    cdef int __query_ball_point_range(cKDTree self,
+                                      np.ndarray xx_arr,
+                                      np.ndarray result,
+                                      np.intp_t start,
+                                      np.intp_t stop,
+                                      np.float64_t r,
+                                      np.float64_t p,
+                                      np.float64_t eps) except -1:
+        # Find the neighbors of xx[start:stop] and store them as lists in
+        # result[start:stop]; the tree traversals are done without the GIL
+        cdef np.float64_t *xx = <np.float64_t*>np.PyArray_DATA(xx_arr)
+        cdef np.ndarray[np.intp_t, ndim=1] bounds
+        cdef np.intp_t *raw_bounds
+        cdef np.intp_t c
+        cdef index_buffer results = index_buffer()
+        cdef PointRectDistanceTracker tracker = PointRectDistanceTracker()
+
+        bounds = np.empty(stop - start + 1, dtype=np.intp)
+        raw_bounds = <np.intp_t*>np.PyArray_DATA(bounds)
+        tracker.init(xx + start * self.m, Rectangle(self.mins, self.maxes, self.boxsize),
                      p, eps, r)
-        
-        results = []
-        self.__query_ball_point_traverse_checking(
-            results, self.tree, tracker)
-        return results
+
+        with nogil:
+            for c in range(start, stop):
+                tracker.reset(xx + c * self.m, p, eps, r)
+                raw_bounds[c - start] = results.n
+                self.__query_ball_point_traverse_checking(
+                    results, self.tree, tracker)
+            raw_bounds[stop - start] = results.n
+
+        for c in range(start, stop):
+            result[c] = results.to_list(raw_bounds[c - start],
+                                        raw_bounds[c - start + 1])
+        return 0
 
 
     def query_ball_point(cKDTree self, object x, np.float64_t r,
-                         np.float64_t p=2., np.float64_t eps=0):
-        """query_ball_point(self, x, r, p, eps)
+                         np.float64_t p=2., np.float64_t eps=0,
+                         np.intp_t n_jobs=1):
+        """query_ball_point(self, x, r, p=2., eps=0, n_jobs=1)
         
         Find all points within distance r of point(s) x.
 
@@ -1344,6 +2278,9 @@ cdef class cKDTree:
             nearest points are further than ``r / (1 + eps)``, and branches are
             added in bulk if their furthest points are nearer than
             ``r * (1 + eps)``.
+        n_jobs : int, optional
+            Number of jobs to schedule for parallel processing. If -1 is given
+            all processors are used. Default: 1.
 
         Returns
         -------
@@ -1368,22 +2305,32 @@ cdef class cKDTree:
         [4, 8, 9, 12]
 
         """
-        cdef np.ndarray[np.float64_t, ndim=1, mode="c"] xx
+        cdef np.ndarray[np.float64_t, ndim=2, mode="c"] xx
+        cdef np.intp_t n
+        cdef object xx_arr
         
         x = np.asarray(x, dtype=np.float64)
         if x.shape[-1] != self.m:
             raise ValueError("Searching for a %d-dimensional point in a " \
                              "%d-dimensional KDTree" % (int(x.shape[-1]), int(self.m)))
+        retshape = x.shape[:-1]
+        n = <np.intp_t> np.prod(retshape)
+        xx = self.__wrap_points(
+            np.ascontiguousarray(x, dtype=np.float64).reshape(n, self.m))
+        result = np.empty(n, dtype=object)
+
+        xx_arr = xx
+
+        def _thread_func(np.intp_t start, np.intp_t stop):
+            self.__query_ball_point_range(xx_arr, result, start, stop,
+                                          r, p, eps)
+
+        _run_threaded(_thread_func, n, n_jobs)
+
         if len(x.shape) == 1:
-            xx = np.ascontiguousarray(x, dtype=np.float64)
-            return self.__query_ball_point(&xx[0], r, p, eps)
+            return result[0]
         else:
-            retshape = x.shape[:-1]
-            result = np.empty(retshape, dtype=object)
-            for c in np.ndindex(retshape):
-                xx = np.ascontiguousarray(x[c], dtype=np.float64)
-                result[c] = self.__query_ball_point(&xx[0], r, p, eps)
-            return result
+            return result.reshape(retshape)
 
     # ---------------
     # query_ball_tree
@@ -1447,10 +2394,11 @@ cdef class cKDTree:
                 for i in range(lnode1.start_idx, lnode1.end_idx):
                     results_i = results[self.raw_indices[i]]
                     for j in range(lnode2.start_idx, lnode2.end_idx):
-                        d = _distance_p(
+                        d = _distance_p_box(
                             self.raw_data + self.raw_indices[i] * self.m,
                             other.raw_data + other.raw_indices[j] * other.m,
-                            tracker.p, self.m, tracker.upper_bound)
+                            tracker.p, self.m, tracker.upper_bound,
+                            self.raw_boxsize)
                         if d <= tracker.upper_bound:
                             list_append(results_i, other.raw_indices[j])
                             
@@ -1539,13 +2487,12 @@ cdef class cKDTree:
         """
 
         # Make sure trees are compatible
-        if self.m != other.m:
-            raise ValueError("Trees passed to query_ball_tree have different dimensionality")
+        self.__check_compatible(other, 'query_ball_tree')
 
         # Track node-to-node min/max distances
         tracker = RectRectDistanceTracker(
-            Rectangle(self.mins, self.maxes),
-            Rectangle(other.mins, other.maxes),
+            Rectangle(self.mins, self.maxes, self.boxsize),
+            Rectangle(other.mins, other.maxes, other.boxsize),
             p, eps, r)
         
         results = [[] for i in range(self.n)]
@@ -1635,10 +2582,11 @@ cdef class cKDTree:
                         min_j = lnode2.start_idx
                         
                     for j in range(min_j, lnode2.end_idx):
-                        d = _distance_p(
+                        d = _distance_p_box(
                             self.raw_data + self.raw_indices[i] * self.m,
                             self.raw_data + self.raw_indices[j] * self.m,
-                            tracker.p, self.m, tracker.upper_bound)
+                            tracker.p, self.m, tracker.upper_bound,
+                            self.raw_boxsize)
                         if d <= tracker.upper_bound:
                             set_add_ordered_pair(results,
                                                  self.raw_indices[i],
@@ -1728,8 +2676,8 @@ cdef class cKDTree:
         """
         
         tracker = RectRectDistanceTracker(
-            Rectangle(self.mins, self.maxes),
-            Rectangle(self.mins, self.maxes),
+            Rectangle(self.mins, self.maxes, self.boxsize),
+            Rectangle(self.mins, self.maxes, self.boxsize),
             p, eps, r)
         
         results = set()
@@ -1742,119 +2690,209 @@ cdef class cKDTree:
     # ---------------
     # count_neighbors
     # ---------------
+    @cython.cdivision(True)
     cdef int __count_neighbors_traverse(cKDTree self,
                                         cKDTree other,
-                                        np.intp_t n_queries,
-                                        np.float64_t* r,
-                                        np.intp_t * results,
-                                        np.intp_t * idx,
-                                        innernode* node1,
-                                        innernode* node2,
-                                        RectRectDistanceTracker tracker) except -1:
+                                        pair_count_state *st,
+                                        np.intp_t lo, np.intp_t hi,
+                                        innernode* node1, np.intp_t start1,
+                                        innernode* node2, np.intp_t start2,
+                                        RectRectDistanceTracker tracker) nogil except -1:
+        # Pairs between node1 and node2 fall in the bins lo..hi, where
+        # hi == st.n_r stands for "beyond the largest radius".  start1 and
+        # start2 are the positions of the nodes' first points in the trees.
         cdef leafnode *lnode1
         cdef leafnode *lnode2
-        cdef np.float64_t d
-        cdef np.intp_t *old_idx
-        cdef np.intp_t old_n_queries, l, i, j
-
-        # Speed through pairs of nodes all of whose children are close
-        # and see if any work remains to be done
-        old_idx = idx
-        cdef np.ndarray[np.intp_t, ndim=1] inner_idx
-        inner_idx = np.empty((n_queries,), dtype=np.intp)
-        idx = &inner_idx[0]
-
-        old_n_queries = n_queries
-        n_queries = 0
-        for i in range(old_n_queries):
-            if tracker.max_distance < r[old_idx[i]]:
-                results[old_idx[i]] += node1.children * node2.children
-            elif tracker.min_distance <= r[old_idx[i]]:
-                idx[n_queries] = old_idx[i]
-                n_queries += 1
-
-        if n_queries > 0:
-            # OK, need to probe a bit deeper
-            if node1.split_dim == -1:  # 1 is leaf node
-                lnode1 = <leafnode*>node1
-                if node2.split_dim == -1:  # 1 & 2 are leaves
-                    lnode2 = <leafnode*>node2
-                    
-                    # brute-force
-                    for i in range(lnode1.start_idx, lnode1.end_idx):
-                        for j in range(lnode2.start_idx, lnode2.end_idx):
-                            d = _distance_p(
-                                self.raw_data + self.raw_indices[i] * self.m,
-                                other.raw_data + other.raw_indices[j] * other.m,
-                                tracker.p, self.m, tracker.max_distance)
-                            # I think it's usually cheaper to test d against all r's
-                            # than to generate a distance array, sort it, then
-                            # search for all r's via binary search
-                            for l in range(n_queries):
-                                if d <= r[idx[l]]:
-                                    results[idx[l]] += 1
-                                
-                else:  # 1 is a leaf node, 2 is inner node
-                    tracker.push_less_of(2, node2)
-                    self.__count_neighbors_traverse(
-                        other, n_queries, r, results, idx,
-                        node1, node2.less, tracker)
-                    tracker.pop()
+        cdef np.float64_t d, w1, upper
+        cdef np.intp_t i, j, a, b, c
+
+        # Narrow down the bins using the node-to-node distance bounds
+        while lo < hi and st.r[lo] < tracker.min_distance:
+            lo += 1
+        while hi > lo and st.r[hi - 1] > tracker.max_distance:
+            hi -= 1
+
+        if lo == st.n_r:
+            # all pairs are beyond the largest radius
+            return 0
+        if lo == hi:
+            # all pairs fall in the same bin
+            if st.counts != NULL:
+                st.counts[lo] += node1.children * node2.children
+            else:
+                st.results[lo] += (
+                    _node_weight(st.cw1, start1, node1.children) *
+                    _node_weight(st.cw2, start2, node2.children))
+            return 0
+
+        # OK, need to probe a bit deeper
+        if node1.split_dim == -1:  # 1 is leaf node
+            lnode1 = <leafnode*>node1
+            if node2.split_dim == -1:  # 1 & 2 are leaves
+                lnode2 = <leafnode*>node2
+                upper = st.r[st.n_r - 1]
+
+                # brute-force
+                for i in range(lnode1.start_idx, lnode1.end_idx):
+                    w1 = _point_weight(st.w1, i)
+                    for j in range(lnode2.start_idx, lnode2.end_idx):
+                        d = _distance_p_box(
+                            self.raw_data + self.raw_indices[i] * self.m,
+                            other.raw_data + other.raw_indices[j] * other.m,
+                            tracker.p, self.m, upper,
+                            self.raw_boxsize)
+                        # binary search for the first radius >= d
+                        a = lo
+                        b = st.n_r
+                        while a < b:
+                            c = a + (b - a) // 2
+                            if st.r[c] < d:
+                                a = c + 1
+                            else:
+                                b = c
+                        if st.counts != NULL:
+                            st.counts[a] += 1
+                        else:
+                            st.results[a] += w1 * _point_weight(st.w2, j)
+
+            else:  # 1 is a leaf node, 2 is inner node
+                tracker.push_less_of(2, node2)
+                self.__count_neighbors_traverse(
+                    other, st, lo, hi, node1, start1,
+                    node2.less, start2, tracker)
+                tracker.pop()
+
+                tracker.push_greater_of(2, node2)
+                self.__count_neighbors_traverse(
+                    other, st, lo, hi, node1, start1,
+                    node2.greater, start2 + node2.less.children, tracker)
+                tracker.pop()
+
+        else:  # 1 is an inner node
+            if node2.split_dim == -1:  # 1 is an inner node, 2 is a leaf node
+                tracker.push_less_of(1, node1)
+                self.__count_neighbors_traverse(
+                    other, st, lo, hi, node1.less, start1,
+                    node2, start2, tracker)
+                tracker.pop()
+
+                tracker.push_greater_of(1, node1)
+                self.__count_neighbors_traverse(
+                    other, st, lo, hi, node1.greater,
+                    start1 + node1.less.children, node2, start2, tracker)
+                tracker.pop()
+
+            else: # 1 and 2 are inner nodes
+                tracker.push_less_of(1, node1)
+                tracker.push_less_of(2, node2)
+                self.__count_neighbors_traverse(
+                    other, st, lo, hi, node1.less, start1,
+                    node2.less, start2, tracker)
+                tracker.pop()
+
+                tracker.push_greater_of(2, node2)
+                self.__count_neighbors_traverse(
+                    other, st, lo, hi, node1.less, start1,
+                    node2.greater, start2 + node2.less.children, tracker)
+                tracker.pop()
+                tracker.pop()
+
+                tracker.push_greater_of(1, node1)
+                tracker.push_less_of(2, node2)
+                self.__count_neighbors_traverse(
+                    other, st, lo, hi, node1.greater,
+                    start1 + node1.less.children,
+                    node2.less, start2, tracker)
+                tracker.pop()
+
+                tracker.push_greater_of(2, node2)
+                self.__count_neighbors_traverse(
+                    other, st, lo, hi, node1.greater,
+                    start1 + node1.less.children,
+                    node2.greater, start2 + node2.less.children, tracker)
+                tracker.pop()
+                tracker.pop()
 
-                    tracker.push_greater_of(2, node2)
-                    self.__count_neighbors_traverse(
-                        other, n_queries, r, results, idx,
-                        node1, node2.greater, tracker)
-                    tracker.pop()
-                
-            else:  # 1 is an inner node
-                if node2.split_dim == -1:  # 1 is an inner node, 2 is a leaf node
-                    tracker.push_less_of(1, node1)
-                    self.__count_neighbors_traverse(
-                        other, n_queries, r, results, idx,
-                        node1.less, node2, tracker)
-                    tracker.pop()
-                    
-                    tracker.push_greater_of(1, node1)
-                    self.__count_neighbors_traverse(
-                        other, n_queries, r, results, idx,
-                        node1.greater, node2, tracker)
-                    tracker.pop()
-                    
-                else: # 1 and 2 are inner nodes
-                    tracker.push_less_of(1, node1)
-                    tracker.push_less_of(2, node2)
-                    self.__count_neighbors_traverse(
-                        other, n_queries, r, results, idx,
-                        node1.less, node2.less, tracker)
-                    tracker.pop()
-                        
-                    tracker.push_greater_of(2, node2)
-                    self.__count_neighbors_traverse(
-                        other, n_queries, r, results, idx,
-                        node1.less, node2.greater, tracker)
-                    tracker.pop()
-                    tracker.pop()
-                        
-                    tracker.push_greater_of(1, node1)
-                    tracker.push_less_of(2, node2)
-                    self.__count_neighbors_traverse(
-                        other, n_queries, r, results, idx,
-                        node1.greater, node2.less, tracker)
-                    tracker.pop()
-                        
-                    tracker.push_greater_of(2, node2)
-                    self.__count_neighbors_traverse(
-                        other, n_queries, r, results, idx,
-                        node1.greater, node2.greater, tracker)
-                    tracker.pop()
-                    tracker.pop()
-                    
         return 0
 
-    @cython.boundscheck(False)
-    def count_neighbors(cKDTree self, cKDTree other, object r, np.float64_t p=2.):
-        """count_neighbors(self, other, r, p)
+    cdef int __count_neighbors_tasks(cKDTree self, innernode* node,
+                                     np.intp_t start, np.ndarray mins,
+                                     np.ndarray maxes, np.intp_t levels,
+                                     list tasks) except -1:
+        # Split the nodes of self into the subtrees `levels` levels down,
+        # appending (node address, start, mins, maxes) for each to tasks.
+        cdef np.ndarray bound
+        if levels == 0 or node.split_dim == -1:
+            tasks.append((<np.intp_t> node, start, mins, maxes))
+            return 0
+        bound = maxes.copy()
+        bound[node.split_dim] = node.split
+        self.__count_neighbors_tasks(node.less, start, mins, bound,
+                                     levels - 1, tasks)
+        bound = mins.copy()
+        bound[node.split_dim] = node.split
+        self.__count_neighbors_tasks(node.greater, start + node.less.children,
+                                     bound, maxes, levels - 1, tasks)
+        return 0
+
+    cdef int __count_neighbors_run(cKDTree self, cKDTree other,
+                                   np.float64_t p, np.ndarray r,
+                                   tuple weights, tuple task,
+                                   np.ndarray results) except -1:
+        # Count the pairs between the subtree of self described by task
+        # and all of other, adding them into results, which holds exact
+        # counts if its dtype is intp and weights otherwise
+        cdef pair_count_state st
+        cdef RectRectDistanceTracker tracker
+        cdef innernode* node1 = <innernode*> <np.intp_t> task[0]
+        cdef np.intp_t start1 = task[1]
+        cdef np.float64_t** ptrs[4]
+        cdef np.intp_t k
+
+        st.r = <np.float64_t*>np.PyArray_DATA(r)
+        st.n_r = r.shape[0]
+        if results.dtype == np.intp:
+            st.results = <np.float64_t*> NULL
+            st.counts = <np.intp_t*>np.PyArray_DATA(results)
+        else:
+            st.results = <np.float64_t*>np.PyArray_DATA(results)
+            st.counts = <np.intp_t*> NULL
+        ptrs[0] = &st.w1
+        ptrs[1] = &st.cw1
+        ptrs[2] = &st.w2
+        ptrs[3] = &st.cw2
+        for k in range(4):
+            if weights[k] is None:
+                ptrs[k][0] = <np.float64_t*> NULL
+            else:
+                ptrs[k][0] = <np.float64_t*>np.PyArray_DATA(weights[k])
+
+        tracker = RectRectDistanceTracker(
+            Rectangle(task[2], task[3], self.boxsize),
+            Rectangle(other.mins, other.maxes, other.boxsize),
+            p, 0.0, 0.0)
+        with nogil:
+            self.__count_neighbors_traverse(other, &st, 0, st.n_r,
+                                            node1, start1, other.tree, 0,
+                                            tracker)
+        return 0
+
+    cdef tuple __tree_order_weights(cKDTree self, object weights):
+        # Weights of the points in tree order and their cumulative sums
+        cdef np.ndarray w
+        if weights is None:
+            return None, None
+        w = np.ascontiguousarray(weights, dtype=np.float64)
+        if w.ndim != 1 or w.shape[0] != self.n:
+            raise ValueError("weights must be a one-dimensional array with "
+                             "one weight per data point")
+        w = w[self.indices]
+        return w, np.concatenate(([0.], np.cumsum(w)))
+
+    def count_neighbors(cKDTree self, cKDTree other, object r, np.float64_t p=2.,
+                        object weights=None, cumulative=True,
+                        np.intp_t n_jobs=1):
+        """count_neighbors(self, other, r, p=2., weights=None, cumulative=True, n_jobs=1)
 
         Count how many nearby pairs can be formed.
 
@@ -1874,22 +2912,40 @@ cdef class cKDTree:
             a single tree traversal.
         p : float, 1<=p<=infinity
             Which Minkowski p-norm to use
+        weights : tuple, array_like or None, optional
+            If None, every pair counts as one.  If a tuple, ``weights[0]``
+            holds the weights of the points in self and ``weights[1]`` those
+            of the points in `other`; either may be None for unit weights.
+            A pair then counts as the product of the weights of its points.
+            If an array, it holds the weights of the points of both trees,
+            which requires `other` to be self.
+        cumulative : bool, optional
+            If True (default), count the pairs with ``distance <= r`` for
+            each radius.  If False, `r` must be non-decreasing and the pairs
+            with ``r[i-1] < distance <= r[i]`` are counted instead, giving a
+            histogram of the pair distances with the radii as bin edges.
+        n_jobs : int, optional
+            Number of threads to split the traversal between. If -1 is
+            given all processors are used. Default: 1.
 
         Returns
         -------
-        result : int or 1-D array of ints
-            The number of pairs. Note that this is internally stored in a numpy int,
-            and so may overflow if very large (2e9).
+        result : scalar or 1-D array
+            The number of pairs, or their total weight if `weights` is
+            given.  Unweighted counts are stored in a numpy int, and so may
+            overflow if very large (2e9).
 
         """
         cdef int r_ndim
-        cdef np.intp_t n_queries, i
-        cdef np.ndarray[np.float64_t, ndim=1, mode="c"] real_r
-        cdef np.ndarray[np.intp_t, ndim=1, mode="c"] results, idx
+        cdef np.intp_t n_queries, levels
+        cdef np.ndarray real_r, order, results
+        cdef object w1, cw1, w2, cw2
+        cdef tuple tree_weights
+        cdef list tasks
 
         # Make sure trees are compatible
-        if self.m != other.m:
-            raise ValueError("Trees passed to count_neighbors have different dimensionality")
+        self.__check_compatible(other, 'count_neighbors')
+        n_jobs = _num_jobs(n_jobs)
 
         # Make a copy of r array to ensure it's contiguous and to modify it
         # below
@@ -1898,29 +2954,69 @@ cdef class cKDTree:
             raise ValueError("r must be either a single value or a one-dimensional array of values")
         real_r = np.array(r, ndmin=1, dtype=np.float64, copy=True)
         n_queries = real_r.shape[0]
+        if n_queries == 0:
+            raise ValueError("r must contain at least one radius")
+
+        # The traversal works on sorted radii; for cumulative counts any
+        # order is allowed, and the counts are put back in order at the end
+        if cumulative:
+            order = np.argsort(real_r, kind='mergesort')
+            real_r = real_r[order]
+        elif np.any(real_r[1:] < real_r[:-1]):
+            raise ValueError("r must be non-decreasing when cumulative is False")
 
         # Internally, we represent all distances as distance ** p
         if p != infinity:
-            for i in range(n_queries):
-                if real_r[i] != infinity:
-                    real_r[i] = real_r[i] ** p
+            real_r = real_r ** p
+
+        if weights is None:
+            w1 = cw1 = w2 = cw2 = None
+        elif isinstance(weights, tuple):
+            if len(weights) != 2:
+                raise ValueError("weights must be a tuple of two weight arrays")
+            w1, cw1 = self.__tree_order_weights(weights[0])
+            w2, cw2 = other.__tree_order_weights(weights[1])
+        else:
+            if other is not self:
+                raise ValueError("a single array of weights can only be "
+                                 "given when other is self; use a tuple")
+            w1, cw1 = self.__tree_order_weights(weights)
+            w2, cw2 = w1, cw1
+        tree_weights = (w1, cw1, w2, cw2)
+
+        # Split self into subtrees, a few per thread, and count the pairs
+        # of each subtree separately
+        levels = 0
+        if n_jobs > 1:
+            while (1 << levels) < 4 * n_jobs:
+                levels += 1
+        tasks = []
+        self.__count_neighbors_tasks(self.tree, 0, self.mins, self.maxes,
+                                     levels, tasks)
+        # Unweighted counts are kept as integers, which stay exact beyond
+        # 2**53 pairs
+        if weights is None:
+            results = np.zeros((len(tasks), n_queries + 1), dtype=np.intp)
+        else:
+            results = np.zeros((len(tasks), n_queries + 1), dtype=np.float64)
+
+        def _thread_func(np.intp_t start, np.intp_t stop):
+            cdef np.intp_t k
+            for k in range(start, stop):
+                self.__count_neighbors_run(other, p, real_r,
+                                           tree_weights, tasks[k], results[k])
+
+        _run_threaded(_thread_func, len(tasks), n_jobs)
+
+        results = results.sum(axis=0)[:n_queries]
+        if cumulative:
+            results = np.cumsum(results)
+            results[order] = results.copy()
 
-        # Track node-to-node min/max distances
-        tracker = RectRectDistanceTracker(
-            Rectangle(self.mins, self.maxes),
-            Rectangle(other.mins, other.maxes),
-            p, 0.0, 0.0)
-        
-        # Go!
-        results = np.zeros(n_queries, dtype=np.intp)
-        idx = np.arange(n_queries, dtype=np.intp)
-        self.__count_neighbors_traverse(other, n_queries,
-                                        &real_r[0], &results[0], &idx[0],
-                                        self.tree, other.tree,
-                                        tracker)
-        
         if r_ndim == 0:
-            if results[0] <= <np.intp_t> LONG_MAX:
+            if weights is not None:
+                return float(results[0])
+            elif results[0] <= <np.intp_t> LONG_MAX:
                 return int(results[0])
             else:
                 return results[0]
@@ -1957,10 +3053,11 @@ cdef class cKDTree:
                         min_j = lnode2.start_idx
                         
                     for j in range(min_j, lnode2.end_idx):
-                        d = _distance_p(
+                        d = _distance_p_box(
                             self.raw_data + self.raw_indices[i] * self.m,
                             other.raw_data + other.raw_indices[j] * self.m,
-                            tracker.p, self.m, tracker.upper_bound)
+                            tracker.p, self.m, tracker.upper_bound,
+                            self.raw_boxsize)
                         if d <= tracker.upper_bound:
                             if tracker.p != 1 and tracker.p != infinity:
                                 d = d**(1. / tracker.p)
@@ -2054,13 +3151,12 @@ cdef class cKDTree:
         """
 
         # Make sure trees are compatible
-        if self.m != other.m:
-            raise ValueError("Trees passed to sparse_distance_matrix have different dimensionality")
+        self.__check_compatible(other, 'sparse_distance_matrix')
 
         # Calculate mins and maxes to outer box
         tracker = RectRectDistanceTracker(
-            Rectangle(self.mins, self.maxes),
-            Rectangle(other.mins, other.maxes),
+            Rectangle(self.mins, self.maxes, self.boxsize),
+            Rectangle(other.mins, other.maxes, other.boxsize),
             p, 0, max_distance)
         
         results = coo_entries()
@@ -16,6 +16,10 @@ stored in a rectangular array.
 
    pdist   -- pairwise distances between observation vectors.
    cdist   -- distances between two collections of observation vectors
+   pdist_chunks -- pairwise distances, computed in blocks
+   cdist_chunks -- distances between two collections, computed in blocks
+   cdist_nearest -- nearest neighbors under any metric, without the full matrix
+   cdist_within -- sparse matrix of the distances below a threshold
    squareform -- convert distance matrix to a condensed one and vice versa
 
 Predicates for checking the validity of distance matrices, both
@@ -71,6 +75,7 @@ import numpy as np
 
 from scipy._lib.six import callable, string_types
 from scipy._lib.six import xrange
+from scipy._lib._parallel import _num_jobs, _run_threaded
 
 from . import _distance_wrap
 from ..linalg import norm
@@ -116,6 +121,33 @@ def _convert_to_double(X):
     return X
 
 
+# Block sizes for the blocked computations of cdist and pdist.  A tile of
+# _TILE_BYTES of XB stays in cache while it is compared to a block of rows
+# of XA; by default the chunked functions yield blocks of _CHUNK_SIZE
+# distances.
+_TILE_BYTES = 1 << 18
+_CHUNK_SIZE = 1 << 21
+
+
+def _chunk_size(chunk_size):
+    if chunk_size is None:
+        return _CHUNK_SIZE
+    elif chunk_size < 1:
+        raise ValueError("chunk_size must be a positive integer")
+    return int(chunk_size)
+
+
+def _output_array(out, shape):
+    if out is None:
+        return np.empty(shape, dtype=np.double)
+    if (not isinstance(out, np.ndarray) or out.shape != shape or
+            out.dtype != np.double or not out.flags.c_contiguous or
+            not out.flags.writeable):
+        raise ValueError('out must be a writeable C-contiguous double array '
+                         'of shape %r.' % (shape,))
+    return out
+
+
 def _validate_vector(u, dtype=None):
     # XXX Is order='c' really necessary?
     u = np.asarray(u, dtype=dtype, order='c').squeeze()
@@ -940,7 +972,8 @@ def sokalsneath(u, v):
     return float(2.0 * (ntf + nft)) / denom
 
 
-def pdist(X, metric='euclidean', p=2, w=None, V=None, VI=None):
+def pdist(X, metric='euclidean', p=2, w=None, V=None, VI=None, out=None,
+          n_jobs=1):
     """
     Pairwise distances between observations in n-dimensional space.
 
@@ -1147,6 +1180,13 @@ def pdist(X, metric='euclidean', p=2, w=None, V=None, VI=None):
             The variance vector (for standardized Euclidean).
     VI : ndarray
         The inverse of the covariance matrix (for Mahalanobis).
+    out : ndarray, optional
+        A C-contiguous double array of length :math:`m(m-1)/2`, for
+        instance a `numpy.memmap`, in which to store the result.
+    n_jobs : int, optional
+        Number of threads used to compute the distances. If -1 is given all
+        processors are used. Metrics given as Python functions do not
+        benefit from threads. Default: 1.
 
     Returns
     -------
@@ -1154,6 +1194,7 @@ def pdist(X, metric='euclidean', p=2, w=None, V=None, VI=None):
         Returns a condensed distance matrix Y.  For
         each :math:`i` and :math:`j` (where :math:`i<j<n`), the
         metric ``dist(u=X[i], v=X[j])`` is computed and stored in entry ``ij``.
+        If `out` is given, it is returned.
 
     See Also
     --------
@@ -1174,22 +1215,19 @@ def pdist(X, metric='euclidean', p=2, w=None, V=None, VI=None):
 #           using the distance metric Y but with a more succinct,
 #           verifiable, but less efficient implementation.
 
-    X = np.asarray(X, order='c')
+    X = _validate_pdist_input(X, metric, w)
+    m, n = X.shape
 
-    # The C code doesn't do striding.
-    [X] = _copy_arrays_if_base_present([_convert_to_double(X)])
+    if _num_jobs(n_jobs) > 1:
+        dm = _output_array(out, ((m * (m - 1)) // 2,))
+        _pdist_blocked(_pdist_func(X, metric, p, w, V, VI), X, dm, 0, m,
+                       n_jobs)
+        return dm
 
-    s = X.shape
-    if len(s) != 2:
-        raise ValueError('A 2-dimensional array must be passed.')
-
-    m, n = s
-    dm = np.zeros((m * (m - 1)) // 2, dtype=np.double)
-
-    wmink_names = ['wminkowski', 'wmi', 'wm', 'wpnorm']
-    if w is None and (metric == wminkowski or metric in wmink_names):
-        raise ValueError('weighted minkowski requires a weight '
-                            'vector `w` to be given.')
+    if out is None:
+        dm = np.zeros((m * (m - 1)) // 2, dtype=np.double)
+    else:
+        dm = _output_array(out, ((m * (m - 1)) // 2,))
 
     if callable(metric):
         if metric == minkowski:
@@ -1239,7 +1277,7 @@ def pdist(X, metric='euclidean', p=2, w=None, V=None, VI=None):
             _distance_wrap.pdist_chebyshev_wrap(_convert_to_double(X), dm)
         elif mstr in set(['minkowski', 'mi', 'm']):
             _distance_wrap.pdist_minkowski_wrap(_convert_to_double(X), dm, p)
-        elif mstr in wmink_names:
+        elif mstr in set(['wminkowski', 'wmi', 'wm', 'wpnorm']):
             w = _convert_to_double(np.asarray(w))
             _distance_wrap.pdist_weighted_minkowski_wrap(_convert_to_double(X),
                                                          dm, p, w)
@@ -1375,9 +1413,148 @@ def pdist(X, metric='euclidean', p=2, w=None, V=None, VI=None):
     else:
         raise TypeError('2nd argument metric must be a string identifier '
                         'or a function.')
+    if out is not None and dm is not out:
+        out[...] = dm
+        dm = out
     return dm
 
 
+def pdist_chunks(X, metric='euclidean', p=2, w=None, V=None, VI=None,
+                 chunk_size=None, n_jobs=1):
+    """
+    Computes the condensed distance matrix of `pdist` in blocks.
+
+    Returns an iterator over consecutive pieces of the condensed distance
+    matrix ``pdist(X, metric, ...)``, each holding the distances of whole
+    rows, so that a distance matrix too large for memory can be processed or
+    written to disk piece by piece.
+
+    Parameters
+    ----------
+    X, metric, p, w, V, VI
+        As for `pdist`.  Parameters estimated from the data (``V`` and
+        ``VI``) are computed once from the full `X`.
+    chunk_size : int, optional
+        Approximate number of distances in each block; a block always holds
+        at least one row.  Default: ``2**21`` (16 MiB).
+    n_jobs : int, optional
+        Number of threads computing each block. If -1 is given all
+        processors are used. Default: 1.
+
+    Yields
+    ------
+    Y : ndarray
+        Consecutive pieces of the condensed distance matrix.  Their
+        concatenation is ``pdist(X, metric, ...)``.
+
+    See Also
+    --------
+    pdist, cdist_chunks
+
+    """
+    X = _validate_pdist_input(X, metric, w)
+    dfun = _pdist_func(X, metric, p, w, V, VI)
+    _num_jobs(n_jobs)
+    bounds = _pdist_row_blocks(X.shape[0], 0, X.shape[0],
+                               _chunk_size(chunk_size))
+    return _pdist_chunks(dfun, X, bounds, n_jobs)
+
+
+def _pdist_chunks(dfun, X, bounds, n_jobs):
+    m = X.shape[0]
+    for start, stop in zip(bounds[:-1], bounds[1:]):
+        dm = np.empty(_pdist_offset(m, stop) - _pdist_offset(m, start),
+                      dtype=np.double)
+        _pdist_blocked(dfun, X, dm, start, stop, n_jobs)
+        yield dm
+
+
+def _validate_pdist_input(X, metric, w):
+    X = np.asarray(X, order='c')
+
+    # The C code doesn't do striding.
+    [X] = _copy_arrays_if_base_present([_convert_to_double(X)])
+
+    s = X.shape
+    if len(s) != 2:
+        raise ValueError('A 2-dimensional array must be passed.')
+
+    wmink_names = ['wminkowski', 'wmi', 'wm', 'wpnorm']
+    if w is None and (metric == wminkowski or metric in wmink_names):
+        raise ValueError('weighted minkowski requires a weight '
+                            'vector `w` to be given.')
+    return X
+
+
+def _pdist_func(X, metric, p, w, V, VI):
+    """
+    Returns a function as `_cdist_func` does, with the metric parameters
+    estimated from `X` the way `pdist` estimates them.
+    """
+    if isinstance(metric, string_types):
+        mstr = metric.lower()
+        if mstr in set(['old_cosine', 'old_cos']):
+            metric = 'cosine'
+        elif metric == 'test_sqeuclidean':
+            metric = 'test_seuclidean'
+        if V is None and (mstr in set(['seuclidean', 'se', 's']) or
+                          metric == 'test_seuclidean'):
+            V = np.var(X, axis=0, ddof=1)
+        if VI is None and (mstr in set(['mahalanobis', 'mahal', 'mah']) or
+                           metric == 'test_mahalanobis'):
+            VI = _convert_to_double(np.linalg.inv(np.cov(X.T)).T.copy())
+    return _cdist_func(X, X, metric, p, V, VI, w)
+
+
+def _pdist_offset(m, i):
+    # Index in a condensed distance matrix of m observations of the
+    # distance between observations i and i + 1
+    return i * m - (i * (i + 1)) // 2
+
+
+def _pdist_row_blocks(m, start, stop, size):
+    """
+    Splits the rows ``start:stop`` of the condensed distance matrix of `m`
+    observations at the returned bounds, into blocks of about `size`
+    distances.
+    """
+    stop = max(start, min(stop, m - 1))
+    bounds = [start]
+    while bounds[-1] < stop:
+        i = bounds[-1]
+        bounds.append(min(stop, i + max(1, size // (m - i - 1))))
+    return bounds
+
+
+def _pdist_blocked(dfun, X, dm, start, stop, n_jobs=1):
+    """
+    Stores the rows ``start:stop`` of the condensed distance matrix of `X`
+    in `dm`, using ``dfun`` from `_cdist_func`.
+
+    The rows are split into blocks of roughly equal numbers of distances,
+    which are divided between `n_jobs` threads.  The distances of a block of
+    rows are computed with `_cdist_blocked`, which also evaluates the few
+    distances below the diagonal of the block.
+    """
+    m = X.shape[0]
+    offset = _pdist_offset(m, start)
+    npairs = _pdist_offset(m, min(stop, m)) - offset
+    size = max(1, min(_TILE_BYTES, -(-npairs // (4 * _num_jobs(n_jobs)))))
+    bounds = _pdist_row_blocks(m, start, stop, size)
+
+    def _thread_func(first, last):
+        for a, b in zip(bounds[first:last], bounds[first + 1:last + 1]):
+            D = np.empty((b - a, m - a - 1), dtype=np.double)
+            _cdist_blocked(dfun, X[a:b], X[a + 1:], D)
+            k = _pdist_offset(m, a) - offset
+            for i in xrange(a, b):
+                l = m - i - 1
+                dm[k:k + l] = D[i - a, i - a:]
+                k += l
+
+    _run_threaded(_thread_func, len(bounds) - 1, n_jobs)
+
+
 def squareform(X, force="no", checks=True):
     """
     Converts a vector-form distance vector to a square-form distance
@@ -1734,7 +1911,8 @@ def _cosine_cdist(XA, XB, dm):
     dm += 1
 
 
-def cdist(XA, XB, metric='euclidean', p=2, V=None, VI=None, w=None):
+def cdist(XA, XB, metric='euclidean', p=2, V=None, VI=None, w=None,
+          out=None, n_jobs=1):
     """
     Computes distance between each pair of the two collections of inputs.
 
@@ -1947,11 +2125,19 @@ def cdist(XA, XB, metric='euclidean', p=2, V=None, VI=None, w=None):
         The variance vector (for standardized Euclidean).
     VI : ndarray, optional
         The inverse of the covariance matrix (for Mahalanobis).
+    out : ndarray, optional
+        A C-contiguous double array of shape :math:`(m_A, m_B)`, for
+        instance a `numpy.memmap`, in which to store the result.
+    n_jobs : int, optional
+        Number of threads used to compute the distances. If -1 is given all
+        processors are used. Metrics given as Python functions do not
+        benefit from threads. Default: 1.
 
     Returns
     -------
     Y : ndarray
         A :math:`m_A` by :math:`m_B` distance matrix is returned.
+        If `out` is given, it is returned.
         For each :math:`i` and :math:`j`, the metric
         ``dist(u=XA[i], v=XB[j])`` is computed and stored in the
         :math:`ij` th entry.
@@ -2008,6 +2194,72 @@ def cdist(XA, XB, metric='euclidean', p=2, V=None, VI=None, w=None):
 #           using the distance metric Y but with a more succint,
 #           verifiable, but less efficient implementation.
 
+    XA, XB = _validate_cdist_input(XA, XB)
+    dfun = _cdist_func(XA, XB, metric, p, V, VI, w)
+    dm = _output_array(out, (XA.shape[0], XB.shape[0]))
+    _cdist_blocked(dfun, XA, XB, dm, n_jobs)
+    return dm
+
+
+def cdist_chunks(XA, XB, metric='euclidean', p=2, V=None, VI=None, w=None,
+                 chunk_size=None, n_jobs=1):
+    """
+    Computes the distance matrix of `cdist` in blocks of rows.
+
+    Returns an iterator over consecutive blocks of rows of
+    ``cdist(XA, XB, metric, ...)``, so that a distance matrix too large for
+    memory can be processed or written to disk piece by piece.
+
+    Parameters
+    ----------
+    XA, XB, metric, p, V, VI, w
+        As for `cdist`.  Parameters estimated from the data (``V`` and
+        ``VI``) are computed once from the full `XA` and `XB`.
+    chunk_size : int, optional
+        Upper bound on the number of distances in each block; a block always
+        holds at least one row.  Default: ``2**21`` (16 MiB).
+    n_jobs : int, optional
+        Number of threads computing each block. If -1 is given all
+        processors are used. Default: 1.
+
+    Yields
+    ------
+    Y : ndarray
+        Blocks of consecutive rows of the :math:`m_A` by :math:`m_B`
+        distance matrix, starting from the first row.
+
+    See Also
+    --------
+    cdist, pdist_chunks
+
+    Examples
+    --------
+    Stream a distance matrix to a file:
+
+    >>> from scipy.spatial.distance import cdist_chunks
+    >>> XA, XB = np.random.rand(1000, 3), np.random.rand(2000, 3)
+    >>> with open('distances.bin', 'wb') as f:
+    ...     for block in cdist_chunks(XA, XB, chunk_size=100000):
+    ...         block.tofile(f)
+
+    """
+    XA, XB = _validate_cdist_input(XA, XB)
+    dfun = _cdist_func(XA, XB, metric, p, V, VI, w)
+    _num_jobs(n_jobs)
+    rows = max(1, _chunk_size(chunk_size) // max(XB.shape[0], 1))
+    return _cdist_chunks(dfun, XA, XB, rows, n_jobs)
+
+
+def _cdist_chunks(dfun, XA, XB, rows, n_jobs):
+    mA, mB = XA.shape[0], XB.shape[0]
+    for start in xrange(0, mA, rows):
+        stop = min(start + rows, mA)
+        dm = np.empty((stop - start, mB), dtype=np.double)
+        _cdist_blocked(dfun, XA[start:stop], XB, dm, n_jobs)
+        yield dm
+
+
+def _validate_cdist_input(XA, XB):
     XA = np.asarray(XA, order='c')
     XB = np.asarray(XB, order='c')
 
@@ -2029,216 +2281,423 @@ def cdist(XA, XB, metric='euclidean', p=2, V=None, VI=None, w=None):
     if s[1] != sB[1]:
         raise ValueError('XA and XB must have the same number of columns '
                          '(i.e. feature dimension.)')
+    return XA, XB
 
-    mA = s[0]
-    mB = sB[0]
-    n = s[1]
-    dm = np.zeros((mA, mB), dtype=np.double)
+
+def _cdist_func(XA, XB, metric, p, V, VI, w):
+    """
+    Returns a function ``f(XA, XB, dm)`` storing the distances between the
+    rows of `XA` and `XB` in the C-contiguous double array `dm`.
+
+    The metric parameters estimated from the data are computed here from
+    the full `XA` and `XB`, so that ``f`` can be applied to blocks of them.
+    """
+    n = XA.shape[1]
 
     if callable(metric):
         if metric == minkowski:
-            for i in xrange(0, mA):
-                for j in xrange(0, mB):
-                    dm[i, j] = minkowski(XA[i, :], XB[j, :], p)
+            def dfun(u, v):
+                return minkowski(u, v, p)
         elif metric == wminkowski:
-            for i in xrange(0, mA):
-                for j in xrange(0, mB):
-                    dm[i, j] = wminkowski(XA[i, :], XB[j, :], p, w)
+            def dfun(u, v):
+                return wminkowski(u, v, p, w)
         elif metric == seuclidean:
-            for i in xrange(0, mA):
-                for j in xrange(0, mB):
-                    dm[i, j] = seuclidean(XA[i, :], XB[j, :], V)
+            def dfun(u, v):
+                return seuclidean(u, v, V)
         elif metric == mahalanobis:
-            for i in xrange(0, mA):
-                for j in xrange(0, mB):
-                    dm[i, j] = mahalanobis(XA[i, :], XB[j, :], V)
+            def dfun(u, v):
+                return mahalanobis(u, v, V)
         else:
-            for i in xrange(0, mA):
-                for j in xrange(0, mB):
-                    dm[i, j] = metric(XA[i, :], XB[j, :])
-    elif isinstance(metric, string_types):
-        mstr = metric.lower()
+            dfun = metric
 
-        #if XA.dtype != np.double and \
-        #       (mstr != 'hamming' and mstr != 'jaccard'):
-        #    TypeError('A double array must be passed.')
-        if mstr in set(['euclidean', 'euclid', 'eu', 'e']):
-            _distance_wrap.cdist_euclidean_wrap(_convert_to_double(XA),
-                                                _convert_to_double(XB), dm)
-        elif mstr in set(['sqeuclidean', 'sqe', 'sqeuclid']):
-            _distance_wrap.cdist_sqeuclidean_wrap(_convert_to_double(XA),
-                                                _convert_to_double(XB), dm)
-        elif mstr in set(['cityblock', 'cblock', 'cb', 'c']):
-            _distance_wrap.cdist_city_block_wrap(_convert_to_double(XA),
-                                                 _convert_to_double(XB), dm)
-        elif mstr in set(['hamming', 'hamm', 'ha', 'h']):
-            if XA.dtype == np.bool:
-                _distance_wrap.cdist_hamming_bool_wrap(_convert_to_bool(XA),
-                                                       _convert_to_bool(XB),
-                                                       dm)
-            else:
-                _distance_wrap.cdist_hamming_wrap(_convert_to_double(XA),
-                                                  _convert_to_double(XB), dm)
-        elif mstr in set(['jaccard', 'jacc', 'ja', 'j']):
-            if XA.dtype == np.bool:
-                _distance_wrap.cdist_jaccard_bool_wrap(_convert_to_bool(XA),
-                                                       _convert_to_bool(XB),
-                                                       dm)
-            else:
-                _distance_wrap.cdist_jaccard_wrap(_convert_to_double(XA),
-                                                  _convert_to_double(XB), dm)
-        elif mstr in set(['chebychev', 'chebyshev', 'cheby', 'cheb', 'ch']):
-            _distance_wrap.cdist_chebyshev_wrap(_convert_to_double(XA),
-                                                _convert_to_double(XB), dm)
-        elif mstr in set(['minkowski', 'mi', 'm', 'pnorm']):
-            _distance_wrap.cdist_minkowski_wrap(_convert_to_double(XA),
-                                                _convert_to_double(XB), dm, p)
-        elif mstr in set(['wminkowski', 'wmi', 'wm', 'wpnorm']):
-            _distance_wrap.cdist_weighted_minkowski_wrap(_convert_to_double(XA),
-                                                         _convert_to_double(XB),
-                                                         dm, p,
-                                                         _convert_to_double(w))
-        elif mstr in set(['seuclidean', 'se', 's']):
-            if V is not None:
-                V = np.asarray(V, order='c')
-                if type(V) != np.ndarray:
-                    raise TypeError('Variance vector V must be a numpy array')
-                if V.dtype != np.double:
-                    raise TypeError('Variance vector V must contain doubles.')
-                if len(V.shape) != 1:
-                    raise ValueError('Variance vector V must be '
-                                     'one-dimensional.')
-                if V.shape[0] != n:
-                    raise ValueError('Variance vector V must be of the same '
-                                     'dimension as the vectors on which the '
-                                     'distances are computed.')
-                # The C code doesn't do striding.
-                [VV] = _copy_arrays_if_base_present([_convert_to_double(V)])
-            else:
-                X = np.vstack([XA, XB])
-                VV = np.var(X, axis=0, ddof=1)
-                X = None
-                del X
-            _distance_wrap.cdist_seuclidean_wrap(_convert_to_double(XA),
-                                                 _convert_to_double(XB), VV, dm)
-        elif mstr in set(['cosine', 'cos']):
-            _cosine_cdist(XA, XB, dm)
-        elif mstr in set(['correlation', 'co']):
+        def f(XA, XB, dm):
+            for i in xrange(0, XA.shape[0]):
+                for j in xrange(0, XB.shape[0]):
+                    dm[i, j] = dfun(XA[i, :], XB[j, :])
+        return f
+
+    if not isinstance(metric, string_types):
+        raise TypeError('2nd argument metric must be a string identifier '
+                        'or a function.')
+
+    mstr = metric.lower()
+
+    #if XA.dtype != np.double and \
+    #       (mstr != 'hamming' and mstr != 'jaccard'):
+    #    TypeError('A double array must be passed.')
+    if mstr in set(['euclidean', 'euclid', 'eu', 'e']):
+        return lambda XA, XB, dm: _distance_wrap.cdist_euclidean_wrap(
+            _convert_to_double(XA), _convert_to_double(XB), dm)
+    elif mstr in set(['sqeuclidean', 'sqe', 'sqeuclid']):
+        return lambda XA, XB, dm: _distance_wrap.cdist_sqeuclidean_wrap(
+            _convert_to_double(XA), _convert_to_double(XB), dm)
+    elif mstr in set(['cityblock', 'cblock', 'cb', 'c']):
+        return lambda XA, XB, dm: _distance_wrap.cdist_city_block_wrap(
+            _convert_to_double(XA), _convert_to_double(XB), dm)
+    elif mstr in set(['hamming', 'hamm', 'ha', 'h']):
+        if XA.dtype == np.bool:
+            return lambda XA, XB, dm: _distance_wrap.cdist_hamming_bool_wrap(
+                _convert_to_bool(XA), _convert_to_bool(XB), dm)
+        else:
+            return lambda XA, XB, dm: _distance_wrap.cdist_hamming_wrap(
+                _convert_to_double(XA), _convert_to_double(XB), dm)
+    elif mstr in set(['jaccard', 'jacc', 'ja', 'j']):
+        if XA.dtype == np.bool:
+            return lambda XA, XB, dm: _distance_wrap.cdist_jaccard_bool_wrap(
+                _convert_to_bool(XA), _convert_to_bool(XB), dm)
+        else:
+            return lambda XA, XB, dm: _distance_wrap.cdist_jaccard_wrap(
+                _convert_to_double(XA), _convert_to_double(XB), dm)
+    elif mstr in set(['chebychev', 'chebyshev', 'cheby', 'cheb', 'ch']):
+        return lambda XA, XB, dm: _distance_wrap.cdist_chebyshev_wrap(
+            _convert_to_double(XA), _convert_to_double(XB), dm)
+    elif mstr in set(['minkowski', 'mi', 'm', 'pnorm']):
+        return lambda XA, XB, dm: _distance_wrap.cdist_minkowski_wrap(
+            _convert_to_double(XA), _convert_to_double(XB), dm, p)
+    elif mstr in set(['wminkowski', 'wmi', 'wm', 'wpnorm']):
+        w = _convert_to_double(np.asarray(w))
+        return lambda XA, XB, dm: _distance_wrap.cdist_weighted_minkowski_wrap(
+            _convert_to_double(XA), _convert_to_double(XB), dm, p, w)
+    elif mstr in set(['seuclidean', 'se', 's']):
+        if V is not None:
+            V = np.asarray(V, order='c')
+            if type(V) != np.ndarray:
+                raise TypeError('Variance vector V must be a numpy array')
+            if V.dtype != np.double:
+                raise TypeError('Variance vector V must contain doubles.')
+            if len(V.shape) != 1:
+                raise ValueError('Variance vector V must be '
+                                 'one-dimensional.')
+            if V.shape[0] != n:
+                raise ValueError('Variance vector V must be of the same '
+                                 'dimension as the vectors on which the '
+                                 'distances are computed.')
+            # The C code doesn't do striding.
+            [VV] = _copy_arrays_if_base_present([_convert_to_double(V)])
+        else:
+            X = np.vstack([XA, XB])
+            VV = np.var(X, axis=0, ddof=1)
+            X = None
+            del X
+        return lambda XA, XB, dm: _distance_wrap.cdist_seuclidean_wrap(
+            _convert_to_double(XA), _convert_to_double(XB), VV, dm)
+    elif mstr in set(['cosine', 'cos']):
+        return _cosine_cdist
+    elif mstr in set(['correlation', 'co']):
+        def f(XA, XB, dm):
             XA = np.array(XA, dtype=np.double, copy=True)
             XB = np.array(XB, dtype=np.double, copy=True)
             XA -= XA.mean(axis=1)[:, np.newaxis]
             XB -= XB.mean(axis=1)[:, np.newaxis]
             _cosine_cdist(XA, XB, dm)
-        elif mstr in set(['mahalanobis', 'mahal', 'mah']):
-            if VI is not None:
-                VI = _convert_to_double(np.asarray(VI, order='c'))
-                if type(VI) != np.ndarray:
-                    raise TypeError('VI must be a numpy array.')
-                if VI.dtype != np.double:
-                    raise TypeError('The array must contain 64-bit floats.')
-                [VI] = _copy_arrays_if_base_present([VI])
-            else:
-                X = np.vstack([XA, XB])
-                V = np.cov(X.T)
-                X = None
-                del X
-                VI = _convert_to_double(np.linalg.inv(V).T.copy())
-            # (u-v)V^(-1)(u-v)^T
-            _distance_wrap.cdist_mahalanobis_wrap(_convert_to_double(XA),
-                                                  _convert_to_double(XB),
-                                                  VI, dm)
-        elif mstr == 'canberra':
-            _distance_wrap.cdist_canberra_wrap(_convert_to_double(XA),
-                                               _convert_to_double(XB), dm)
-        elif mstr == 'braycurtis':
-            _distance_wrap.cdist_bray_curtis_wrap(_convert_to_double(XA),
-                                                  _convert_to_double(XB), dm)
-        elif mstr == 'yule':
-            _distance_wrap.cdist_yule_bool_wrap(_convert_to_bool(XA),
-                                                _convert_to_bool(XB), dm)
-        elif mstr == 'matching':
-            _distance_wrap.cdist_matching_bool_wrap(_convert_to_bool(XA),
-                                                    _convert_to_bool(XB), dm)
-        elif mstr == 'kulsinski':
-            _distance_wrap.cdist_kulsinski_bool_wrap(_convert_to_bool(XA),
-                                                     _convert_to_bool(XB), dm)
-        elif mstr == 'dice':
-            _distance_wrap.cdist_dice_bool_wrap(_convert_to_bool(XA),
-                                                _convert_to_bool(XB), dm)
-        elif mstr == 'rogerstanimoto':
-            _distance_wrap.cdist_rogerstanimoto_bool_wrap(_convert_to_bool(XA),
-                                                          _convert_to_bool(XB),
-                                                          dm)
-        elif mstr == 'russellrao':
-            _distance_wrap.cdist_russellrao_bool_wrap(_convert_to_bool(XA),
-                                                      _convert_to_bool(XB), dm)
-        elif mstr == 'sokalmichener':
-            _distance_wrap.cdist_sokalmichener_bool_wrap(_convert_to_bool(XA),
-                                                         _convert_to_bool(XB),
-                                                         dm)
-        elif mstr == 'sokalsneath':
-            _distance_wrap.cdist_sokalsneath_bool_wrap(_convert_to_bool(XA),
-                                                       _convert_to_bool(XB),
-                                                       dm)
-        elif metric == 'test_euclidean':
-            dm = cdist(XA, XB, euclidean)
-        elif metric == 'test_seuclidean':
-            if V is None:
-                V = np.var(np.vstack([XA, XB]), axis=0, ddof=1)
-            else:
-                V = np.asarray(V, order='c')
-            dm = cdist(XA, XB, lambda u, v: seuclidean(u, v, V))
-        elif metric == 'test_sqeuclidean':
-            dm = cdist(XA, XB, lambda u, v: sqeuclidean(u, v))
-        elif metric == 'test_braycurtis':
-            dm = cdist(XA, XB, braycurtis)
-        elif metric == 'test_mahalanobis':
-            if VI is None:
-                X = np.vstack([XA, XB])
-                V = np.cov(X.T)
-                VI = np.linalg.inv(V)
-                X = None
-                del X
-            else:
-                VI = np.asarray(VI, order='c')
+        return f
+    elif mstr in set(['mahalanobis', 'mahal', 'mah']):
+        if VI is not None:
+            VI = _convert_to_double(np.asarray(VI, order='c'))
+            if type(VI) != np.ndarray:
+                raise TypeError('VI must be a numpy array.')
+            if VI.dtype != np.double:
+                raise TypeError('The array must contain 64-bit floats.')
             [VI] = _copy_arrays_if_base_present([VI])
-            # (u-v)V^(-1)(u-v)^T
-            dm = cdist(XA, XB, (lambda u, v: mahalanobis(u, v, VI)))
-        elif metric == 'test_canberra':
-            dm = cdist(XA, XB, canberra)
-        elif metric == 'test_cityblock':
-            dm = cdist(XA, XB, cityblock)
-        elif metric == 'test_minkowski':
-            dm = cdist(XA, XB, minkowski, p=p)
-        elif metric == 'test_wminkowski':
-            dm = cdist(XA, XB, wminkowski, p=p, w=w)
-        elif metric == 'test_correlation':
-            dm = cdist(XA, XB, correlation)
-        elif metric == 'test_hamming':
-            dm = cdist(XA, XB, hamming)
-        elif metric == 'test_jaccard':
-            dm = cdist(XA, XB, jaccard)
-        elif metric == 'test_chebyshev' or metric == 'test_chebychev':
-            dm = cdist(XA, XB, chebyshev)
-        elif metric == 'test_yule':
-            dm = cdist(XA, XB, yule)
-        elif metric == 'test_matching':
-            dm = cdist(XA, XB, matching)
-        elif metric == 'test_dice':
-            dm = cdist(XA, XB, dice)
-        elif metric == 'test_kulsinski':
-            dm = cdist(XA, XB, kulsinski)
-        elif metric == 'test_rogerstanimoto':
-            dm = cdist(XA, XB, rogerstanimoto)
-        elif metric == 'test_russellrao':
-            dm = cdist(XA, XB, russellrao)
-        elif metric == 'test_sokalsneath':
-            dm = cdist(XA, XB, sokalsneath)
-        elif metric == 'test_sokalmichener':
-            dm = cdist(XA, XB, sokalmichener)
         else:
-            raise ValueError('Unknown Distance Metric: %s' % mstr)
+            X = np.vstack([XA, XB])
+            V = np.cov(X.T)
+            X = None
+            del X
+            VI = _convert_to_double(np.linalg.inv(V).T.copy())
+        # (u-v)V^(-1)(u-v)^T
+        return lambda XA, XB, dm: _distance_wrap.cdist_mahalanobis_wrap(
+            _convert_to_double(XA), _convert_to_double(XB), VI, dm)
+    elif mstr == 'canberra':
+        return lambda XA, XB, dm: _distance_wrap.cdist_canberra_wrap(
+            _convert_to_double(XA), _convert_to_double(XB), dm)
+    elif mstr == 'braycurtis':
+        return lambda XA, XB, dm: _distance_wrap.cdist_bray_curtis_wrap(
+            _convert_to_double(XA), _convert_to_double(XB), dm)
+    elif mstr == 'yule':
+        return lambda XA, XB, dm: _distance_wrap.cdist_yule_bool_wrap(
+            _convert_to_bool(XA), _convert_to_bool(XB), dm)
+    elif mstr == 'matching':
+        return lambda XA, XB, dm: _distance_wrap.cdist_matching_bool_wrap(
+            _convert_to_bool(XA), _convert_to_bool(XB), dm)
+    elif mstr == 'kulsinski':
+        return lambda XA, XB, dm: _distance_wrap.cdist_kulsinski_bool_wrap(
+            _convert_to_bool(XA), _convert_to_bool(XB), dm)
+    elif mstr == 'dice':
+        return lambda XA, XB, dm: _distance_wrap.cdist_dice_bool_wrap(
+            _convert_to_bool(XA), _convert_to_bool(XB), dm)
+    elif mstr == 'rogerstanimoto':
+        return lambda XA, XB, dm: _distance_wrap.cdist_rogerstanimoto_bool_wrap(
+            _convert_to_bool(XA), _convert_to_bool(XB), dm)
+    elif mstr == 'russellrao':
+        return lambda XA, XB, dm: _distance_wrap.cdist_russellrao_bool_wrap(
+            _convert_to_bool(XA), _convert_to_bool(XB), dm)
+    elif mstr == 'sokalmichener':
+        return lambda XA, XB, dm: _distance_wrap.cdist_sokalmichener_bool_wrap(
+            _convert_to_bool(XA), _convert_to_bool(XB), dm)
+    elif mstr == 'sokalsneath':
+        return lambda XA, XB, dm: _distance_wrap.cdist_sokalsneath_bool_wrap(
+            _convert_to_bool(XA), _convert_to_bool(XB), dm)
+    elif metric == 'test_euclidean':
+        return _cdist_func(XA, XB, euclidean, p, V, VI, w)
+    elif metric == 'test_seuclidean':
+        if V is None:
+            V = np.var(np.vstack([XA, XB]), axis=0, ddof=1)
+        else:
+            V = np.asarray(V, order='c')
+        return _cdist_func(XA, XB, lambda u, v: seuclidean(u, v, V),
+                           p, V, VI, w)
+    elif metric == 'test_sqeuclidean':
+        return _cdist_func(XA, XB, lambda u, v: sqeuclidean(u, v),
+                           p, V, VI, w)
+    elif metric == 'test_braycurtis':
+        return _cdist_func(XA, XB, braycurtis, p, V, VI, w)
+    elif metric == 'test_mahalanobis':
+        if VI is None:
+            X = np.vstack([XA, XB])
+            V = np.cov(X.T)
+            VI = np.linalg.inv(V)
+            X = None
+            del X
+        else:
+            VI = np.asarray(VI, order='c')
+        [VI] = _copy_arrays_if_base_present([VI])
+        # (u-v)V^(-1)(u-v)^T
+        return _cdist_func(XA, XB, (lambda u, v: mahalanobis(u, v, VI)),
+                           p, V, VI, w)
+    elif metric == 'test_canberra':
+        return _cdist_func(XA, XB, canberra, p, V, VI, w)
+    elif metric == 'test_cityblock':
+        return _cdist_func(XA, XB, cityblock, p, V, VI, w)
+    elif metric == 'test_minkowski':
+        return _cdist_func(XA, XB, minkowski, p, V, VI, w)
+    elif metric == 'test_wminkowski':
+        return _cdist_func(XA, XB, wminkowski, p, V, VI, w)
+    elif metric == 'test_correlation':
+        return _cdist_func(XA, XB, correlation, p, V, VI, w)
+    elif metric == 'test_hamming':
+        return _cdist_func(XA, XB, hamming, p, V, VI, w)
+    elif metric == 'test_jaccard':
+        return _cdist_func(XA, XB, jaccard, p, V, VI, w)
+    elif metric == 'test_chebyshev' or metric == 'test_chebychev':
+        return _cdist_func(XA, XB, chebyshev, p, V, VI, w)
+    elif metric == 'test_yule':
+        return _cdist_func(XA, XB, yule, p, V, VI, w)
+    elif metric == 'test_matching':
+        return _cdist_func(XA, XB, matching, p, V, VI, w)
+    elif metric == 'test_dice':
+        return _cdist_func(XA, XB, dice, p, V, VI, w)
+    elif metric == 'test_kulsinski':
+        return _cdist_func(XA, XB, kulsinski, p, V, VI, w)
+    elif metric == 'test_rogerstanimoto':
+        return _cdist_func(XA, XB, rogerstanimoto, p, V, VI, w)
+    elif metric == 'test_russellrao':
+        return _cdist_func(XA, XB, russellrao, p, V, VI, w)
+    elif metric == 'test_sokalsneath':
+        return _cdist_func(XA, XB, sokalsneath, p, V, VI, w)
+    elif metric == 'test_sokalmichener':
+        return _cdist_func(XA, XB, sokalmichener, p, V, VI, w)
     else:
-        raise TypeError('2nd argument metric must be a string identifier '
-                        'or a function.')
-    return dm
+        raise ValueError('Unknown Distance Metric: %s' % mstr)
+
+
+def _cdist_blocked(dfun, XA, XB, dm, n_jobs=1):
+    """
+    Stores the distances between the rows of `XA` and `XB` in `dm` using
+    ``dfun(XA, XB, dm)`` from `_cdist_func`.
+
+    If `XB` does not fit in a tile of ``_TILE_BYTES``, the distances are
+    computed tile by tile, each tile of `XB` being compared to a block of
+    rows of `XA` while it is in cache.  The rows of `XA` are split between
+    `n_jobs` threads; the C code releases the GIL.
+    """
+    mA, mB = dm.shape
+    tile = max(1, _TILE_BYTES // (8 * max(XB.shape[1], 1)))
+
+    def _thread_func(start, stop):
+        if tile >= mB:
+            dfun(XA[start:stop], XB, dm[start:stop])
+            return
+        rows = max(64, _TILE_BYTES // (8 * tile))
+        buf = np.empty(rows * tile, dtype=np.double)
+        for i in xrange(start, stop, rows):
+            i2 = min(i + rows, stop)
+            for j in xrange(0, mB, tile):
+                j2 = min(j + tile, mB)
+                block = buf[:(i2 - i) * (j2 - j)].reshape(i2 - i, j2 - j)
+                dfun(XA[i:i2], XB[j:j2], block)
+                dm[i:i2, j:j2] = block
+
+    _run_threaded(_thread_func, mA, n_jobs)
+
+
+def _k_smallest(D, k):
+    # Column indices of the k smallest entries of each row of D, in
+    # increasing order of the entries
+    if k >= D.shape[1] or not hasattr(np, 'argpartition'):
+        return np.argsort(D, axis=1)[:, :k]
+    idx = np.argpartition(D, k - 1, axis=1)[:, :k]
+    rows = np.arange(D.shape[0])[:, np.newaxis]
+    return idx[rows, np.argsort(D[rows, idx], axis=1)]
+
+
+def cdist_nearest(XA, XB, k=1, metric='euclidean', p=2, V=None, VI=None,
+                  w=None, chunk_size=None, n_jobs=1):
+    """
+    Finds the `k` nearest rows of `XB` to each row of `XA`.
+
+    This gives the `k` smallest entries of each row of
+    ``cdist(XA, XB, metric, ...)`` and their column indices, but the
+    distance matrix is computed and reduced block by block, so that it is
+    never stored in full.
+
+    Parameters
+    ----------
+    XA, XB, metric, p, V, VI, w
+        As for `cdist`.  Parameters estimated from the data (``V`` and
+        ``VI``) are computed once from the full `XA` and `XB`.
+    k : int, optional
+        The number of nearest neighbors to return. Default: 1.
+    chunk_size : int, optional
+        Upper bound on the number of distances computed at a time by each
+        thread; at least one row is always computed at a time.
+        Default: ``2**21`` (16 MiB).
+    n_jobs : int, optional
+        Number of threads used to compute the distances. If -1 is given all
+        processors are used. Default: 1.
+
+    Returns
+    -------
+    d : ndarray
+        An :math:`m_A` by `k` array of the distances to the nearest
+        neighbors, in increasing order.  If `XB` has fewer than `k` rows,
+        the missing neighbors are at infinite distance.
+    i : ndarray of ints
+        The row indices in `XB` of the neighbors.  Missing neighbors are
+        indicated with :math:`m_B`.
+
+    See Also
+    --------
+    cdist, cdist_within
+    scipy.spatial.cKDTree.query : faster for the Minkowski metrics in
+        low dimensions
+
+    Examples
+    --------
+    >>> from scipy.spatial.distance import cdist_nearest
+    >>> XA = np.array([[0., 0.], [2., 2.]])
+    >>> XB = np.array([[0., 1.], [3., 3.], [1., 1.]])
+    >>> d, i = cdist_nearest(XA, XB, k=2, metric='cityblock')
+    >>> d
+    array([[ 1.,  2.],
+           [ 2.,  2.]])
+    >>> i
+    array([[0, 2],
+           [1, 2]])
+
+    """
+    XA, XB = _validate_cdist_input(XA, XB)
+    dfun = _cdist_func(XA, XB, metric, p, V, VI, w)
+    k = int(k)
+    if k < 1:
+        raise ValueError('k must be at least 1.')
+    mA, mB = XA.shape[0], XB.shape[0]
+    kk = min(k, mB)
+    rows = max(1, _chunk_size(chunk_size) // max(mB, 1))
+
+    dd = np.empty((mA, k), dtype=np.double)
+    dd.fill(np.inf)
+    ii = np.empty((mA, k), dtype=np.intp)
+    ii.fill(mB)
+
+    def _thread_func(start, stop):
+        for a in xrange(start, stop, rows):
+            b = min(a + rows, stop)
+            D = np.empty((b - a, mB), dtype=np.double)
+            _cdist_blocked(dfun, XA[a:b], XB, D)
+            idx = _k_smallest(D, kk)
+            ii[a:b, :kk] = idx
+            dd[a:b, :kk] = D[np.arange(b - a)[:, np.newaxis], idx]
+
+    if kk > 0:
+        _run_threaded(_thread_func, mA, n_jobs)
+    return dd, ii
+
+
+def cdist_within(XA, XB, max_distance, metric='euclidean', p=2, V=None,
+                 VI=None, w=None, format='coo', chunk_size=None, n_jobs=1):
+    """
+    Computes a sparse matrix of the distances not exceeding `max_distance`.
+
+    This gives the entries of ``cdist(XA, XB, metric, ...)`` that are at
+    most `max_distance`, but the distance matrix is computed and filtered
+    block by block, so that it is never stored in full.
+
+    Parameters
+    ----------
+    XA, XB, metric, p, V, VI, w
+        As for `cdist`.  Parameters estimated from the data (``V`` and
+        ``VI``) are computed once from the full `XA` and `XB`.
+    max_distance : float
+        The largest distance kept.
+    format : {'coo', 'csr'}, optional
+        The sparse matrix format of the result. Default: 'coo'.
+    chunk_size : int, optional
+        Upper bound on the number of distances computed at a time by each
+        thread; at least one row is always computed at a time.
+        Default: ``2**21`` (16 MiB).
+    n_jobs : int, optional
+        Number of threads used to compute the distances. If -1 is given all
+        processors are used. Default: 1.
+
+    Returns
+    -------
+    Y : coo_matrix or csr_matrix
+        An :math:`m_A` by :math:`m_B` sparse matrix holding the distances
+        not exceeding `max_distance`.  Pairs at distance zero are stored as
+        explicit zeros.
+
+    See Also
+    --------
+    cdist, cdist_nearest
+    scipy.spatial.cKDTree.sparse_distance_matrix : faster for the Minkowski
+        metrics in low dimensions
+
+    """
+    # imported here so that importing this module does not load scipy.sparse
+    from scipy.sparse import coo_matrix, csr_matrix
+
+    if format not in ('coo', 'csr'):
+        raise ValueError("format must be 'coo' or 'csr'.")
+    XA, XB = _validate_cdist_input(XA, XB)
+    dfun = _cdist_func(XA, XB, metric, p, V, VI, w)
+    mA, mB = XA.shape[0], XB.shape[0]
+    if mA == 0:
+        if format == 'csr':
+            return csr_matrix((mA, mB), dtype=np.double)
+        return coo_matrix((mA, mB), dtype=np.double)
+    rows = max(1, _chunk_size(chunk_size) // max(mB, 1))
+    # at least one block of rows per thread
+    rows = min(rows, max(1, -(-mA // _num_jobs(n_jobs))))
+    starts = list(xrange(0, mA, rows))
+    results = [None] * len(starts)
+
+    def _thread_func(first, last):
+        for c in xrange(first, last):
+            a = starts[c]
+            b = min(a + rows, mA)
+            D = np.empty((b - a, mB), dtype=np.double)
+            _cdist_blocked(dfun, XA[a:b], XB, D)
+            i, j = np.nonzero(D <= max_distance)
+            results[c] = (i + a, j, D[i, j])
+
+    _run_threaded(_thread_func, len(starts), n_jobs)
+
+    i = np.concatenate([r[0] for r in results] + [np.empty(0, np.intp)])
+    j = np.concatenate([r[1] for r in results] + [np.empty(0, np.intp)])
+    v = np.concatenate([r[2] for r in results] + [np.empty(0, np.double)])
+    if format == 'csr':
+        # the pairs are ordered by row
+        indptr = np.searchsorted(i, np.arange(mA + 1))
+        return csr_matrix((v, j, indptr), shape=(mA, mB))
+    return coo_matrix((v, (i, j)), shape=(mA, mB))
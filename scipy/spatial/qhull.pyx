@@ -11,7 +11,9 @@ Wrappers for Qhull triangulation, plus some additional N-D geometry utilities
 #
 
 import threading
+import itertools
 import numpy as np
+import scipy.sparse
 cimport numpy as np
 cimport cython
 cimport qhull
@@ -19,6 +21,8 @@ cimport setlist
 
 from numpy.compat import asbytes
 
+from scipy._lib._parallel import _num_jobs, _run_threaded
+
 cdef extern from "numpy/npy_math.h":
     double nan "NPY_NAN"
 
@@ -1450,6 +1454,217 @@ cdef int _find_simplex(DelaunayInfo_t *d, double *c,
     return _find_simplex_directed(d, c, x, start, eps, eps_broad)
 
 
+#------------------------------------------------------------------------------
+# Locating many points
+#------------------------------------------------------------------------------
+
+ctypedef struct SimplexGrid_t:
+    # Uniform grid over the bounding box of the triangulation, storing for
+    # each cell a simplex at (or close to) the cell center.
+    np.npy_intp *shape
+    double *lower
+    double *scale
+    int *simplices
+
+cdef int _grid_simplex(DelaunayInfo_t *d, SimplexGrid_t *grid,
+                       double *x) nogil:
+    """
+    Look up the simplex stored for the grid cell containing `x`.
+
+    """
+    cdef int k
+    cdef np.npy_intp cell, j
+    cdef double v
+
+    cell = 0
+    for k in xrange(d.ndim):
+        v = (x[k] - grid.lower[k]) * grid.scale[k]
+        if v >= grid.shape[k]:
+            j = grid.shape[k] - 1
+        elif v > 0:
+            j = <np.npy_intp>v
+        else:
+            j = 0
+        cell = cell * grid.shape[k] + j
+    return grid.simplices[cell]
+
+cdef void _find_simplex_many(DelaunayInfo_t *d, double *x, int *out,
+                             np.npy_intp *order, SimplexGrid_t *grid,
+                             np.npy_intp start, np.npy_intp stop,
+                             double eps, double eps_broad,
+                             int bruteforce) nogil:
+    """
+    Locate the points ``x[order[start:stop]]`` (or ``x[start:stop]`` if
+    `order` is NULL), storing the simplices found in `out`.
+
+    Each walk starts from the simplex stored in `grid` for the point, or,
+    if `grid` is NULL, from the simplex found for the previous point.
+
+    """
+    cdef double c[NPY_MAXDIMS]
+    cdef np.npy_intp i, k
+    cdef int walk_start = 0
+    cdef double *p
+
+    for i in xrange(start, stop):
+        if order != NULL:
+            k = order[i]
+        else:
+            k = i
+        p = x + d.ndim*k
+        if bruteforce:
+            out[k] = _find_simplex_bruteforce(d, c, p, eps, eps_broad)
+        else:
+            if grid != NULL:
+                walk_start = _grid_simplex(d, grid, p)
+            out[k] = _find_simplex(d, c, p, &walk_start, eps, eps_broad)
+
+cdef void _morton_keys(DelaunayInfo_t *d, double *x, np.npy_intp n,
+                       np.npy_uint64 *keys) nogil:
+    """
+    Compute the position of each point along a Z-order (Morton) curve
+    over the bounding box of the triangulation.
+
+    """
+    cdef int k, b, bits
+    cdef np.npy_intp i
+    cdef double v, top
+    cdef double scale[NPY_MAXDIMS]
+    cdef np.npy_uint64 q[NPY_MAXDIMS]
+    cdef np.npy_uint64 key
+
+    bits = 63 // d.ndim
+    if bits > 21:
+        bits = 21
+    top = <double>((<np.npy_uint64>1 << bits) - 1)
+    for k in xrange(d.ndim):
+        if d.max_bound[k] > d.min_bound[k]:
+            scale[k] = top / (d.max_bound[k] - d.min_bound[k])
+        else:
+            scale[k] = 0
+
+    for i in xrange(n):
+        for k in xrange(d.ndim):
+            v = (x[d.ndim*i + k] - d.min_bound[k]) * scale[k]
+            if v >= top:
+                q[k] = <np.npy_uint64>top
+            elif v > 0:
+                q[k] = <np.npy_uint64>v
+            else:
+                # also catches nan
+                q[k] = 0
+        key = 0
+        for b in xrange(bits - 1, -1, -1):
+            for k in xrange(d.ndim):
+                key = (key << 1) | ((q[k] >> b) & 1)
+        keys[i] = key
+
+cdef int _find_simplex_chunk(tri, np.ndarray x, np.ndarray out, order, grid,
+                             np.npy_intp start, np.npy_intp stop,
+                             double eps, double eps_broad,
+                             int bruteforce) except -1:
+    """
+    Python-callable part of `Delaunay.find_simplex`, locating the points
+    ``start:stop`` (in the order given by `order`) with the GIL released.
+
+    """
+    cdef DelaunayInfo_t info
+    cdef SimplexGrid_t grid_info
+    cdef SimplexGrid_t *grid_ptr = NULL
+    cdef np.npy_intp *order_ptr = NULL
+    cdef np.ndarray[np.npy_intp, ndim=1] order_arr, grid_shape
+    cdef np.ndarray[np.double_t, ndim=1] grid_lower, grid_scale
+    cdef np.ndarray[np.npy_int, ndim=1] grid_simplices
+
+    _get_delaunay_info(&info, tri, 1, 0, 0)
+
+    if order is not None:
+        order_arr = order
+        order_ptr = <np.npy_intp*>order_arr.data
+    if grid is not None:
+        grid_shape, grid_lower, grid_scale, grid_simplices = grid
+        grid_info.shape = <np.npy_intp*>grid_shape.data
+        grid_info.lower = <double*>grid_lower.data
+        grid_info.scale = <double*>grid_scale.data
+        grid_info.simplices = <int*>grid_simplices.data
+        grid_ptr = &grid_info
+
+    with nogil:
+        _find_simplex_many(&info, <double*>x.data, <int*>out.data,
+                           order_ptr, grid_ptr, start, stop,
+                           eps, eps_broad, bruteforce)
+    return 0
+
+cdef void _fill_simplex_grid(DelaunayInfo_t *d, double *centers,
+                             np.npy_intp ncells, int *out,
+                             double eps, double eps_broad) nogil:
+    """
+    Locate the cell centers of a `SimplexGrid_t`, in order.  Cells whose
+    center is outside the triangulation get the boundary simplex where
+    the walk stopped.
+
+    """
+    cdef double c[NPY_MAXDIMS]
+    cdef np.npy_intp i
+    cdef int walk_start = 0, isimplex
+
+    for i in xrange(ncells):
+        isimplex = _find_simplex(d, c, centers + d.ndim*i, &walk_start,
+                                 eps, eps_broad)
+        if isimplex == -1:
+            if walk_start >= 0 and walk_start < d.nsimplex:
+                isimplex = walk_start
+            else:
+                isimplex = 0
+        out[i] = isimplex
+
+def _simplex_grid(tri, double eps, double eps_broad):
+    """
+    Build a uniform grid with about one cell per simplex over the bounding
+    box of the triangulation, storing a simplex close to each cell.
+
+    """
+    cdef DelaunayInfo_t info
+    cdef np.ndarray centers, simplices
+
+    ndim = tri.ndim
+    n = max(1, int(round(tri.nsimplex ** (1.0 / ndim))))
+    shape = np.empty((ndim,), dtype=np.intp)
+    shape.fill(n)
+    lower = np.ascontiguousarray(tri.min_bound, dtype=np.double)
+    extent = tri.max_bound - tri.min_bound
+    scale = np.zeros((ndim,), dtype=np.double)
+    scale[extent > 0] = n / extent[extent > 0]
+
+    # cell centers in C order, so that consecutive walks are short
+    index = np.indices(shape).reshape(ndim, -1).T + 0.5
+    centers = lower + index / np.where(scale > 0, scale, np.inf)
+    centers = np.ascontiguousarray(centers, dtype=np.double)
+    simplices = np.empty((centers.shape[0],), dtype=np.intc)
+
+    _get_delaunay_info(&info, tri, 1, 0, 0)
+    with nogil:
+        _fill_simplex_grid(&info, <double*>centers.data, centers.shape[0],
+                           <int*>simplices.data, eps, eps_broad)
+    return shape, lower, scale, simplices
+
+def _morton_order(tri, np.ndarray x):
+    """
+    Permutation sorting the points `x` along a Z-order curve, so that
+    consecutive points are close to each other.
+
+    """
+    cdef DelaunayInfo_t info
+    cdef np.ndarray keys
+
+    _get_delaunay_info(&info, tri, 0, 0, 0)
+    keys = np.empty((x.shape[0],), dtype=np.uint64)
+    with nogil:
+        _morton_keys(&info, <double*>x.data, x.shape[0],
+                     <np.npy_uint64*>keys.data)
+    return np.ascontiguousarray(np.argsort(keys), dtype=np.intp)
+
+
 #------------------------------------------------------------------------------
 # Delaunay triangulation interface, for Python
 #------------------------------------------------------------------------------
@@ -1753,6 +1968,7 @@ class Delaunay(_QhullUser):
         self._transform = None
         self._vertex_to_simplex = None
         self._vertex_neighbor_vertices = None
+        self._simplex_grid = None
 
         # Backwards compatibility (Scipy < 0.12.0)
         self.vertices = self.simplices
@@ -1926,9 +2142,10 @@ class Delaunay(_QhullUser):
         return out
 
     @cython.boundscheck(False)
-    def find_simplex(self, xi, bruteforce=False, tol=None):
+    def find_simplex(self, xi, bruteforce=False, tol=None, n_jobs=1,
+                     walk_start='previous'):
         """
-        find_simplex(self, xi, bruteforce=False, tol=None)
+        find_simplex(self, xi, bruteforce=False, tol=None, n_jobs=1, walk_start='previous')
 
         Find the simplices containing the given points.
 
@@ -1943,6 +2160,26 @@ class Delaunay(_QhullUser):
         tol : float, optional
             Tolerance allowed in the inside-triangle check.
             Default is ``100*eps``.
+        n_jobs : int, optional
+            Number of threads to split the points between.  If -1 is
+            given all processors are used.  Default: 1.
+
+            .. versionadded:: 0.16.0
+        walk_start : {'previous', 'sorted', 'grid'}, optional
+            Where the walk locating each point starts:
+
+            - 'previous': from the simplex found for the previous point,
+              which is fast when consecutive points are close.
+            - 'sorted': same, but the points are visited along a
+              Z-order (Morton) curve, so that consecutive points are close
+              to each other even if `xi` is in random order.
+            - 'grid': from a simplex close to the point, looked up in a
+              uniform grid over the triangulation.  The grid is built on
+              first use and reused by later calls.
+
+            Default is 'previous'.
+
+            .. versionadded:: 0.16.0
 
         Returns
         -------
@@ -1958,15 +2195,17 @@ class Delaunay(_QhullUser):
         the point in N+1 dimensions, the algorithm falls back to
         directed search in N dimensions.
 
+        For a point on the boundary between several simplices, which one
+        of them is returned may depend on `n_jobs` and `walk_start`.
+
         """
-        cdef DelaunayInfo_t info
-        cdef int isimplex
-        cdef double c[NPY_MAXDIMS]
         cdef double eps, eps_broad
-        cdef int start
-        cdef int k
-        cdef np.ndarray[np.double_t, ndim=2] x
-        cdef np.ndarray[np.npy_int, ndim=1] out_
+        cdef np.ndarray x, out
+
+        if walk_start not in ('previous', 'sorted', 'grid'):
+            raise ValueError("walk_start must be one of 'previous', "
+                             "'sorted' or 'grid'")
+        n_jobs = _num_jobs(n_jobs)
 
         xi = np.asanyarray(xi)
 
@@ -1977,32 +2216,31 @@ class Delaunay(_QhullUser):
         xi = xi.reshape(-1, xi.shape[-1])
         x = np.ascontiguousarray(xi.astype(np.double))
 
-        start = 0
-
         if tol is None:
             eps = 100 * np.finfo(np.double).eps
         else:
             eps = tol
         eps_broad = sqrt(eps)
         out = np.zeros((xi.shape[0],), dtype=np.intc)
-        out_ = out
-        _get_delaunay_info(&info, self, 1, 0, 0)
 
-        if bruteforce:
-            with nogil:
-                for k in xrange(x.shape[0]):
-                    isimplex = _find_simplex_bruteforce(
-                        &info, c,
-                        <double*>x.data + info.ndim*k,
-                        eps, eps_broad)
-                    out_[k] = isimplex
-        else:
-            with nogil:
-                for k in xrange(x.shape[0]):
-                    isimplex = _find_simplex(&info, c,
-                                             <double*>x.data + info.ndim*k,
-                                             &start, eps, eps_broad)
-                    out_[k] = isimplex
+        # compute the barycentric transforms before starting any thread
+        self.transform
+
+        order = None
+        grid = None
+        if not bruteforce and self.nsimplex > 0:
+            if walk_start == 'sorted':
+                order = _morton_order(self, x)
+            elif walk_start == 'grid':
+                if self._simplex_grid is None:
+                    self._simplex_grid = _simplex_grid(self, eps, eps_broad)
+                grid = self._simplex_grid
+
+        def _thread_func(np.npy_intp start, np.npy_intp stop):
+            _find_simplex_chunk(self, x, out, order, grid, start, stop,
+                                eps, eps_broad, bruteforce)
+
+        _run_threaded(_thread_func, x.shape[0], n_jobs)
 
         return out.reshape(xi_shape[:-1])
 
@@ -2256,6 +2494,188 @@ class ConvexHull(_QhullUser):
             self._vertices = np.unique(self.simplices)
         return self._vertices
 
+    @staticmethod
+    def from_chunks(chunks, qhull_options=None):
+        """
+        from_chunks(chunks, qhull_options=None)
+
+        Compute the convex hull of points given in chunks.
+
+        Only one chunk and the vertices of the hull of the previous chunks
+        are held in memory at a time, so that hulls of point sets larger
+        than memory can be computed.
+
+        .. versionadded:: 0.16.0
+
+        Parameters
+        ----------
+        chunks : iterable of ndarrays of floats, shape (npoints_i, ndim)
+            Coordinates of the points, in consecutive chunks.
+        qhull_options : str, optional
+            Additional options to pass to Qhull, see `ConvexHull`.
+
+        Returns
+        -------
+        hull : ConvexHull
+            The convex hull of all the points.  Its `points` are the hull
+            vertices only, and it has an additional attribute
+            ``point_indices``, giving the index of each of them in the
+            concatenation of the chunks.
+
+        Notes
+        -----
+        The points of each chunk lying inside the polytope spanned by the
+        extreme points of the hull so far and of the chunk, in the
+        directions of the coordinate axes and diagonals, are discarded
+        first (Akl-Toussaint heuristic [1]_).  The remaining points are
+        added to an incremental hull with `add_points`, which is reduced to
+        its vertices whenever most of its points have become interior.
+
+        References
+        ----------
+        .. [1] S. G. Akl and G. T. Toussaint, "A fast convex hull algorithm",
+           Information Processing Letters, 7(5), pp. 219-222, 1978.
+
+        Examples
+        --------
+        >>> from scipy.spatial import ConvexHull
+        >>> np.random.seed(1234)
+        >>> chunks = (np.random.rand(10000, 3) for i in range(10))
+        >>> hull = ConvexHull.from_chunks(chunks)
+        >>> hull.points.shape[0] == hull.vertices.shape[0]
+        True
+
+        """
+        hull = None
+        hull_index = None
+        pending = None
+        pending_index = None
+        offset = 0
+        directions = None
+
+        try:
+            for chunk in chunks:
+                if np.ma.isMaskedArray(chunk):
+                    raise ValueError('Input points cannot be a masked array')
+                chunk = np.ascontiguousarray(chunk, dtype=np.double)
+                if chunk.ndim != 2:
+                    raise ValueError("Chunks must be 2-D arrays of points")
+                if directions is None:
+                    ndim = chunk.shape[1]
+                    directions = _extreme_directions(ndim)
+                elif chunk.shape[1] != ndim:
+                    raise ValueError("Chunks must all have the same number "
+                                     "of dimensions")
+
+                index = np.arange(offset, offset + chunk.shape[0])
+                offset += chunk.shape[0]
+
+                if hull is not None:
+                    known = hull.points[hull.vertices]
+                elif pending is not None:
+                    known = pending
+                else:
+                    known = None
+                keep = _extreme_filter(chunk, known, directions)
+                chunk = chunk[keep]
+                index = index[keep]
+                if chunk.shape[0] == 0:
+                    continue
+
+                if hull is None:
+                    # wait for enough points to span a full-dimensional hull
+                    if pending is not None:
+                        chunk = np.concatenate([pending, chunk])
+                        index = np.concatenate([pending_index, index])
+                    if not _is_full_dimensional(chunk):
+                        pending, pending_index = chunk, index
+                        continue
+                    hull = ConvexHull(chunk, incremental=True,
+                                      qhull_options=qhull_options)
+                    hull_index = index
+                    pending = pending_index = None
+                else:
+                    hull.add_points(chunk)
+                    hull_index = np.concatenate([hull_index, index])
+
+                if hull.npoints > 2 * len(hull.vertices):
+                    vertices = hull.vertices
+                    hull.close()
+                    hull = ConvexHull(hull.points[vertices], incremental=True,
+                                      qhull_options=qhull_options)
+                    hull_index = hull_index[vertices]
+        finally:
+            if hull is not None:
+                hull.close()
+
+        if hull is None:
+            if pending is None:
+                raise ValueError("No points given")
+            # degenerate input: let Qhull report the error
+            hull = ConvexHull(pending, qhull_options=qhull_options)
+            hull.point_indices = pending_index
+            return hull
+
+        vertices = np.sort(hull.vertices)
+        result = ConvexHull(hull.points[vertices], qhull_options=qhull_options)
+        result.point_indices = hull_index[vertices]
+        return result
+
+
+def _extreme_directions(ndim):
+    """
+    Directions along which extreme points are looked for by `_extreme_filter`:
+    the coordinate axes and, in low dimensions, the diagonals.
+    """
+    directions = [np.eye(ndim), -np.eye(ndim)]
+    if 1 < ndim <= 6:
+        signs = np.indices((2,) * ndim).reshape(ndim, -1).T * 2.0 - 1
+        directions.append(signs)
+    return np.concatenate(directions, axis=0)
+
+
+def _is_full_dimensional(points):
+    """
+    Whether the points span a full-dimensional volume, up to rounding.
+    """
+    ndim = points.shape[1]
+    if points.shape[0] <= ndim:
+        return False
+    centered = points - points.mean(axis=0)
+    sv = np.linalg.svd(centered, compute_uv=False)
+    return sv[-1] > 1e3 * np.finfo(np.double).eps * max(1, sv[0])
+
+
+def _extreme_filter(points, known, directions):
+    """
+    Mask of the points that are not strictly inside the polytope spanned
+    by the extreme points, in the given directions, of `points` and `known`.
+    """
+    if known is not None and known.shape[0] > 0:
+        candidates = np.concatenate([known, points], axis=0)
+    else:
+        candidates = points
+    extremes = candidates[np.unique(np.dot(candidates, directions.T)
+                                    .argmax(axis=0))]
+    if not _is_full_dimensional(extremes):
+        return np.ones(points.shape[0], dtype=bool)
+
+    try:
+        polytope = ConvexHull(extremes)
+    except QhullError:
+        return np.ones(points.shape[0], dtype=bool)
+
+    # Keep a margin so that no point of the final hull can be dropped
+    normals = polytope.equations[:,:-1]
+    offsets = polytope.equations[:,-1]
+    tol = 1e3 * np.finfo(np.double).eps * (1 + abs(extremes).max())
+    keep = np.zeros(points.shape[0], dtype=bool)
+    for start in range(0, points.shape[0], 65536):
+        block = points[start:start + 65536]
+        dist = np.dot(block, normals.T) + offsets
+        keep[start:start + 65536] = (dist > -tol).any(axis=1)
+    return keep
+
 
 #------------------------------------------------------------------------------
 # Voronoi diagrams
@@ -2300,6 +2720,22 @@ class Voronoi(_QhullUser):
         Index of the Voronoi region for each input point.
         If qhull option "Qc" was not specified, the list will contain -1
         for points that are not associated with a Voronoi region.
+    ridge_areas : ndarray of double, shape (nridges,)
+        Area (length in 2-D) of each Voronoi ridge, ``inf`` for
+        unbounded ridges.  Computed on first access.
+
+        .. versionadded:: 0.16.0
+    region_volumes : ndarray of double, shape (nregions,)
+        Volume (area in 2-D) of each Voronoi region, ``inf`` for unbounded
+        regions and ``nan`` for regions not associated with an input point.
+        Computed on first access.
+
+        .. versionadded:: 0.16.0
+    adjacency : csr_matrix of bool, shape (npoints, npoints)
+        Symmetric adjacency matrix of the input points whose Voronoi
+        regions share a ridge.  Computed on first access.
+
+        .. versionadded:: 0.16.0
 
     Raises
     ------
@@ -2317,6 +2753,13 @@ class Voronoi(_QhullUser):
     Do not call the ``add_points`` method from a ``__del__``
     destructor.
 
+    The volume of a region is the sum, over its ridges, of the volumes of
+    the pyramids with the ridge as base and the input point as apex, whose
+    height is half the distance to the neighbouring point.  The ridge areas
+    are computed with vectorized operations in 2-D and 3-D, where Qhull
+    returns the vertices of each ridge in order, and by triangulating each
+    ridge separately in higher dimensions.
+
     Examples
     --------
     Voronoi diagram for a set of point:
@@ -2393,6 +2836,9 @@ class Voronoi(_QhullUser):
                        qhull.get_voronoi_diagram()
 
         self._ridge_dict = None
+        self._ridge_areas = None
+        self._region_volumes = None
+        self._adjacency = None
 
         _QhullUser._update(self, qhull)
 
@@ -2402,3 +2848,115 @@ class Voronoi(_QhullUser):
             self._ridge_dict = dict(zip(map(tuple, self.ridge_points.tolist()),
                                         self.ridge_vertices))
         return self._ridge_dict
+
+    @property
+    def ridge_areas(self):
+        if self._ridge_areas is None:
+            self._ridge_areas = _voronoi_ridge_areas(self)
+        return self._ridge_areas
+
+    @property
+    def region_volumes(self):
+        if self._region_volumes is None:
+            npoints = self.points.shape[0]
+            ndim = self.points.shape[1]
+            ridge_points = self.ridge_points
+            heights = np.sqrt(((self.points[ridge_points[:,0]] -
+                                self.points[ridge_points[:,1]])**2).sum(axis=1))
+            pyramids = self.ridge_areas * heights / (2.0 * ndim)
+            point_volumes = (
+                np.bincount(ridge_points[:,0], pyramids, minlength=npoints) +
+                np.bincount(ridge_points[:,1], pyramids, minlength=npoints))
+
+            # coplanar points without ridges of their own share the region
+            # of a vertex point
+            has_ridges = np.zeros(npoints, dtype=bool)
+            has_ridges[ridge_points.ravel()] = True
+            point_region = np.asarray(self.point_region)
+            has_ridges &= point_region >= 0
+
+            volumes = np.empty(len(self.regions))
+            volumes.fill(np.nan)
+            volumes[point_region[has_ridges]] = point_volumes[has_ridges]
+            self._region_volumes = volumes
+        return self._region_volumes
+
+    @property
+    def adjacency(self):
+        if self._adjacency is None:
+            npoints = self.points.shape[0]
+            i = np.concatenate([self.ridge_points[:,0], self.ridge_points[:,1]])
+            j = np.concatenate([self.ridge_points[:,1], self.ridge_points[:,0]])
+            order = np.argsort(i.astype(np.int64) * npoints + j)
+            indices = j[order].astype(np.intc)
+            indptr = np.concatenate([[0], np.cumsum(
+                np.bincount(i, minlength=npoints))]).astype(np.intc)
+            data = np.ones(len(indices), dtype=bool)
+            self._adjacency = scipy.sparse.csr_matrix((data, indices, indptr),
+                                                      shape=(npoints, npoints))
+        return self._adjacency
+
+
+def _voronoi_ridge_areas(vor):
+    """
+    (ndim-1)-dimensional measure of each ridge of a Voronoi diagram,
+    ``inf`` for the unbounded ones.
+    """
+    ndim = vor.points.shape[1]
+    nridges = len(vor.ridge_vertices)
+    areas = np.empty(nridges)
+    areas.fill(np.inf)
+    if nridges == 0:
+        return areas
+
+    lengths = np.fromiter(map(len, vor.ridge_vertices), dtype=np.intp,
+                          count=nridges)
+    flat = np.fromiter(itertools.chain.from_iterable(vor.ridge_vertices),
+                       dtype=np.intp, count=lengths.sum())
+    starts = np.concatenate([[0], np.cumsum(lengths[:-1])])
+    ridge = np.repeat(np.arange(nridges), lengths)
+    bounded = np.bincount(ridge, flat < 0, minlength=nridges) == 0
+    # ridges with too few vertices to span a ridge are degenerate
+    areas[bounded & (lengths < ndim)] = 0
+    finite = bounded & (lengths >= ndim)
+    vertices = vor.vertices
+
+    if ndim == 2:
+        first = flat[starts[finite]]
+        second = flat[starts[finite] + 1]
+        d = vertices[second] - vertices[first]
+        areas[finite] = np.sqrt((d*d).sum(axis=1))
+    elif ndim == 3:
+        # fan triangulation of the ridge polygons, whose vertices are in order
+        pos = np.arange(len(flat)) - starts[ridge]
+        fan = finite[ridge] & (pos >= 1) & (pos < lengths[ridge] - 1)
+        fan = np.nonzero(fan)[0]
+        apex = vertices[flat[starts[ridge[fan]]]]
+        cross = np.cross(vertices[flat[fan]] - apex,
+                         vertices[flat[fan + 1]] - apex)
+        normal = np.empty((nridges, 3))
+        for k in range(3):
+            normal[:,k] = np.bincount(ridge[fan], cross[:,k],
+                                       minlength=nridges)
+        areas[finite] = 0.5 * np.sqrt((normal[finite]**2).sum(axis=1))
+    else:
+        points = vor.points
+        ridge_points = vor.ridge_points
+        factorial = np.prod(np.arange(1, ndim))
+        for r in np.nonzero(finite)[0]:
+            ridge_vertices = vertices[flat[starts[r]:starts[r] + lengths[r]]]
+            normal = points[ridge_points[r,1]] - points[ridge_points[r,0]]
+            normal /= np.sqrt(np.dot(normal, normal))
+            centered = ridge_vertices - ridge_vertices.mean(axis=0)
+            centered -= np.outer(np.dot(centered, normal), normal)
+            # coordinates in the hyperplane of the ridge
+            basis = np.linalg.svd(centered, full_matrices=False)[2][:ndim-1]
+            coords = np.dot(centered, basis.T)
+            try:
+                tri = Delaunay(coords)
+            except QhullError:
+                areas[r] = 0
+                continue
+            edges = coords[tri.simplices[:,1:]] - coords[tri.simplices[:,:1]]
+            areas[r] = sum(abs(np.linalg.det(e)) for e in edges) / factorial
+    return areas
@@ -48,7 +48,8 @@ from scipy.spatial.distance import (squareform, pdist, cdist, matching,
         jaccard, dice, sokalsneath, rogerstanimoto, russellrao, yule,
         num_obs_y, num_obs_dm, is_valid_dm, is_valid_y, minkowski, wminkowski,
         euclidean, sqeuclidean, cosine, correlation, hamming, mahalanobis,
-        canberra, braycurtis, sokalmichener, _validate_vector)
+        canberra, braycurtis, sokalmichener, _validate_vector, cdist_chunks,
+        pdist_chunks, cdist_nearest, cdist_within)
 
 
 _filenames = ["iris.txt",
@@ -1098,6 +1099,128 @@ def within_tol(a, b, tol):
     return np.abs(a - b).max() < tol
 
 
+class TestBlocked(TestCase):
+
+    metrics = ['euclidean', 'cityblock', 'seuclidean', 'cosine',
+               'correlation', 'mahalanobis', 'jaccard', 'hamming']
+
+    def setUp(self):
+        np.random.seed(1234)
+        # large enough for several tiles and blocks
+        self.XA = np.random.rand(500, 4)
+        self.XB = np.random.rand(20000, 4)
+
+    def test_cdist_n_jobs(self):
+        XA, XB = self.XA[:50], self.XB
+        for metric in self.metrics:
+            Y1 = cdist(XA, XB, metric)
+            for n_jobs in (2, -1):
+                Y2 = cdist(XA, XB, metric, n_jobs=n_jobs)
+                assert_allclose(Y1, Y2, rtol=1e-13, atol=1e-13)
+        assert_raises(ValueError, cdist, XA, XB, n_jobs=0)
+
+    def test_cdist_out(self):
+        XA, XB = self.XA, self.XB[:300]
+        out = np.empty((500, 300))
+        Y = cdist(XA, XB, 'minkowski', p=3, out=out, n_jobs=2)
+        assert_(Y is out)
+        assert_allclose(out, cdist(XA, XB, 'test_minkowski', p=3))
+        assert_raises(ValueError, cdist, XA, XB, out=np.empty((300, 500)))
+        assert_raises(ValueError, cdist, XA, XB,
+                      out=np.empty((500, 300), dtype=np.float32))
+
+    def test_cdist_chunks(self):
+        XA, XB = self.XA, self.XB[:300]
+        for metric in self.metrics:
+            blocks = list(cdist_chunks(XA, XB, metric, chunk_size=10000,
+                                       n_jobs=2))
+            assert_(all(b.size <= 10000 for b in blocks))
+            assert_allclose(np.vstack(blocks), cdist(XA, XB, metric))
+
+    def test_pdist_n_jobs(self):
+        X = self.XA
+        for metric in self.metrics:
+            Y1 = pdist(X, metric)
+            for n_jobs in (2, 3, -1):
+                Y2 = pdist(X, metric, n_jobs=n_jobs)
+                assert_allclose(Y1, Y2, rtol=1e-13, atol=1e-13)
+        for m in (0, 1, 2):
+            assert_equal(pdist(X[:m], n_jobs=2), pdist(X[:m]))
+
+    def test_pdist_out(self):
+        X = self.XA
+        out = np.empty(500 * 499 // 2)
+        for n_jobs in (1, 2):
+            Y = pdist(X, 'sqeuclidean', out=out, n_jobs=n_jobs)
+            assert_(Y is out)
+            assert_allclose(out, pdist(X, 'test_euclidean')**2)
+        assert_raises(ValueError, pdist, X, out=np.empty(100))
+
+    def test_pdist_chunks(self):
+        X = self.XA
+        for metric in self.metrics:
+            blocks = list(pdist_chunks(X, metric, chunk_size=10000,
+                                       n_jobs=2))
+            assert_(len(blocks) > 1)
+            assert_allclose(np.concatenate(blocks), pdist(X, metric))
+
+
+class TestReductions(TestCase):
+
+    metrics = [('euclidean', {}), ('seuclidean', {}), ('mahalanobis', {}),
+               ('wminkowski', {'p': 3, 'w': [1., 2., 3., 4.]}),
+               ('cosine', {}), ('braycurtis', {})]
+
+    def setUp(self):
+        np.random.seed(1234)
+        self.XA = np.random.rand(200, 4)
+        self.XB = np.random.rand(300, 4)
+
+    def test_cdist_nearest(self):
+        XA, XB = self.XA, self.XB
+        for metric, kwargs in self.metrics:
+            Y = cdist(XA, XB, metric, **kwargs)
+            for n_jobs in (1, 2):
+                d, i = cdist_nearest(XA, XB, k=4, metric=metric,
+                                     chunk_size=1000, n_jobs=n_jobs,
+                                     **kwargs)
+                assert_allclose(d, np.sort(Y, axis=1)[:, :4])
+                assert_allclose(Y[np.arange(200)[:, np.newaxis], i], d)
+
+    def test_cdist_nearest_k_large(self):
+        XA, XB = self.XA, self.XB[:3]
+        d, i = cdist_nearest(XA, XB, k=5)
+        assert_allclose(d[:, :3], np.sort(cdist(XA, XB), axis=1))
+        assert_(np.all(np.isinf(d[:, 3:])))
+        assert_equal(i[:, 3:], 3)
+        assert_raises(ValueError, cdist_nearest, XA, XB, k=0)
+
+    def test_cdist_within(self):
+        XA, XB = self.XA, self.XB
+        for metric, kwargs in self.metrics:
+            Y = cdist(XA, XB, metric, **kwargs)
+            r = np.percentile(Y, 5)
+            for format in ('coo', 'csr'):
+                for n_jobs in (1, 3):
+                    M = cdist_within(XA, XB, r, metric, format=format,
+                                     chunk_size=1000, n_jobs=n_jobs,
+                                     **kwargs)
+                    assert_equal(M.format, format)
+                    assert_equal(M.nnz, (Y <= r).sum())
+                    assert_allclose(M.toarray(), np.where(Y <= r, Y, 0))
+        assert_raises(ValueError, cdist_within, XA, XB, 0.1, format='dok')
+
+    def test_cdist_within_empty(self):
+        XA, XB = self.XA, self.XB
+        for format in ('coo', 'csr'):
+            M = cdist_within(XA[:0], XB, 1., format=format)
+            assert_equal(M.shape, (0, XB.shape[0]))
+            assert_equal(M.format, format)
+            M = cdist_within(XA, XB, -1., format=format)
+            assert_equal(M.shape, (XA.shape[0], XB.shape[0]))
+            assert_equal(M.nnz, 0)
+
+
 def _assert_within_tol(a, b, atol, verbose_=False):
     if verbose_:
         print(np.abs(a-b).max())
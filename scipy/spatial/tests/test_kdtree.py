@@ -3,8 +3,13 @@
 
 from __future__ import division, print_function, absolute_import
 
+import os
+import pickle
+import tempfile
+
 from numpy.testing import (assert_equal, assert_array_equal,
-    assert_almost_equal, assert_array_almost_equal, assert_, run_module_suite)
+    assert_almost_equal, assert_array_almost_equal, assert_, assert_raises,
+    run_module_suite)
 
 import numpy as np
 from scipy.spatial import KDTree, Rectangle, distance_matrix, cKDTree
@@ -557,6 +562,58 @@ class test_count_neighbors_compiled:
         for r,result in zip(rs, results):
             assert_equal(self.T1.count_neighbors(self.T2, r), result)
 
+    def test_unsorted_radius(self):
+        rs = np.array([0.5, 0.1, 2., 0.1, np.inf])
+        results = self.T1.count_neighbors(self.T2, rs)
+        for r,result in zip(rs, results):
+            assert_equal(self.T1.count_neighbors(self.T2, r), result)
+
+    def test_non_cumulative(self):
+        rs = np.array([0., 0.1, 0.5, 0.5, 1., 10.])
+        results = self.T1.count_neighbors(self.T2, rs, cumulative=False)
+        assert_equal(np.cumsum(results), self.T1.count_neighbors(self.T2, rs))
+        assert_raises(ValueError, self.T1.count_neighbors, self.T2, rs[::-1],
+                      cumulative=False)
+
+    def test_weights(self):
+        rs = np.array([0.1, 0.5, 1., 10.])
+        w1 = np.random.rand(self.T1.n)
+        w2 = np.random.rand(self.T2.n)
+        d = distance_matrix(self.T1.data, self.T2.data)
+        for weights, w in [((w1, w2), np.outer(w1, w2)),
+                           ((w1, None), w1[:,None] * np.ones(self.T2.n)),
+                           ((None, None), np.ones((self.T1.n, self.T2.n)))]:
+            results = self.T1.count_neighbors(self.T2, rs, weights=weights)
+            assert_array_almost_equal(results, [w[d <= r].sum() for r in rs])
+            assert_equal(results.dtype, np.float64)
+        # unweighted counts are exact integers
+        assert_equal(self.T1.count_neighbors(self.T2, rs).dtype, np.intp)
+        assert_almost_equal(self.T1.count_neighbors(self.T2, 0.5,
+                                                    weights=(w1, w2)),
+                            np.outer(w1, w2)[d <= 0.5].sum())
+
+        d = distance_matrix(self.T1.data, self.T1.data)
+        assert_array_almost_equal(
+            self.T1.count_neighbors(self.T1, rs, weights=w1),
+            [np.outer(w1, w1)[d <= r].sum() for r in rs])
+        assert_raises(ValueError, self.T1.count_neighbors, self.T2, rs,
+                      weights=w1)
+        assert_raises(ValueError, self.T1.count_neighbors, self.T2, rs,
+                      weights=(w1[:-1], None))
+
+    def test_n_jobs(self):
+        rs = np.exp(np.linspace(np.log(0.01),np.log(10),5))
+        w1 = np.random.rand(self.T1.n)
+        expected = self.T1.count_neighbors(self.T2, rs)
+        expected_w = self.T1.count_neighbors(self.T2, rs, weights=(w1, None))
+        for n_jobs in (2, 5, -1):
+            assert_equal(self.T1.count_neighbors(self.T2, rs, n_jobs=n_jobs),
+                         expected)
+            assert_array_almost_equal(
+                self.T1.count_neighbors(self.T2, rs, weights=(w1, None),
+                                        n_jobs=n_jobs),
+                expected_w)
+
 
 class test_sparse_distance_matrix:
     def setUp(self):
@@ -721,6 +778,177 @@ def test_kdtree_comparisons():
     assert_equal(sorted(nodes), sorted(nodes[::-1]))
 
 
+def test_ckdtree_query_n_jobs():
+    np.random.seed(1234)
+    T = cKDTree(np.random.randn(1000, 3))
+    x = np.random.randn(257, 3)
+    d, i = T.query(x, k=4)
+    for n_jobs in (2, 3, -1):
+        dd, ii = T.query(x, k=4, n_jobs=n_jobs)
+        assert_array_equal(d, dd)
+        assert_array_equal(i, ii)
+
+    d, i = T.query(x, k=4, distance_upper_bound=0.1, n_jobs=4)
+    d0, i0 = T.query(x, k=4, distance_upper_bound=0.1)
+    assert_array_equal(d, d0)
+    assert_array_equal(i, i0)
+
+
+def test_ckdtree_query_ball_point_n_jobs():
+    np.random.seed(1234)
+    T = cKDTree(np.random.randn(1000, 3))
+    x = np.random.randn(5, 7, 3)
+    r = T.query_ball_point(x, 0.5)
+    for n_jobs in (2, 3, -1):
+        rr = T.query_ball_point(x, 0.5, n_jobs=n_jobs)
+        assert_equal(rr.shape, (5, 7))
+        for c in np.ndindex(r.shape):
+            assert_equal(r[c], rr[c])
+    assert_equal(T.query_ball_point(x[0, 0], 0.5, n_jobs=2), r[0, 0])
+
+
+def test_ckdtree_invalid_n_jobs():
+    T = cKDTree(np.random.randn(10, 2))
+    assert_raises(ValueError, T.query, np.zeros((3, 2)), n_jobs=0)
+    assert_raises(ValueError, T.query_ball_point, np.zeros((3, 2)), 1.,
+                  n_jobs=-2)
+
+
+def test_ckdtree_pickle():
+    np.random.seed(1234)
+    T = cKDTree(np.random.randn(1000, 3), leafsize=7)
+    x = np.random.randn(100, 3)
+    d, i = T.query(x, k=3)
+    for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+        T2 = pickle.loads(pickle.dumps(T, protocol=protocol))
+        assert_equal(T2.leafsize, 7)
+        assert_array_equal(T2.data, T.data)
+        dd, ii = T2.query(x, k=3)
+        assert_array_equal(d, dd)
+        assert_array_equal(i, ii)
+        assert_equal(T2.query_pairs(0.1), T.query_pairs(0.1))
+
+
+def test_ckdtree_save_load():
+    np.random.seed(1234)
+    T = cKDTree(np.random.randn(1000, 3))
+    x = np.random.randn(100, 3)
+    d, i = T.query(x, k=3)
+    fd, fname = tempfile.mkstemp(suffix='.ckdtree')
+    os.close(fd)
+    try:
+        T.save(fname)
+        for mmap_mode in (None, 'r', 'c'):
+            T2 = cKDTree.load(fname, mmap_mode=mmap_mode)
+            assert_equal(isinstance(T2.data, np.memmap), mmap_mode is not None)
+            assert_array_equal(T2.data, T.data)
+            assert_array_equal(T2.mins, T.mins)
+            assert_array_equal(T2.maxes, T.maxes)
+            dd, ii = T2.query(x, k=3)
+            assert_array_equal(d, dd)
+            assert_array_equal(i, ii)
+            assert_equal(T2.count_neighbors(T, 0.2), T.count_neighbors(T, 0.2))
+            del T2
+        assert_raises(ValueError, cKDTree.load, fname, mmap_mode='r+')
+
+        with open(fname, 'wb') as f:
+            f.write(b'\0' * 100)
+        assert_raises(ValueError, cKDTree.load, fname)
+    finally:
+        os.remove(fname)
+
+
+def test_ckdtree_balanced():
+    np.random.seed(1234)
+    # clustered data, with duplicates, to exercise the median split
+    data = np.vstack([np.random.randn(500, 3),
+                      0.01*np.random.randn(500, 3) + 5,
+                      np.ones((50, 3))])
+    x = np.random.randn(100, 3)
+    T1 = cKDTree(data)
+    T2 = cKDTree(data, balanced_tree=True)
+    d1, i1 = T1.query(x, k=4)
+    d2, i2 = T2.query(x, k=4)
+    assert_array_almost_equal(d1, d2)
+    r1 = T1.query_ball_point(x, 0.5)
+    r2 = T2.query_ball_point(x, 0.5)
+    for a, b in zip(r1, r2):
+        assert_equal(sorted(a), sorted(b))
+    assert_equal(T1.count_neighbors(T1, 0.3), T2.count_neighbors(T2, 0.3))
+
+    stats = T2.tree_stats()
+    assert_(stats['max_leaf_size'] <= 50)
+    assert_(stats['depth'] <= 2 + int(np.log2(data.shape[0])))
+    assert_equal(stats['n_nodes'], 2*stats['n_leaves'] - 1)
+
+
+def test_ckdtree_build_n_jobs():
+    np.random.seed(1234)
+    data = np.random.randn(5000, 3)
+    x = np.random.randn(100, 3)
+    for balanced_tree in (False, True):
+        T1 = cKDTree(data, balanced_tree=balanced_tree)
+        d1, i1 = T1.query(x, k=3)
+        for n_jobs in (2, 3, -1):
+            T2 = cKDTree(data, balanced_tree=balanced_tree, n_jobs=n_jobs)
+            assert_equal(T2.tree_stats(), T1.tree_stats())
+            d2, i2 = T2.query(x, k=3)
+            assert_array_equal(d1, d2)
+            assert_array_equal(i1, i2)
+    assert_raises(ValueError, cKDTree, data, n_jobs=0)
+
+
+def test_ckdtree_tree_stats():
+    np.random.seed(1234)
+    T = cKDTree(np.random.randn(1000, 2), leafsize=10)
+    stats = T.tree_stats()
+    assert_equal(stats['n_nodes'], 2*stats['n_leaves'] - 1)
+    assert_(stats['max_leaf_size'] <= 10)
+    assert_almost_equal(stats['mean_leaf_size'], 1000./stats['n_leaves'])
+    T2 = pickle.loads(pickle.dumps(T))
+    assert_equal(T2.tree_stats(), stats)
+
+
+def test_ckdtree_periodic():
+    np.random.seed(1234)
+    boxsize = np.array([1.0, 2.0, np.inf])
+    data = np.random.rand(300, 3) * [1.0, 2.0, 1.0]
+    x = np.random.rand(50, 3) * [3.0, 4.0, 1.0] - [1.0, 1.0, 0.0]
+
+    def periodic_distance(a, b, p):
+        z = np.abs(a[..., None, :] - b[None, ...])
+        z = np.where(np.isfinite(boxsize), np.minimum(z % boxsize,
+                                                      boxsize - z % boxsize), z)
+        return distance(z, 0, p)
+
+    T = cKDTree(data, leafsize=4, boxsize=boxsize)
+    T2 = cKDTree(data, leafsize=4, boxsize=boxsize)
+    for p in (1, 2, 3.5, np.inf):
+        dd = periodic_distance(x, data, p)
+        d, i = T.query(x, k=4, p=p)
+        assert_array_almost_equal(d, np.sort(dd, axis=1)[:, :4])
+        for k, ball in enumerate(T.query_ball_point(x, 0.3, p=p)):
+            assert_equal(sorted(ball), np.nonzero(dd[k] <= 0.3)[0])
+
+        ddself = periodic_distance(data, data, p)
+        pairs = T.query_pairs(0.2, p=p)
+        assert_equal(pairs, set((a, b) for a, b in
+                                zip(*np.nonzero(ddself <= 0.2)) if a < b))
+        r = np.array([0.1, 0.2, 0.5])
+        assert_equal(T.count_neighbors(T, r, p=p),
+                     [(ddself <= rr).sum() for rr in r])
+        M = T.sparse_distance_matrix(T2, 0.2, p=p).toarray()
+        assert_array_almost_equal(M, np.where(ddself <= 0.2, ddself, 0))
+
+    T3 = pickle.loads(pickle.dumps(T))
+    assert_array_equal(T3.boxsize, T.boxsize)
+    assert_array_equal(T3.query(x, k=4)[1], T.query(x, k=4)[1])
+
+    assert_raises(ValueError, cKDTree, data + 1.0, boxsize=boxsize)
+    assert_raises(ValueError, cKDTree, data, boxsize=-1.0)
+    assert_raises(ValueError, T.count_neighbors, cKDTree(data), 0.1)
+
+
 # cKDTree is specialized to type double points, so no need to make
 # a unit test corresponding to test_ball_point_ints()
 
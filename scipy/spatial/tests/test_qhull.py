@@ -190,6 +190,29 @@ class TestUtilities(object):
             j = qhull.tsearch(tri, p[:2])
             assert_equal(i, j)
 
+    def test_find_simplex_many(self):
+        # Threaded search and the different walk starting points should
+        # locate random points in the same simplices as the default search
+        np.random.seed(1234)
+        for ndim in [2, 3, 4]:
+            tri = qhull.Delaunay(np.random.rand(200, ndim))
+            xi = np.random.rand(2000, ndim) * 1.2 - 0.1
+            expected = tri.find_simplex(xi)
+            assert_((expected == -1).any())
+
+            for walk_start in ['previous', 'sorted', 'grid']:
+                for n_jobs in [1, 3]:
+                    j = tri.find_simplex(xi, n_jobs=n_jobs,
+                                         walk_start=walk_start)
+                    assert_equal(j, expected, err_msg="%r %r" % (walk_start,
+                                                                 n_jobs))
+
+            j = tri.find_simplex(xi.reshape(40, 50, ndim), walk_start='grid')
+            assert_equal(j, expected.reshape(40, 50))
+
+        assert_raises(ValueError, tri.find_simplex, xi, walk_start='foo')
+        assert_raises(ValueError, tri.find_simplex, xi, n_jobs=0)
+
     def test_plane_distance(self):
         # Compare plane distance from hyperplane equations obtained from Qhull
         # to manually computed plane equations
@@ -618,6 +641,32 @@ class TestConvexHull:
         for name in sorted(INCREMENTAL_DATASETS):
             yield check, name
 
+    def test_from_chunks(self):
+        # The hull built from chunks should have the same vertices as the
+        # hull of all the points
+        np.random.seed(1234)
+        sphere = np.random.randn(500, 3)
+        sphere /= np.sqrt((sphere**2).sum(axis=1))[:,None]
+        line = np.c_[np.linspace(0, 1, 10), np.linspace(0, 1, 10)]
+
+        for points, nchunks in [(np.random.randn(5000, 2), 7),
+                                (np.random.randn(5000, 3), 5),
+                                (np.random.randn(2000, 4), 3),
+                                (sphere, 4),
+                                (np.r_[line, np.random.rand(100, 2)], 11)]:
+            hull = qhull.ConvexHull.from_chunks(np.array_split(points,
+                                                               nchunks))
+            expected = qhull.ConvexHull(points)
+            assert_equal(np.sort(hull.point_indices),
+                         np.sort(expected.vertices))
+            assert_equal(hull.points, points[hull.point_indices])
+            assert_hulls_equal(hull.points, hull.simplices,
+                               qhull.ConvexHull(hull.points).simplices)
+
+        assert_raises(ValueError, qhull.ConvexHull.from_chunks, [])
+        assert_raises(ValueError, qhull.ConvexHull.from_chunks,
+                      [np.random.rand(10, 2), np.random.rand(10, 3)])
+
     def test_vertices_2d(self):
         # The vertices should be in counterclockwise order in 2-D
         np.random.seed(1234)
@@ -764,6 +813,68 @@ class TestVoronoi:
         """
         self._compare_qvoronoi(points, output, furthest_site=True)
 
+    def test_volumes_and_adjacency(self):
+        # Compare against volumes of the triangulated regions and ridges
+
+        def simplex_volume(points):
+            tri = qhull.Delaunay(points)
+            edges = points[tri.simplices[:,1:]] - points[tri.simplices[:,:1]]
+            ndim = points.shape[1]
+            return (sum(abs(np.linalg.det(e)) for e in edges) /
+                    np.prod(np.arange(1, ndim + 1)))
+
+        def check(ndim, npoints):
+            np.random.seed(1234)
+            points = np.random.rand(npoints, ndim)
+            vor = qhull.Voronoi(points)
+
+            volumes = vor.region_volumes
+            assert_equal(volumes.shape, (len(vor.regions),))
+            for volume, region in zip(volumes, vor.regions):
+                if not region:
+                    assert_(np.isnan(volume))
+                elif -1 in region:
+                    assert_equal(volume, np.inf)
+                else:
+                    assert_allclose(volume,
+                                    simplex_volume(vor.vertices[region]),
+                                    rtol=1e-10)
+
+            areas = vor.ridge_areas
+            assert_equal(areas.shape, (len(vor.ridge_vertices),))
+            for area, ridge, p in zip(areas, vor.ridge_vertices,
+                                      vor.ridge_points):
+                if -1 in ridge:
+                    assert_equal(area, np.inf)
+                elif ndim == 2:
+                    assert_allclose(area, np.sqrt(((vor.vertices[ridge[0]] -
+                                                    vor.vertices[ridge[1]])**2).sum()))
+                else:
+                    # pyramid over the ridge with a point as apex
+                    apex = points[p[0]]
+                    height = np.sqrt(((points[p[0]] - points[p[1]])**2).sum())/2
+                    vertices = np.vstack([vor.vertices[ridge], apex])
+                    assert_allclose(area * height / ndim,
+                                    simplex_volume(vertices), rtol=1e-10)
+
+            adjacency = vor.adjacency.toarray()
+            expected = np.zeros((npoints, npoints), dtype=bool)
+            expected[vor.ridge_points[:,0], vor.ridge_points[:,1]] = True
+            expected[vor.ridge_points[:,1], vor.ridge_points[:,0]] = True
+            assert_array_equal(adjacency, expected)
+
+            # cached
+            assert_(vor.region_volumes is volumes)
+
+        yield check, 2, 100
+        yield check, 3, 100
+        yield check, 4, 40
+
+        # unit cubes in the interior of a lattice
+        points = np.indices((4, 4, 4)).reshape(3, -1).T.astype(float)
+        volumes = qhull.Voronoi(points).region_volumes
+        assert_allclose(volumes[np.isfinite(volumes)], 1)
+
     def test_incremental(self):
         # Test incremental construction of the triangulation
 